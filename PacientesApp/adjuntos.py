@@ -0,0 +1,435 @@
+"""
+Adjuntos clínicos: radiografías, escaneos y documentos de los pacientes.
+
+    - Subida en partes (SubidaAdjunto): el navegador manda el archivo en partes de
+      hasta ADJUNTOS_MAX_BYTES_POR_PARTE con Content-Range; cada parte se escribe
+      en disco a medida que llega (nunca entera en memoria). Si se corta, se pide el
+      estado y se sigue desde `recibidos`.
+    - Deduplicación: al completarse se calcula el SHA-256; si ese contenido ya
+      existe (otro paciente, la misma radiografía subida dos veces) se reutiliza.
+    - Almacenamiento (storage 'adjuntos', fuera de MEDIA_ROOT) en rutas repartidas
+      por el hash: archivos/ab/cd/abcd…, así ningún directorio junta miles de archivos.
+    - Descarga en streaming con soporte de Range (visores y descargas retomables).
+    - Miniaturas de las imágenes, generadas la primera vez que se piden.
+"""
+import hashlib
+from io import BytesIO
+from pathlib import Path, PurePath
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files import File
+from django.core.files.base import ContentFile
+from django.core.files.storage import storages
+from django.db import IntegrityError, transaction
+from django.db.models import ProtectedError
+from django.http import HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.cache import patch_cache_control
+from django.utils.http import content_disposition_header
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+
+CARPETA = 'archivos'
+CARPETA_MINIATURAS = 'miniaturas'
+
+# Bytes por lectura/escritura al recibir, calcular el hash y descargar
+BLOQUE = 64 * 1024
+
+# Extensiones aceptadas y el tipo que se declara (imágenes, PDF y DICOM se verifican por contenido)
+EXTENSIONES = {
+    '.jpg': 'image/jpeg',
+    '.jpeg': 'image/jpeg',
+    '.png': 'image/png',
+    '.webp': 'image/webp',
+    '.tif': 'image/tiff',
+    '.tiff': 'image/tiff',
+    '.bmp': 'image/bmp',
+    '.pdf': 'application/pdf',
+    '.dcm': 'application/dicom',
+    '.stl': 'model/stl',
+}
+
+_FORMATOS_IMAGEN = {
+    'JPEG': 'image/jpeg',
+    'PNG': 'image/png',
+    'WEBP': 'image/webp',
+    'TIFF': 'image/tiff',
+    'BMP': 'image/bmp',
+}
+
+# Se muestran en el navegador; el resto se descarga
+TIPOS_EN_LINEA = {'image/jpeg', 'image/png', 'image/webp', 'application/pdf'}
+
+
+class DesfaseSubida(Exception):
+    """La parte no empieza donde termina lo recibido (parte repetida o fuera de orden)"""
+
+    def __init__(self, recibidos):
+        super().__init__(f'Se esperaba la parte que empieza en el byte {recibidos}.')
+        self.recibidos = recibidos
+
+
+def almacenamiento():
+    return storages['adjuntos']
+
+
+def _repartida(carpeta, sha256, sufijo=''):
+    return f'{carpeta}/{sha256[:2]}/{sha256[2:4]}/{sha256}{sufijo}'
+
+
+def ruta_archivo(sha256):
+    return _repartida(CARPETA, sha256)
+
+
+def ruta_miniatura(sha256, tamanio):
+    return _repartida(CARPETA_MINIATURAS, sha256, f'-{tamanio}.webp')
+
+
+def tamanios_miniatura():
+    return getattr(settings, 'ADJUNTOS_MINIATURAS', {'chica': 200, 'grande': 1024})
+
+
+def maximo_por_parte():
+    return getattr(settings, 'ADJUNTOS_MAX_BYTES_POR_PARTE', 8 * 1024 * 1024)
+
+
+# ========== SUBIDA EN PARTES ==========
+
+def _ruta_subida(subida):
+    directorio = Path(getattr(settings, 'ADJUNTOS_SUBIDAS_DIR', settings.BASE_DIR / 'adjuntos' / 'subidas'))
+    return directorio / f'{subida.pk}.part'
+
+
+def tipo_declarado(nombre):
+    """Tipo de contenido según la extensión (ValidationError si no se acepta)"""
+    tipo = EXTENSIONES.get(PurePath(nombre).suffix.lower())
+    if tipo is None:
+        raise ValidationError('Tipo de archivo no permitido (imágenes, PDF, DICOM o STL).')
+    return tipo
+
+
+def iniciar_subida(paciente, usuario, nombre, tamanio, tipo, descripcion=''):
+    """
+    Subida nueva, o la que el mismo usuario dejó sin terminar para ese archivo
+    (mismo paciente, nombre y tamaño): así se retoma después de recargar la página.
+    """
+    from .models import SubidaAdjunto
+
+    nombre = PurePath(nombre.replace('\\', '/')).name[:255]
+    tipo_declarado(nombre)
+    maximo = getattr(settings, 'ADJUNTOS_MAX_BYTES', 500 * 1024 * 1024)
+    if not 0 < tamanio <= maximo:
+        raise ValidationError(f'El archivo debe tener entre 1 byte y {maximo // (1024 * 1024)} MB.')
+
+    subida = SubidaAdjunto.objects.filter(
+        paciente=paciente, usuario=usuario, nombre=nombre, tamanio=tamanio
+    ).order_by('-fecha_modificacion').first()
+    if subida is not None:
+        return subida
+
+    subida = SubidaAdjunto.objects.create(
+        paciente=paciente, usuario=usuario, nombre=nombre, tamanio=tamanio, tipo=tipo, descripcion=descripcion
+    )
+    ruta = _ruta_subida(subida)
+    ruta.parent.mkdir(parents=True, exist_ok=True)
+    ruta.touch()
+    return subida
+
+
+def recibir_parte(subida, desde, flujo, largo):
+    """
+    Escribe `largo` bytes leídos de `flujo` a partir del byte `desde`.
+    Retorna el Adjunto si con esta parte se completó el archivo, o None.
+
+    No toma bloqueos mientras llegan los datos: `recibidos` avanza con un UPDATE
+    condicionado a que siga valiendo `desde`. Dos envíos de la misma parte (un
+    reintento) escriben los mismos bytes en el mismo lugar y solo uno avanza.
+    """
+    from .models import SubidaAdjunto
+
+    if desde != subida.recibidos:
+        raise DesfaseSubida(subida.recibidos)
+    if not 0 < largo <= maximo_por_parte() or desde + largo > subida.tamanio:
+        raise ValidationError('Parte de tamaño inválido.')
+
+    ruta = _ruta_subida(subida)
+    if not ruta.exists():
+        raise ValidationError('La subida ya no existe: hay que empezarla de nuevo.')
+
+    restante = largo
+    with open(ruta, 'r+b') as destino:
+        destino.seek(desde)
+        while restante:
+            bloque = flujo.read(min(BLOQUE, restante))
+            if not bloque:
+                break
+            destino.write(bloque)
+            restante -= len(bloque)
+    if restante:
+        # Lo escrito queda después de `recibidos`: el reintento lo sobrescribe
+        raise ValidationError('La parte llegó incompleta.')
+
+    # update() no aplica auto_now: sin la fecha, limpiar() vería vieja una subida en curso
+    avanzo = SubidaAdjunto.objects.filter(pk=subida.pk, recibidos=desde).update(
+        recibidos=desde + largo,
+        fecha_modificacion=timezone.now()
+    )
+    if not avanzo:
+        # Otro envío de la misma parte avanzó primero (y completa el archivo si era la última)
+        subida.refresh_from_db(fields=['recibidos'])
+        return None
+
+    subida.recibidos = desde + largo
+    if subida.recibidos < subida.tamanio:
+        return None
+    return completar_subida(subida)
+
+
+def _sha256(archivo):
+    hash_contenido = hashlib.sha256()
+    for bloque in iter(lambda: archivo.read(BLOQUE), b''):
+        hash_contenido.update(bloque)
+    return hash_contenido.hexdigest()
+
+
+def _identificar(ruta, tipo):
+    """(tipo de contenido, ancho, alto) verificando el contenido; ValidationError si no coincide"""
+    if tipo.startswith('image/'):
+        try:
+            with Image.open(ruta) as imagen:
+                formato = imagen.format
+                ancho, alto = imagen.size
+                imagen.verify()
+        except (UnidentifiedImageError, OSError, Image.DecompressionBombError):
+            raise ValidationError('El archivo no es una imagen válida.')
+        if formato not in _FORMATOS_IMAGEN:
+            raise ValidationError('Formato de imagen no permitido.')
+        return _FORMATOS_IMAGEN[formato], ancho, alto
+
+    with open(ruta, 'rb') as archivo:
+        inicio = archivo.read(132)
+    if tipo == 'application/pdf' and not inicio.startswith(b'%PDF-'):
+        raise ValidationError('El archivo no es un PDF válido.')
+    if tipo == 'application/dicom' and inicio[128:132] != b'DICM':
+        raise ValidationError('El archivo no es un DICOM válido.')
+    return tipo, None, None
+
+
+def _guardar_contenido(ruta, sha256):
+    """
+    Deja el contenido de `ruta` en ruta_archivo(sha256). Lo que ya esté guardado
+    ahí se reutiliza solo si tiene ese hash (un corte a mitad de escritura deja
+    un archivo incompleto con el nombre correcto).
+    """
+    storage = almacenamiento()
+    destino = ruta_archivo(sha256)
+    if storage.exists(destino):
+        with storage.open(destino, 'rb') as guardado:
+            if _sha256(guardado) == sha256:
+                return
+        storage.delete(destino)
+
+    with open(ruta, 'rb') as contenido:
+        nombre = storage.save(destino, File(contenido))
+    if nombre != destino:
+        # Otra subida del mismo contenido lo guardó a la vez: el suyo es igual a este
+        storage.delete(nombre)
+
+
+def completar_subida(subida):
+    """Verifica el archivo recibido, lo guarda (o reutiliza si ya existía) y crea el Adjunto"""
+    from .models import ArchivoClinico, Adjunto
+
+    ruta = _ruta_subida(subida)
+    try:
+        tipo, ancho, alto = _identificar(ruta, tipo_declarado(subida.nombre))
+        with open(ruta, 'rb') as contenido:
+            sha256 = _sha256(contenido)
+
+        with transaction.atomic():
+            # Mismo bloqueo que limpiar(): el archivo no se borra mientras se le suma un adjunto
+            archivo = ArchivoClinico.objects.select_for_update().filter(sha256=sha256).first()
+            if archivo is None:
+                _guardar_contenido(ruta, sha256)
+                try:
+                    with transaction.atomic():
+                        archivo = ArchivoClinico.objects.create(
+                            sha256=sha256, tamanio=subida.tamanio, tipo_contenido=tipo, ancho=ancho, alto=alto
+                        )
+                except IntegrityError:
+                    # Se completó la misma subida (u otra con el mismo contenido) a la vez
+                    archivo = ArchivoClinico.objects.select_for_update().get(sha256=sha256)
+
+            adjunto = Adjunto.objects.create(
+                paciente_id=subida.paciente_id,
+                archivo=archivo,
+                nombre=subida.nombre,
+                tipo=subida.tipo,
+                descripcion=subida.descripcion,
+                usuario_registro_id=subida.usuario_id,
+            )
+            subida.delete()
+    except ValidationError:
+        subida.delete()
+        ruta.unlink(missing_ok=True)
+        raise
+
+    ruta.unlink(missing_ok=True)
+    return adjunto
+
+
+# ========== DESCARGA ==========
+
+def _rango(encabezado, total):
+    """
+    (inicio, fin) pedido en un encabezado Range de un solo rango, None si no hay
+    (o no se entiende: se manda el archivo entero) y False si no se puede satisfacer
+    """
+    if not encabezado or not encabezado.startswith('bytes=') or ',' in encabezado:
+        return None
+    inicio, _, fin = encabezado[len('bytes='):].strip().partition('-')
+    try:
+        if inicio == '':
+            # Los últimos N bytes
+            largo = int(fin)
+            if largo <= 0:
+                return False
+            return max(total - largo, 0), total - 1
+        inicio = int(inicio)
+        fin = int(fin) if fin else total - 1
+    except ValueError:
+        return None
+    if inicio >= total or fin < inicio:
+        return False
+    return inicio, min(fin, total - 1)
+
+
+def _leer(ruta, inicio, largo):
+    with almacenamiento().open(ruta, 'rb') as archivo:
+        archivo.seek(inicio)
+        while largo > 0:
+            bloque = archivo.read(min(BLOQUE, largo))
+            if not bloque:
+                break
+            largo -= len(bloque)
+            yield bloque
+
+
+def respuesta_adjunto(request, adjunto):
+    """Contenido del adjunto en streaming, entero o el rango pedido (206)"""
+    archivo = adjunto.archivo
+    etag = f'"{archivo.sha256}"'
+
+    if etag in request.headers.get('If-None-Match', ''):
+        response = HttpResponseNotModified()
+        response['ETag'] = etag
+        return response
+
+    total = archivo.tamanio
+    rango = None
+    # If-Range: el rango vale solo si el cliente tiene esta misma versión
+    if request.headers.get('If-Range', etag) == etag:
+        rango = _rango(request.headers.get('Range'), total)
+    if rango is False:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{total}'
+        return response
+
+    inicio, fin = rango or (0, total - 1)
+    response = StreamingHttpResponse(
+        _leer(ruta_archivo(archivo.sha256), inicio, fin - inicio + 1),
+        status=206 if rango else 200,
+        content_type=archivo.tipo_contenido
+    )
+    response['Content-Length'] = fin - inicio + 1
+    if rango:
+        response['Content-Range'] = f'bytes {inicio}-{fin}/{total}'
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    response['Content-Disposition'] = content_disposition_header(
+        archivo.tipo_contenido not in TIPOS_EN_LINEA, adjunto.nombre
+    )
+    response['X-Content-Type-Options'] = 'nosniff'
+    # private: datos clínicos, solo con sesión; el contenido de un adjunto no cambia
+    patch_cache_control(response, private=True, max_age=24 * 60 * 60)
+    return response
+
+
+# ========== MINIATURAS ==========
+
+def _a_rgb(imagen):
+    """RGB de 8 bits: escala las radiografías de 16 bits y aplana la transparencia sobre blanco"""
+    if imagen.mode in ('I;16', 'I;16B', 'I;16L', 'I'):
+        imagen = imagen.convert('I').point(lambda valor: valor * (1 / 256)).convert('L')
+    if imagen.mode in ('RGBA', 'LA', 'P'):
+        imagen = imagen.convert('RGBA')
+        fondo = Image.new('RGB', imagen.size, (255, 255, 255))
+        fondo.paste(imagen, mask=imagen.getchannel('A'))
+        return fondo
+    return imagen.convert('RGB')
+
+
+def generar_miniatura(archivo, tamanio):
+    """
+    Genera (si falta) la miniatura WEBP de una imagen, sin recortar, y retorna su
+    ruta; None si el archivo no es una imagen. Dos procesos generando a la vez escriben lo mismo.
+    """
+    if not archivo.es_imagen():
+        return None
+
+    ruta = ruta_miniatura(archivo.sha256, tamanio)
+    storage = almacenamiento()
+    if storage.exists(ruta):
+        return ruta
+
+    lado = tamanios_miniatura()[tamanio]
+    with storage.open(ruta_archivo(archivo.sha256), 'rb') as original, Image.open(original) as imagen:
+        # JPEG: decodifica directamente a una escala reducida (mucho menos memoria)
+        imagen.draft('RGB', (lado, lado))
+        miniatura = _a_rgb(ImageOps.exif_transpose(imagen))
+    miniatura.thumbnail((lado, lado), Image.Resampling.LANCZOS)
+
+    buffer = BytesIO()
+    miniatura.save(buffer, 'WEBP', quality=80, method=4)
+    if not storage.exists(ruta):
+        storage.save(ruta, ContentFile(buffer.getvalue()))
+    return ruta
+
+
+# ========== LIMPIEZA ==========
+
+def limpiar(horas=None):
+    """
+    Borra las subidas sin completar de hace más de `horas` (y sus partes en disco) y
+    los archivos que ya no tiene ningún adjunto, con sus miniaturas.
+    Retorna (subidas, archivos) borrados.
+    """
+    from datetime import timedelta
+    from .models import SubidaAdjunto, ArchivoClinico
+
+    horas = horas if horas is not None else getattr(settings, 'ADJUNTOS_SUBIDA_HORAS', 24)
+    vencidas = list(SubidaAdjunto.objects.filter(fecha_modificacion__lt=timezone.now() - timedelta(hours=horas)))
+    for subida in vencidas:
+        _ruta_subida(subida).unlink(missing_ok=True)
+        subida.delete()
+
+    storage = almacenamiento()
+    borrados = 0
+    for pk in ArchivoClinico.objects.filter(adjuntos__isnull=True).values_list('pk', flat=True):
+        try:
+            with transaction.atomic():
+                # Mismo bloqueo que completar_subida(): una subida de este contenido espera acá
+                archivo = ArchivoClinico.objects.select_for_update().filter(pk=pk).first()
+                if archivo is None:
+                    continue
+                archivo.delete()
+                # Antes del commit: la subida que esperaba ya no encuentra ni la fila ni el archivo
+                storage.delete(ruta_archivo(archivo.sha256))
+                for tamanio in tamanios_miniatura():
+                    storage.delete(ruta_miniatura(archivo.sha256, tamanio))
+        except ProtectedError:
+            # Volvió a usarse mientras tanto (PROTECT en Adjunto.archivo)
+            continue
+        borrados += 1
+
+    return len(vencidas), borrados
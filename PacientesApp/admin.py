@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Paciente, ObraSocial, CategoriaAntecedente, AntecedentePaciente
+from .models import Paciente, ObraSocial, Prestacion, CategoriaAntecedente, AntecedentePaciente, Diagnostico, EntradaClinica, VersionOdontograma, ArchivoClinico, Adjunto
 
 @admin.register(CategoriaAntecedente)
 class CategoriaAntecedenteAdmin(admin.ModelAdmin):
@@ -22,14 +22,84 @@ class AntecedentePacienteAdmin(admin.ModelAdmin):
 
 @admin.register(ObraSocial)
 class ObraSocialAdmin(admin.ModelAdmin):
-    list_display = ['nombre', 'codigo', 'activa']
+    list_display = ['nombre', 'sigla', 'codigo', 'activa']
     list_filter = ['activa']
-    search_fields = ['nombre', 'codigo']
+    search_fields = ['nombre', 'sigla', 'codigo']
+    
+
+@admin.register(Prestacion)
+class PrestacionAdmin(admin.ModelAdmin):
+    list_display = ['codigo', 'descripcion', 'capitulo', 'activa']
+    list_filter = ['activa', 'capitulo']
+    search_fields = ['codigo', 'descripcion']
+    
+@admin.register(Diagnostico)
+class DiagnosticoAdmin(admin.ModelAdmin):
+    list_display = ['codigo', 'descripcion', 'activo']
+    list_filter = ['activo']
+    search_fields = ['codigo', 'descripcion']
+
+@admin.register(EntradaClinica)
+class EntradaClinicaAdmin(admin.ModelAdmin):
+    """Solo lectura: las entradas se registran desde la historia clínica y no se modifican"""
+    list_display = ['fecha', 'paciente', 'profesional', 'diagnostico', 'pieza']
+    list_filter = ['fecha']
+    search_fields = ['paciente__dni', 'paciente__apellido', 'diagnostico__codigo', 'notas']
+    list_select_related = ['paciente', 'profesional', 'diagnostico']
+    raw_id_fields = ['paciente', 'turno', 'corrige']
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+    
+    def has_delete_permission(self, request, obj=None):
+        return False
+    
+@admin.register(VersionOdontograma)
+class VersionOdontogramaAdmin(admin.ModelAdmin):
+    """Solo lectura: las versiones las genera el odontograma del paciente"""
+    list_display = ['paciente', 'version', 'fecha', 'profesional']
+    search_fields = ['paciente__dni', 'paciente__apellido']
+    list_select_related = ['paciente', 'profesional']
+    exclude = ['cambios', 'estado']
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+    
+@admin.register(ArchivoClinico)
+class ArchivoClinicoAdmin(admin.ModelAdmin):
+    list_display = ['sha256', 'tipo_contenido', 'tamanio', 'ancho', 'alto', 'fecha_creacion']
+    list_filter = ['tipo_contenido']
+    search_fields = ['sha256']
+    
+    # El contenido está en el storage 'adjuntos' bajo su hash: no se edita
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+    
+@admin.register(Adjunto)
+class AdjuntoAdmin(admin.ModelAdmin):
+    list_display = ['paciente', 'nombre', 'tipo', 'fecha_subida', 'usuario_registro']
+    list_filter = ['tipo', 'fecha_subida']
+    search_fields = ['paciente__dni', 'paciente__apellido', 'nombre', 'descripcion']
+    list_select_related = ['paciente', 'usuario_registro']
+    readonly_fields = ['paciente', 'archivo', 'nombre', 'fecha_subida', 'usuario_registro']
+    
+    # Se suben desde la pantalla de adjuntos del paciente (en partes)
+    def has_add_permission(self, request):
+        return False
     
 @admin.register(Paciente)
 class PacienteAdmin(admin.ModelAdmin):
-    list_display = ['dni', 'apellido', 'nombre', 'telefono', 'fecha_nacimiento', 'activo', 'fecha_registro']
-    list_filter = ['activo', 'sexo', 'fecha_registro']
+    list_display = ['dni', 'apellido', 'nombre', 'telefono', 'fecha_nacimiento', 'requiere_precaucion', 'activo', 'fecha_registro']
+    list_filter = ['activo', 'requiere_precaucion', 'sexo', 'fecha_registro']
     search_fields = ['dni', 'apellido', 'nombre', 'telefono', 'email']
     readonly_fields = ['fecha_registro', 'fecha_modificacion', 'usuario_registro']
     
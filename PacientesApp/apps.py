@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class PacientesappConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'PacientesApp'
+
+    def ready(self):
+        # Registrar señales (versión de la ficha del paciente)
+        from . import signals  # noqa: F401
@@ -0,0 +1,78 @@
+import threading
+import time as reloj
+from django.conf import settings
+from config.caches import version_modelo, invalidar_modelo
+
+
+class CatalogoAntecedentes:
+    """Antecedentes activos agrupados por categoría, en el orden del modelo"""
+
+    def __init__(self, antecedentes, version):
+        from .models import CategoriaAntecedente
+
+        self.version = version
+        self.por_categoria = {categoria: [] for categoria, _ in CategoriaAntecedente.CATEGORIAS}
+        self.por_id = {}
+
+        for antecedente in antecedentes:
+            self.por_categoria.setdefault(antecedente.categoria, []).append(antecedente)
+            self.por_id[antecedente.pk] = antecedente
+
+    def opciones(self, categoria):
+        return self.por_categoria.get(categoria, [])
+
+    def buscar(self, categoria, pk):
+        """Antecedente activo de la categoría, o None"""
+        antecedente = self.por_id.get(pk)
+        if antecedente is None or antecedente.categoria != categoria:
+            return None
+        return antecedente
+
+
+_lock = threading.Lock()
+_cache = {'catalogo': None, 'cargado': 0.0}
+
+
+def version_actual():
+    """
+    Versión de CategoriaAntecedente en el cache compartido: un cambio en un proceso
+    hace que los demás recarguen en su próxima lectura
+    """
+    from .models import CategoriaAntecedente
+
+    return version_modelo(CategoriaAntecedente)
+
+
+def obtener_catalogo():
+    """
+    Catálogo de antecedentes cacheado en el proceso.
+    Se recarga cuando cambia la versión (al guardar/eliminar una categoría) o a
+    los CATALOGO_ANTECEDENTES_CACHE_SEGUNDOS, para procesos que no vieron el cambio.
+    """
+    ttl = getattr(settings, 'CATALOGO_ANTECEDENTES_CACHE_SEGUNDOS', 300)
+    version = version_actual()
+    catalogo = _cache['catalogo']
+
+    if catalogo is not None and catalogo.version == version and reloj.monotonic() - _cache['cargado'] < ttl:
+        return catalogo
+
+    with _lock:
+        catalogo = _cache['catalogo']
+        if catalogo is None or catalogo.version != version or reloj.monotonic() - _cache['cargado'] >= ttl:
+            from .models import CategoriaAntecedente
+
+            catalogo = CatalogoAntecedentes(list(CategoriaAntecedente.objects.filter(activo=True)), version)
+            _cache['catalogo'] = catalogo
+            _cache['cargado'] = reloj.monotonic()
+
+        return catalogo
+
+
+def invalidar_catalogo():
+    """Sube la versión del catálogo y descarta la copia de este proceso"""
+    from .models import CategoriaAntecedente
+
+    invalidar_modelo(CategoriaAntecedente)
+
+    with _lock:
+        _cache['catalogo'] = None
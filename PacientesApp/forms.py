@@ -1,40 +1,166 @@
 from django import forms
-from .models import Paciente, CategoriaAntecedente, AntecedentePaciente
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.forms.models import ModelChoiceIterator
+from django.urls import reverse
+from django.utils.html import format_html
+from .models import Paciente, ObraSocial, CategoriaAntecedente, AntecedentePaciente, Prestacion, Diagnostico, EntradaClinica, Adjunto
+from .precauciones import actualizar_banderas
+from .catalogo import obtener_catalogo
+from .obras_sociales import CAMPOS as CAMPOS_OBRA_SOCIAL, obtener_indice, etiqueta
+from .odontograma import DIENTES, CARAS, ESTADOS_PIEZA, ESTADOS_CARA, EstadoOdontograma
 from datetime import date
 
 
+class CatalogoChoiceIterator(ModelChoiceIterator):
+    """Opciones de una categoría servidas desde el catálogo en memoria (sin consultas)"""
+    
+    def __iter__(self):
+        for antecedente in obtener_catalogo().opciones(self.field.categoria):
+            yield self.choice(antecedente)
+    
+    def __len__(self):
+        return len(obtener_catalogo().opciones(self.field.categoria))
+    
+    def __bool__(self):
+        return bool(obtener_catalogo().opciones(self.field.categoria))
+
+
+class AntecedentesField(forms.ModelMultipleChoiceField):
+    """Selección múltiple de antecedentes de una categoría, validada contra el catálogo cacheado"""
+    
+    iterator = CatalogoChoiceIterator
+    
+    def __init__(self, categoria, **kwargs):
+        self.categoria = categoria
+        super().__init__(
+            queryset=CategoriaAntecedente.objects.filter(categoria=categoria, activo=True),
+            **kwargs
+        )
+    
+    def clean(self, value):
+        """Lista de antecedentes elegidos (sin repetir), buscados en el catálogo en lugar de la base"""
+        value = self.prepare_value(value)
+        if not value:
+            if self.required:
+                raise ValidationError(self.error_messages['required'], code='required')
+            return []
+        if not isinstance(value, (list, tuple)):
+            raise ValidationError(self.error_messages['invalid_list'], code='invalid_list')
+        
+        catalogo = obtener_catalogo()
+        seleccionados = []
+        for pk in dict.fromkeys(str(pk) for pk in value):
+            antecedente = catalogo.buscar(self.categoria, int(pk)) if pk.isdigit() else None
+            if antecedente is None:
+                raise ValidationError(
+                    self.error_messages['invalid_choice'],
+                    code='invalid_choice',
+                    params={'value': pk},
+                )
+            seleccionados.append(antecedente)
+        
+        self.run_validators(seleccionados)
+        return seleccionados
+
+
+class ObraSocialWidget(forms.Widget):
+    """
+    Autocompletado de obra social: un campo de texto que busca en
+    PacientesApp:buscar_obras_sociales y un hidden con el id elegido.
+    No embebe el listado completo en la página.
+    """
+    
+    def render(self, name, value, attrs=None, renderer=None):
+        attrs = self.build_attrs(self.attrs, attrs)
+        id_ = attrs.get('id') or f'id_{name}'
+        
+        obra = obtener_indice().obtener(int(value)) if str(value or '').isdigit() else None
+        
+        return format_html(
+            '<div class="position-relative">'
+            '<input type="hidden" name="{}" id="{}" value="{}">'
+            '<input type="text" class="form-control" id="{}_buscar" value="{}" autocomplete="off" '
+            'placeholder="Buscar por nombre, sigla o RNOS..." '
+            'data-obra-social-url="{}" data-obra-social-destino="{}">'
+            '<div class="list-group position-absolute w-100 shadow-sm" id="{}_resultados" style="z-index: 1000;"></div>'
+            '</div>',
+            name, id_, obra['id'] if obra else '',
+            id_, etiqueta(obra) if obra else '',
+            reverse('PacientesApp:buscar_obras_sociales'), id_,
+            id_,
+        )
+
+
+class ObraSocialField(forms.Field):
+    """Obra social validada contra el índice en memoria (sin consultas)"""
+    
+    widget = ObraSocialWidget
+    default_error_messages = {
+        'invalid_choice': 'Seleccione una obra social válida de la lista.',
+    }
+    
+    def __init__(self, **kwargs):
+        # Id de la obra social que ya tenía el paciente (se acepta aunque esté inactiva)
+        self.actual = None
+        super().__init__(**kwargs)
+    
+    def to_python(self, value):
+        if value in self.empty_values:
+            return None
+        
+        obra = obtener_indice().obtener(int(value)) if str(value).isdigit() else None
+        if obra is None or not (obra['activa'] or obra['id'] == self.actual):
+            raise ValidationError(self.error_messages['invalid_choice'], code='invalid_choice')
+        
+        # Armada con los campos del índice (son todos los de ObraSocial): sin ir a la base
+        return ObraSocial(**{campo: obra[campo] for campo in CAMPOS_OBRA_SOCIAL})
+    
+    def prepare_value(self, value):
+        return value.pk if isinstance(value, ObraSocial) else value
+    
+    def has_changed(self, initial, data):
+        return str(self.prepare_value(initial) or '') != str(data or '')
+
+
 class PacienteForm(forms.ModelForm):
     """Formulario para crear y editar pacientes"""
     
-    # Campos para antecedentes médicos (se generan dinámicamente)
-    antecedentes_enfermedades = forms.ModelMultipleChoiceField(
-        queryset=CategoriaAntecedente.objects.filter(categoria='enfermedad_cronica', activo=True),
+    # Campos para antecedentes médicos (opciones desde el catálogo cacheado)
+    antecedentes_enfermedades = AntecedentesField(
+        categoria='enfermedad_cronica',
         widget=forms.CheckboxSelectMultiple,
         required=False,
         label='Enfermedades Crónicas'
     )
     
-    antecedentes_its = forms.ModelMultipleChoiceField(
-        queryset=CategoriaAntecedente.objects.filter(categoria='its', activo=True),
+    antecedentes_its = AntecedentesField(
+        categoria='its',
         widget=forms.CheckboxSelectMultiple,
         required=False,
         label='Infecciones de Transmisión Sexual (ITS)'
     )
     
-    antecedentes_alergias = forms.ModelMultipleChoiceField(
-        queryset=CategoriaAntecedente.objects.filter(categoria='alergia', activo=True),
+    antecedentes_alergias = AntecedentesField(
+        categoria='alergia',
         widget=forms.CheckboxSelectMultiple,
         required=False,
         label='Alergias'
     )
     
-    antecedentes_medicacion = forms.ModelMultipleChoiceField(
-        queryset=CategoriaAntecedente.objects.filter(categoria='medicacion', activo=True),
+    antecedentes_medicacion = AntecedentesField(
+        categoria='medicacion',
         widget=forms.CheckboxSelectMultiple,
         required=False,
         label='Medicación Actual'
     )
     
+    obra_social = ObraSocialField(
+        required=False,
+        label='Obra Social',
+        help_text='Seleccione la obra social'
+    )
+    
     class Meta:
         model = Paciente
         fields = ['nombre', 'apellido', 'dni', 'fecha_nacimiento', 'sexo',
@@ -77,9 +203,6 @@ class PacienteForm(forms.ModelForm):
                 'class': 'form-control',
                 'placeholder': 'Número de afiliado'
             }),
-            'obra_social': forms.Select(attrs={
-                'class': 'form-select'
-            }),
             'observaciones_generales': forms.Textarea(attrs={
                 'class': 'form-control',
                 'rows': 3,
@@ -93,25 +216,23 @@ class PacienteForm(forms.ModelForm):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         
-        # Si estamos editando, cargar los antecedentes actuales
+        self.fields['obra_social'].actual = self.instance.obra_social_id
+        
+        # Si estamos editando, cargar los antecedentes actuales (una consulta)
         if self.instance.pk:
-            antecedentes_actuales = self.instance.antecedentes_medicos.filter(activo=True)
-            
-            self.fields['antecedentes_enfermedades'].initial = antecedentes_actuales.filter(
-                antecedente__categoria='enfermedad_cronica'
-            ).values_list('antecedente', flat=True)
-            
-            self.fields['antecedentes_its'].initial = antecedentes_actuales.filter(
-                antecedente__categoria='its'
-            ).values_list('antecedente', flat=True)
+            catalogo = obtener_catalogo()
+            actuales = {categoria: [] for categoria, _ in CategoriaAntecedente.CATEGORIAS}
+            for antecedente_id in self.instance.antecedentes_medicos.filter(activo=True).values_list(
+                'antecedente_id', flat=True
+            ):
+                antecedente = catalogo.por_id.get(antecedente_id)
+                if antecedente is not None:
+                    actuales[antecedente.categoria].append(antecedente_id)
             
-            self.fields['antecedentes_alergias'].initial = antecedentes_actuales.filter(
-                antecedente__categoria='alergia'
-            ).values_list('antecedente', flat=True)
-            
-            self.fields['antecedentes_medicacion'].initial = antecedentes_actuales.filter(
-                antecedente__categoria='medicacion'
-            ).values_list('antecedente', flat=True)
+            self.fields['antecedentes_enfermedades'].initial = actuales['enfermedad_cronica']
+            self.fields['antecedentes_its'].initial = actuales['its']
+            self.fields['antecedentes_alergias'].initial = actuales['alergia']
+            self.fields['antecedentes_medicacion'].initial = actuales['medicacion']
     
     def clean_dni(self):
         """Validar que el DNI sea único (excepto en edición)"""
@@ -152,7 +273,7 @@ class PacienteForm(forms.ModelForm):
         obra_social = cleaned_data.get('obra_social')
         
         # Si tiene número de afiliado, debe tener obra social y viceversa
-        if numero_afiliado and not obra_social:
+        if numero_afiliado and not obra_social and 'obra_social' not in self.errors:
             self.add_error('obra_social', 'Debe seleccionar la obra social.')
         
         if obra_social and not numero_afiliado:
@@ -161,29 +282,158 @@ class PacienteForm(forms.ModelForm):
         return cleaned_data
     
     def save(self, commit=True, usuario=None):
-        """Guardar el paciente y sus antecedentes"""
-        paciente = super().save(commit=commit)
+        """Guardar el paciente y sus antecedentes en una sola transacción"""
+        if not commit:
+            return super().save(commit=False)
         
-        if commit:
-            # Desactivar todos los antecedentes actuales
-            AntecedentePaciente.objects.filter(paciente=paciente).update(activo=False)
-            
-            # Guardar antecedentes seleccionados
-            todos_antecedentes = []
-            todos_antecedentes.extend(self.cleaned_data.get('antecedentes_enfermedades', []))
-            todos_antecedentes.extend(self.cleaned_data.get('antecedentes_its', []))
-            todos_antecedentes.extend(self.cleaned_data.get('antecedentes_alergias', []))
-            todos_antecedentes.extend(self.cleaned_data.get('antecedentes_medicacion', []))
-            
-            for antecedente in todos_antecedentes:
-                AntecedentePaciente.objects.update_or_create(
-                    paciente=paciente,
-                    antecedente=antecedente,
-                    defaults={
-                        'activo': True,
-                        'usuario_registro': usuario
-                    }
-                )
+        with transaction.atomic():
+            paciente = super().save(commit=True)
+            self._guardar_antecedentes(paciente, usuario)
         
         return paciente
-    
\ No newline at end of file
+    
+    def _guardar_antecedentes(self, paciente, usuario):
+        """
+        Aplica solo las diferencias entre los antecedentes guardados y los seleccionados:
+        crea los nuevos, reactiva los que estaban inactivos y desactiva los quitados.
+        Las filas sin cambios conservan su usuario y fecha de registro.
+        """
+        seleccionados = set()
+        for campo in ['antecedentes_enfermedades', 'antecedentes_its',
+                      'antecedentes_alergias', 'antecedentes_medicacion']:
+            seleccionados.update(antecedente.pk for antecedente in self.cleaned_data.get(campo, []))
+        
+        actuales = {
+            antecedente.antecedente_id: antecedente
+            for antecedente in AntecedentePaciente.objects.filter(paciente=paciente).only(
+                'id', 'antecedente_id', 'activo', 'usuario_registro_id'
+            )
+        }
+        
+        nuevos = [
+            AntecedentePaciente(paciente=paciente, antecedente_id=antecedente_id,
+                                activo=True, usuario_registro=usuario)
+            for antecedente_id in seleccionados - actuales.keys()
+        ]
+        
+        modificados = []
+        for antecedente_id, antecedente in actuales.items():
+            if antecedente_id in seleccionados and not antecedente.activo:
+                antecedente.activo = True
+                antecedente.usuario_registro = usuario
+                modificados.append(antecedente)
+            elif antecedente_id not in seleccionados and antecedente.activo:
+                antecedente.activo = False
+                modificados.append(antecedente)
+        
+        if nuevos:
+            AntecedentePaciente.objects.bulk_create(nuevos)
+        if modificados:
+            AntecedentePaciente.objects.bulk_update(modificados, ['activo', 'usuario_registro'])
+        
+        # bulk_create/bulk_update no disparan señales
+        if nuevos or modificados:
+            actualizar_banderas([paciente.pk])
+
+
+class EntradaClinicaForm(forms.ModelForm):
+    """Entrada nueva de la historia clínica (las guardadas no se editan)"""
+    
+    prestaciones_realizadas = forms.ModelMultipleChoiceField(
+        queryset=Prestacion.objects.none(),
+        required=False,
+        widget=forms.SelectMultiple(attrs={'class': 'form-select', 'size': 8}),
+        label='Prestaciones',
+        help_text='Ctrl/Cmd + clic para elegir varias'
+    )
+    
+    class Meta:
+        model = EntradaClinica
+        fields = ['diagnostico', 'pieza', 'notas']
+        widgets = {
+            'diagnostico': forms.Select(attrs={'class': 'form-select'}),
+            'pieza': forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'Ej: 36'}),
+            'notas': forms.Textarea(attrs={'class': 'form-control', 'rows': 5}),
+        }
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['diagnostico'].queryset = Diagnostico.objects.filter(activo=True)
+        self.fields['prestaciones_realizadas'].queryset = Prestacion.objects.filter(activa=True)
+    
+    def clean_prestaciones_realizadas(self):
+        prestaciones = self.cleaned_data['prestaciones_realizadas']
+        # El nomenclador repite códigos: se guarda cada código una vez
+        codigos = ', '.join(dict.fromkeys(prestacion.codigo for prestacion in prestaciones))
+        if len(codigos) > EntradaClinica._meta.get_field('prestaciones').max_length:
+            raise ValidationError('Demasiadas prestaciones para una entrada: registralas en dos.')
+        self.instance.prestaciones = codigos
+        return prestaciones
+
+
+class OdontogramaForm(forms.Form):
+    """
+    Estado de cada pieza y de sus caras (campos p18, p18_O, p18_V, ...), más la
+    versión sobre la que se editó: al guardar se aplica solo lo que cambió desde ella
+    """
+    
+    version = forms.IntegerField(min_value=0, widget=forms.HiddenInput)
+    
+    def __init__(self, *args, estado=None, version=0, **kwargs):
+        super().__init__(*args, **kwargs)
+        estado = estado or EstadoOdontograma()
+        self.fields['version'].initial = version
+        
+        for numero in DIENTES:
+            self.fields[f'p{numero}'] = forms.TypedChoiceField(
+                choices=ESTADOS_PIEZA,
+                coerce=int,
+                initial=estado.estado(numero),
+                widget=forms.Select(attrs={'class': 'form-select form-select-sm'}),
+                label=str(numero)
+            )
+            for cara, nombre in CARAS:
+                self.fields[f'p{numero}_{cara}'] = forms.TypedChoiceField(
+                    choices=ESTADOS_CARA,
+                    coerce=int,
+                    initial=estado.estado(numero, cara),
+                    widget=forms.Select(attrs={'class': 'form-select form-select-sm'}),
+                    label=nombre
+                )
+    
+    def piezas(self):
+        """(número, campo de la pieza, campos de las caras) en el orden de DIENTES"""
+        return [
+            (numero, self[f'p{numero}'], [self[f'p{numero}_{cara}'] for cara, _ in CARAS])
+            for numero in DIENTES
+        ]
+    
+    def get_estado(self):
+        """EstadoOdontograma con lo cargado (form válido)"""
+        estado = EstadoOdontograma()
+        for numero in DIENTES:
+            estado.cambiar(numero, None, self.cleaned_data[f'p{numero}'])
+            for cara, _ in CARAS:
+                estado.cambiar(numero, cara, self.cleaned_data[f'p{numero}_{cara}'])
+        return estado
+
+
+class SubidaAdjuntoForm(forms.Form):
+    """Datos del archivo que se va a subir en partes (el contenido llega después)"""
+    
+    nombre = forms.CharField(max_length=255)
+    
+    tamanio = forms.IntegerField(min_value=1)
+    
+    tipo = forms.ChoiceField(
+        choices=Adjunto.TIPO_CHOICES,
+        widget=forms.Select(attrs={'class': 'form-select'}),
+        label='Tipo'
+    )
+    
+    descripcion = forms.CharField(
+        max_length=255,
+        required=False,
+        widget=forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'Ej: Panorámica inicial'}),
+        label='Descripción'
+    )
@@ -0,0 +1,126 @@
+"""
+Historia clínica: entradas que solo se agregan (EntradaClinica) y su resumen por paciente.
+
+Abrir la historia de un paciente con cientos de visitas cuesta lo mismo que una con tres:
+
+    - el resumen (ResumenHistoriaClinica: cantidad de entradas, primera y última
+      visita, diagnósticos y prestaciones registrados) viene con el paciente en la
+      misma consulta (select_related). Como las entradas no se modifican ni se
+      eliminan, cada entrada nueva lo actualiza sumando (señal post_save), sin
+      recorrer las anteriores;
+    - la línea de tiempo se pagina por cursor (fecha, id) sobre el índice
+      (paciente, fecha, id): cada página es una consulta con LIMIT, sin COUNT ni
+      OFFSET, y la página 50 cuesta lo mismo que la primera.
+"""
+from datetime import datetime, timedelta, timezone as tz
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from .models import EntradaClinica, ResumenHistoriaClinica
+
+
+# Entradas por página de la línea de tiempo
+ENTRADAS_POR_PAGINA = 20
+
+_EPOCA = datetime(1970, 1, 1, tzinfo=tz.utc)
+
+
+# ========== CURSOR ==========
+
+def cursor_de(entrada):
+    """'microsegundos-id' de la entrada: la siguiente página empieza después de ella"""
+    microsegundos = (entrada.fecha - _EPOCA) // timedelta(microseconds=1)
+    return f'{microsegundos}-{entrada.pk}'
+
+
+def leer_cursor(cursor):
+    """(fecha, id) del cursor, o None si falta o no es válido (se muestra la primera página)"""
+    try:
+        microsegundos, pk = (int(parte) for parte in (cursor or '').split('-'))
+        return _EPOCA + timedelta(microseconds=microsegundos), pk
+    except (ValueError, OverflowError):
+        return None
+
+
+# ========== LÍNEA DE TIEMPO ==========
+
+def linea_de_tiempo(paciente_id, cursor=None, limite=ENTRADAS_POR_PAGINA):
+    """
+    Entradas del paciente de la más nueva a la más vieja, empezando después del cursor.
+    Retorna (entradas, cursor de la página siguiente o None). Una consulta.
+    """
+    entradas = EntradaClinica.objects.filter(paciente_id=paciente_id).select_related(
+        'profesional', 'diagnostico'
+    ).only(
+        'fecha', 'pieza', 'prestaciones', 'notas', 'turno_id', 'corrige_id', 'paciente_id',
+        'profesional__first_name', 'profesional__last_name', 'profesional__matricula_profesional',
+        'diagnostico__codigo', 'diagnostico__descripcion',
+    ).order_by('-fecha', '-id')
+
+    posicion = leer_cursor(cursor)
+    if posicion:
+        fecha, pk = posicion
+        entradas = entradas.filter(Q(fecha__lt=fecha) | Q(fecha=fecha, pk__lt=pk))
+
+    # Una de más para saber si hay otra página
+    entradas = list(entradas[:limite + 1])
+    if len(entradas) > limite:
+        entradas = entradas[:limite]
+        return entradas, cursor_de(entradas[-1])
+    return entradas, None
+
+
+# ========== RESUMEN ==========
+
+def _sumar(resumen, entrada, diagnostico=None):
+    """Agrega la entrada a los totales del resumen (sin guardar)"""
+    resumen.entradas += 1
+    if resumen.primera_fecha is None or entrada.fecha < resumen.primera_fecha:
+        resumen.primera_fecha = entrada.fecha
+    if resumen.ultima_fecha is None or entrada.fecha > resumen.ultima_fecha:
+        resumen.ultima_fecha = entrada.fecha
+
+    if diagnostico is not None:
+        # Día de la visita en la hora local (fecha se guarda en UTC)
+        dia = timezone.localdate(entrada.fecha).isoformat()
+        _, veces, ultima = resumen.diagnosticos.get(diagnostico.codigo, (None, 0, dia))
+        resumen.diagnosticos[diagnostico.codigo] = [diagnostico.descripcion, veces + 1, max(ultima, dia)]
+
+    for codigo in entrada.get_prestaciones():
+        resumen.prestaciones[codigo] = resumen.prestaciones.get(codigo, 0) + 1
+
+
+def sumar_entrada(entrada):
+    """Actualiza el resumen del paciente con una entrada recién creada"""
+    with transaction.atomic():
+        resumen, _ = ResumenHistoriaClinica.objects.select_for_update().get_or_create(paciente_id=entrada.paciente_id)
+        _sumar(resumen, entrada, entrada.diagnostico)
+        resumen.save()
+
+
+def recalcular_resumenes(paciente_ids=None, batch_size=1000):
+    """
+    Reconstruye los resúmenes desde las entradas (todos, o los de esos pacientes).
+    Recorre las entradas una vez, ordenadas por paciente. Retorna la cantidad de resúmenes.
+    """
+    entradas = EntradaClinica.objects.select_related('diagnostico').only(
+        'paciente_id', 'fecha', 'prestaciones', 'diagnostico__codigo', 'diagnostico__descripcion'
+    ).order_by('paciente_id', 'fecha', 'id')
+    anteriores = ResumenHistoriaClinica.objects.all()
+    if paciente_ids is not None:
+        entradas = entradas.filter(paciente_id__in=paciente_ids)
+        anteriores = anteriores.filter(paciente_id__in=paciente_ids)
+
+    resumenes = {}
+    for entrada in entradas.iterator(chunk_size=batch_size):
+        resumen = resumenes.get(entrada.paciente_id)
+        if resumen is None:
+            resumen = resumenes[entrada.paciente_id] = ResumenHistoriaClinica(
+                paciente_id=entrada.paciente_id, diagnosticos={}, prestaciones={}
+            )
+        _sumar(resumen, entrada, entrada.diagnostico)
+
+    with transaction.atomic():
+        anteriores.delete()
+        ResumenHistoriaClinica.objects.bulk_create(resumenes.values(), batch_size=batch_size)
+    return len(resumenes)
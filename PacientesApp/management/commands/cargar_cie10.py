@@ -0,0 +1,69 @@
+from django.core.management.base import BaseCommand
+from PacientesApp.models import Diagnostico
+
+
+class Command(BaseCommand):
+    help = 'Carga los diagnósticos CIE-10 desde un archivo de texto separado por tabulaciones'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'archivo',
+            type=str,
+            help='Ruta al archivo CIE-10 (código, descripción)'
+        )
+
+    def handle(self, *args, **options):
+        archivo = options['archivo']
+        
+        self.stdout.write(self.style.WARNING(f'Cargando diagnósticos CIE-10 desde: {archivo}'))
+        
+        try:
+            with open(archivo, 'r', encoding='utf-8') as file:
+                creados = 0
+                actualizados = 0
+                errores = 0
+                
+                for numero, linea in enumerate(file, start=1):
+                    if not linea.strip():
+                        continue
+                    
+                    campos = linea.rstrip('\n').split('\t')
+                    try:
+                        codigo = campos[0].strip().upper()
+                        descripcion = ' '.join(campos[1].split())
+                        
+                        if not codigo or not descripcion:
+                            raise ValueError('Falta el código o la descripción')
+                        
+                        diagnostico, created = Diagnostico.objects.update_or_create(
+                            codigo=codigo[:10],
+                            defaults={
+                                'descripcion': descripcion[:200],
+                                'activo': True
+                            }
+                        )
+                        
+                        if created:
+                            creados += 1
+                        else:
+                            actualizados += 1
+                    
+                    except (IndexError, ValueError) as e:
+                        errores += 1
+                        self.stdout.write(
+                            self.style.ERROR(f'✗ Error en línea {numero}: {str(e)}')
+                        )
+                
+                # Resumen
+                self.stdout.write('\n' + '='*50)
+                self.stdout.write(self.style.SUCCESS(f'Diagnósticos creados: {creados}'))
+                self.stdout.write(self.style.WARNING(f'Diagnósticos actualizados: {actualizados}'))
+                if errores > 0:
+                    self.stdout.write(self.style.ERROR(f'Errores: {errores}'))
+                self.stdout.write(self.style.SUCCESS(f'\nTotal procesado: {creados + actualizados}'))
+                self.stdout.write('='*50)
+        
+        except FileNotFoundError:
+            self.stdout.write(
+                self.style.ERROR(f'Error: No se encontró el archivo {archivo}')
+            )
@@ -0,0 +1,76 @@
+from django.core.management.base import BaseCommand
+from PacientesApp.models import Prestacion
+
+
+class Command(BaseCommand):
+    help = 'Carga las prestaciones del Nomenclador desde un archivo de texto separado por tabulaciones'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'archivo',
+            type=str,
+            help='Ruta al archivo del nomenclador (capítulo, código, descripción, detalle)'
+        )
+
+    def handle(self, *args, **options):
+        archivo = options['archivo']
+        
+        self.stdout.write(self.style.WARNING(f'Cargando nomenclador desde: {archivo}'))
+        
+        try:
+            with open(archivo, 'r', encoding='utf-8') as file:
+                creadas = 0
+                actualizadas = 0
+                errores = 0
+                
+                for numero, linea in enumerate(file, start=1):
+                    if not linea.strip():
+                        continue
+                    
+                    campos = linea.rstrip('\n').split('\t')
+                    try:
+                        capitulo = ' '.join(campos[0].split())
+                        codigo = campos[1].strip()
+                        descripcion = ' '.join(campos[2].split())
+                        # El detalle puede traer tabulaciones propias; '.' significa sin detalle
+                        detalle = ' '.join(' '.join(campos[3:]).split())
+                        if detalle == '.':
+                            detalle = ''
+                        
+                        if not codigo or not descripcion:
+                            raise ValueError('Falta el código o la descripción')
+                        
+                        prestacion, created = Prestacion.objects.update_or_create(
+                            codigo=codigo,
+                            descripcion=descripcion[:200],
+                            defaults={
+                                'capitulo': capitulo[:100],
+                                'detalle': detalle,
+                                'activa': True
+                            }
+                        )
+                        
+                        if created:
+                            creadas += 1
+                        else:
+                            actualizadas += 1
+                    
+                    except (IndexError, ValueError) as e:
+                        errores += 1
+                        self.stdout.write(
+                            self.style.ERROR(f'✗ Error en línea {numero}: {str(e)}')
+                        )
+                
+                # Resumen
+                self.stdout.write('\n' + '='*50)
+                self.stdout.write(self.style.SUCCESS(f'Prestaciones creadas: {creadas}'))
+                self.stdout.write(self.style.WARNING(f'Prestaciones actualizadas: {actualizadas}'))
+                if errores > 0:
+                    self.stdout.write(self.style.ERROR(f'Errores: {errores}'))
+                self.stdout.write(self.style.SUCCESS(f'\nTotal procesado: {creadas + actualizadas}'))
+                self.stdout.write('='*50)
+        
+        except FileNotFoundError:
+            self.stdout.write(
+                self.style.ERROR(f'Error: No se encontró el archivo {archivo}')
+            )
@@ -37,6 +37,7 @@ class Command(BaseCommand):
                             codigo=rnos,
                             defaults={
                                 'nombre': descripcion,
+                                'sigla': sigla,
                                 'activa': True
                             }
                         )
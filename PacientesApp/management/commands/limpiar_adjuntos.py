@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from PacientesApp.adjuntos import limpiar
+
+
+class Command(BaseCommand):
+    help = ('Borra las subidas de adjuntos que quedaron sin terminar y los archivos que ya no '
+            'usa ningún adjunto (con sus miniaturas).')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--horas',
+            type=int,
+            help='Antigüedad mínima de una subida sin terminar para borrarla (por defecto ADJUNTOS_SUBIDA_HORAS)'
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.WARNING('Limpiando adjuntos...'))
+
+        subidas, archivos = limpiar(options['horas'])
+
+        self.stdout.write('\n' + '='*50)
+        self.stdout.write(self.style.SUCCESS(f'Subidas sin terminar borradas: {subidas}'))
+        self.stdout.write(self.style.SUCCESS(f'Archivos sin adjuntos borrados: {archivos}'))
+        self.stdout.write('='*50)
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+from PacientesApp.historia import recalcular_resumenes
+
+
+class Command(BaseCommand):
+    help = ('Reconstruye los resúmenes de las historias clínicas desde sus entradas '
+            '(normalmente se mantienen solos al registrar cada entrada).')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--paciente',
+            type=int,
+            action='append',
+            help='ID del paciente (se puede repetir); sin esta opción se reconstruyen todos'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Cantidad de filas por consulta e inserción'
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.WARNING('Reconstruyendo resúmenes de historias clínicas...'))
+
+        cantidad = recalcular_resumenes(options['paciente'], batch_size=options['batch_size'])
+
+        self.stdout.write('\n' + '='*50)
+        self.stdout.write(self.style.SUCCESS(f'Resúmenes reconstruidos: {cantidad}'))
+        self.stdout.write('='*50)
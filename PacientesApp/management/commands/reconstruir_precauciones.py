@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from PacientesApp.precauciones import reconstruir_banderas
+
+
+class Command(BaseCommand):
+    help = ('Recalcula las banderas de precaución y categorías de antecedentes de todos los pacientes '
+            '(necesario después de cargas masivas que no disparan señales)')
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.WARNING('Recalculando banderas de precaución...'))
+        
+        total = reconstruir_banderas()
+        
+        self.stdout.write('\n' + '='*50)
+        self.stdout.write(self.style.SUCCESS(f'Pacientes con banderas actualizadas: {total}'))
+        self.stdout.write('='*50)
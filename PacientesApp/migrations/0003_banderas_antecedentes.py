@@ -0,0 +1,57 @@
+# Generated by Django 5.2.8 on 2026-10-19 11:30
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+# Copia de CategoriaAntecedente.BITS al momento de la migración
+BITS = {'enfermedad_cronica': 1, 'its': 2, 'alergia': 4, 'medicacion': 8}
+
+
+def calcular_banderas(apps, schema_editor):
+    Paciente = apps.get_model('PacientesApp', 'Paciente')
+    AntecedentePaciente = apps.get_model('PacientesApp', 'AntecedentePaciente')
+
+    banderas = {}
+    for paciente_id, categoria, precaucion in AntecedentePaciente.objects.filter(activo=True).order_by().values_list(
+        'paciente_id', 'antecedente__categoria', 'antecedente__requiere_precaucion'
+    ).distinct():
+        requiere, mascara = banderas.get(paciente_id, (False, 0))
+        banderas[paciente_id] = (requiere or precaucion, mascara | BITS.get(categoria, 0))
+
+    grupos = {}
+    for paciente_id, valores in banderas.items():
+        grupos.setdefault(valores, []).append(paciente_id)
+
+    for (requiere, mascara), ids in grupos.items():
+        for inicio in range(0, len(ids), 1000):
+            Paciente.objects.filter(pk__in=ids[inicio:inicio + 1000]).update(
+                requiere_precaucion=requiere,
+                categorias_antecedentes=mascara
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('PacientesApp', '0002_remove_antecedentepaciente_observaciones_generales_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='paciente',
+            name='categorias_antecedentes',
+            field=models.PositiveSmallIntegerField(default=0, editable=False, help_text='Máscara de bits de las categorías con antecedentes activos (CategoriaAntecedente.BITS)', verbose_name='Categorías de Antecedentes'),
+        ),
+        migrations.AddField(
+            model_name='paciente',
+            name='requiere_precaucion',
+            field=models.BooleanField(default=False, editable=False, help_text='Tiene algún antecedente activo que requiere precaución especial', verbose_name='Requiere Precaución'),
+        ),
+        migrations.AddIndex(
+            model_name='paciente',
+            index=models.Index(fields=['requiere_precaucion'], name='PacientesAp_requier_e899ad_idx'),
+        ),
+        migrations.RunPython(calcular_banderas, migrations.RunPython.noop),
+    ]
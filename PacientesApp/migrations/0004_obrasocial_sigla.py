@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-19 11:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('PacientesApp', '0003_banderas_antecedentes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='obrasocial',
+            name='sigla',
+            field=models.CharField(blank=True, help_text='Sigla de la obra social (ej: OSDE, PAMI)', max_length=20, null=True, verbose_name='Sigla'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.8 on 2026-10-19 11:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('PacientesApp', '0004_obrasocial_sigla'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Prestacion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('codigo', models.CharField(help_text='Código del nomenclador (ej: 01.01.00)', max_length=10, verbose_name='Código')),
+                ('capitulo', models.CharField(max_length=100, verbose_name='Capítulo')),
+                ('descripcion', models.CharField(max_length=200, verbose_name='Descripción')),
+                ('detalle', models.TextField(blank=True, help_text='Alcance y condiciones de la prestación', verbose_name='Detalle')),
+                ('activa', models.BooleanField(default=True, verbose_name='Activa')),
+            ],
+            options={
+                'verbose_name': 'Prestación',
+                'verbose_name_plural': 'Prestaciones',
+                'ordering': ['codigo', 'descripcion'],
+                'constraints': [models.UniqueConstraint(fields=('codigo', 'descripcion'), name='prestacion_codigo_descripcion_unica')],
+            },
+        ),
+    ]
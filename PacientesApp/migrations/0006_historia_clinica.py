@@ -0,0 +1,68 @@
+# Generated by Django 5.2.8 on 2026-10-19 12:01
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('PacientesApp', '0005_prestacion'),
+        ('TurnosApp', '0005_facturacion'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Diagnostico',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('codigo', models.CharField(help_text='Código CIE-10 (ej: K021)', max_length=10, unique=True, verbose_name='Código')),
+                ('descripcion', models.CharField(max_length=200, verbose_name='Descripción')),
+                ('activo', models.BooleanField(default=True, verbose_name='Activo')),
+            ],
+            options={
+                'verbose_name': 'Diagnóstico CIE-10',
+                'verbose_name_plural': 'Diagnósticos CIE-10',
+                'ordering': ['codigo'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ResumenHistoriaClinica',
+            fields=[
+                ('paciente', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='resumen_historia', serialize=False, to='PacientesApp.paciente', verbose_name='Paciente')),
+                ('entradas', models.PositiveIntegerField(default=0, verbose_name='Entradas')),
+                ('primera_fecha', models.DateTimeField(blank=True, null=True, verbose_name='Primera entrada')),
+                ('ultima_fecha', models.DateTimeField(blank=True, db_index=True, null=True, verbose_name='Última entrada')),
+                ('diagnosticos', models.JSONField(default=dict, verbose_name='Diagnósticos')),
+                ('prestaciones', models.JSONField(default=dict, verbose_name='Prestaciones')),
+            ],
+            options={
+                'verbose_name': 'Resumen de Historia Clínica',
+                'verbose_name_plural': 'Resúmenes de Historias Clínicas',
+            },
+        ),
+        migrations.CreateModel(
+            name='EntradaClinica',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateTimeField(default=django.utils.timezone.now, editable=False, verbose_name='Fecha')),
+                ('pieza', models.CharField(blank=True, help_text='Pieza dental (FDI) o zona, si corresponde', max_length=10, verbose_name='Pieza/s')),
+                ('prestaciones', models.CharField(blank=True, help_text='Códigos del nomenclador separados por coma (copia al registrar)', max_length=200, verbose_name='Prestaciones')),
+                ('notas', models.TextField(help_text='Hallazgos, tratamiento realizado e indicaciones', verbose_name='Evolución')),
+                ('corrige', models.ForeignKey(blank=True, help_text='Entrada anterior que esta corrige o aclara', null=True, on_delete=django.db.models.deletion.PROTECT, related_name='aclaraciones', to='PacientesApp.entradaclinica', verbose_name='Aclara a')),
+                ('diagnostico', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='PacientesApp.diagnostico', verbose_name='Diagnóstico (CIE-10)')),
+                ('paciente', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='entradas_clinicas', to='PacientesApp.paciente', verbose_name='Paciente')),
+                ('profesional', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='entradas_clinicas', to=settings.AUTH_USER_MODEL, verbose_name='Profesional')),
+                ('turno', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='entradas_clinicas', to='TurnosApp.turno', verbose_name='Turno')),
+            ],
+            options={
+                'verbose_name': 'Entrada de Historia Clínica',
+                'verbose_name_plural': 'Entradas de Historias Clínicas',
+                'ordering': ['-fecha', '-id'],
+                'indexes': [models.Index(fields=['paciente', 'fecha', 'id'], name='entrada_paciente_fecha')],
+            },
+        ),
+    ]
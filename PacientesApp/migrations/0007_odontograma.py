@@ -0,0 +1,47 @@
+# Generated by Django 5.2.8 on 2026-10-19 12:04
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('PacientesApp', '0006_historia_clinica'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Odontograma',
+            fields=[
+                ('paciente', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='odontograma', serialize=False, to='PacientesApp.paciente', verbose_name='Paciente')),
+                ('estado', models.BinaryField(help_text='Codificado por PacientesApp.odontograma.EstadoOdontograma', max_length=312, verbose_name='Estado')),
+                ('version', models.PositiveIntegerField(default=0, verbose_name='Versión')),
+                ('fecha_modificacion', models.DateTimeField(auto_now=True, verbose_name='Última Modificación')),
+            ],
+            options={
+                'verbose_name': 'Odontograma',
+                'verbose_name_plural': 'Odontogramas',
+            },
+        ),
+        migrations.CreateModel(
+            name='VersionOdontograma',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.PositiveIntegerField(verbose_name='Versión')),
+                ('fecha', models.DateTimeField(auto_now_add=True, verbose_name='Fecha')),
+                ('cambios', models.BinaryField(help_text='4 bytes por cambio: posición, estado anterior y nuevo', verbose_name='Cambios')),
+                ('estado', models.BinaryField(blank=True, max_length=312, null=True, verbose_name='Estado completo')),
+                ('paciente', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='versiones_odontograma', to='PacientesApp.paciente', verbose_name='Paciente')),
+                ('profesional', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Profesional')),
+            ],
+            options={
+                'verbose_name': 'Versión de Odontograma',
+                'verbose_name_plural': 'Versiones de Odontogramas',
+                'ordering': ['paciente', '-version'],
+                'constraints': [models.UniqueConstraint(fields=('paciente', 'version'), name='odontograma_version_unica')],
+            },
+        ),
+    ]
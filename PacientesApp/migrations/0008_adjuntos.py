@@ -0,0 +1,71 @@
+# Generated by Django 5.2.8 on 2026-10-19 12:09
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('PacientesApp', '0007_odontograma'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivoClinico',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sha256', models.CharField(max_length=64, unique=True, verbose_name='SHA-256')),
+                ('tamanio', models.PositiveBigIntegerField(verbose_name='Tamaño (bytes)')),
+                ('tipo_contenido', models.CharField(max_length=100, verbose_name='Tipo de contenido')),
+                ('ancho', models.PositiveIntegerField(blank=True, null=True, verbose_name='Ancho (px)')),
+                ('alto', models.PositiveIntegerField(blank=True, null=True, verbose_name='Alto (px)')),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True, verbose_name='Fecha de Creación')),
+            ],
+            options={
+                'verbose_name': 'Archivo Clínico',
+                'verbose_name_plural': 'Archivos Clínicos',
+            },
+        ),
+        migrations.CreateModel(
+            name='SubidaAdjunto',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('nombre', models.CharField(max_length=255, verbose_name='Nombre del archivo')),
+                ('tipo', models.CharField(choices=[('radiografia', 'Radiografía'), ('escaneo', 'Escaneo intraoral'), ('foto', 'Fotografía clínica'), ('documento', 'Documento'), ('otro', 'Otro')], max_length=20, verbose_name='Tipo')),
+                ('descripcion', models.CharField(blank=True, max_length=255, verbose_name='Descripción')),
+                ('tamanio', models.PositiveBigIntegerField(verbose_name='Tamaño total (bytes)')),
+                ('recibidos', models.PositiveBigIntegerField(default=0, verbose_name='Bytes recibidos')),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True, verbose_name='Fecha de Creación')),
+                ('fecha_modificacion', models.DateTimeField(auto_now=True, verbose_name='Última Modificación')),
+                ('paciente', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='PacientesApp.paciente', verbose_name='Paciente')),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Usuario')),
+            ],
+            options={
+                'verbose_name': 'Subida de Adjunto',
+                'verbose_name_plural': 'Subidas de Adjuntos',
+            },
+        ),
+        migrations.CreateModel(
+            name='Adjunto',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.CharField(max_length=255, verbose_name='Nombre del archivo')),
+                ('tipo', models.CharField(choices=[('radiografia', 'Radiografía'), ('escaneo', 'Escaneo intraoral'), ('foto', 'Fotografía clínica'), ('documento', 'Documento'), ('otro', 'Otro')], default='radiografia', max_length=20, verbose_name='Tipo')),
+                ('descripcion', models.CharField(blank=True, max_length=255, verbose_name='Descripción')),
+                ('fecha_subida', models.DateTimeField(auto_now_add=True, verbose_name='Fecha de Subida')),
+                ('paciente', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='adjuntos', to='PacientesApp.paciente', verbose_name='Paciente')),
+                ('usuario_registro', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Usuario que Registró')),
+                ('archivo', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='adjuntos', to='PacientesApp.archivoclinico', verbose_name='Archivo')),
+            ],
+            options={
+                'verbose_name': 'Adjunto',
+                'verbose_name_plural': 'Adjuntos',
+                'ordering': ['-fecha_subida', '-id'],
+                'indexes': [models.Index(fields=['paciente', 'fecha_subida'], name='adjunto_paciente_fecha')],
+            },
+        ),
+    ]
@@ -1,5 +1,9 @@
+import uuid
+from datetime import date
 from django.db import models
+from django.core.exceptions import ValidationError
 from django.core.validators import RegexValidator
+from django.utils import timezone
 from UsuarioApp.models import Usuario
 
 class ObraSocial(models.Model):
@@ -19,6 +23,14 @@ class ObraSocial(models.Model):
         help_text='Código identificador de la obra social'
     )
     
+    sigla = models.CharField(
+        max_length=20,
+        blank=True,
+        null=True,
+        verbose_name='Sigla',
+        help_text='Sigla de la obra social (ej: OSDE, PAMI)'
+    )
+    
     activa = models.BooleanField(
         default=True,
         verbose_name='Activa'
@@ -33,6 +45,49 @@ class ObraSocial(models.Model):
         return self.nombre
 
 
+class Prestacion(models.Model):
+    """Prestación del Nomenclador odontológico (ver comando cargar_nomenclador)"""
+    
+    codigo = models.CharField(
+        max_length=10,
+        verbose_name='Código',
+        help_text='Código del nomenclador (ej: 01.01.00)'
+    )
+    
+    capitulo = models.CharField(
+        max_length=100,
+        verbose_name='Capítulo'
+    )
+    
+    descripcion = models.CharField(
+        max_length=200,
+        verbose_name='Descripción'
+    )
+    
+    detalle = models.TextField(
+        blank=True,
+        verbose_name='Detalle',
+        help_text='Alcance y condiciones de la prestación'
+    )
+    
+    activa = models.BooleanField(
+        default=True,
+        verbose_name='Activa'
+    )
+    
+    class Meta:
+        verbose_name = 'Prestación'
+        verbose_name_plural = 'Prestaciones'
+        ordering = ['codigo', 'descripcion']
+        # El nomenclador repite algunos códigos con prestaciones distintas
+        constraints = [
+            models.UniqueConstraint(fields=['codigo', 'descripcion'], name='prestacion_codigo_descripcion_unica'),
+        ]
+    
+    def __str__(self):
+        return f"{self.codigo} - {self.descripcion}"
+
+
 class CategoriaAntecedente(models.Model):
     """Categorías para organizar los antecedentes médicos"""
     
@@ -43,6 +98,14 @@ class CategoriaAntecedente(models.Model):
         ('medicacion', 'Medicación Actual'),
     ]
     
+    # Bit de cada categoría en Paciente.categorias_antecedentes
+    BITS = {
+        'enfermedad_cronica': 1,
+        'its': 2,
+        'alergia': 4,
+        'medicacion': 8,
+    }
+    
     nombre = models.CharField(
         max_length=100,
         verbose_name='Nombre'
@@ -242,6 +305,21 @@ class Paciente(models.Model):
         verbose_name='Paciente Activo'
     )
     
+    # Banderas desnormalizadas de los antecedentes activos (las mantiene PacientesApp.precauciones)
+    requiere_precaucion = models.BooleanField(
+        default=False,
+        editable=False,
+        verbose_name='Requiere Precaución',
+        help_text='Tiene algún antecedente activo que requiere precaución especial'
+    )
+    
+    categorias_antecedentes = models.PositiveSmallIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Categorías de Antecedentes',
+        help_text='Máscara de bits de las categorías con antecedentes activos (CategoriaAntecedente.BITS)'
+    )
+    
     # Campos de auditoría
     fecha_registro = models.DateTimeField(
         auto_now_add=True,
@@ -268,6 +346,7 @@ class Paciente(models.Model):
         indexes = [
             models.Index(fields=['dni']),
             models.Index(fields=['apellido', 'nombre']),
+            models.Index(fields=['requiere_precaucion']),
         ]
     
     def __str__(self):
@@ -288,4 +367,489 @@ class Paciente(models.Model):
     
     def tiene_obra_social(self):
         """Verifica si el paciente tiene obra social"""
-        return bool(self.numero_afiliado and self.obra_social)
\ No newline at end of file
+        return bool(self.numero_afiliado and self.obra_social)
+    
+    def tiene_antecedentes_de(self, categoria):
+        """Verifica si el paciente tiene antecedentes activos de la categoría"""
+        return bool(self.categorias_antecedentes & CategoriaAntecedente.BITS[categoria])
+    
+    def get_categorias_antecedentes(self):
+        """Nombres de las categorías con antecedentes activos (sin consultar la base)"""
+        return [
+            nombre for categoria, nombre in CategoriaAntecedente.CATEGORIAS
+            if self.tiene_antecedentes_de(categoria)
+        ]
+
+
+# ========== HISTORIA CLÍNICA (ver historia.py) ==========
+
+class Diagnostico(models.Model):
+    """Diagnóstico de la CIE-10 (capítulo odontológico, ver comando cargar_cie10)"""
+    
+    codigo = models.CharField(
+        max_length=10,
+        unique=True,
+        verbose_name='Código',
+        help_text='Código CIE-10 (ej: K021)'
+    )
+    
+    descripcion = models.CharField(
+        max_length=200,
+        verbose_name='Descripción'
+    )
+    
+    activo = models.BooleanField(
+        default=True,
+        verbose_name='Activo'
+    )
+    
+    class Meta:
+        verbose_name = 'Diagnóstico CIE-10'
+        verbose_name_plural = 'Diagnósticos CIE-10'
+        ordering = ['codigo']
+    
+    def __str__(self):
+        return f"{self.codigo} - {self.descripcion}"
+
+
+class EntradaClinica(models.Model):
+    """
+    Entrada de la historia clínica de un paciente. Solo se agregan: una entrada
+    guardada no se modifica ni se elimina (para corregirla se registra otra que la aclara).
+    """
+    
+    paciente = models.ForeignKey(
+        Paciente,
+        on_delete=models.PROTECT,
+        related_name='entradas_clinicas',
+        verbose_name='Paciente'
+    )
+    
+    turno = models.ForeignKey(
+        'TurnosApp.Turno',
+        on_delete=models.SET_NULL,
+        blank=True,
+        null=True,
+        related_name='entradas_clinicas',
+        verbose_name='Turno'
+    )
+    
+    fecha = models.DateTimeField(
+        default=timezone.now,
+        editable=False,
+        verbose_name='Fecha'
+    )
+    
+    profesional = models.ForeignKey(
+        Usuario,
+        on_delete=models.PROTECT,
+        related_name='entradas_clinicas',
+        verbose_name='Profesional'
+    )
+    
+    diagnostico = models.ForeignKey(
+        Diagnostico,
+        on_delete=models.PROTECT,
+        blank=True,
+        null=True,
+        related_name='+',
+        verbose_name='Diagnóstico (CIE-10)'
+    )
+    
+    pieza = models.CharField(
+        max_length=10,
+        blank=True,
+        verbose_name='Pieza/s',
+        help_text='Pieza dental (FDI) o zona, si corresponde'
+    )
+    
+    prestaciones = models.CharField(
+        max_length=200,
+        blank=True,
+        verbose_name='Prestaciones',
+        help_text='Códigos del nomenclador separados por coma (copia al registrar)'
+    )
+    
+    notas = models.TextField(
+        verbose_name='Evolución',
+        help_text='Hallazgos, tratamiento realizado e indicaciones'
+    )
+    
+    corrige = models.ForeignKey(
+        'self',
+        on_delete=models.PROTECT,
+        blank=True,
+        null=True,
+        related_name='aclaraciones',
+        verbose_name='Aclara a',
+        help_text='Entrada anterior que esta corrige o aclara'
+    )
+    
+    class Meta:
+        verbose_name = 'Entrada de Historia Clínica'
+        verbose_name_plural = 'Entradas de Historias Clínicas'
+        ordering = ['-fecha', '-id']
+        indexes = [
+            # Línea de tiempo del paciente paginada por cursor (fecha, id)
+            models.Index(fields=['paciente', 'fecha', 'id'], name='entrada_paciente_fecha'),
+        ]
+    
+    def __str__(self):
+        return f"{self.paciente_id} - {self.fecha:%d/%m/%Y %H:%M}"
+    
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValidationError('Las entradas de la historia clínica no se modifican: registrá una aclaración.')
+        super().save(*args, **kwargs)
+    
+    def delete(self, *args, **kwargs):
+        raise ValidationError('Las entradas de la historia clínica no se eliminan.')
+    
+    def get_prestaciones(self):
+        """Códigos del nomenclador como lista"""
+        return [codigo.strip() for codigo in self.prestaciones.split(',') if codigo.strip()]
+
+
+class ResumenHistoriaClinica(models.Model):
+    """
+    Resumen de la historia clínica de un paciente, al día con cada entrada nueva
+    (señal de EntradaClinica). Se lee junto con el paciente: abrir la historia no
+    recorre las entradas. Se reconstruye con el comando recalcular_historias.
+    """
+    
+    paciente = models.OneToOneField(
+        Paciente,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='resumen_historia',
+        verbose_name='Paciente'
+    )
+    
+    entradas = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Entradas'
+    )
+    
+    primera_fecha = models.DateTimeField(
+        blank=True,
+        null=True,
+        verbose_name='Primera entrada'
+    )
+    
+    ultima_fecha = models.DateTimeField(
+        blank=True,
+        null=True,
+        db_index=True,
+        verbose_name='Última entrada'
+    )
+    
+    # {código: [descripción, veces, 'AAAA-MM-DD' de la última vez]}: a lo sumo un ítem por código del catálogo
+    diagnosticos = models.JSONField(
+        default=dict,
+        verbose_name='Diagnósticos'
+    )
+    
+    # {código del nomenclador: veces}
+    prestaciones = models.JSONField(
+        default=dict,
+        verbose_name='Prestaciones'
+    )
+    
+    class Meta:
+        verbose_name = 'Resumen de Historia Clínica'
+        verbose_name_plural = 'Resúmenes de Historias Clínicas'
+    
+    def __str__(self):
+        return f"Historia de {self.paciente_id} ({self.entradas} entradas)"
+    
+    def get_diagnosticos(self):
+        """Diagnósticos ordenados por la última vez que se registraron"""
+        return sorted(
+            (
+                {'codigo': codigo, 'descripcion': descripcion, 'veces': veces, 'ultima': date.fromisoformat(ultima)}
+                for codigo, (descripcion, veces, ultima) in self.diagnosticos.items()
+            ),
+            key=lambda diagnostico: diagnostico['ultima'],
+            reverse=True
+        )
+    
+    def get_prestaciones(self):
+        """Prestaciones más registradas primero"""
+        return sorted(self.prestaciones.items(), key=lambda item: (-item[1], item[0]))
+
+
+# ========== ODONTOGRAMA (ver odontograma.py) ==========
+
+class Odontograma(models.Model):
+    """Estado vigente del odontograma del paciente: 52 piezas x (pieza + 5 caras) en 312 bytes"""
+    
+    paciente = models.OneToOneField(
+        Paciente,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='odontograma',
+        verbose_name='Paciente'
+    )
+    
+    estado = models.BinaryField(
+        max_length=312,
+        verbose_name='Estado',
+        help_text='Codificado por PacientesApp.odontograma.EstadoOdontograma'
+    )
+    
+    version = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Versión'
+    )
+    
+    fecha_modificacion = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Última Modificación'
+    )
+    
+    class Meta:
+        verbose_name = 'Odontograma'
+        verbose_name_plural = 'Odontogramas'
+    
+    def __str__(self):
+        return f"Odontograma de {self.paciente_id} (v{self.version})"
+
+
+class VersionOdontograma(models.Model):
+    """
+    Versión del odontograma: los cambios respecto de la anterior y, cada
+    FOTO_CADA versiones, el estado completo
+    """
+    
+    paciente = models.ForeignKey(
+        Paciente,
+        on_delete=models.CASCADE,
+        related_name='versiones_odontograma',
+        verbose_name='Paciente'
+    )
+    
+    version = models.PositiveIntegerField(
+        verbose_name='Versión'
+    )
+    
+    fecha = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Fecha'
+    )
+    
+    profesional = models.ForeignKey(
+        Usuario,
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name='+',
+        verbose_name='Profesional'
+    )
+    
+    cambios = models.BinaryField(
+        verbose_name='Cambios',
+        help_text='4 bytes por cambio: posición, estado anterior y nuevo'
+    )
+    
+    estado = models.BinaryField(
+        max_length=312,
+        blank=True,
+        null=True,
+        verbose_name='Estado completo'
+    )
+    
+    class Meta:
+        verbose_name = 'Versión de Odontograma'
+        verbose_name_plural = 'Versiones de Odontogramas'
+        ordering = ['paciente', '-version']
+        constraints = [
+            models.UniqueConstraint(fields=['paciente', 'version'], name='odontograma_version_unica'),
+        ]
+    
+    def __str__(self):
+        return f"Odontograma de {self.paciente_id} v{self.version}"
+
+
+# ========== ADJUNTOS (ver adjuntos.py) ==========
+
+class ArchivoClinico(models.Model):
+    """
+    Contenido de un adjunto, identificado por su SHA-256: el mismo archivo subido
+    varias veces (o para varios pacientes) se guarda una sola vez
+    """
+    
+    sha256 = models.CharField(
+        max_length=64,
+        unique=True,
+        verbose_name='SHA-256'
+    )
+    
+    tamanio = models.PositiveBigIntegerField(
+        verbose_name='Tamaño (bytes)'
+    )
+    
+    tipo_contenido = models.CharField(
+        max_length=100,
+        verbose_name='Tipo de contenido'
+    )
+    
+    ancho = models.PositiveIntegerField(
+        blank=True,
+        null=True,
+        verbose_name='Ancho (px)'
+    )
+    
+    alto = models.PositiveIntegerField(
+        blank=True,
+        null=True,
+        verbose_name='Alto (px)'
+    )
+    
+    fecha_creacion = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Fecha de Creación'
+    )
+    
+    class Meta:
+        verbose_name = 'Archivo Clínico'
+        verbose_name_plural = 'Archivos Clínicos'
+    
+    def __str__(self):
+        return f"{self.sha256[:12]} ({self.tipo_contenido}, {self.tamanio} bytes)"
+    
+    def es_imagen(self):
+        return self.ancho is not None
+
+
+class Adjunto(models.Model):
+    """Radiografía, escaneo o documento adjunto a un paciente"""
+    
+    TIPO_CHOICES = [
+        ('radiografia', 'Radiografía'),
+        ('escaneo', 'Escaneo intraoral'),
+        ('foto', 'Fotografía clínica'),
+        ('documento', 'Documento'),
+        ('otro', 'Otro'),
+    ]
+    
+    paciente = models.ForeignKey(
+        Paciente,
+        on_delete=models.CASCADE,
+        related_name='adjuntos',
+        verbose_name='Paciente'
+    )
+    
+    archivo = models.ForeignKey(
+        ArchivoClinico,
+        on_delete=models.PROTECT,
+        related_name='adjuntos',
+        verbose_name='Archivo'
+    )
+    
+    nombre = models.CharField(
+        max_length=255,
+        verbose_name='Nombre del archivo'
+    )
+    
+    tipo = models.CharField(
+        max_length=20,
+        choices=TIPO_CHOICES,
+        default='radiografia',
+        verbose_name='Tipo'
+    )
+    
+    descripcion = models.CharField(
+        max_length=255,
+        blank=True,
+        verbose_name='Descripción'
+    )
+    
+    fecha_subida = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Fecha de Subida'
+    )
+    
+    usuario_registro = models.ForeignKey(
+        Usuario,
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name='+',
+        verbose_name='Usuario que Registró'
+    )
+    
+    class Meta:
+        verbose_name = 'Adjunto'
+        verbose_name_plural = 'Adjuntos'
+        ordering = ['-fecha_subida', '-id']
+        indexes = [
+            models.Index(fields=['paciente', 'fecha_subida'], name='adjunto_paciente_fecha'),
+        ]
+    
+    def __str__(self):
+        return f"{self.nombre} ({self.paciente_id})"
+
+
+class SubidaAdjunto(models.Model):
+    """Subida en partes en curso: se puede retomar desde `recibidos` si se corta"""
+    
+    id = models.UUIDField(
+        primary_key=True,
+        default=uuid.uuid4,
+        editable=False
+    )
+    
+    paciente = models.ForeignKey(
+        Paciente,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Paciente'
+    )
+    
+    usuario = models.ForeignKey(
+        Usuario,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Usuario'
+    )
+    
+    nombre = models.CharField(
+        max_length=255,
+        verbose_name='Nombre del archivo'
+    )
+    
+    tipo = models.CharField(
+        max_length=20,
+        choices=Adjunto.TIPO_CHOICES,
+        verbose_name='Tipo'
+    )
+    
+    descripcion = models.CharField(
+        max_length=255,
+        blank=True,
+        verbose_name='Descripción'
+    )
+    
+    tamanio = models.PositiveBigIntegerField(
+        verbose_name='Tamaño total (bytes)'
+    )
+    
+    recibidos = models.PositiveBigIntegerField(
+        default=0,
+        verbose_name='Bytes recibidos'
+    )
+    
+    fecha_creacion = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Fecha de Creación'
+    )
+    
+    fecha_modificacion = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Última Modificación'
+    )
+    
+    class Meta:
+        verbose_name = 'Subida de Adjunto'
+        verbose_name_plural = 'Subidas de Adjuntos'
+    
+    def __str__(self):
+        return f"{self.nombre} ({self.recibidos}/{self.tamanio})"
@@ -0,0 +1,173 @@
+import re
+import threading
+import time as reloj
+import unicodedata
+from bisect import bisect_left
+from django.conf import settings
+from config.caches import version_modelo, invalidar_modelo
+
+CAMPOS = ['id', 'nombre', 'codigo', 'sigla', 'activa']
+
+
+def normalizar(texto):
+    """Mayúsculas, sin acentos ni signos, espacios simples: 'Obra  Social (Ñandú)' -> 'OBRA SOCIAL NANDU'"""
+    texto = unicodedata.normalize('NFKD', texto or '')
+    texto = ''.join(caracter for caracter in texto if not unicodedata.combining(caracter))
+    return ' '.join(re.sub(r'[^0-9A-Z]+', ' ', texto.upper()).split())
+
+
+def normalizar_codigo(codigo):
+    """El RNOS se compara solo por sus dígitos: '1-0020-8' -> '100208'"""
+    return re.sub(r'\D', '', codigo or '')
+
+
+def etiqueta(obra):
+    """Texto para mostrar una obra social: 'NOMBRE (SIGLA)'"""
+    if obra['sigla']:
+        return f"{obra['nombre']} ({obra['sigla']})"
+    return obra['nombre']
+
+
+class IndiceObrasSociales:
+    """
+    Obras sociales en memoria, indexadas por id, código RNOS, sigla y palabras
+    del nombre normalizado. Las ~300 del padrón de la SSSalud ocupan poco y se
+    buscan sin consultar la base.
+    """
+
+    def __init__(self, obras, version):
+        self.version = version
+        self.por_id = {}
+        self.por_codigo = {}
+        self.por_sigla = {}
+        self.nombres = {}
+        palabras = set()
+
+        for obra in obras:
+            self.por_id[obra['id']] = obra
+            if not obra['activa']:
+                continue
+
+            codigo = normalizar_codigo(obra['codigo'])
+            if codigo:
+                self.por_codigo[codigo] = obra['id']
+
+            sigla = normalizar(obra['sigla'])
+            if sigla:
+                self.por_sigla.setdefault(sigla, []).append(obra['id'])
+
+            nombre = normalizar(obra['nombre'])
+            self.nombres[obra['id']] = nombre
+            palabras.update((palabra, obra['id']) for palabra in nombre.split())
+
+        # Ordenadas para buscar por prefijo con bisect
+        self.palabras = sorted(palabras)
+        self.siglas = sorted(self.por_sigla)
+
+    def obtener(self, pk):
+        """Obra social por id (activa o no), o None"""
+        return self.por_id.get(pk)
+
+    def _con_prefijo(self, prefijo):
+        """Ids de obras con alguna palabra del nombre que empieza con el prefijo"""
+        ids = set()
+        for palabra, obra_id in self.palabras[bisect_left(self.palabras, (prefijo,)):]:
+            if not palabra.startswith(prefijo):
+                break
+            ids.add(obra_id)
+        return ids
+
+    def _siglas_con_prefijo(self, prefijo):
+        ids = []
+        for sigla in self.siglas[bisect_left(self.siglas, prefijo):]:
+            if not sigla.startswith(prefijo):
+                break
+            ids.extend(self.por_sigla[sigla])
+        return ids
+
+    def buscar(self, texto, limite=10):
+        """
+        Obras sociales activas que coinciden con el texto, en orden de relevancia:
+        código RNOS exacto, siglas que empiezan con el texto (la exacta primero) y
+        luego nombres en los que cada palabra buscada es prefijo de alguna palabra
+        (los que empiezan con el texto primero).
+        """
+        consulta = normalizar(texto)
+        if not consulta:
+            return []
+
+        resultados = []
+
+        codigo = normalizar_codigo(consulta)
+        if codigo and codigo == consulta.replace(' ', ''):
+            if codigo in self.por_codigo:
+                resultados.append(self.por_codigo[codigo])
+
+        resultados.extend(self.por_sigla.get(consulta, []))
+        resultados.extend(self._siglas_con_prefijo(consulta))
+
+        palabras = consulta.split()
+        candidatos = self._con_prefijo(max(palabras, key=len))
+        for palabra in palabras:
+            if not candidatos:
+                break
+            candidatos &= self._con_prefijo(palabra)
+
+        resultados.extend(sorted(
+            candidatos,
+            key=lambda obra_id: (not self.nombres[obra_id].startswith(consulta), self.nombres[obra_id])
+        ))
+
+        vistos = set()
+        obras = []
+        for obra_id in resultados:
+            if obra_id not in vistos:
+                vistos.add(obra_id)
+                obras.append(self.por_id[obra_id])
+        return obras[:limite]
+
+
+_lock = threading.Lock()
+_cache = {'indice': None, 'cargado': 0.0}
+
+
+def version_actual():
+    """Versión de ObraSocial en el cache compartido (ver PacientesApp.catalogo)"""
+    from .models import ObraSocial
+
+    return version_modelo(ObraSocial)
+
+
+def obtener_indice():
+    """
+    Índice de obras sociales cacheado en el proceso.
+    Se recarga cuando cambia la versión (al guardar/eliminar una obra social) o a
+    los OBRAS_SOCIALES_CACHE_SEGUNDOS, para procesos que no vieron el cambio.
+    """
+    ttl = getattr(settings, 'OBRAS_SOCIALES_CACHE_SEGUNDOS', 300)
+    version = version_actual()
+    indice = _cache['indice']
+
+    if indice is not None and indice.version == version and reloj.monotonic() - _cache['cargado'] < ttl:
+        return indice
+
+    with _lock:
+        indice = _cache['indice']
+        if indice is None or indice.version != version or reloj.monotonic() - _cache['cargado'] >= ttl:
+            from .models import ObraSocial
+
+            indice = IndiceObrasSociales(list(ObraSocial.objects.order_by().values(*CAMPOS)), version)
+            _cache['indice'] = indice
+            _cache['cargado'] = reloj.monotonic()
+
+        return indice
+
+
+def invalidar_indice():
+    """Sube la versión del índice y descarta la copia de este proceso"""
+    from .models import ObraSocial
+
+    invalidar_modelo(ObraSocial)
+
+    with _lock:
+        _cache['indice'] = None
@@ -0,0 +1,326 @@
+"""
+Odontograma codificado en bytes de ancho fijo.
+
+Cada una de las 52 piezas FDI (32 permanentes y 20 temporales) ocupa 6 bytes: el
+estado de la pieza completa y el de sus 5 caras. Todo el odontograma son 312 bytes
+en una sola columna (Odontograma.estado) en lugar de 260 filas por paciente, y
+decodificarlo es indexar un bytearray.
+
+Historial (VersionOdontograma): cada guardado con cambios es una versión nueva que
+guarda solo las posiciones que cambiaron (4 bytes por cambio: posición, antes,
+después). Cada FOTO_CADA versiones se guarda además el estado completo, así que
+cualquier versión se reconstruye con una consulta: la foto anterior más los
+cambios que la siguen (a lo sumo FOTO_CADA - 1).
+"""
+import struct
+from collections import namedtuple
+from django.db import transaction
+
+
+# Orden fijo de las piezas en el arreglo: no cambiarlo (invalidaría lo guardado)
+DIENTES = tuple(
+    cuadrante * 10 + pieza
+    for cuadrante, piezas in ((1, 8), (2, 8), (3, 8), (4, 8), (5, 5), (6, 5), (7, 5), (8, 5))
+    for pieza in range(1, piezas + 1)
+)
+
+CARAS = [
+    ('O', 'Oclusal/Incisal'),
+    ('V', 'Vestibular'),
+    ('L', 'Lingual/Palatino'),
+    ('M', 'Mesial'),
+    ('D', 'Distal'),
+]
+
+ESTADOS_PIEZA = [
+    (0, 'Presente'),
+    (1, 'Ausente'),
+    (2, 'Extracción indicada'),
+    (3, 'Corona'),
+    (4, 'Implante'),
+    (5, 'Endodoncia'),
+    (6, 'Póntico'),
+    (7, 'Sin erupcionar'),
+]
+
+ESTADOS_CARA = [
+    (0, 'Sana'),
+    (1, 'Caries'),
+    (2, 'Restauración'),
+    (3, 'Restauración defectuosa'),
+    (4, 'Sellador'),
+    (5, 'Fractura'),
+]
+
+BYTES_POR_DIENTE = 1 + len(CARAS)
+TAMANIO = len(DIENTES) * BYTES_POR_DIENTE
+
+# Cada cuántas versiones se guarda el estado completo
+FOTO_CADA = 10
+
+_POSICION_DIENTE = {numero: i * BYTES_POR_DIENTE for i, numero in enumerate(DIENTES)}
+_DESPLAZAMIENTO_CARA = {codigo: i + 1 for i, (codigo, _) in enumerate(CARAS)}
+_NOMBRES_PIEZA = dict(ESTADOS_PIEZA)
+_NOMBRES_CARA = dict(ESTADOS_CARA)
+_NOMBRES_CARAS = dict(CARAS)
+
+# Cambio: posición (2 bytes), estado anterior y estado nuevo
+_REGISTRO = struct.Struct('>HBB')
+
+# cara None = la pieza completa
+Cambio = namedtuple('Cambio', ['diente', 'cara', 'antes', 'despues'])
+
+
+def _ubicar(posicion):
+    """(diente, cara o None) de una posición del arreglo"""
+    indice, desplazamiento = divmod(posicion, BYTES_POR_DIENTE)
+    return DIENTES[indice], CARAS[desplazamiento - 1][0] if desplazamiento else None
+
+
+def nombre_estado(cara, estado):
+    return (_NOMBRES_CARA if cara else _NOMBRES_PIEZA).get(estado, f'Estado {estado}')
+
+
+def describir(cambio):
+    """'36 Oclusal/Incisal: Sana → Caries'"""
+    lugar = f'{cambio.diente} {_NOMBRES_CARAS[cambio.cara]}' if cambio.cara else f'{cambio.diente}'
+    return f'{lugar}: {nombre_estado(cambio.cara, cambio.antes)} → {nombre_estado(cambio.cara, cambio.despues)}'
+
+
+class EstadoOdontograma:
+    """Estado de las 52 piezas sobre un bytearray de TAMANIO bytes"""
+
+    __slots__ = ('datos',)
+
+    def __init__(self, datos=None):
+        self.datos = bytearray(TAMANIO if datos is None else datos)
+        if len(self.datos) != TAMANIO:
+            raise ValueError(f'El odontograma debe tener {TAMANIO} bytes (tiene {len(self.datos)}).')
+
+    def __bytes__(self):
+        return bytes(self.datos)
+
+    def __eq__(self, otro):
+        return isinstance(otro, EstadoOdontograma) and self.datos == otro.datos
+
+    def copia(self):
+        return EstadoOdontograma(self.datos)
+
+    @staticmethod
+    def posicion(diente, cara=None):
+        try:
+            return _POSICION_DIENTE[diente] + (_DESPLAZAMIENTO_CARA[cara] if cara else 0)
+        except KeyError:
+            raise ValueError(f'Pieza o cara inexistente: {diente} {cara or ""}'.strip())
+
+    def estado(self, diente, cara=None):
+        return self.datos[self.posicion(diente, cara)]
+
+    def cambiar(self, diente, cara, estado):
+        """Cambia el estado de una cara (o de la pieza completa con cara=None)"""
+        if estado not in (_NOMBRES_CARA if cara else _NOMBRES_PIEZA):
+            raise ValueError(f'Estado inválido para {diente} {cara or ""}: {estado}'.strip())
+        self.datos[self.posicion(diente, cara)] = estado
+
+    def diente(self, numero):
+        """{'numero', 'estado', 'caras': {código: estado}} de una pieza"""
+        inicio = self.posicion(numero)
+        estados = self.datos[inicio:inicio + BYTES_POR_DIENTE]
+        return {
+            'numero': numero,
+            'estado': estados[0],
+            'caras': {codigo: estados[i + 1] for i, (codigo, _) in enumerate(CARAS)},
+        }
+
+    def diferencias(self, otro):
+        """Cambios para pasar de este estado a `otro`, en el orden de DIENTES"""
+        cambios = []
+        for inicio in range(0, TAMANIO, BYTES_POR_DIENTE):
+            fin = inicio + BYTES_POR_DIENTE
+            # La mayoría de las piezas no cambia entre visitas: se comparan enteras primero
+            if self.datos[inicio:fin] == otro.datos[inicio:fin]:
+                continue
+            for posicion in range(inicio, fin):
+                if self.datos[posicion] != otro.datos[posicion]:
+                    cambios.append(Cambio(*_ubicar(posicion), self.datos[posicion], otro.datos[posicion]))
+        return cambios
+
+
+# ========== DELTAS ==========
+
+def codificar_cambios(antes, despues):
+    """Bytes con las posiciones que cambian de `antes` a `despues` (vacío si son iguales)"""
+    return b''.join(
+        _REGISTRO.pack(posicion, anterior, nuevo)
+        for posicion, (anterior, nuevo) in enumerate(zip(antes.datos, despues.datos))
+        if anterior != nuevo
+    )
+
+
+def aplicar_cambios(estado, cambios, revertir=False):
+    """Aplica (o deshace, con revertir=True) un delta sobre el estado, en el lugar"""
+    for posicion, anterior, nuevo in _REGISTRO.iter_unpack(cambios):
+        estado.datos[posicion] = anterior if revertir else nuevo
+    return estado
+
+
+def leer_cambios(cambios):
+    """Lista de Cambio de un delta"""
+    return [
+        Cambio(*_ubicar(posicion), anterior, nuevo)
+        for posicion, anterior, nuevo in _REGISTRO.iter_unpack(cambios)
+    ]
+
+
+def cantidad_cambios(cambios):
+    return len(cambios) // _REGISTRO.size
+
+
+# ========== PERSISTENCIA ==========
+
+def lleva_foto(version):
+    return (version - 1) % FOTO_CADA == 0
+
+
+def estado_actual(paciente_id):
+    """(EstadoOdontograma, versión) vigente del paciente; vacío y 0 si no tiene"""
+    from .models import Odontograma
+
+    fila = Odontograma.objects.filter(paciente_id=paciente_id).values_list('estado', 'version').first()
+    if fila is None:
+        return EstadoOdontograma(), 0
+    return EstadoOdontograma(fila[0]), fila[1]
+
+
+def estado_en_version(paciente_id, version):
+    """Estado del odontograma en una versión (una consulta), o None si no existe"""
+    from .models import VersionOdontograma
+
+    foto = version - (version - 1) % FOTO_CADA
+    filas = list(
+        VersionOdontograma.objects.filter(
+            paciente_id=paciente_id, version__range=(foto, version)
+        ).order_by('version').values_list('version', 'estado', 'cambios')
+    )
+    if version < 1 or len(filas) != version - foto + 1 or filas[0][1] is None:
+        return None
+
+    estado = EstadoOdontograma(filas[0][1])
+    for _, _, cambios in filas[1:]:
+        aplicar_cambios(estado, cambios)
+    return estado
+
+
+class OdontogramaDesactualizado(Exception):
+    """Otro profesional cambió las mismas posiciones desde que se abrió el formulario"""
+
+    def __init__(self, cambios):
+        self.cambios = cambios
+        super().__init__(', '.join(describir(cambio) for cambio in cambios))
+
+
+def combinar(vigente, base, nuevo):
+    """
+    Aplica sobre el estado vigente solo lo que cambió de `base` (lo que vio el
+    formulario) a `nuevo` (lo que se envió). Si alguna de esas posiciones también
+    cambió en vigente, y a otro valor, se rechaza con OdontogramaDesactualizado.
+    """
+    resultado = vigente.copia()
+    conflictos = []
+    for cambio in base.diferencias(nuevo):
+        posicion = EstadoOdontograma.posicion(cambio.diente, cambio.cara)
+        actual = vigente.datos[posicion]
+        if actual != cambio.antes and actual != cambio.despues:
+            conflictos.append(Cambio(cambio.diente, cambio.cara, actual, cambio.despues))
+        resultado.datos[posicion] = cambio.despues
+    if conflictos:
+        raise OdontogramaDesactualizado(conflictos)
+    return resultado
+
+
+def guardar_odontograma(paciente_id, nuevo, profesional, base=None):
+    """
+    Guarda el estado como versión nueva si cambió algo.
+    Con `base` (el estado sobre el que se editó) se guardan solo las posiciones
+    editadas, combinadas con el estado vigente bajo bloqueo: dos profesionales que
+    editan a la vez piezas distintas no se pisan (ver combinar).
+    Retorna la VersionOdontograma creada, o None si no hubo cambios.
+    """
+    from .models import Odontograma, VersionOdontograma
+
+    with transaction.atomic():
+        actual, _ = Odontograma.objects.select_for_update().get_or_create(
+            paciente_id=paciente_id,
+            defaults={'estado': bytes(TAMANIO)}
+        )
+        vigente = EstadoOdontograma(actual.estado)
+        if base is not None:
+            nuevo = combinar(vigente, base, nuevo)
+        cambios = codificar_cambios(vigente, nuevo)
+        if not cambios:
+            return None
+
+        actual.version += 1
+        actual.estado = bytes(nuevo)
+        actual.save()
+        return VersionOdontograma.objects.create(
+            paciente_id=paciente_id,
+            version=actual.version,
+            profesional=profesional,
+            cambios=cambios,
+            estado=actual.estado if lleva_foto(actual.version) else None,
+        )
+
+
+# ========== DIBUJO ==========
+
+# Filas del odontograma como se dibuja (de la derecha a la izquierda del paciente)
+FILAS = [
+    [18, 17, 16, 15, 14, 13, 12, 11, 21, 22, 23, 24, 25, 26, 27, 28],
+    [55, 54, 53, 52, 51, 61, 62, 63, 64, 65],
+    [85, 84, 83, 82, 81, 71, 72, 73, 74, 75],
+    [48, 47, 46, 45, 44, 43, 42, 41, 31, 32, 33, 34, 35, 36, 37, 38],
+]
+
+
+def disposicion(numero):
+    """
+    Caras en (arriba, izquierda, centro, derecha, abajo) al dibujar la pieza:
+    vestibular hacia afuera de la boca y mesial hacia la línea media.
+    """
+    cuadrante = numero // 10
+    superior = cuadrante in (1, 2, 5, 6)
+    derecha_paciente = cuadrante in (1, 4, 5, 8)
+    arriba, abajo = ('V', 'L') if superior else ('L', 'V')
+    izquierda, derecha = ('D', 'M') if derecha_paciente else ('M', 'D')
+    return arriba, izquierda, 'O', derecha, abajo
+
+
+def filas_para_dibujar(estado, resaltar=()):
+    """
+    Estructura para la plantilla: filas de piezas con sus caras en orden de dibujo.
+    `resaltar` son Cambio (p. ej. de diferencias) que se marcan.
+    """
+    resaltados = {(cambio.diente, cambio.cara) for cambio in resaltar}
+    filas = []
+    for numeros in FILAS:
+        fila = []
+        for numero in numeros:
+            pieza = estado.diente(numero)
+            fila.append({
+                'numero': numero,
+                'estado': pieza['estado'],
+                'nombre_estado': _NOMBRES_PIEZA.get(pieza['estado'], ''),
+                'cambiada': (numero, None) in resaltados,
+                'caras': [
+                    {
+                        'codigo': cara,
+                        'estado': pieza['caras'][cara],
+                        'titulo': f'{numero} {_NOMBRES_CARAS[cara]}: {nombre_estado(cara, pieza["caras"][cara])}',
+                        'cambiada': (numero, cara) in resaltados,
+                    }
+                    for cara in disposicion(numero)
+                ],
+            })
+        filas.append(fila)
+    return filas
@@ -0,0 +1,74 @@
+from django.db import transaction
+from django.utils import timezone
+from .models import Paciente, AntecedentePaciente, CategoriaAntecedente
+
+
+def calcular_banderas(paciente_ids=None):
+    """
+    Calcula (requiere_precaucion, categorias_antecedentes) a partir de los
+    antecedentes activos, en una sola consulta agrupada.
+    Retorna {paciente_id: (requiere_precaucion, máscara)}; los pacientes pedidos
+    sin antecedentes activos quedan en (False, 0).
+    """
+    banderas = {paciente_id: (False, 0) for paciente_id in (paciente_ids or [])}
+
+    antecedentes = AntecedentePaciente.objects.filter(activo=True)
+    if paciente_ids is not None:
+        antecedentes = antecedentes.filter(paciente_id__in=paciente_ids)
+
+    for paciente_id, categoria, precaucion in antecedentes.order_by().values_list(
+        'paciente_id', 'antecedente__categoria', 'antecedente__requiere_precaucion'
+    ).distinct():
+        requiere, mascara = banderas.get(paciente_id, (False, 0))
+        banderas[paciente_id] = (requiere or precaucion, mascara | CategoriaAntecedente.BITS.get(categoria, 0))
+
+    return banderas
+
+
+def _guardar_banderas(banderas, tocar, batch_size=1000):
+    """Un UPDATE por combinación de banderas (a lo sumo 32), no uno por paciente"""
+    grupos = {}
+    for paciente_id, valores in banderas.items():
+        grupos.setdefault(valores, []).append(paciente_id)
+
+    cambios = {'fecha_modificacion': timezone.now()} if tocar else {}
+    for (requiere, mascara), ids in grupos.items():
+        for inicio in range(0, len(ids), batch_size):
+            Paciente.objects.filter(pk__in=ids[inicio:inicio + batch_size]).update(
+                requiere_precaucion=requiere,
+                categorias_antecedentes=mascara,
+                **cambios
+            )
+
+
+def actualizar_banderas(paciente_ids):
+    """
+    Recalcula las banderas de los pacientes y cambia su fecha de modificación
+    (la versión de la ficha cacheada en PacientesApp.resumen)
+    """
+    paciente_ids = [paciente_id for paciente_id in paciente_ids if paciente_id]
+    if not paciente_ids:
+        return
+
+    _guardar_banderas(calcular_banderas(paciente_ids), tocar=True)
+
+
+def reconstruir_banderas():
+    """
+    Recalcula las banderas de todos los pacientes. Solo se escriben los que
+    cambiaron, y a esos se les cambia la fecha de modificación: la ficha y las
+    filas de turnos cacheadas usan esa fecha como versión.
+    Retorna la cantidad de pacientes actualizados.
+    """
+    banderas = calcular_banderas()
+
+    with transaction.atomic():
+        cambiados = {}
+        actuales = Paciente.objects.order_by().values_list('pk', 'requiere_precaucion', 'categorias_antecedentes')
+        for paciente_id, requiere, mascara in actuales.iterator(chunk_size=2000):
+            valores = banderas.get(paciente_id, (False, 0))
+            if valores != (requiere, mascara):
+                cambiados[paciente_id] = valores
+        _guardar_banderas(cambiados, tocar=True)
+
+    return len(cambiados)
@@ -0,0 +1,82 @@
+from django.conf import settings
+from django.http import Http404
+from django.utils import timezone
+from config.caches import clave_versionada, obtener_o_calcular
+from .models import Paciente, AntecedentePaciente, CategoriaAntecedente, ObraSocial
+
+
+def version_paciente(paciente_id):
+    """Versión de la ficha: la fecha de última modificación del paciente (None si no existe)"""
+    return Paciente.objects.filter(pk=paciente_id).values_list('fecha_modificacion', flat=True).first()
+
+
+def clave_resumen(paciente_id, version):
+    """Clave de la ficha: versión del paciente y de ObraSocial (la ficha muestra su obra social)"""
+    return clave_versionada('pacientes:resumen', paciente_id, version.timestamp(), modelos=[ObraSocial])
+
+
+def _cargar_ficha(paciente_id):
+    """Paciente con obra social y antecedentes activos agrupados por categoría (2 consultas)"""
+    paciente = Paciente.objects.select_related('obra_social', 'usuario_registro').get(pk=paciente_id)
+
+    antecedentes = {categoria: [] for categoria, _ in CategoriaAntecedente.CATEGORIAS}
+    for antecedente in AntecedentePaciente.objects.filter(
+        paciente_id=paciente_id,
+        activo=True
+    ).select_related('antecedente').order_by('antecedente__orden', 'antecedente__nombre'):
+        antecedentes.setdefault(antecedente.antecedente.categoria, []).append(antecedente)
+
+    return {'paciente': paciente, 'antecedentes': antecedentes}
+
+
+def _turnos(paciente_id, limite):
+    """Próximos turnos activos y últimos turnos pasados del paciente (2 consultas)"""
+    from TurnosApp.models import Turno
+
+    hoy = timezone.localdate()
+    turnos = Turno.objects.filter(paciente_id=paciente_id).select_related('odontologo')
+
+    proximos = list(turnos.filter(fecha__gte=hoy, estado__in=Turno.ESTADOS_ACTIVOS).order_by('fecha', 'hora')[:limite])
+    recientes = list(turnos.filter(fecha__lt=hoy).order_by('-fecha', '-hora')[:limite])
+    return proximos, recientes
+
+
+def obtener_resumen(paciente_id, limite_turnos=5):
+    """
+    Resumen clínico de un paciente para la ficha, en una cantidad fija de consultas.
+
+    La ficha (paciente, obra social y antecedentes) se cachea con la versión del
+    paciente en la clave: cualquier guardado del paciente o de sus antecedentes
+    cambia fecha_modificacion y la entrada vieja simplemente deja de leerse. La
+    clave lleva también la versión de ObraSocial, que sube al editar cualquier
+    obra social (un cambio de nombre no toca a sus pacientes).
+    Los turnos cambian en otro ritmo: van al cache 'agenda' con la versión de Turno
+    en la clave (sube con cualquier alta, cambio o baja de un turno).
+
+    Con cache: 1 consulta. Sin cache: 5.
+    """
+    version = version_paciente(paciente_id)
+    if version is None:
+        raise Http404('No existe el paciente.')
+
+    ficha = obtener_o_calcular(
+        clave_resumen(paciente_id, version),
+        lambda: _cargar_ficha(paciente_id),
+        getattr(settings, 'PACIENTES_RESUMEN_CACHE_SEGUNDOS', 600)
+    )
+
+    from TurnosApp.models import Turno
+
+    hoy = timezone.localdate()
+    proximos, recientes = obtener_o_calcular(
+        clave_versionada('pacientes:turnos', paciente_id, limite_turnos, hoy.isoformat(), modelos=[Turno]),
+        lambda: _turnos(paciente_id, limite_turnos),
+        alias='agenda'
+    )
+
+    return {
+        **ficha,
+        'turnos_proximos': proximos,
+        'turnos_recientes': recientes,
+    }
+
@@ -0,0 +1,53 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import AntecedentePaciente, CategoriaAntecedente, ObraSocial, EntradaClinica
+from .precauciones import actualizar_banderas
+from .catalogo import invalidar_catalogo
+from .obras_sociales import invalidar_indice
+from .historia import sumar_entrada
+
+
+@receiver(post_save, sender=AntecedentePaciente)
+@receiver(post_delete, sender=AntecedentePaciente)
+def antecedente_modificado(sender, instance, raw=False, **kwargs):
+    """Recalcula las banderas del paciente (y cambia la versión de su ficha)"""
+    if raw:
+        return
+    actualizar_banderas([instance.paciente_id])
+
+
+@receiver(post_save, sender=CategoriaAntecedente)
+def categoria_modificada(sender, instance, created, raw=False, **kwargs):
+    """Un cambio de categoría o de precaución afecta a todos los pacientes que la tienen"""
+    if raw or created:
+        return
+    actualizar_banderas(list(
+        AntecedentePaciente.objects.filter(antecedente=instance).values_list('paciente_id', flat=True)
+    ))
+
+
+@receiver(post_save, sender=CategoriaAntecedente)
+@receiver(post_delete, sender=CategoriaAntecedente)
+def catalogo_modificado(sender, raw=False, **kwargs):
+    """Invalida el catálogo de antecedentes en memoria cuando se confirma el cambio"""
+    if raw:
+        return
+    transaction.on_commit(invalidar_catalogo)
+
+
+@receiver(post_save, sender=ObraSocial)
+@receiver(post_delete, sender=ObraSocial)
+def obra_social_modificada(sender, raw=False, **kwargs):
+    """Invalida el índice de obras sociales en memoria cuando se confirma el cambio"""
+    if raw:
+        return
+    transaction.on_commit(invalidar_indice)
+
+
+@receiver(post_save, sender=EntradaClinica)
+def entrada_clinica_registrada(sender, instance, created, raw=False, **kwargs):
+    """Suma la entrada nueva al resumen de la historia del paciente"""
+    if raw or not created:
+        return
+    sumar_entrada(instance)
@@ -1,3 +1,553 @@
-from django.test import TestCase
+import csv
+import hashlib
+import tempfile
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from io import BytesIO
+from pathlib import Path
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.urls import reverse
+from UsuarioApp.instrumentacion import PresupuestoConsultasTestMixin
+from UsuarioApp.models import Usuario
+from .adjuntos import _rango, almacenamiento, iniciar_subida, limpiar, recibir_parte, ruta_archivo
+from .catalogo import invalidar_catalogo, obtener_catalogo
+from .historia import linea_de_tiempo
+from .forms import AntecedentesField, ObraSocialField, PacienteForm
+from .models import (
+    Paciente, ObraSocial, CategoriaAntecedente, AntecedentePaciente, ArchivoClinico, SubidaAdjunto, Diagnostico,
+    EntradaClinica, ResumenHistoriaClinica,
+)
+from .obras_sociales import invalidar_indice, obtener_indice
+from .odontograma import DIENTES, CARAS, EstadoOdontograma, estado_actual
+from .precauciones import reconstruir_banderas
+from .resumen import obtener_resumen
 
-# Create your tests here.
+
+def crear_paciente(dni='30000000', **campos):
+    """Paciente con los datos obligatorios completos"""
+    return Paciente.objects.create(
+        nombre='Paciente', apellido='Único', dni=dni, fecha_nacimiento=date(1980, 1, 1),
+        telefono='3870000000', sexo='F', **campos
+    )
+
+
+class PacienteTestCase(TestCase):
+    """Base de los tests que trabajan con un paciente y el odontólogo que lo atiende"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.odontologo = Usuario.objects.create_user('odontologo', password='x', rol='odontologo')
+        cls.paciente = crear_paciente()
+
+
+class VistasPacientesTests(PresupuestoConsultasTestMixin, TestCase):
+    """Presupuesto de consultas de las vistas de PacientesApp (middleware en modo estricto)"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.odontologo = Usuario.objects.create_user(
+            'odontologo', password='x', rol='odontologo', first_name='Pablo', last_name='Pérez'
+        )
+        obras_sociales = ObraSocial.objects.bulk_create([
+            ObraSocial(nombre=f'Obra Social {i}', codigo=f'{i:06d}') for i in range(5)
+        ])
+        cls.alergia = CategoriaAntecedente.objects.create(
+            nombre='Alergia a la penicilina', categoria='alergia', requiere_precaucion=True
+        )
+        Paciente.objects.bulk_create([
+            Paciente(
+                nombre='Paciente', apellido=f'Número {i}', dni=f'{30000000 + i}', fecha_nacimiento=date(1980, 1, 1),
+                telefono='3870000000', sexo='F', obra_social=obras_sociales[i % len(obras_sociales)],
+                numero_afiliado=f'{i:08d}', usuario_registro=cls.odontologo
+            )
+            for i in range(25)
+        ])
+        cls.paciente = Paciente.objects.order_by('pk').first()
+        AntecedentePaciente.objects.create(paciente=cls.paciente, antecedente=cls.alergia)
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.odontologo)
+
+    def obtener(self, url, **datos):
+        response = self.client.get(url, datos)
+        self.assertEqual(response.status_code, 200)
+        self.assertDentroDelPresupuesto(response, umbral_duplicadas=3)
+        return response
+
+    def test_lista_pacientes(self):
+        # Cada fila muestra la obra social: sin select_related serían 25 consultas más
+        self.obtener(reverse('PacientesApp:lista_pacientes'))
+
+    def test_exportar_pacientes(self):
+        Paciente.objects.filter(pk=self.paciente.pk).update(direccion='+54 387 Balcarce', email='@mail')
+        response = self.obtener(reverse('PacientesApp:exportar_pacientes', args=['csv']))
+        filas = list(csv.reader(b''.join(response.streaming_content).decode('utf-8-sig').splitlines(), delimiter=';'))
+
+        self.assertEqual(filas[0][:3], ['DNI', 'Apellido', 'Nombre'])
+        self.assertEqual(len(filas), 26)
+        fila = next(fila for fila in filas if fila[0] == self.paciente.dni)
+        # Texto que empieza como fórmula sale con comilla: Excel no lo evalúa
+        self.assertEqual((fila[6], fila[7]), ("'@mail", "'+54 387 Balcarce"))
+
+    def test_ver_paciente(self):
+        self.obtener(reverse('PacientesApp:ver_paciente', args=[self.paciente.pk]))
+
+    def test_crear_paciente(self):
+        self.obtener(reverse('PacientesApp:crear_paciente'))
+
+    def test_editar_paciente(self):
+        self.obtener(reverse('PacientesApp:editar_paciente', args=[self.paciente.pk]))
+
+    def test_buscar_obras_sociales(self):
+        self.obtener(reverse('PacientesApp:buscar_obras_sociales'), q='obra')
+
+    def test_historia_clinica(self):
+        self.obtener(reverse('PacientesApp:historia_clinica', args=[self.paciente.pk]))
+
+    def test_agregar_entrada_clinica(self):
+        self.obtener(reverse('PacientesApp:agregar_entrada_clinica', args=[self.paciente.pk]))
+
+    def test_odontograma(self):
+        self.obtener(reverse('PacientesApp:odontograma', args=[self.paciente.pk]))
+
+    def test_editar_odontograma(self):
+        self.obtener(reverse('PacientesApp:editar_odontograma', args=[self.paciente.pk]))
+
+    def test_adjuntos_paciente(self):
+        self.obtener(reverse('PacientesApp:adjuntos_paciente', args=[self.paciente.pk]))
+
+
+class GuardarAntecedentesTests(PacienteTestCase):
+    """PacienteForm aplica solo las diferencias en los antecedentes del paciente"""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.recepcionista = Usuario.objects.create_user('recepcion', password='x', rol='recepcionista')
+        cls.alergia, cls.diabetes, cls.anticoagulantes = CategoriaAntecedente.objects.bulk_create([
+            CategoriaAntecedente(nombre='Alergia a la penicilina', categoria='alergia', requiere_precaucion=True),
+            CategoriaAntecedente(nombre='Diabetes', categoria='enfermedad_cronica'),
+            CategoriaAntecedente(nombre='Anticoagulantes', categoria='medicacion', requiere_precaucion=True),
+        ])
+        cls.registro = timezone.now() - timedelta(days=400)
+        AntecedentePaciente.objects.bulk_create([
+            AntecedentePaciente(paciente=cls.paciente, antecedente=cls.alergia, usuario_registro=cls.odontologo),
+            AntecedentePaciente(
+                paciente=cls.paciente, antecedente=cls.diabetes, usuario_registro=cls.odontologo, activo=False
+            ),
+        ])
+        AntecedentePaciente.objects.update(fecha_registro=cls.registro)
+
+    def setUp(self):
+        # bulk_create no dispara señales: el catálogo en memoria no conoce estas categorías
+        invalidar_catalogo()
+
+    def guardar(self, *antecedentes):
+        datos = {
+            'nombre': 'Paciente', 'apellido': 'Único', 'dni': '30000000', 'fecha_nacimiento': '1980-01-01',
+            'sexo': 'F', 'telefono': '3870000000', 'activo': 'on',
+        }
+        campos = {
+            'alergia': 'antecedentes_alergias', 'enfermedad_cronica': 'antecedentes_enfermedades',
+            'medicacion': 'antecedentes_medicacion',
+        }
+        for antecedente in antecedentes:
+            datos.setdefault(campos[antecedente.categoria], []).append(antecedente.pk)
+        form = PacienteForm(datos, instance=Paciente.objects.get(pk=self.paciente.pk))
+        self.assertTrue(form.is_valid(), form.errors)
+        form.save(usuario=self.recepcionista)
+
+    def filas(self):
+        return {
+            fila.antecedente_id: fila
+            for fila in AntecedentePaciente.objects.filter(paciente=self.paciente)
+        }
+
+    def test_conserva_registro_reactiva_y_agrega(self):
+        self.guardar(self.alergia, self.diabetes, self.anticoagulantes)
+        filas = self.filas()
+
+        # Sin cambios: quien y cuando la registró
+        self.assertEqual(
+            (filas[self.alergia.pk].usuario_registro, filas[self.alergia.pk].fecha_registro),
+            (self.odontologo, self.registro)
+        )
+        # Reactivada: la misma fila, ahora a nombre de quien la volvió a marcar
+        self.assertTrue(filas[self.diabetes.pk].activo)
+        self.assertEqual(filas[self.diabetes.pk].usuario_registro, self.recepcionista)
+        self.assertEqual(filas[self.diabetes.pk].fecha_registro, self.registro)
+        # Nueva
+        self.assertEqual(filas[self.anticoagulantes.pk].usuario_registro, self.recepcionista)
+        self.assertEqual(len(filas), 3)
+
+    def test_quitar_desactiva_sin_borrar(self):
+        self.guardar(self.anticoagulantes)
+        filas = self.filas()
+
+        self.assertFalse(filas[self.alergia.pk].activo)
+        self.assertEqual(filas[self.alergia.pk].usuario_registro, self.odontologo)
+        paciente = Paciente.objects.get(pk=self.paciente.pk)
+        self.assertTrue(paciente.requiere_precaucion)
+        self.assertEqual(paciente.categorias_antecedentes, CategoriaAntecedente.BITS['medicacion'])
+
+    def test_sin_cambios_no_escribe_antecedentes(self):
+        with CaptureQueriesContext(connection) as consultas:
+            self.guardar(self.alergia)
+        self.assertFalse([
+            consulta for consulta in consultas
+            if 'pacientesapp_antecedentepaciente' in consulta['sql'] and not consulta['sql'].startswith('SELECT')
+        ])
+
+
+class AntecedentesFieldTests(TestCase):
+    """AntecedentesField valida contra el catálogo en memoria, sin consultas"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.alergia, cls.latex, cls.diabetes, cls.inactiva = CategoriaAntecedente.objects.bulk_create([
+            CategoriaAntecedente(nombre='Alergia a la penicilina', categoria='alergia'),
+            CategoriaAntecedente(nombre='Alergia al látex', categoria='alergia'),
+            CategoriaAntecedente(nombre='Diabetes', categoria='enfermedad_cronica'),
+            CategoriaAntecedente(nombre='Alergia en desuso', categoria='alergia', activo=False),
+        ])
+
+    def setUp(self):
+        invalidar_catalogo()
+        self.campo = AntecedentesField(categoria='alergia', required=False)
+        obtener_catalogo()
+
+    def test_elegidos_en_orden_y_sin_repetir(self):
+        with self.assertNumQueries(0):
+            elegidos = self.campo.clean([str(self.latex.pk), self.alergia.pk, str(self.latex.pk)])
+        self.assertEqual(elegidos, [self.latex, self.alergia])
+
+    def test_vacio(self):
+        self.assertEqual(self.campo.clean([]), [])
+        self.assertEqual(self.campo.clean(None), [])
+        with self.assertRaisesMessage(ValidationError, 'Este campo es obligatorio'):
+            AntecedentesField(categoria='alergia').clean([])
+
+    def test_rechaza_otra_categoria_inactivos_y_basura(self):
+        for valor in (self.diabetes.pk, self.inactiva.pk, 'x', '-1', 999999):
+            with self.assertRaises(ValidationError) as error:
+                self.campo.clean([self.alergia.pk, valor])
+            self.assertEqual(error.exception.code, 'invalid_choice', valor)
+        with self.assertRaises(ValidationError) as error:
+            self.campo.clean(str(self.alergia.pk))
+        self.assertEqual(error.exception.code, 'invalid_list')
+
+    def test_opciones_desde_el_catalogo(self):
+        with self.assertNumQueries(0):
+            opciones = [etiqueta for _, etiqueta in self.campo.choices]
+        self.assertEqual(sorted(opciones), ['Alergia a la penicilina (Alergia)', 'Alergia al látex (Alergia)'])
+
+
+class ObrasSocialesTests(TestCase):
+    """Búsqueda en el índice de obras sociales y validación de ObraSocialField, sin consultas"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.osde, cls.ioma, cls.osep, cls.baja, cls.construccion = ObraSocial.objects.bulk_create([
+            ObraSocial(nombre='Organización de Servicios Directos Empresarios', sigla='OSDE', codigo='4-0080-0'),
+            ObraSocial(nombre='Instituto Obra Médico Asistencial', sigla='IOMA', codigo='9-0001-1'),
+            ObraSocial(nombre='Obra Social de Empleados Públicos', sigla='OSEP', codigo='9-0002-2'),
+            ObraSocial(nombre='Obra Social dada de baja', sigla='OSB', codigo='1-0000-0', activa=False),
+            ObraSocial(nombre='Obra Social de la Construcción', sigla='OSPECON', codigo='1-0180-8'),
+        ])
+
+    def setUp(self):
+        invalidar_indice()
+        self.indice = obtener_indice()
+
+    def ids(self, texto, limite=10):
+        return [obra['id'] for obra in self.indice.buscar(texto, limite)]
+
+    def test_codigo_exacto_primero(self):
+        self.assertEqual(self.ids('400800'), [self.osde.pk])
+        self.assertEqual(self.ids('4-0080-0'), [self.osde.pk])
+
+    def test_sigla_exacta_antes_que_prefijo_y_nombres(self):
+        self.assertEqual(self.ids('osep'), [self.osep.pk])
+        # 'OSE' es prefijo de una sigla; los nombres no tienen palabras que empiecen así
+        self.assertEqual(self.ids('ose'), [self.osep.pk])
+        # Las siglas que empiezan con 'os' van antes que los nombres con palabras 'os...'
+        self.assertEqual(self.ids('os')[:3], [self.osde.pk, self.osep.pk, self.construccion.pk])
+
+    def test_nombres_por_prefijo_de_cada_palabra(self):
+        # Sin acentos y en cualquier orden; los que empiezan con el texto primero
+        self.assertEqual(self.ids('obra soc'), [self.osep.pk, self.construccion.pk])
+        self.assertEqual(self.ids('publicos empl'), [self.osep.pk])
+        self.assertEqual(self.ids('construcción'), [self.construccion.pk])
+        self.assertEqual(self.ids('obra'), [self.osep.pk, self.construccion.pk, self.ioma.pk])
+        self.assertEqual(self.ids('obra', limite=1), [self.osep.pk])
+
+    def test_inactivas_no_aparecen(self):
+        self.assertEqual(self.ids('baja'), [])
+        self.assertEqual(self.ids('100000'), [])
+        self.assertEqual(self.ids(''), [])
+
+    def test_campo_valida_contra_el_indice(self):
+        campo = ObraSocialField(required=False)
+        with self.assertNumQueries(0):
+            obra_social = campo.clean(str(self.osde.pk))
+        self.assertEqual((obra_social.pk, obra_social.nombre, obra_social.sigla), (self.osde.pk, self.osde.nombre, 'OSDE'))
+        self.assertIsNone(campo.clean(''))
+
+        for valor in (str(self.baja.pk), 'OSDE', '999999'):
+            with self.assertRaises(ValidationError, msg=valor):
+                campo.clean(valor)
+
+        # La que ya tenía el paciente se acepta aunque esté dada de baja
+        campo.actual = self.baja.pk
+        self.assertEqual(campo.clean(str(self.baja.pk)).pk, self.baja.pk)
+
+    def test_paciente_guarda_la_obra_social_elegida(self):
+        paciente = crear_paciente()
+        form = PacienteForm({
+            'nombre': 'Paciente', 'apellido': 'Único', 'dni': '30000000', 'fecha_nacimiento': '1980-01-01',
+            'sexo': 'F', 'telefono': '3870000000', 'activo': 'on',
+            'obra_social': str(self.ioma.pk), 'numero_afiliado': '123',
+        }, instance=paciente)
+        self.assertTrue(form.is_valid(), form.errors)
+        form.save()
+        self.assertEqual(Paciente.objects.get(pk=paciente.pk).obra_social_id, self.ioma.pk)
+
+    def test_ficha_cacheada_muestra_la_obra_social_editada(self):
+        paciente = crear_paciente(obra_social=self.ioma)
+        self.assertEqual(obtener_resumen(paciente.pk)['paciente'].obra_social.sigla, 'IOMA')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.ioma.sigla = 'IOMA-BA'
+            self.ioma.save()
+        self.assertEqual(obtener_resumen(paciente.pk)['paciente'].obra_social.sigla, 'IOMA-BA')
+
+
+class ReconstruirBanderasTests(TestCase):
+    """reconstruir_banderas cambia la versión de los pacientes que cambiaron (y solo de esos)"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.alergia = CategoriaAntecedente.objects.create(
+            nombre='Alergia a la penicilina', categoria='alergia', requiere_precaucion=True
+        )
+        cls.con_alergia = crear_paciente('30000000')
+        cls.sin_cambios = crear_paciente('30000001')
+
+    def test_ficha_cacheada_muestra_las_banderas_nuevas(self):
+        self.assertFalse(obtener_resumen(self.con_alergia.pk)['paciente'].requiere_precaucion)
+        # Carga masiva: bulk_create no dispara señales, las banderas quedan viejas
+        AntecedentePaciente.objects.bulk_create([AntecedentePaciente(paciente=self.con_alergia, antecedente=self.alergia)])
+        sin_cambios = Paciente.objects.get(pk=self.sin_cambios.pk).fecha_modificacion
+
+        self.assertEqual(reconstruir_banderas(), 1)
+
+        paciente = obtener_resumen(self.con_alergia.pk)['paciente']
+        self.assertTrue(paciente.requiere_precaucion)
+        self.assertEqual(paciente.categorias_antecedentes, CategoriaAntecedente.BITS['alergia'])
+        self.assertEqual(Paciente.objects.get(pk=self.sin_cambios.pk).fecha_modificacion, sin_cambios)
+        # Sin cambios pendientes no se escribe nada
+        self.assertEqual(reconstruir_banderas(), 0)
+
+
+class OdontogramaConcurrenteTests(PacienteTestCase):
+    """Dos profesionales que editan el odontograma a la vez no se pisan los cambios"""
+
+    def setUp(self):
+        self.client.force_login(self.odontologo)
+
+    def enviar(self, version, *cambios):
+        """POST del formulario completo, abierto en `version`, con (diente, cara, estado) cambiados"""
+        estado = EstadoOdontograma()
+        for diente, cara, valor in cambios:
+            estado.cambiar(diente, cara, valor)
+        datos = {'version': version}
+        for numero in DIENTES:
+            datos[f'p{numero}'] = estado.estado(numero)
+            for cara, _ in CARAS:
+                datos[f'p{numero}_{cara}'] = estado.estado(numero, cara)
+        return self.client.post(reverse('PacientesApp:editar_odontograma', args=[self.paciente.pk]), datos)
+
+    def test_ediciones_simultaneas_de_piezas_distintas_se_combinan(self):
+        # Los dos abrieron el formulario en la versión 0
+        self.enviar(0, (18, None, 1))
+        self.enviar(0, (36, 'O', 1))
+
+        estado, version = estado_actual(self.paciente.pk)
+        self.assertEqual(version, 2)
+        self.assertEqual(estado.estado(18), 1)
+        self.assertEqual(estado.estado(36, 'O'), 1)
+
+    def test_misma_posicion_cambiada_por_otro_se_rechaza(self):
+        self.enviar(0, (36, 'O', 1))
+        response = self.enviar(0, (36, 'O', 2))
+
+        self.assertRedirects(response, reverse('PacientesApp:editar_odontograma', args=[self.paciente.pk]))
+        estado, version = estado_actual(self.paciente.pk)
+        self.assertEqual(version, 1)
+        self.assertEqual(estado.estado(36, 'O'), 1)
+
+
+class SubidaAdjuntoTests(PacienteTestCase):
+    """Subida en partes, deduplicación por hash, descarga con Range y limpieza de adjuntos"""
+
+    def setUp(self):
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        configuracion = override_settings(
+            ADJUNTOS_SUBIDAS_DIR=Path(directorio.name) / 'subidas',
+            ADJUNTOS_SUBIDA_HORAS=24,
+            STORAGES={**settings.STORAGES, 'adjuntos': {
+                'BACKEND': 'django.core.files.storage.FileSystemStorage',
+                'OPTIONS': {'location': Path(directorio.name) / 'adjuntos'},
+            }},
+        )
+        configuracion.enable()
+        self.addCleanup(configuracion.disable)
+
+    def subir(self, contenido, nombre='consentimiento.pdf'):
+        subida = iniciar_subida(self.paciente, self.odontologo, nombre, len(contenido), 'documento')
+        return recibir_parte(subida, 0, BytesIO(contenido), len(contenido))
+
+    def test_mismo_contenido_se_guarda_una_vez(self):
+        contenido = b'%PDF-1.4 consentimiento firmado'
+        primero = self.subir(contenido)
+        segundo = self.subir(contenido, 'consentimiento (copia).pdf')
+
+        self.assertEqual(primero.archivo_id, segundo.archivo_id)
+        self.assertEqual(ArchivoClinico.objects.count(), 1)
+        sha256 = hashlib.sha256(contenido).hexdigest()
+        self.assertEqual(primero.archivo.sha256, sha256)
+        self.assertEqual(sorted(almacenamiento().listdir(f'archivos/{sha256[:2]}/{sha256[2:4]}')[1]), [sha256])
+
+    def test_archivo_incompleto_de_un_corte_se_reescribe(self):
+        contenido = b'%PDF-1.4 consentimiento firmado'
+        sha256 = hashlib.sha256(contenido).hexdigest()
+        # Quedó de un corte a mitad de escritura, sin fila en ArchivoClinico
+        almacenamiento().save(ruta_archivo(sha256), ContentFile(contenido[:5]))
+
+        self.subir(contenido)
+        with almacenamiento().open(ruta_archivo(sha256), 'rb') as guardado:
+            self.assertEqual(guardado.read(), contenido)
+
+    def test_limpiar_borra_solo_archivos_sin_adjuntos(self):
+        usado = self.subir(b'%PDF-1.4 usado')
+        huerfano = self.subir(b'%PDF-1.4 huerfano')
+        huerfano.delete()
+
+        self.assertEqual(limpiar(), (0, 1))
+        self.assertEqual(list(ArchivoClinico.objects.values_list('pk', flat=True)), [usado.archivo_id])
+        self.assertFalse(almacenamiento().exists(ruta_archivo(huerfano.archivo.sha256)))
+        self.assertTrue(almacenamiento().exists(ruta_archivo(usado.archivo.sha256)))
+
+    def test_rango(self):
+        self.assertEqual(_rango('bytes=0-9', 100), (0, 9))
+        self.assertEqual(_rango('bytes=90-', 100), (90, 99))
+        self.assertEqual(_rango('bytes=-10', 100), (90, 99))
+        self.assertEqual(_rango('bytes=-500', 100), (0, 99))
+        self.assertEqual(_rango('bytes=50-500', 100), (50, 99))
+        # Fuera del archivo: 416
+        self.assertIs(_rango('bytes=100-', 100), False)
+        self.assertIs(_rango('bytes=-0', 100), False)
+        self.assertIs(_rango('bytes=9-0', 100), False)
+        # Varios rangos o encabezados que no se entienden: el archivo entero
+        for encabezado in (None, '', 'bytes=0-1,5-6', 'items=0-9', 'bytes=a-b'):
+            self.assertIsNone(_rango(encabezado, 100))
+
+    def test_descarga_con_range_e_if_range(self):
+        contenido = b'%PDF-1.4 ' + bytes(range(256)) * 4
+        adjunto = self.subir(contenido)
+        etag = f'"{adjunto.archivo.sha256}"'
+        url = reverse('PacientesApp:descargar_adjunto', args=[adjunto.pk])
+        self.client.force_login(self.odontologo)
+
+        response = self.client.get(url, headers={'Range': 'bytes=9-18'})
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], f'bytes 9-18/{len(contenido)}')
+        self.assertEqual(b''.join(response.streaming_content), contenido[9:19])
+
+        # If-Range con la versión actual: vale el rango; con otra, el archivo entero
+        response = self.client.get(url, headers={'Range': 'bytes=9-18', 'If-Range': etag})
+        self.assertEqual(response.status_code, 206)
+        response = self.client.get(url, headers={'Range': 'bytes=9-18', 'If-Range': '"otra-version"'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), contenido)
+
+        response = self.client.get(url, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+        response = self.client.get(url, headers={'Range': f'bytes={len(contenido)}-'})
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], f'bytes */{len(contenido)}')
+
+    def test_parte_recibida_renueva_la_subida(self):
+        subida = iniciar_subida(self.paciente, self.odontologo, 'panoramica.stl', 20, 'radiografia')
+        # Empezada hace más de un día (conexión lenta, varios reintentos)
+        SubidaAdjunto.objects.filter(pk=subida.pk).update(fecha_modificacion=timezone.now() - timedelta(hours=25))
+
+        self.assertIsNone(recibir_parte(subida, 0, BytesIO(b'x' * 10), 10))
+        self.assertEqual(limpiar(), (0, 0))
+        self.assertEqual(SubidaAdjunto.objects.get(pk=subida.pk).recibidos, 10)
+
+
+class HistoriaClinicaTests(PacienteTestCase):
+    """Resumen, línea de tiempo paginada por cursor y entradas que solo se agregan"""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.caries = Diagnostico.objects.create(codigo='K02.1', descripcion='Caries de la dentina')
+
+    def registrar(self, fecha, notas='Control'):
+        entrada = EntradaClinica(paciente=self.paciente, profesional=self.odontologo, diagnostico=self.caries, notas=notas)
+        entrada.fecha = fecha
+        entrada.save()
+        return entrada
+
+    def test_visita_de_noche_cuenta_en_el_dia_local(self):
+        # 21:30 en Buenos Aires (UTC-3) ya es el día siguiente en UTC, como llega de timezone.now()
+        self.registrar(timezone.make_aware(datetime(2026, 3, 10, 21, 30)).astimezone(dt_timezone.utc))
+
+        resumen = ResumenHistoriaClinica.objects.get(paciente=self.paciente)
+        self.assertEqual(resumen.diagnosticos['K02.1'][2], '2026-03-10')
+
+    def test_linea_de_tiempo_por_cursor(self):
+        inicio = timezone.make_aware(datetime(2026, 3, 10, 9, 0))
+        entradas = [self.registrar(inicio + timedelta(days=dia)) for dia in range(4)]
+        # Dos entradas en el mismo instante: el id desempata
+        entradas += [self.registrar(inicio + timedelta(days=1)) for _ in range(2)]
+        esperadas = [entrada.pk for entrada in sorted(entradas, key=lambda entrada: (entrada.fecha, entrada.pk), reverse=True)]
+
+        paginas = []
+        cursor = None
+        while True:
+            with self.assertNumQueries(1):
+                pagina, cursor = linea_de_tiempo(self.paciente.pk, cursor, limite=2)
+            paginas.append([entrada.pk for entrada in pagina])
+            if cursor is None:
+                break
+
+        self.assertEqual([len(pagina) for pagina in paginas], [2, 2, 2])
+        self.assertEqual(sum(paginas, []), esperadas)
+
+        # Un cursor que no se entiende muestra la primera página
+        for cursor in ('basura', '1-2-3', ''):
+            self.assertEqual([entrada.pk for entrada in linea_de_tiempo(self.paciente.pk, cursor, limite=2)[0]], esperadas[:2])
+
+    def test_entradas_no_se_modifican_ni_eliminan(self):
+        entrada = self.registrar(timezone.now(), notas='Extracción de 38')
+
+        entrada.notas = 'Otra cosa'
+        with self.assertRaisesMessage(ValidationError, 'no se modifican'):
+            entrada.save()
+        with self.assertRaisesMessage(ValidationError, 'no se eliminan'):
+            entrada.delete()
+
+        self.assertEqual(EntradaClinica.objects.get(pk=entrada.pk).notas, 'Extracción de 38')
+        self.assertEqual(ResumenHistoriaClinica.objects.get(paciente=self.paciente).entradas, 1)
@@ -7,7 +7,24 @@ urlpatterns = [
     # Lista y gestión de pacientes
     path('', views.lista_pacientes, name='lista_pacientes'),
     path('crear/', views.crear_paciente, name='crear_paciente'),
+    path('exportar/<str:formato>/', views.exportar_pacientes, name='exportar_pacientes'),
     path('<int:pk>/editar/', views.editar_paciente, name='editar_paciente'),
     path('<int:pk>/ver/', views.ver_paciente, name='ver_paciente'),
     path('<int:pk>/toggle/', views.toggle_paciente_activo, name='toggle_paciente'),
+    
+    # Historia clínica
+    path('<int:pk>/historia/', views.historia_clinica, name='historia_clinica'),
+    path('<int:pk>/historia/agregar/', views.agregar_entrada_clinica, name='agregar_entrada_clinica'),
+    path('<int:pk>/odontograma/', views.odontograma, name='odontograma'),
+    path('<int:pk>/odontograma/editar/', views.editar_odontograma, name='editar_odontograma'),
+    
+    # Adjuntos (radiografías, escaneos, documentos)
+    path('<int:pk>/adjuntos/', views.adjuntos_paciente, name='adjuntos_paciente'),
+    path('<int:pk>/adjuntos/subir/', views.iniciar_subida_adjunto, name='iniciar_subida_adjunto'),
+    path('adjuntos/subidas/<uuid:subida_id>/', views.subida_adjunto, name='subida_adjunto'),
+    path('adjuntos/<int:pk>/', views.descargar_adjunto, name='descargar_adjunto'),
+    path('adjuntos/<int:pk>/miniatura/<str:tamanio>/', views.miniatura_adjunto, name='miniatura_adjunto'),
+    
+    # Autocompletado
+    path('obras-sociales/buscar/', views.buscar_obras_sociales, name='buscar_obras_sociales'),
 ]
\ No newline at end of file
@@ -1,18 +1,34 @@
 from django.shortcuts import render, redirect, get_object_or_404
+from django.urls import reverse
+from django.http import JsonResponse, Http404, FileResponse
+from django.core.exceptions import ValidationError
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import require_GET, require_POST, require_http_methods
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.db.models import Q
-from UsuarioApp.decorators import staff_medico
-from .models import Paciente
-from .forms import PacienteForm
+from UsuarioApp.decorators import staff_medico, staff_o_auditor, odontologo_o_admin, presupuesto_consultas, lectura_en_replica
+from .models import Paciente, EntradaClinica, VersionOdontograma, Adjunto, SubidaAdjunto
+from .forms import PacienteForm, EntradaClinicaForm, OdontogramaForm, SubidaAdjuntoForm
+from .historia import linea_de_tiempo
+from .odontograma import (
+    CARAS, ESTADOS_PIEZA, ESTADOS_CARA, EstadoOdontograma, estado_actual, estado_en_version,
+    guardar_odontograma, OdontogramaDesactualizado, filas_para_dibujar, describir, cantidad_cambios,
+)
+from .adjuntos import (
+    DesfaseSubida, iniciar_subida, recibir_parte, respuesta_adjunto, generar_miniatura,
+    tamanios_miniatura, maximo_por_parte, almacenamiento,
+)
+from .resumen import obtener_resumen
+from .obras_sociales import obtener_indice, etiqueta
+from config.exportar import Columna, respuesta_exportacion, si_no
 
 
 # ========== GESTIÓN DE PACIENTES ==========
 
-@staff_medico
-def lista_pacientes(request):
-    """Lista de todos los pacientes con búsqueda y filtros"""
-    pacientes = Paciente.objects.all().order_by('apellido', 'nombre')
+def _pacientes_filtrados(request):
+    """Pacientes según la búsqueda y los filtros de la lista (los usa también la exportación)"""
+    pacientes = Paciente.objects.order_by('apellido', 'nombre')
     
     # Búsqueda
     busqueda = request.GET.get('buscar', '')
@@ -45,18 +61,58 @@ def lista_pacientes(request):
     elif obra_social_filtro == 'sin_obra':
         pacientes = pacientes.filter(Q(numero_afiliado__isnull=True) | Q(numero_afiliado=''))
     
-    context = {
-        'pacientes': pacientes,
+    filtros = {
         'busqueda': busqueda,
         'sexo_filtro': sexo_filtro,
         'estado_filtro': estado_filtro,
         'obra_social_filtro': obra_social_filtro,
+    }
+    return pacientes, filtros
+
+
+@presupuesto_consultas(8)
+@lectura_en_replica
+@staff_medico
+def lista_pacientes(request):
+    """Lista de todos los pacientes con búsqueda y filtros"""
+    pacientes, filtros = _pacientes_filtrados(request)
+    pacientes = pacientes.select_related('obra_social')
+    
+    context = {
+        'pacientes': pacientes,
+        **filtros,
         'total_pacientes': pacientes.count(),
     }
     
     return render(request, 'PacientesApp/lista_pacientes.html', context)
 
 
+@presupuesto_consultas(5)
+@lectura_en_replica
+@staff_o_auditor
+def exportar_pacientes(request, formato):
+    """Descarga los pacientes de la lista (mismos filtros) en CSV o XLSX"""
+    pacientes, _ = _pacientes_filtrados(request)
+    
+    columnas = [
+        Columna('DNI', 'dni'),
+        Columna('Apellido', 'apellido'),
+        Columna('Nombre', 'nombre'),
+        Columna('Fecha de nacimiento', 'fecha_nacimiento'),
+        Columna('Sexo', 'sexo', dict(Paciente.SEXO_CHOICES).get),
+        Columna('Teléfono', 'telefono'),
+        Columna('Email', 'email'),
+        Columna('Dirección', 'direccion'),
+        Columna('Obra social', 'obra_social__nombre'),
+        Columna('Número de afiliado', 'numero_afiliado'),
+        Columna('Activo', 'activo', si_no),
+        Columna('Fecha de registro', 'fecha_registro'),
+    ]
+    
+    return respuesta_exportacion(pacientes, columnas, 'pacientes', formato)
+
+
+@presupuesto_consultas(16)
 @staff_medico
 def crear_paciente(request):
     """Crear un nuevo paciente"""
@@ -65,10 +121,8 @@ def crear_paciente(request):
         if form.is_valid():
             paciente = form.save(commit=False)
             paciente.usuario_registro = request.user
-            paciente.save()
-            form.save_m2m()  # Guardar relaciones many-to-many
             
-            # Guardar antecedentes
+            # Guardar paciente y antecedentes
             form.save(usuario=request.user)
             
             messages.success(request, f'Paciente {paciente.get_nombre_completo()} registrado exitosamente.')
@@ -85,6 +139,7 @@ def crear_paciente(request):
     return render(request, 'PacientesApp/form_paciente.html', context)
 
 
+@presupuesto_consultas(14)
 @staff_medico
 def editar_paciente(request, pk):
     """Editar un paciente existente"""
@@ -93,11 +148,8 @@ def editar_paciente(request, pk):
     if request.method == 'POST':
         form = PacienteForm(request.POST, instance=paciente)
         if form.is_valid():
-            paciente = form.save(commit=False)
-            paciente.save()
-            
-            # Guardar antecedentes
-            form.save(usuario=request.user)
+            # Guardar paciente y antecedentes
+            paciente = form.save(usuario=request.user)
             
             messages.success(request, f'Paciente {paciente.get_nombre_completo()} actualizado exitosamente.')
             return redirect('PacientesApp:lista_pacientes')
@@ -114,25 +166,28 @@ def editar_paciente(request, pk):
     return render(request, 'PacientesApp/form_paciente.html', context)
 
 
+@presupuesto_consultas(9)
+@lectura_en_replica
 @staff_medico
 def ver_paciente(request, pk):
     """Ver detalles completos de un paciente"""
-    paciente = get_object_or_404(Paciente, pk=pk)
-    
-    # Obtener antecedentes organizados por categoría
-    antecedentes_activos = paciente.antecedentes_medicos.filter(activo=True).select_related('antecedente')
+    resumen = obtener_resumen(pk)
+    antecedentes = resumen['antecedentes']
     
     context = {
-        'paciente': paciente,
-        'enfermedades': antecedentes_activos.filter(antecedente__categoria='enfermedad_cronica'),
-        'its': antecedentes_activos.filter(antecedente__categoria='its'),
-        'alergias': antecedentes_activos.filter(antecedente__categoria='alergia'),
-        'medicacion': antecedentes_activos.filter(antecedente__categoria='medicacion'),
+        'paciente': resumen['paciente'],
+        'enfermedades': antecedentes['enfermedad_cronica'],
+        'its': antecedentes['its'],
+        'alergias': antecedentes['alergia'],
+        'medicacion': antecedentes['medicacion'],
+        'turnos_proximos': resumen['turnos_proximos'],
+        'turnos_recientes': resumen['turnos_recientes'],
     }
     
     return render(request, 'PacientesApp/ver_paciente.html', context)
 
 
+@presupuesto_consultas(7)
 @staff_medico
 def toggle_paciente_activo(request, pk):
     """Activar o desactivar un paciente"""
@@ -149,4 +204,327 @@ def toggle_paciente_activo(request, pk):
     estado = "activado" if paciente.activo else "desactivado"
     messages.success(request, f'Paciente {paciente.get_nombre_completo()} {estado} exitosamente.')
     
-    return redirect('PacientesApp:lista_pacientes')
\ No newline at end of file
+    return redirect('PacientesApp:lista_pacientes')
+
+
+@presupuesto_consultas(4)
+@staff_medico
+def buscar_obras_sociales(request):
+    """Autocompletado de obras sociales por nombre, sigla o RNOS (desde el índice en memoria)"""
+    obras = obtener_indice().buscar(request.GET.get('q', ''), limite=15)
+    
+    return JsonResponse({
+        'resultados': [
+            {
+                'id': obra['id'],
+                'nombre': obra['nombre'],
+                'sigla': obra['sigla'],
+                'codigo': obra['codigo'],
+                'etiqueta': etiqueta(obra),
+            }
+            for obra in obras
+        ]
+    })
+
+
+# ========== HISTORIA CLÍNICA (ver historia.py) ==========
+
+@presupuesto_consultas(6)
+@lectura_en_replica
+@odontologo_o_admin
+def historia_clinica(request, pk):
+    """Historia clínica: resumen y entradas de la más nueva a la más vieja (paginadas por cursor)"""
+    paciente = get_object_or_404(Paciente.objects.select_related('obra_social', 'resumen_historia'), pk=pk)
+    cursor = request.GET.get('antes')
+    entradas, siguiente = linea_de_tiempo(pk, cursor)
+    
+    context = {
+        'paciente': paciente,
+        'resumen': getattr(paciente, 'resumen_historia', None),
+        'entradas': entradas,
+        'siguiente': siguiente,
+        'es_primera_pagina': not cursor,
+    }
+    
+    return render(request, 'PacientesApp/historia_clinica.html', context)
+
+
+@presupuesto_consultas(16)
+@odontologo_o_admin
+def agregar_entrada_clinica(request, pk):
+    """Registrar una entrada en la historia clínica (opcionalmente de un turno o aclarando otra)"""
+    from TurnosApp.models import Turno
+    
+    paciente = get_object_or_404(Paciente, pk=pk)
+    datos = request.POST if request.method == 'POST' else request.GET
+    
+    # El turno y la entrada aclarada tienen que ser de este paciente
+    turno = None
+    if datos.get('turno'):
+        turno = get_object_or_404(Turno.objects.select_related('odontologo'), pk=datos['turno'], paciente=paciente)
+    corrige = None
+    if datos.get('corrige'):
+        corrige = get_object_or_404(
+            EntradaClinica.objects.select_related('diagnostico'), pk=datos['corrige'], paciente=paciente
+        )
+    
+    if request.method == 'POST':
+        form = EntradaClinicaForm(request.POST)
+        if form.is_valid():
+            entrada = form.save(commit=False)
+            entrada.paciente = paciente
+            entrada.turno = turno
+            entrada.corrige = corrige
+            entrada.profesional = request.user
+            entrada.save()
+            messages.success(request, 'Entrada registrada en la historia clínica.')
+            return redirect('PacientesApp:historia_clinica', pk=paciente.pk)
+    else:
+        inicial = {}
+        if turno:
+            # Lo cargado en el turno (para facturar) como punto de partida
+            prestaciones = list(turno.prestaciones.values_list('prestacion_id', 'pieza'))
+            inicial['prestaciones_realizadas'] = [prestacion_id for prestacion_id, _ in prestaciones]
+            inicial['pieza'] = ' '.join(dict.fromkeys(pieza for _, pieza in prestaciones if pieza))[:10]
+        elif corrige:
+            inicial = {'diagnostico': corrige.diagnostico_id, 'pieza': corrige.pieza}
+        form = EntradaClinicaForm(initial=inicial)
+    
+    context = {
+        'paciente': paciente,
+        'turno': turno,
+        'corrige': corrige,
+        'form': form,
+    }
+    
+    return render(request, 'PacientesApp/form_entrada_clinica.html', context)
+
+
+# ========== ODONTOGRAMA (ver odontograma.py) ==========
+
+# Versiones que muestra el historial del odontograma
+VERSIONES_ODONTOGRAMA = 30
+
+
+def _version_pedida(request, parametro):
+    """Número de versión del parámetro GET, o None si falta o no es un número"""
+    try:
+        return int(request.GET[parametro])
+    except (KeyError, ValueError):
+        return None
+
+
+@presupuesto_consultas(10)
+@lectura_en_replica
+@odontologo_o_admin
+def odontograma(request, pk):
+    """Odontograma vigente o de una versión anterior, con los cambios respecto de otra versión"""
+    paciente = get_object_or_404(Paciente.objects.select_related('odontograma'), pk=pk)
+    vigente = getattr(paciente, 'odontograma', None)
+    version_vigente = vigente.version if vigente else 0
+    
+    version = _version_pedida(request, 'version')
+    if version is None or version == version_vigente:
+        version = version_vigente
+        estado = EstadoOdontograma(vigente.estado) if vigente else EstadoOdontograma()
+    else:
+        estado = estado_en_version(pk, version)
+        if estado is None:
+            raise Http404('No existe esa versión del odontograma.')
+    
+    # Diferencias con otra versión (0 = odontograma vacío)
+    comparar = _version_pedida(request, 'comparar')
+    cambios = []
+    if comparar is not None:
+        base = EstadoOdontograma() if comparar == 0 else estado_en_version(pk, comparar)
+        if base is None:
+            raise Http404('No existe esa versión del odontograma.')
+        cambios = base.diferencias(estado)
+    
+    versiones = VersionOdontograma.objects.filter(paciente=paciente).select_related('profesional').only(
+        'version', 'fecha', 'cambios', 'profesional__first_name', 'profesional__last_name'
+    ).order_by('-version')[:VERSIONES_ODONTOGRAMA]
+    
+    context = {
+        'paciente': paciente,
+        'version': version,
+        'version_vigente': version_vigente,
+        'filas': filas_para_dibujar(estado, cambios),
+        'comparar': comparar,
+        'cambios': [describir(cambio) for cambio in cambios],
+        'versiones': [
+            {'version': v.version, 'fecha': v.fecha, 'profesional': v.profesional, 'cantidad': cantidad_cambios(v.cambios)}
+            for v in versiones
+        ],
+        'estados_pieza': ESTADOS_PIEZA[1:],
+        'estados_cara': ESTADOS_CARA[1:],
+    }
+    
+    return render(request, 'PacientesApp/odontograma.html', context)
+
+
+@presupuesto_consultas(12)
+@odontologo_o_admin
+def editar_odontograma(request, pk):
+    """Registrar el odontograma de la visita: guarda una versión nueva con lo que cambió"""
+    paciente = get_object_or_404(Paciente, pk=pk)
+    estado, version = estado_actual(pk)
+    
+    if request.method == 'POST':
+        form = OdontogramaForm(request.POST, estado=estado, version=version)
+        if form.is_valid():
+            # Estado que vio el formulario: si otro guardó mientras tanto, se reconstruye esa versión
+            base_version = form.cleaned_data['version']
+            base = estado if base_version == version else (
+                EstadoOdontograma() if base_version == 0 else estado_en_version(pk, base_version)
+            )
+            if base is None:
+                raise Http404('No existe esa versión del odontograma.')
+            try:
+                nueva = guardar_odontograma(pk, form.get_estado(), request.user, base=base)
+            except OdontogramaDesactualizado as conflicto:
+                messages.error(
+                    request,
+                    f'Otro profesional modificó las mismas piezas mientras editabas ({conflicto}). '
+                    'Revisá el odontograma vigente y volvé a cargar tus cambios.'
+                )
+                return redirect('PacientesApp:editar_odontograma', pk=pk)
+            if nueva is None:
+                messages.info(request, 'El odontograma no tuvo cambios.')
+                return redirect('PacientesApp:odontograma', pk=pk)
+            messages.success(
+                request,
+                f'Odontograma guardado (versión {nueva.version}, {cantidad_cambios(nueva.cambios)} cambios).'
+            )
+            return redirect(f"{reverse('PacientesApp:odontograma', args=[pk])}?comparar={nueva.version - 1}")
+    else:
+        form = OdontogramaForm(estado=estado, version=version)
+    
+    context = {
+        'paciente': paciente,
+        'version': version,
+        'form': form,
+        'caras': CARAS,
+    }
+    
+    return render(request, 'PacientesApp/form_odontograma.html', context)
+
+
+# ========== ADJUNTOS (ver adjuntos.py) ==========
+
+def _estado_subida(subida):
+    return {
+        'id': str(subida.pk),
+        'recibidos': subida.recibidos,
+        'tamanio': subida.tamanio,
+        'parte_maxima': maximo_por_parte(),
+        'url': reverse('PacientesApp:subida_adjunto', args=[subida.pk]),
+    }
+
+
+@presupuesto_consultas(6)
+@lectura_en_replica
+@odontologo_o_admin
+def adjuntos_paciente(request, pk):
+    """Radiografías, escaneos y documentos del paciente, con la subida en partes"""
+    paciente = get_object_or_404(Paciente, pk=pk)
+    adjuntos = paciente.adjuntos.select_related('archivo', 'usuario_registro')
+    
+    context = {
+        'paciente': paciente,
+        'adjuntos': adjuntos,
+        'form': SubidaAdjuntoForm(),
+    }
+    
+    return render(request, 'PacientesApp/adjuntos.html', context)
+
+
+@presupuesto_consultas(8)
+@require_POST
+@odontologo_o_admin
+def iniciar_subida_adjunto(request, pk):
+    """Abre (o retoma) una subida en partes: JSON con la URL y desde qué byte seguir"""
+    paciente = get_object_or_404(Paciente, pk=pk)
+    form = SubidaAdjuntoForm(request.POST)
+    if not form.is_valid():
+        return JsonResponse({'error': 'Datos del archivo inválidos.', 'errores': form.errors}, status=400)
+    
+    try:
+        subida = iniciar_subida(paciente, request.user, **form.cleaned_data)
+    except ValidationError as e:
+        return JsonResponse({'error': ' '.join(e.messages)}, status=400)
+    
+    return JsonResponse(_estado_subida(subida))
+
+
+@presupuesto_consultas(16)
+@require_http_methods(['GET', 'PUT'])
+@odontologo_o_admin
+def subida_adjunto(request, subida_id):
+    """
+    GET: cuántos bytes se recibieron (para retomar).
+    PUT: una parte del archivo, con Content-Range: bytes <desde>-<hasta>/<total>.
+    """
+    subida = get_object_or_404(SubidaAdjunto, pk=subida_id, usuario=request.user)
+    if request.method == 'GET':
+        return JsonResponse(_estado_subida(subida))
+    
+    try:
+        unidad, _, rango = request.headers.get('Content-Range', '').partition(' ')
+        desde_hasta, _, total = rango.partition('/')
+        desde, _, hasta = desde_hasta.partition('-')
+        desde, hasta, total = int(desde), int(hasta), int(total)
+        largo = int(request.headers.get('Content-Length', ''))
+    except ValueError:
+        return JsonResponse({'error': 'Falta Content-Range o Content-Length.'}, status=400)
+    if unidad != 'bytes' or total != subida.tamanio or hasta - desde + 1 != largo:
+        return JsonResponse({'error': 'Content-Range no coincide con la subida.'}, status=400)
+    
+    try:
+        # El cuerpo se lee de a bloques directamente del request (nunca request.body)
+        adjunto = recibir_parte(subida, desde, request, largo)
+    except DesfaseSubida as e:
+        return JsonResponse({**_estado_subida(subida), 'recibidos': e.recibidos, 'error': str(e)}, status=409)
+    except ValidationError as e:
+        return JsonResponse({'error': ' '.join(e.messages)}, status=400)
+    
+    if adjunto is None:
+        return JsonResponse(_estado_subida(subida))
+    
+    messages.success(request, f'Adjunto "{adjunto.nombre}" guardado.')
+    # La subida ya se borró: se informa el adjunto creado
+    return JsonResponse({
+        'recibidos': subida.tamanio,
+        'tamanio': subida.tamanio,
+        'adjunto': adjunto.pk,
+        'url_adjunto': reverse('PacientesApp:descargar_adjunto', args=[adjunto.pk]),
+    }, status=201)
+
+
+@presupuesto_consultas(5)
+@require_GET
+@odontologo_o_admin
+def descargar_adjunto(request, pk):
+    """Contenido del adjunto (acepta Range: visores y descargas retomables)"""
+    adjunto = get_object_or_404(Adjunto.objects.select_related('archivo'), pk=pk)
+    return respuesta_adjunto(request, adjunto)
+
+
+@presupuesto_consultas(5)
+@require_GET
+@odontologo_o_admin
+def miniatura_adjunto(request, pk, tamanio):
+    """Miniatura WEBP de un adjunto de imagen, generada la primera vez que se pide"""
+    if tamanio not in tamanios_miniatura():
+        raise Http404
+    adjunto = get_object_or_404(Adjunto.objects.select_related('archivo'), pk=pk)
+    
+    ruta = generar_miniatura(adjunto.archivo, tamanio)
+    if ruta is None:
+        raise Http404
+    
+    response = FileResponse(almacenamiento().open(ruta, 'rb'), content_type='image/webp')
+    # El contenido de un adjunto no cambia: la miniatura tampoco
+    patch_cache_control(response, private=True, max_age=365 * 24 * 60 * 60, immutable=True)
+    response['ETag'] = f'"{adjunto.archivo.sha256}-{tamanio}"'
+    return response
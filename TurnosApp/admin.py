@@ -1,5 +1,8 @@
 from django.contrib import admin
-from .models import ConfiguracionAgenda, BloqueoHorario, Turno
+from .models import (
+    ConfiguracionAgenda, BloqueoHorario, Turno, EstadisticaPaciente, EjecucionReportes,
+    PrestacionTurno, LoteFacturacion, LineaFacturacion,
+)
 
 
 @admin.register(ConfiguracionAgenda)
@@ -23,6 +26,13 @@ class BloqueoHorarioAdmin(admin.ModelAdmin):
         super().save_model(request, obj, form, change)
 
 
+class PrestacionTurnoInline(admin.TabularInline):
+    model = PrestacionTurno
+    extra = 0
+    autocomplete_fields = ['prestacion']
+    readonly_fields = ['usuario_registro', 'fecha_modificacion']
+
+
 @admin.register(Turno)
 class TurnoAdmin(admin.ModelAdmin):
     list_display = ['fecha', 'hora', 'paciente', 'odontologo', 'motivo_consulta', 'estado', 'duracion']
@@ -30,6 +40,7 @@ class TurnoAdmin(admin.ModelAdmin):
     search_fields = ['paciente__nombre', 'paciente__apellido', 'motivo_consulta', 'odontologo__first_name', 'odontologo__last_name']
     readonly_fields = ['usuario_registro', 'fecha_creacion', 'fecha_modificacion', 'fecha_confirmacion', 'fecha_atencion']
     date_hierarchy = 'fecha'
+    inlines = [PrestacionTurnoInline]
     
     fieldsets = (
         ('Información del Turno', {
@@ -39,7 +50,7 @@ class TurnoAdmin(admin.ModelAdmin):
             'fields': ('motivo_consulta', 'observaciones')
         }),
         ('Estado', {
-            'fields': ('estado', 'recordatorio_enviado', 'fecha_confirmacion', 'fecha_atencion')
+            'fields': ('estado', 'motivo_cancelacion', 'recordatorio_enviado', 'fecha_confirmacion', 'fecha_atencion')
         }),
         ('Auditoría', {
             'fields': ('usuario_registro', 'fecha_creacion', 'fecha_modificacion'),
@@ -51,4 +62,53 @@ class TurnoAdmin(admin.ModelAdmin):
         if not change:
             obj.usuario_registro = request.user
         super().save_model(request, obj, form, change)
-        
\ No newline at end of file
+
+
+@admin.register(EstadisticaPaciente)
+class EstadisticaPacienteAdmin(admin.ModelAdmin):
+    list_display = ['paciente', 'total_turnos', 'atendidos', 'ausentes', 'cancelados', 'ultima_visita', 'fecha_actualizacion']
+    search_fields = ['paciente__nombre', 'paciente__apellido', 'paciente__dni']
+    list_select_related = ['paciente']
+    readonly_fields = ['paciente', 'total_turnos', 'atendidos', 'ausentes', 'cancelados', 'ultima_visita',
+                       'suma_anticipacion_dias', 'turnos_con_anticipacion', 'fecha_actualizacion']
+    
+    def has_add_permission(self, request):
+        # Se mantiene automáticamente desde los turnos
+        return False
+
+
+@admin.register(EjecucionReportes)
+class EjecucionReportesAdmin(admin.ModelAdmin):
+    list_display = ['inicio', 'fin', 'completa', 'dias_recalculados']
+    list_filter = ['completa']
+    readonly_fields = ['inicio', 'fin', 'completa', 'dias_recalculados']
+    
+    def has_add_permission(self, request):
+        # Las registra el comando actualizar_reportes
+        return False
+
+
+class LineaFacturacionInline(admin.TabularInline):
+    model = LineaFacturacion
+    extra = 0
+    can_delete = False
+    fields = ['fecha', 'dni', 'apellido', 'nombre', 'numero_afiliado', 'codigo', 'cantidad', 'pieza', 'matricula']
+    readonly_fields = fields
+    
+    def has_add_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(LoteFacturacion)
+class LoteFacturacionAdmin(admin.ModelAdmin):
+    list_display = ['obra_social', 'periodo', 'estado', 'turnos', 'prestaciones', 'fecha_generacion']
+    list_filter = ['estado', 'periodo']
+    search_fields = ['obra_social__nombre', 'obra_social__codigo']
+    list_select_related = ['obra_social']
+    readonly_fields = ['obra_social', 'periodo', 'firma', 'turnos', 'prestaciones', 'fecha_generacion',
+                       'fecha_cierre', 'usuario_cierre']
+    inlines = [LineaFacturacionInline]
+    
+    def has_add_permission(self, request):
+        # Los genera la pantalla de facturación o el comando generar_lotes_facturacion
+        return False
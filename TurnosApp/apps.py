@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class TurnosappConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'TurnosApp'
+
+    def ready(self):
+        # Registrar señales (estadísticas de pacientes)
+        from . import signals  # noqa: F401
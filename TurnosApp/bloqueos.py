@@ -0,0 +1,142 @@
+import threading
+import time as reloj
+from bisect import bisect_right
+from datetime import time
+from django.conf import settings
+from config.caches import version_modelo, invalidar_modelo
+
+
+class IndiceIntervalos:
+    """
+    Índice estático de intervalos de fechas (inclusive) para consultas de punto.
+    Ordena por fecha de inicio y guarda el máximo acumulado de fecha de fin, así
+    una consulta es una búsqueda binaria más un recorrido hacia atrás que corta
+    en cuanto ningún intervalo anterior puede llegar a la fecha buscada.
+    """
+
+    def __init__(self, intervalos):
+        # intervalos: lista de (fecha_inicio, fecha_fin, valor)
+        self.intervalos = sorted(intervalos, key=lambda intervalo: intervalo[0])
+        self.inicios = [intervalo[0] for intervalo in self.intervalos]
+        self.max_fin = []
+
+        maximo = None
+        for _, fin, _ in self.intervalos:
+            maximo = fin if maximo is None or fin > maximo else maximo
+            self.max_fin.append(maximo)
+
+    def en(self, fecha):
+        """Valores de los intervalos que contienen la fecha"""
+        resultado = []
+        i = bisect_right(self.inicios, fecha) - 1
+
+        while i >= 0 and self.max_fin[i] >= fecha:
+            _, fin, valor = self.intervalos[i]
+            if fin >= fecha:
+                resultado.append(valor)
+            i -= 1
+
+        return resultado
+
+
+class IndiceBloqueos:
+    """Bloqueos activos agrupados por odontólogo (None = bloqueo general)"""
+
+    def __init__(self, bloqueos):
+        por_odontologo = {}
+        for bloqueo in bloqueos:
+            por_odontologo.setdefault(bloqueo['odontologo_id'], []).append(
+                (bloqueo['fecha_inicio'], bloqueo['fecha_fin'], bloqueo)
+            )
+
+        self.indices = {
+            odontologo_id: IndiceIntervalos(intervalos)
+            for odontologo_id, intervalos in por_odontologo.items()
+        }
+
+    def bloqueos_en(self, odontologo_id, fecha):
+        """Bloqueos generales y del odontólogo vigentes en la fecha"""
+        resultado = []
+        for clave in (None, odontologo_id):
+            indice = self.indices.get(clave)
+            if indice:
+                resultado.extend(indice.en(fecha))
+            if odontologo_id is None:
+                break
+        return resultado
+
+    def esta_bloqueado(self, odontologo_id, fecha, hora_inicio=None, hora_fin=None):
+        """
+        Indica si el horario [hora_inicio, hora_fin) de la fecha está bloqueado.
+        Sin horas verifica si hay algún bloqueo en el día.
+        Retorna el bloqueo que lo impide o None.
+        """
+        for bloqueo in self.bloqueos_en(odontologo_id, fecha):
+            if hora_inicio is None or _solapa(bloqueo, hora_inicio, hora_fin or hora_inicio):
+                return bloqueo
+        return None
+
+
+def _solapa(bloqueo, hora_inicio, hora_fin):
+    """Verifica si un bloqueo (de día completo o parcial) pisa el horario"""
+    desde = bloqueo['hora_inicio'] or time.min
+    hasta = bloqueo['hora_fin'] or time.max
+
+    if hora_fin == hora_inicio:
+        return desde <= hora_inicio < hasta
+    return hora_inicio < hasta and desde < hora_fin
+
+
+# ========== CACHE EN MEMORIA ==========
+
+_lock = threading.Lock()
+_cache = {'indice': None, 'cargado': 0.0, 'version': None}
+
+
+def _version():
+    from .models import BloqueoHorario
+
+    return version_modelo(BloqueoHorario)
+
+
+def obtener_indice():
+    """
+    Índice de bloqueos activos cacheado en el proceso.
+    Se recarga cuando cambia la versión de BloqueoHorario en el cache compartido
+    (al guardar/eliminar un bloqueo en cualquier proceso) o a los BLOQUEOS_CACHE_SEGUNDOS.
+    """
+    ttl = getattr(settings, 'BLOQUEOS_CACHE_SEGUNDOS', 300)
+    version = _version()
+    indice = _cache['indice']
+
+    if indice is not None and _cache['version'] == version and reloj.monotonic() - _cache['cargado'] < ttl:
+        return indice
+
+    with _lock:
+        if (_cache['indice'] is None or _cache['version'] != version
+                or reloj.monotonic() - _cache['cargado'] >= ttl):
+            from .models import BloqueoHorario
+
+            bloqueos = BloqueoHorario.objects.filter(activo=True).values(
+                'id', 'odontologo_id', 'fecha_inicio', 'fecha_fin',
+                'hora_inicio', 'hora_fin', 'tipo', 'motivo'
+            )
+            _cache['indice'] = IndiceBloqueos(list(bloqueos))
+            _cache['cargado'] = reloj.monotonic()
+            _cache['version'] = version
+
+        return _cache['indice']
+
+
+def invalidar_cache():
+    """Sube la versión de los bloqueos y descarta el índice de este proceso"""
+    from .models import BloqueoHorario
+
+    invalidar_modelo(BloqueoHorario)
+    with _lock:
+        _cache['indice'] = None
+
+
+def esta_bloqueado(odontologo_id, fecha, hora_inicio=None, hora_fin=None):
+    """Atajo sobre el índice cacheado"""
+    return obtener_indice().esta_bloqueado(odontologo_id, fecha, hora_inicio, hora_fin)
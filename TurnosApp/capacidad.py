@@ -0,0 +1,63 @@
+from django.conf import settings
+
+
+def a_minutos(hora):
+    """Convierte un time en minutos desde la medianoche"""
+    return hora.hour * 60 + hora.minute
+
+
+def carga_maxima(intervalos, inicio, fin):
+    """
+    Barrido (sweep-line) sobre intervalos [inicio, fin) en minutos.
+    `intervalos` es una lista de (inicio, fin, peso); retorna la carga máxima
+    (suma de pesos simultáneos) dentro de la ventana [inicio, fin).
+    """
+    eventos = []
+    for desde, hasta, peso in intervalos:
+        if desde < fin and hasta > inicio:
+            eventos.append((max(desde, inicio), 1, peso))
+            eventos.append((hasta, 0, -peso))
+
+    # A igual minuto, primero cierran los turnos que terminan (0) y luego abren los que empiezan (1)
+    eventos.sort(key=lambda evento: (evento[0], evento[1]))
+
+    actual = maximo = 0
+    for _, _, delta in eventos:
+        actual += delta
+        maximo = max(maximo, actual)
+
+    return maximo
+
+
+def probabilidad_asistencia(ausentes, total_turnos):
+    """
+    Probabilidad de que el paciente asista según su historial.
+    Sin historial suficiente se asume que asiste.
+    """
+    minimo = getattr(settings, 'TURNOS_SOBRETURNO_MIN_HISTORIAL', 5)
+    if not total_turnos or total_turnos < minimo:
+        return 1.0
+    return 1.0 - (ausentes or 0) / total_turnos
+
+
+def hay_capacidad(turnos_del_dia, inicio, fin, capacidad, asistencia_nuevo=1.0):
+    """
+    Verifica si entra un turno [inicio, fin) dada la capacidad del consultorio.
+    `turnos_del_dia` es una lista de (inicio, fin, probabilidad_asistencia).
+
+    Sin sobreturnos la regla es estricta: a lo sumo `capacidad` turnos simultáneos.
+    Con TURNOS_SOBRETURNO_ACTIVO se permiten hasta TURNOS_SOBRETURNO_MAXIMO turnos
+    extra siempre que la asistencia esperada no supere la capacidad.
+    """
+    ocupados = carga_maxima([(a, b, 1) for a, b, _ in turnos_del_dia], inicio, fin)
+    if ocupados + 1 <= capacidad:
+        return True
+
+    if not getattr(settings, 'TURNOS_SOBRETURNO_ACTIVO', False):
+        return False
+
+    if ocupados + 1 > capacidad + getattr(settings, 'TURNOS_SOBRETURNO_MAXIMO', 1):
+        return False
+
+    esperados = carga_maxima(turnos_del_dia, inicio, fin)
+    return esperados + asistencia_nuevo <= capacidad
@@ -0,0 +1,203 @@
+from django.db import transaction
+from django.db.models import Count, DurationField, ExpressionWrapper, F, Max, Q, Sum
+from django.db.models.functions import Greatest, TruncDate
+from django.utils import timezone
+from .models import Turno, EstadisticaPaciente
+
+
+# Estado del turno -> contador que incrementa en EstadisticaPaciente
+CONTADORES_POR_ESTADO = {
+    'atendido': 'atendidos',
+    'ausente': 'ausentes',
+    'cancelado': 'cancelados',
+}
+
+
+def valores_estado(turno):
+    """
+    Valores actuales de las columnas que afectan las estadísticas.
+    Usa __dict__ para no disparar consultas sobre campos diferidos (.only/.defer).
+    """
+    return {campo: turno.__dict__[campo] for campo in Turno.CAMPOS_ESTADISTICAS if campo in turno.__dict__}
+
+
+def calcular_anticipacion(valores):
+    """
+    Días entre la reserva y la fecha del turno.
+    Retorna None si el turno todavía no se guardó o se cargó con fecha pasada.
+    """
+    fecha = valores.get('fecha')
+    fecha_creacion = valores.get('fecha_creacion')
+
+    if not fecha or not fecha_creacion:
+        return None
+
+    dias = (fecha - timezone.localdate(fecha_creacion)).days
+    return dias if dias >= 0 else None
+
+
+def capturar_estado(valores):
+    """
+    Foto de los valores (ver valores_estado) tal como cuentan en las estadísticas.
+    Retorna None si falta el paciente o el estado.
+    """
+    if not valores or 'paciente_id' not in valores or 'estado' not in valores:
+        return None
+
+    return {
+        'paciente_id': valores['paciente_id'],
+        'estado': valores['estado'],
+        'fecha': valores.get('fecha'),
+        'anticipacion': calcular_anticipacion(valores),
+    }
+
+
+def _aporte(foto, signo):
+    """Contadores que un turno suma (signo=1) o resta (signo=-1)"""
+    deltas = {'total_turnos': signo}
+
+    contador = CONTADORES_POR_ESTADO.get(foto['estado'])
+    if contador:
+        deltas[contador] = signo
+
+    if foto['anticipacion'] is not None:
+        deltas['suma_anticipacion_dias'] = signo * foto['anticipacion']
+        deltas['turnos_con_anticipacion'] = signo
+
+    return deltas
+
+
+def _aplicar_deltas(paciente_id, deltas, crear=True):
+    """
+    Aplica los deltas con F() para que dos recepciones no se pisen.
+    Los contadores no bajan de cero aunque un descuento llegue dos veces.
+    Retorna False si no había fila previa (se recalculó o no hay nada que descontar).
+    """
+    deltas = {campo: valor for campo, valor in deltas.items() if valor}
+
+    if crear:
+        _, creada = EstadisticaPaciente.objects.get_or_create(paciente_id=paciente_id)
+        if creada:
+            # La fila no existía: el historial previo no está contado, recalcular todo
+            reconstruir_estadisticas(paciente_ids=[paciente_id])
+            return False
+
+    actualizadas = EstadisticaPaciente.objects.filter(paciente_id=paciente_id).update(
+        fecha_actualizacion=timezone.now(),
+        **{campo: Greatest(F(campo) + valor, 0) for campo, valor in deltas.items()}
+    )
+    return bool(actualizadas)
+
+
+def _recalcular_ultima_visita(paciente_id):
+    """Recalcula la última visita cuando un turno atendido deja de serlo"""
+    ultima = Turno.objects.filter(
+        paciente_id=paciente_id,
+        estado='atendido'
+    ).aggregate(ultima=Max('fecha'))['ultima']
+
+    EstadisticaPaciente.objects.filter(paciente_id=paciente_id).update(ultima_visita=ultima)
+
+
+def _registrar_visita(paciente_id, fecha):
+    """Avanza la última visita si el turno atendido es más reciente"""
+    EstadisticaPaciente.objects.filter(
+        Q(ultima_visita__isnull=True) | Q(ultima_visita__lt=fecha),
+        paciente_id=paciente_id
+    ).update(ultima_visita=fecha)
+
+
+def actualizar_estadisticas(turno, anterior=None):
+    """
+    Actualiza incrementalmente las estadísticas al guardar un turno.
+    `anterior` es la foto de cómo se cargó el turno (None si es nuevo).
+    """
+    actual = capturar_estado(valores_estado(turno))
+    if actual is None:
+        reconstruir_estadisticas(paciente_ids=[turno.paciente_id])
+        return
+
+    if anterior == actual:
+        return
+
+    # Sumar el estado nuevo y restar el anterior (puede cambiar de paciente)
+    aportes = [(actual, 1)]
+    if anterior is not None:
+        aportes.append((anterior, -1))
+
+    por_paciente = {}
+    for foto, signo in aportes:
+        deltas = por_paciente.setdefault(foto['paciente_id'], {})
+        for campo, valor in _aporte(foto, signo).items():
+            deltas[campo] = deltas.get(campo, 0) + valor
+
+    with transaction.atomic():
+        for paciente_id, deltas in por_paciente.items():
+            if not _aplicar_deltas(paciente_id, deltas):
+                continue
+
+            if anterior and anterior['paciente_id'] == paciente_id and anterior['estado'] == 'atendido':
+                _recalcular_ultima_visita(paciente_id)
+            elif actual['paciente_id'] == paciente_id and actual['estado'] == 'atendido':
+                _registrar_visita(paciente_id, actual['fecha'])
+
+
+def descontar_turno(foto):
+    """
+    Resta el aporte de un turno eliminado.
+    No crea la fila si falta (p. ej. el paciente se está eliminando en cascada).
+    """
+    with transaction.atomic():
+        if _aplicar_deltas(foto['paciente_id'], _aporte(foto, -1), crear=False) and foto['estado'] == 'atendido':
+            _recalcular_ultima_visita(foto['paciente_id'])
+
+
+def reconstruir_estadisticas(paciente_ids=None, batch_size=1000):
+    """
+    Recalcula las estadísticas desde cero con agregados agrupados por paciente.
+    Si se pasan paciente_ids solo recalcula esos pacientes.
+    Retorna la cantidad de filas generadas.
+    """
+    fecha_reserva = TruncDate('fecha_creacion')
+    con_anticipacion = Q(fecha__gte=fecha_reserva)
+
+    turnos = Turno.objects.all()
+    if paciente_ids is not None:
+        turnos = turnos.filter(paciente_id__in=paciente_ids)
+
+    filas = turnos.values('paciente_id').annotate(
+        total=Count('id'),
+        n_atendidos=Count('id', filter=Q(estado='atendido')),
+        n_ausentes=Count('id', filter=Q(estado='ausente')),
+        n_cancelados=Count('id', filter=Q(estado='cancelado')),
+        ultima=Max('fecha', filter=Q(estado='atendido')),
+        suma_anticipacion=Sum(
+            ExpressionWrapper(F('fecha') - fecha_reserva, output_field=DurationField()),
+            filter=con_anticipacion
+        ),
+        n_anticipacion=Count('id', filter=con_anticipacion),
+    ).order_by()
+
+    estadisticas = [
+        EstadisticaPaciente(
+            paciente_id=fila['paciente_id'],
+            total_turnos=fila['total'],
+            atendidos=fila['n_atendidos'],
+            ausentes=fila['n_ausentes'],
+            cancelados=fila['n_cancelados'],
+            ultima_visita=fila['ultima'],
+            suma_anticipacion_dias=fila['suma_anticipacion'].days if fila['suma_anticipacion'] else 0,
+            turnos_con_anticipacion=fila['n_anticipacion'],
+        )
+        for fila in filas.iterator(chunk_size=batch_size)
+    ]
+
+    with transaction.atomic():
+        existentes = EstadisticaPaciente.objects.all()
+        if paciente_ids is not None:
+            existentes = existentes.filter(paciente_id__in=paciente_ids)
+        existentes.delete()
+
+        EstadisticaPaciente.objects.bulk_create(estadisticas, batch_size=batch_size)
+
+    return len(estadisticas)
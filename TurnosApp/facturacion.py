@@ -0,0 +1,175 @@
+"""
+Lotes de facturación a obras sociales.
+
+Cada mes y obra social se factura lo prestado en los turnos atendidos de pacientes
+afiliados (PrestacionTurno). generar_lotes(periodo) guarda una copia en
+LoteFacturacion/LineaFacturacion y los archivos se descargan desde esa copia.
+
+Regeneración incremental: una sola consulta agrupada por obra social calcula la
+"firma" de sus datos de origen (cantidad de prestaciones y última modificación de
+prestación, turno, paciente y odontólogo). Solo se regeneran los lotes abiertos
+cuya firma cambió; los cerrados no se tocan (se informa si cambiaron después).
+"""
+from datetime import date, timedelta
+from django.db import transaction
+from django.db.models import Count, Max, Sum
+from django.utils import timezone
+from config.exportar import Columna
+from .models import PrestacionTurno, LoteFacturacion, LineaFacturacion
+
+
+# Columnas de los archivos de cada lote; `ancho` se usa en el formato de ancho fijo (txt)
+COLUMNAS_LOTE = [
+    Columna('Fecha', 'fecha', ancho=8),
+    Columna('DNI', 'dni', ancho=10),
+    Columna('Número de afiliado', 'numero_afiliado', ancho=20),
+    Columna('Apellido', 'apellido', ancho=30),
+    Columna('Nombre', 'nombre', ancho=30),
+    Columna('Código', 'codigo', ancho=8),
+    Columna('Descripción', 'descripcion', ancho=40),
+    Columna('Cantidad', 'cantidad', ancho=3),
+    Columna('Pieza', 'pieza', ancho=10),
+    Columna('Matrícula', 'matricula', ancho=12),
+]
+
+# Campos de PrestacionTurno que se copian a cada LineaFacturacion
+_ORIGEN_LINEA = {
+    'prestacion_turno_id': 'id',
+    'fecha': 'turno__fecha',
+    'dni': 'turno__paciente__dni',
+    'apellido': 'turno__paciente__apellido',
+    'nombre': 'turno__paciente__nombre',
+    'numero_afiliado': 'turno__paciente__numero_afiliado',
+    'codigo': 'prestacion__codigo',
+    'descripcion': 'prestacion__descripcion',
+    'cantidad': 'cantidad',
+    'pieza': 'pieza',
+    'matricula': 'turno__odontologo__matricula_profesional',
+}
+
+
+def inicio_periodo(fecha):
+    return fecha.replace(day=1)
+
+
+def fin_periodo(periodo):
+    return (inicio_periodo(periodo) + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+
+
+def periodo_anterior(hoy=None):
+    """Mes que se cierra a principio de mes: el anterior al actual"""
+    hoy = hoy or date.today()
+    return inicio_periodo(inicio_periodo(hoy) - timedelta(days=1))
+
+
+def prestaciones_facturables(periodo):
+    """Prestaciones de turnos atendidos en el mes, de pacientes con obra social"""
+    return PrestacionTurno.objects.filter(
+        turno__estado='atendido',
+        turno__fecha__range=(inicio_periodo(periodo), fin_periodo(periodo)),
+        turno__paciente__obra_social__isnull=False,
+    )
+
+
+def firmas(periodo):
+    """{obra_social_id: {'firma', 'turnos', 'prestaciones'}} con una consulta agrupada"""
+    filas = prestaciones_facturables(periodo).values('turno__paciente__obra_social_id').annotate(
+        n=Count('id'),
+        n_turnos=Count('turno_id', distinct=True),
+        suma=Sum('cantidad'),
+        ultima_prestacion=Max('fecha_modificacion'),
+        ultimo_turno=Max('turno__fecha_modificacion'),
+        ultimo_paciente=Max('turno__paciente__fecha_modificacion'),
+        ultimo_odontologo=Max('turno__odontologo__fecha_modificacion'),
+    ).order_by()
+
+    resultado = {}
+    for fila in filas:
+        ultima = max(
+            fila['ultima_prestacion'], fila['ultimo_turno'], fila['ultimo_paciente'], fila['ultimo_odontologo']
+        )
+        resultado[fila['turno__paciente__obra_social_id']] = {
+            'firma': f"{fila['n']}:{fila['suma']}:{ultima.timestamp():.6f}",
+            'turnos': fila['n_turnos'],
+            'prestaciones': fila['suma'],
+        }
+    return resultado
+
+
+def generar_lotes(periodo, batch_size=1000):
+    """
+    Crea o regenera los lotes abiertos del mes que cambiaron.
+    Retorna un resumen con los lotes generados y los que quedaron igual.
+    """
+    periodo = inicio_periodo(periodo)
+    actuales = firmas(periodo)
+    lotes = {lote.obra_social_id: lote for lote in LoteFacturacion.objects.filter(periodo=periodo)}
+
+    resumen = {'generados': 0, 'sin_cambios': 0, 'cerrados': 0, 'cerrados_con_cambios': 0, 'eliminados': 0}
+    regenerar = []
+    for obra_social_id, datos in actuales.items():
+        lote = lotes.get(obra_social_id)
+        if lote and lote.esta_cerrado():
+            resumen['cerrados'] += 1
+            if lote.firma != datos['firma']:
+                resumen['cerrados_con_cambios'] += 1
+        elif lote and lote.firma == datos['firma']:
+            resumen['sin_cambios'] += 1
+        else:
+            regenerar.append(obra_social_id)
+
+    # Lotes abiertos que se quedaron sin prestaciones (p. ej. se corrigió la obra social del paciente)
+    vacios = [lote.pk for obra_social_id, lote in lotes.items()
+              if obra_social_id not in actuales and not lote.esta_cerrado()]
+
+    ahora = timezone.now()
+    with transaction.atomic():
+        if vacios:
+            resumen['eliminados'] = len(vacios)
+            LoteFacturacion.objects.filter(pk__in=vacios).delete()
+
+        if not regenerar:
+            return resumen
+
+        regenerados = {}
+        nuevos, existentes = [], []
+        for obra_social_id in regenerar:
+            lote = lotes.get(obra_social_id) or LoteFacturacion(obra_social_id=obra_social_id, periodo=periodo)
+            lote.firma = actuales[obra_social_id]['firma']
+            lote.turnos = actuales[obra_social_id]['turnos']
+            lote.prestaciones = actuales[obra_social_id]['prestaciones']
+            lote.fecha_generacion = ahora
+            (existentes if lote.pk else nuevos).append(lote)
+            regenerados[obra_social_id] = lote
+
+        # Consultas fijas sin importar cuántas obras sociales cambiaron
+        LoteFacturacion.objects.bulk_create(nuevos)
+        LoteFacturacion.objects.bulk_update(existentes, ['firma', 'turnos', 'prestaciones', 'fecha_generacion'])
+        LineaFacturacion.objects.filter(lote__in=regenerados.values()).delete()
+
+        # Las líneas de todas las obras sociales que cambiaron salen de una sola consulta
+        origen = prestaciones_facturables(periodo).filter(
+            turno__paciente__obra_social_id__in=regenerados
+        ).values_list('turno__paciente__obra_social_id', *_ORIGEN_LINEA.values()).order_by()
+
+        lineas = []
+        for obra_social_id, *valores in origen.iterator(chunk_size=batch_size):
+            datos = dict(zip(_ORIGEN_LINEA, valores))
+            datos['numero_afiliado'] = datos['numero_afiliado'] or ''
+            datos['matricula'] = datos['matricula'] or ''
+            lineas.append(LineaFacturacion(lote=regenerados[obra_social_id], **datos))
+            if len(lineas) >= batch_size:
+                LineaFacturacion.objects.bulk_create(lineas)
+                lineas = []
+        LineaFacturacion.objects.bulk_create(lineas)
+
+    resumen['generados'] = len(regenerados)
+    return resumen
+
+
+def cerrar_lote(lote, usuario=None):
+    """Cierra el lote: ya no se regenera (el archivo presentado queda fijo)"""
+    lote.estado = 'cerrado'
+    lote.fecha_cierre = timezone.now()
+    lote.usuario_cierre = usuario
+    lote.save(update_fields=['estado', 'fecha_cierre', 'usuario_cierre'])
@@ -0,0 +1,86 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+
+# Subir al cambiar fila_turno.html: las filas cacheadas con la versión anterior dejan de usarse
+VERSION_FILA = 2
+
+
+def vista_usuario(usuario):
+    """
+    Variante de la fila según quién mira: el odontólogo solo ve sus turnos (sin
+    columna de odontólogo y con los botones de atención); el resto ve todos.
+    """
+    return 'odontologo' if usuario.es_odontologo() else 'general'
+
+
+def acciones_turno(turno, usuario):
+    """Botones disponibles para el turno, calculados una vez en la vista y no en el template"""
+    acciones = {'ver'}
+    propio = usuario.es_odontologo() and turno.odontologo_id == usuario.pk
+
+    if turno.estado in ('pendiente', 'confirmado'):
+        acciones.update(('editar', 'ausente'))
+        if propio:
+            acciones.add('iniciar')
+    if turno.puede_confirmar():
+        acciones.add('confirmar')
+    if turno.puede_cancelar():
+        acciones.add('cancelar')
+    if turno.estado == 'en_atencion' and propio:
+        acciones.add('finalizar')
+    if turno.estado in ('en_atencion', 'atendido') and (propio or not usuario.es_odontologo()):
+        acciones.add('prestaciones')
+
+    return acciones
+
+
+def clave_fila(turno, vista):
+    """
+    La fila muestra datos del turno, del paciente y del odontólogo: la clave lleva
+    la fecha de modificación de los tres, así cualquier cambio genera otra clave.
+    Las banderas de precaución del paciente también van en la clave: las cargas
+    masivas de antecedentes las cambian con update(), sin pasar por save().
+    """
+    return 'turnos:fila:v{}:{}:{}:{}:{}:{}:{}:{}'.format(
+        VERSION_FILA,
+        turno.pk,
+        turno.fecha_modificacion.timestamp(),
+        turno.paciente.fecha_modificacion.timestamp(),
+        int(turno.paciente.requiere_precaucion),
+        turno.paciente.categorias_antecedentes,
+        turno.odontologo.fecha_modificacion.timestamp(),
+        vista,
+    )
+
+
+def renderizar_filas(turnos, usuario):
+    """
+    HTML de cada fila de la lista de turnos. Las filas cacheadas se traen con un
+    solo get_many; solo las que cambiaron se renderizan y se guardan juntas.
+    """
+    turnos = list(turnos)
+    vista = vista_usuario(usuario)
+    claves = [clave_fila(turno, vista) for turno in turnos]
+    cache = caches['fragmentos']
+    cacheadas = cache.get_many(claves)
+
+    filas = []
+    nuevas = {}
+    for turno, clave in zip(turnos, claves):
+        html = cacheadas.get(clave)
+        if html is None:
+            html = render_to_string('TurnosApp/fila_turno.html', {
+                'turno': turno,
+                'acciones': acciones_turno(turno, usuario),
+                'mostrar_odontologo': vista != 'odontologo',
+            })
+            nuevas[clave] = str(html)
+        filas.append(mark_safe(html))
+
+    if nuevas:
+        cache.set_many(nuevas, getattr(settings, 'TURNOS_FILA_CACHE_SEGUNDOS', 3600))
+
+    return filas
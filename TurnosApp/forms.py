@@ -1,8 +1,7 @@
 from django import forms
-from .models import Turno, ConfiguracionAgenda, BloqueoHorario
-from PacientesApp.models import Paciente
+from .models import Turno, ConfiguracionAgenda, BloqueoHorario, PrestacionTurno
+from PacientesApp.models import Paciente, Prestacion
 from UsuarioApp.models import Usuario
-from datetime import datetime, timedelta, time
 
 
 class TurnoForm(forms.ModelForm):
@@ -71,18 +70,8 @@ class TurnoForm(forms.ModelForm):
 #            self.fields['estado'].widget = forms.HiddenInput()
 #            self.fields['estado'].initial = 'pendiente'
     
-    def clean(self):
-        cleaned_data = super().clean()
-        fecha = cleaned_data.get('fecha')
-        hora = cleaned_data.get('hora')
-        
-        # Validar que no sea en el pasado
-        if fecha and hora:
-            turno_datetime = datetime.combine(fecha, hora)
-            if turno_datetime < datetime.now():
-                raise forms.ValidationError('No se pueden crear turnos en fechas/horas pasadas.')
-        
-        return cleaned_data
+    # Las validaciones de fecha, agenda, bloqueos y capacidad las hace
+    # Turno.clean() (ValidadorTurnos) al validar el formulario
 
 
 class ConfiguracionAgendaForm(forms.ModelForm):
@@ -246,6 +235,49 @@ class FiltroTurnosForm(forms.Form):
         }),
         label='Estado'
     )
+
+
+class FiltroReportesForm(forms.Form):
+    """Período y odontólogo de los reportes de auditoría"""
+    
+    fecha_desde = forms.DateField(
+        required=False,
+        widget=forms.DateInput(attrs={
+            'class': 'form-control',
+            'type': 'date'
+        }),
+        label='Desde'
+    )
+    
+    fecha_hasta = forms.DateField(
+        required=False,
+        widget=forms.DateInput(attrs={
+            'class': 'form-control',
+            'type': 'date'
+        }),
+        label='Hasta'
+    )
+    
+    # Incluye odontólogos dados de baja: los reportes cubren períodos pasados
+    odontologo = forms.ModelChoiceField(
+        queryset=Usuario.objects.filter(rol='odontologo').order_by('last_name', 'first_name'),
+        required=False,
+        widget=forms.Select(attrs={
+            'class': 'form-select'
+        }),
+        label='Odontólogo',
+        empty_label='Todos'
+    )
+    
+    def clean(self):
+        cleaned_data = super().clean()
+        desde = cleaned_data.get('fecha_desde')
+        hasta = cleaned_data.get('fecha_hasta')
+        if desde and hasta and desde > hasta:
+            raise forms.ValidationError('La fecha "Desde" no puede ser posterior a "Hasta".')
+        return cleaned_data
+
+
 class TurnoEditarForm(TurnoForm):
     """Formulario para editar turnos (incluye estado)"""
     
@@ -254,4 +286,34 @@ class TurnoEditarForm(TurnoForm):
         widgets = {
             **TurnoForm.Meta.widgets,
             'estado': forms.Select(attrs={'class': 'form-select'}),
-        }
\ No newline at end of file
+        }
+
+
+class PrestacionTurnoForm(forms.ModelForm):
+    """Prestación del nomenclador realizada en el turno"""
+    
+    class Meta:
+        model = PrestacionTurno
+        fields = ['prestacion', 'cantidad', 'pieza']
+        widgets = {
+            'prestacion': forms.Select(attrs={'class': 'form-select'}),
+            'cantidad': forms.NumberInput(attrs={'class': 'form-control', 'min': 1, 'max': 32}),
+            'pieza': forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'Ej: 36'}),
+        }
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['prestacion'].queryset = Prestacion.objects.filter(activa=True)
+
+
+class PeriodoFacturacionForm(forms.Form):
+    """Mes a facturar"""
+    
+    periodo = forms.DateField(
+        input_formats=['%Y-%m'],
+        widget=forms.DateInput(format='%Y-%m', attrs={
+            'class': 'form-control',
+            'type': 'month'
+        }),
+        label='Período'
+    )
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+from TurnosApp.reportes import actualizar_reportes, ultima_ejecucion
+
+
+class Command(BaseCommand):
+    help = ('Actualiza las tablas de hechos de los reportes de auditoría. Solo recalcula los días '
+            'tocados desde la corrida anterior (pensado para correr todas las noches).')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--completo',
+            action='store_true',
+            help='Reconstruye todos los días en lugar de solo los modificados'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Cantidad de filas por inserción'
+        )
+
+    def handle(self, *args, **options):
+        anterior = ultima_ejecucion()
+
+        if options['completo'] or anterior is None:
+            self.stdout.write(self.style.WARNING('Reconstruyendo todos los reportes...'))
+        else:
+            self.stdout.write(self.style.WARNING(
+                f'Actualizando reportes con los cambios desde {anterior.inicio:%d/%m/%Y %H:%M}...'
+            ))
+
+        ejecucion = actualizar_reportes(completo=options['completo'], batch_size=options['batch_size'])
+        segundos = (ejecucion.fin - ejecucion.inicio).total_seconds()
+
+        self.stdout.write('\n' + '='*50)
+        self.stdout.write(self.style.SUCCESS(f'Días recalculados: {ejecucion.dias_recalculados}'))
+        self.stdout.write(f'Duración: {segundos:.2f} s')
+        self.stdout.write('='*50)
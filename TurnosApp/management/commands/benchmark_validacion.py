@@ -0,0 +1,112 @@
+import time as reloj
+from datetime import date, time, timedelta
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from config.caches import invalidar_modelo
+from UsuarioApp.busqueda import reconstruir_palabras_busqueda
+from UsuarioApp.models import Usuario
+from PacientesApp.models import Paciente
+from TurnosApp.models import Turno, ConfiguracionAgenda
+from TurnosApp.validaciones import ValidadorTurnos
+
+
+class Rollback(Exception):
+    """Se usa para descartar los datos de prueba al terminar"""
+
+
+class Command(BaseCommand):
+    help = ('Mide consultas y tiempo de validar un turno a medida que crece la tabla de turnos. '
+            'Los datos de prueba se crean dentro de una transacción que se revierte al final.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--tamanios',
+            type=int,
+            nargs='+',
+            default=[0, 1000, 10000, 50000],
+            help='Cantidades de turnos en la tabla a medir'
+        )
+        parser.add_argument(
+            '--repeticiones',
+            type=int,
+            default=50,
+            help='Validaciones por medición'
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.WARNING('Midiendo validación de turnos (los datos se revierten al terminar)...'))
+
+        try:
+            with transaction.atomic():
+                self.medir(options['tamanios'], options['repeticiones'])
+                raise Rollback()
+        except Rollback:
+            pass
+        finally:
+            # Lo cacheado durante la medición (versión de Turno incluida) vio turnos que ya no existen
+            invalidar_modelo(Turno)
+
+    def medir(self, tamanios, repeticiones):
+        odontologos = Usuario.objects.bulk_create([
+            Usuario(username=f'bench_odontologo_{i}', rol='odontologo', first_name='Bench', last_name=str(i))
+            for i in range(5)
+        ])
+        reconstruir_palabras_busqueda([odontologo.pk for odontologo in odontologos])
+        pacientes = [
+            Paciente.objects.create(
+                nombre='Bench', apellido=str(i), dni=f'9{i:07d}', fecha_nacimiento=date(1990, 1, 1),
+                telefono='3870000000', sexo='O'
+            )
+            for i in range(20)
+        ]
+
+        for odontologo in odontologos:
+            ConfiguracionAgenda.objects.bulk_create([
+                ConfiguracionAgenda(odontologo=odontologo, dia_semana=dia, hora_inicio=time(8), hora_fin=time(20))
+                for dia in range(7)
+            ])
+
+        fecha_objetivo = date.today() + timedelta(days=30)
+        cargados = 0
+
+        self.stdout.write('\n' + '='*50)
+        self.stdout.write(f'{"Turnos en tabla":>16} {"Consultas":>10} {"ms/validación":>15}')
+
+        for tamanio in sorted(tamanios):
+            # Historial repartido en otros días y odontólogos
+            nuevos = []
+            for i in range(cargados, tamanio):
+                nuevos.append(Turno(
+                    paciente=pacientes[i % len(pacientes)],
+                    odontologo=odontologos[i % len(odontologos)],
+                    fecha=fecha_objetivo - timedelta(days=1 + (i // 48) % 3000),
+                    hora=time(8 + (i % 24) // 2, 30 * (i % 2)),
+                    motivo_consulta='Benchmark',
+                    estado='atendido',
+                ))
+            Turno.objects.bulk_create(nuevos, batch_size=1000)
+            invalidar_modelo(Turno)  # bulk_create no dispara post_save
+            cargados = max(cargados, tamanio)
+
+            turno = Turno(
+                paciente=pacientes[0],
+                odontologo=odontologos[0],
+                fecha=fecha_objetivo,
+                hora=time(10),
+                motivo_consulta='Benchmark'
+            )
+
+            ValidadorTurnos([turno]).validar(turno)  # Precalentar el índice de bloqueos
+
+            with CaptureQueriesContext(connection) as consultas:
+                ValidadorTurnos([turno]).validar(turno)
+
+            inicio = reloj.perf_counter()
+            for _ in range(repeticiones):
+                ValidadorTurnos([turno]).validar(turno)
+            milisegundos = (reloj.perf_counter() - inicio) * 1000 / repeticiones
+
+            self.stdout.write(f'{tamanio:>16} {len(consultas):>10} {milisegundos:>15.2f}')
+
+        self.stdout.write('='*50)
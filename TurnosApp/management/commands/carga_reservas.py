@@ -0,0 +1,181 @@
+import threading
+import time as reloj
+from datetime import date, time, timedelta
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections, transaction, OperationalError
+from UsuarioApp.busqueda import reconstruir_palabras_busqueda
+from UsuarioApp.models import Usuario
+from PacientesApp.models import Paciente
+from TurnosApp.models import Turno, ConfiguracionAgenda
+
+
+PREFIJO = 'carga_reservas'
+
+
+class Command(BaseCommand):
+    help = ('Prueba de carga: varios hilos reservan turnos a la vez (validación + guardado, como el '
+            'formulario de recepción) y se mide cuántas reservas por segundo soporta la base. '
+            'Crea odontólogos y pacientes de prueba y los borra al terminar: usar una base de '
+            'prueba vacía (DB_NAME) y --confirmar.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--hilos',
+            type=int,
+            nargs='+',
+            default=[1, 2, 4, 8],
+            help='Cantidades de terminales simultáneas a medir'
+        )
+        parser.add_argument(
+            '--segundos',
+            type=float,
+            default=5,
+            help='Duración de cada medición'
+        )
+        parser.add_argument(
+            '--confirmar',
+            action='store_true',
+            help='Confirma que la base configurada es de prueba (se escriben y borran datos en ella)'
+        )
+
+    def handle(self, *args, **options):
+        nombre = connection.settings_dict['NAME']
+        if not options['confirmar']:
+            raise CommandError(
+                f'La prueba de carga escribe y borra datos en la base configurada ({nombre}). '
+                'Apuntá DB_NAME a una base de prueba vacía y agregá --confirmar.'
+            )
+        # Con datos reales los DNI de prueba podrían chocar y la limpieza borra por prefijo
+        if Paciente.objects.exclude(observaciones_generales=PREFIJO).exists() or \
+                Turno.objects.exclude(odontologo__username__startswith=f'{PREFIJO}_').exists():
+            raise CommandError(
+                f'La base {nombre} tiene pacientes o turnos: la prueba de carga solo corre sobre '
+                'una base de prueba vacía (por ejemplo, una copia recién migrada).'
+            )
+
+        motor = connection.vendor
+        self.stdout.write(self.style.WARNING(
+            f'Midiendo reservas concurrentes en {motor} ({nombre})...'
+        ))
+        if motor == 'sqlite':
+            with connection.cursor() as cursor:
+                modo = cursor.execute('PRAGMA journal_mode').fetchone()[0]
+                espera = cursor.execute('PRAGMA busy_timeout').fetchone()[0]
+            transaccion = connection.settings_dict['OPTIONS'].get('transaction_mode') or 'DEFERRED'
+            self.stdout.write(f'journal_mode={modo} busy_timeout={espera}ms transacciones={transaccion}')
+
+        odontologos, pacientes = self.preparar(max(options['hilos']))
+        try:
+            self.stdout.write('\n' + '='*72)
+            self.stdout.write(
+                f'{"Hilos":>6} {"Reservas":>9} {"Reservas/s":>11} {"p50 ms":>8} {"p95 ms":>8} '
+                f'{"Bloqueos":>9} {"Rechazos":>9}'
+            )
+            for hilos in options['hilos']:
+                resultado = self.medir(hilos, options['segundos'], odontologos, pacientes)
+                self.stdout.write(
+                    f'{hilos:>6} {resultado["reservas"]:>9} {resultado["por_segundo"]:>11.1f} '
+                    f'{resultado["p50"]:>8.1f} {resultado["p95"]:>8.1f} '
+                    f'{resultado["bloqueos"]:>9} {resultado["rechazos"]:>9}'
+                )
+            self.stdout.write('='*72)
+            self.stdout.write('Bloqueos: la base rechazó la escritura por estar ocupada (database is locked).')
+        finally:
+            self.limpiar()
+
+    def preparar(self, cantidad):
+        """Un odontólogo por hilo (agenda libre todos los días) y pacientes para reservar"""
+        self.limpiar()
+
+        odontologos = Usuario.objects.bulk_create([
+            Usuario(username=f'{PREFIJO}_{i}', rol='odontologo', first_name='Carga', last_name=str(i))
+            for i in range(cantidad)
+        ])
+        # bulk_create no pasa por Usuario.save: sin esto no aparecen en la búsqueda de usuarios
+        reconstruir_palabras_busqueda([odontologo.pk for odontologo in odontologos])
+        ConfiguracionAgenda.objects.bulk_create([
+            ConfiguracionAgenda(odontologo=odontologo, dia_semana=dia, hora_inicio=time(0), hora_fin=time(23, 59))
+            for odontologo in odontologos
+            for dia in range(7)
+        ])
+
+        pacientes = [
+            Paciente.objects.create(
+                nombre='Carga', apellido=str(i), dni=f'0{i:07d}', fecha_nacimiento=date(1990, 1, 1),
+                telefono='3870000000', sexo='O', observaciones_generales=PREFIJO
+            )
+            for i in range(20)
+        ]
+        return odontologos, pacientes
+
+    def limpiar(self):
+        Usuario.objects.filter(username__startswith=f'{PREFIJO}_').delete()
+        Paciente.objects.filter(observaciones_generales=PREFIJO).delete()
+
+    def medir(self, hilos, segundos, odontologos, pacientes):
+        # Cada medición usa días nuevos para no chocar con los turnos de la anterior
+        self.dia_inicial = getattr(self, 'dia_inicial', 0) + 400
+        fin = reloj.perf_counter() + segundos
+        resultados = []
+        barrera = threading.Barrier(hilos)
+
+        def reservar(numero):
+            latencias, bloqueos, rechazos = [], 0, 0
+            odontologo = odontologos[numero]
+            barrera.wait()
+            try:
+                intento = 0
+                while reloj.perf_counter() < fin:
+                    # 47 turnos de 30 minutos por día (de 00:00 a 23:30, la agenda cierra 23:59)
+                    fecha = date.today() + timedelta(days=self.dia_inicial + intento // 47)
+                    hora = time((intento % 47) // 2, 30 * (intento % 47 % 2))
+                    intento += 1
+
+                    inicio = reloj.perf_counter()
+                    try:
+                        with transaction.atomic():
+                            turno = Turno(
+                                paciente=pacientes[intento % len(pacientes)],
+                                odontologo=odontologo,
+                                fecha=fecha,
+                                hora=hora,
+                                motivo_consulta='Prueba de carga',
+                                usuario_registro=odontologo,
+                            )
+                            turno.full_clean()
+                            turno.save()
+                    except OperationalError:
+                        bloqueos += 1
+                        continue
+                    except ValidationError:
+                        rechazos += 1
+                        continue
+                    latencias.append(reloj.perf_counter() - inicio)
+            finally:
+                resultados.append((latencias, bloqueos, rechazos))
+                connections.close_all()
+
+        inicio = reloj.perf_counter()
+        trabajadores = [threading.Thread(target=reservar, args=(numero,)) for numero in range(hilos)]
+        for trabajador in trabajadores:
+            trabajador.start()
+        for trabajador in trabajadores:
+            trabajador.join()
+        duracion = reloj.perf_counter() - inicio
+
+        latencias = sorted(latencia for parcial, _, _ in resultados for latencia in parcial)
+
+        def percentil(p):
+            if not latencias:
+                return 0.0
+            return latencias[min(len(latencias) - 1, int(len(latencias) * p))] * 1000
+
+        return {
+            'reservas': len(latencias),
+            'por_segundo': len(latencias) / duracion,
+            'p50': percentil(0.50),
+            'p95': percentil(0.95),
+            'bloqueos': sum(bloqueos for _, bloqueos, _ in resultados),
+            'rechazos': sum(rechazos for _, _, rechazos in resultados),
+        }
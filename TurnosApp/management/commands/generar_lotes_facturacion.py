@@ -0,0 +1,46 @@
+from datetime import datetime
+from django.core.management.base import BaseCommand, CommandError
+from TurnosApp.facturacion import generar_lotes, periodo_anterior
+
+
+class Command(BaseCommand):
+    help = ('Genera los lotes de facturación a obras sociales de un mes. Solo regenera los lotes '
+            'abiertos cuyos datos cambiaron desde la generación anterior.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--periodo',
+            type=str,
+            help='Mes a facturar (AAAA-MM). Por defecto, el mes anterior.'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Cantidad de líneas por inserción'
+        )
+
+    def handle(self, *args, **options):
+        if options['periodo']:
+            try:
+                periodo = datetime.strptime(options['periodo'], '%Y-%m').date()
+            except ValueError:
+                raise CommandError('El período debe tener el formato AAAA-MM')
+        else:
+            periodo = periodo_anterior()
+        
+        self.stdout.write(self.style.WARNING(f'Generando lotes de facturación de {periodo:%m/%Y}...'))
+        
+        resumen = generar_lotes(periodo, batch_size=options['batch_size'])
+        
+        self.stdout.write('\n' + '='*50)
+        self.stdout.write(self.style.SUCCESS(f'Lotes generados: {resumen["generados"]}'))
+        self.stdout.write(f'Sin cambios: {resumen["sin_cambios"]}')
+        self.stdout.write(f'Cerrados (no se modifican): {resumen["cerrados"]}')
+        if resumen['eliminados']:
+            self.stdout.write(f'Eliminados (sin prestaciones): {resumen["eliminados"]}')
+        if resumen['cerrados_con_cambios']:
+            self.stdout.write(self.style.ERROR(
+                f'Lotes cerrados con cambios posteriores al cierre: {resumen["cerrados_con_cambios"]}'
+            ))
+        self.stdout.write('='*50)
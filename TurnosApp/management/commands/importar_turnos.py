@@ -0,0 +1,284 @@
+import csv
+import os
+from datetime import datetime
+from itertools import islice
+from pathlib import Path
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from config.caches import invalidar_modelo
+from UsuarioApp.models import Usuario
+from PacientesApp.models import Paciente
+from TurnosApp.models import Turno
+from TurnosApp.validaciones import ValidadorTurnos, filtro_dias
+from TurnosApp.estadisticas import reconstruir_estadisticas
+
+
+FORMATOS_FECHA = ['%Y-%m-%d', '%d/%m/%Y']
+FORMATOS_HORA = ['%H:%M', '%H:%M:%S']
+ESTADOS_VALIDOS = dict(Turno.ESTADO_CHOICES)
+
+
+def normalizar_matricula(matricula):
+    """Quita espacios y unifica mayúsculas para comparar matrículas"""
+    return ''.join((matricula or '').split()).upper()
+
+
+def guardar_progreso(ruta, fila):
+    """
+    Escribe el avance de forma atómica: un archivo temporal que reemplaza al anterior,
+    así un corte a mitad de la escritura no deja el archivo vacío o a medias
+    """
+    temporal = ruta.with_name(ruta.name + '.tmp')
+    with open(temporal, 'w') as archivo:
+        archivo.write(str(fila))
+        archivo.flush()
+        os.fsync(archivo.fileno())
+    os.replace(temporal, ruta)
+
+
+def parsear(valor, formatos, convertir):
+    """Intenta cada formato y retorna el valor convertido o None"""
+    for formato in formatos:
+        try:
+            return convertir(datetime.strptime(valor.strip(), formato))
+        except ValueError:
+            continue
+    return None
+
+
+class Command(BaseCommand):
+    help = ('Importa turnos históricos desde un CSV (exportado del sistema anterior o de Excel). '
+            'Columnas: dni, matricula, fecha, hora, duracion, motivo, estado, observaciones')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'csv_file',
+            type=str,
+            help='Ruta al archivo CSV con los turnos'
+        )
+        parser.add_argument(
+            '--delimitador',
+            default=',',
+            help='Separador de columnas (Excel en español suele exportar con ";")'
+        )
+        parser.add_argument(
+            '--encoding',
+            default='utf-8-sig',
+            help='Codificación del archivo'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='Filas por transacción'
+        )
+        parser.add_argument(
+            '--reanudar',
+            action='store_true',
+            help='Continuar desde la última fila confirmada en una ejecución anterior'
+        )
+        parser.add_argument(
+            '--rechazados',
+            help='Ruta del reporte de filas rechazadas (por defecto <csv>.rechazados.csv)'
+        )
+        parser.add_argument(
+            '--validar-agenda',
+            action='store_true',
+            help='Rechazar turnos activos fuera de la agenda del odontólogo'
+        )
+        parser.add_argument(
+            '--usuario',
+            help='Username que figura como usuario que registró los turnos'
+        )
+
+    def handle(self, *args, **options):
+        csv_file = Path(options['csv_file'])
+        batch_size = options['batch_size']
+        progreso = csv_file.with_name(csv_file.name + '.progreso')
+        rechazados_path = Path(options['rechazados'] or csv_file.with_name(csv_file.name + '.rechazados.csv'))
+
+        if not csv_file.exists():
+            raise CommandError(f'No se encontró el archivo {csv_file}')
+
+        usuario_registro = None
+        if options['usuario']:
+            usuario_registro = Usuario.objects.filter(username=options['usuario']).first()
+            if usuario_registro is None:
+                raise CommandError(f'No existe el usuario {options["usuario"]}')
+
+        # Filas ya confirmadas en una ejecución anterior
+        procesadas = 0
+        if options['reanudar'] and progreso.exists():
+            procesadas = int(progreso.read_text().strip() or 0)
+            self.stdout.write(self.style.WARNING(f'Reanudando desde la fila {procesadas + 1}'))
+        reanudada = bool(procesadas)
+
+        # Mapas en memoria, se arman una sola vez
+        self.stdout.write(self.style.WARNING('Cargando pacientes y odontólogos...'))
+        self.pacientes = dict(Paciente.objects.values_list('dni', 'id'))
+        self.odontologos = {}
+        for odontologo in Usuario.objects.filter(rol='odontologo').exclude(matricula_profesional__isnull=True):
+            self.odontologos[normalizar_matricula(odontologo.matricula_profesional)] = odontologo
+
+        importados = 0
+        rechazados = 0
+        repetidos = 0
+        pacientes_afectados = set()
+
+        self.stdout.write(self.style.WARNING(f'Importando turnos desde: {csv_file}'))
+
+        with open(csv_file, 'r', encoding=options['encoding'], newline='') as archivo, \
+                open(rechazados_path, 'a' if procesadas else 'w', encoding='utf-8', newline='') as reporte:
+            reader = csv.DictReader(archivo, delimiter=options['delimitador'])
+            writer = csv.writer(reporte)
+            if not procesadas:
+                writer.writerow(['fila', 'error'] + (reader.fieldnames or []))
+
+            filas = enumerate(reader, start=1)
+            if procesadas:
+                filas = islice(filas, procesadas, None)
+
+            while True:
+                lote = list(islice(filas, batch_size))
+                if not lote:
+                    break
+
+                turnos, errores, omitidos = self.procesar_lote(lote, usuario_registro, options['validar_agenda'])
+
+                with transaction.atomic():
+                    Turno.objects.bulk_create(turnos, batch_size=1000)
+                # bulk_create no dispara post_save: la versión de Turno (cache 'agenda') se sube acá
+                if turnos:
+                    invalidar_modelo(Turno)
+
+                for numero, error, row in errores:
+                    writer.writerow([numero, error] + [row.get(campo, '') for campo in reader.fieldnames])
+                reporte.flush()
+
+                # Recién con el lote confirmado se guarda el avance. Si el proceso se corta
+                # antes, al reanudar el lote se repite y sus turnos ya cargados se omiten
+                procesadas = lote[-1][0]
+                guardar_progreso(progreso, procesadas)
+
+                importados += len(turnos)
+                rechazados += len(errores)
+                repetidos += omitidos
+                pacientes_afectados.update(turno.paciente_id for turno in turnos)
+
+                self.stdout.write(f'  Fila {procesadas}: {importados} importados, {rechazados} rechazados')
+
+        # bulk_create no dispara señales: recalcular estadísticas de los pacientes tocados
+        # (todas si se reanudó, porque no sabemos qué pacientes tocó la ejecución anterior)
+        if pacientes_afectados or reanudada:
+            self.stdout.write(self.style.WARNING('Recalculando estadísticas de pacientes...'))
+            if reanudada or len(pacientes_afectados) > 10000:
+                reconstruir_estadisticas()
+            else:
+                reconstruir_estadisticas(paciente_ids=list(pacientes_afectados))
+
+        progreso.unlink(missing_ok=True)
+
+        self.stdout.write('\n' + '='*50)
+        self.stdout.write(self.style.SUCCESS(f'Turnos importados: {importados}'))
+        if repetidos > 0:
+            self.stdout.write(self.style.WARNING(f'Turnos ya cargados (omitidos): {repetidos}'))
+        if rechazados > 0:
+            self.stdout.write(self.style.ERROR(f'Filas rechazadas: {rechazados} (ver {rechazados_path})'))
+        self.stdout.write('='*50)
+
+    def procesar_lote(self, lote, usuario_registro, validar_agenda):
+        """
+        Convierte y valida un lote de filas. Retorna (turnos válidos, errores, omitidos):
+        omitidos son los turnos que ya existen (mismo paciente, odontólogo, fecha y hora),
+        así volver a importar un lote (al reanudar o repetir el comando) no los duplica.
+        """
+        candidatos = []
+        errores = []
+
+        for numero, row in lote:
+            try:
+                turno = self.construir_turno(row, usuario_registro)
+            except ValueError as e:
+                errores.append((numero, str(e), row))
+                continue
+            candidatos.append((numero, turno, row))
+
+        existentes = self.turnos_existentes([turno for _, turno, _ in candidatos])
+        nuevos = []
+        for numero, turno, row in candidatos:
+            clave = (turno.paciente_id, turno.odontologo_id, turno.fecha, turno.hora)
+            if clave in existentes:
+                continue
+            existentes.add(clave)
+            nuevos.append((numero, turno, row))
+        omitidos = len(candidatos) - len(nuevos)
+        candidatos = nuevos
+
+        # Validación en lote: una consulta por modelo para todo el lote
+        validador = ValidadorTurnos(
+            [turno for _, turno, _ in candidatos],
+            validar_pasado=False,
+            validar_agenda=validar_agenda
+        )
+
+        turnos = []
+        for numero, turno, row in candidatos:
+            problemas = validador.validar(turno)
+            if problemas:
+                errores.append((numero, ' '.join(problemas), row))
+            else:
+                turnos.append(turno)
+
+        return turnos, errores, omitidos
+
+    def turnos_existentes(self, turnos):
+        """(paciente, odontólogo, fecha, hora) de los turnos ya cargados en los días del lote, en una consulta"""
+        if not turnos:
+            return set()
+        return set(Turno.objects.filter(filtro_dias(turnos)).order_by().values_list(
+            'paciente_id', 'odontologo_id', 'fecha', 'hora'
+        ))
+
+    def construir_turno(self, row, usuario_registro):
+        """Arma un Turno a partir de una fila del CSV o lanza ValueError"""
+        dni = (row.get('dni') or '').strip()
+        paciente_id = self.pacientes.get(dni)
+        if paciente_id is None:
+            raise ValueError(f'No existe paciente con DNI {dni}')
+
+        matricula = normalizar_matricula(row.get('matricula'))
+        odontologo = self.odontologos.get(matricula)
+        if odontologo is None:
+            raise ValueError(f'No existe odontólogo con matrícula {row.get("matricula")}')
+
+        fecha = parsear(row.get('fecha') or '', FORMATOS_FECHA, lambda valor: valor.date())
+        if fecha is None:
+            raise ValueError(f'Fecha inválida: {row.get("fecha")}')
+
+        hora = parsear(row.get('hora') or '', FORMATOS_HORA, lambda valor: valor.time())
+        if hora is None:
+            raise ValueError(f'Hora inválida: {row.get("hora")}')
+
+        duracion = (row.get('duracion') or '').strip() or '30'
+        if not duracion.isdigit() or not 15 <= int(duracion) <= 120:
+            raise ValueError(f'Duración inválida: {duracion} (entre 15 y 120 minutos)')
+
+        estado = (row.get('estado') or '').strip().lower() or 'atendido'
+        if estado not in ESTADOS_VALIDOS:
+            raise ValueError(f'Estado inválido: {estado}')
+
+        motivo = (row.get('motivo') or '').strip()
+        if not motivo:
+            raise ValueError('Falta el motivo de consulta')
+
+        return Turno(
+            paciente_id=paciente_id,
+            odontologo=odontologo,
+            fecha=fecha,
+            hora=hora,
+            duracion=int(duracion),
+            motivo_consulta=motivo[:255],
+            estado=estado,
+            observaciones=(row.get('observaciones') or '').strip() or None,
+            usuario_registro=usuario_registro,
+        )
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+from TurnosApp.estadisticas import reconstruir_estadisticas
+
+
+class Command(BaseCommand):
+    help = 'Recalcula las estadísticas de asistencia por paciente a partir de los turnos'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--paciente',
+            type=int,
+            action='append',
+            dest='pacientes',
+            help='ID de paciente a recalcular (se puede repetir). Por defecto recalcula todos.'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Cantidad de filas por inserción'
+        )
+
+    def handle(self, *args, **options):
+        pacientes = options['pacientes']
+        
+        if pacientes:
+            self.stdout.write(self.style.WARNING(f'Recalculando estadísticas de {len(pacientes)} paciente(s)...'))
+        else:
+            self.stdout.write(self.style.WARNING('Recalculando estadísticas de todos los pacientes...'))
+        
+        total = reconstruir_estadisticas(paciente_ids=pacientes, batch_size=options['batch_size'])
+        
+        self.stdout.write('\n' + '='*50)
+        self.stdout.write(self.style.SUCCESS(f'Estadísticas generadas: {total}'))
+        self.stdout.write('='*50)
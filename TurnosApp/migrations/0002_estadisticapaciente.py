@@ -0,0 +1,34 @@
+# Generated by Django 5.2.8 on 2026-10-19 11:19
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('PacientesApp', '0002_remove_antecedentepaciente_observaciones_generales_and_more'),
+        ('TurnosApp', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EstadisticaPaciente',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_turnos', models.PositiveIntegerField(default=0, verbose_name='Total de Turnos')),
+                ('atendidos', models.PositiveIntegerField(default=0, verbose_name='Turnos Atendidos')),
+                ('ausentes', models.PositiveIntegerField(default=0, verbose_name='Ausencias')),
+                ('cancelados', models.PositiveIntegerField(default=0, verbose_name='Cancelaciones')),
+                ('ultima_visita', models.DateField(blank=True, null=True, verbose_name='Última Visita')),
+                ('suma_anticipacion_dias', models.PositiveIntegerField(default=0, help_text='Días entre la reserva y el turno, acumulados', verbose_name='Suma de Anticipación (días)')),
+                ('turnos_con_anticipacion', models.PositiveIntegerField(default=0, verbose_name='Turnos con Anticipación')),
+                ('fecha_actualizacion', models.DateTimeField(auto_now=True, verbose_name='Última Actualización')),
+                ('paciente', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='estadisticas', to='PacientesApp.paciente', verbose_name='Paciente')),
+            ],
+            options={
+                'verbose_name': 'Estadística de Paciente',
+                'verbose_name_plural': 'Estadísticas de Pacientes',
+            },
+        ),
+    ]
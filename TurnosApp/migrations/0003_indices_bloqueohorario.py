@@ -0,0 +1,23 @@
+# Generated by Django 5.2.8 on 2026-10-19 11:20
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('TurnosApp', '0002_estadisticapaciente'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='bloqueohorario',
+            index=models.Index(fields=['activo', 'fecha_inicio', 'fecha_fin'], name='TurnosApp_b_activo_b6308a_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bloqueohorario',
+            index=models.Index(fields=['odontologo', 'activo', 'fecha_inicio'], name='TurnosApp_b_odontol_9eba84_idx'),
+        ),
+    ]
@@ -0,0 +1,103 @@
+# Generated by Django 5.2.8 on 2026-10-19 11:50
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def cargar_motivos_cancelacion(apps, schema_editor):
+    """Hasta ahora el motivo quedaba solo en observaciones ("Cancelado: <motivo>")"""
+    Turno = apps.get_model('TurnosApp', 'Turno')
+    turnos = Turno.objects.filter(estado='cancelado', observaciones__contains='Cancelado: ')
+    actualizados = []
+    for turno in turnos.only('id', 'observaciones').iterator():
+        lineas = [linea for linea in turno.observaciones.splitlines() if linea.startswith('Cancelado: ')]
+        if lineas:
+            motivo = ' '.join(lineas[-1][len('Cancelado: '):].split())
+            turno.motivo_cancelacion = motivo[:1].upper() + motivo[1:100]
+            actualizados.append(turno)
+    Turno.objects.bulk_update(actualizados, ['motivo_cancelacion'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('PacientesApp', '0004_obrasocial_sigla'),
+        ('TurnosApp', '0003_indices_bloqueohorario'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EjecucionReportes',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('inicio', models.DateTimeField(verbose_name='Inicio')),
+                ('fin', models.DateTimeField(blank=True, null=True, verbose_name='Fin')),
+                ('completa', models.BooleanField(default=False, verbose_name='Reconstrucción Completa')),
+                ('dias_recalculados', models.PositiveIntegerField(default=0, verbose_name='Días Recalculados')),
+            ],
+            options={
+                'verbose_name': 'Ejecución de Reportes',
+                'verbose_name_plural': 'Ejecuciones de Reportes',
+                'get_latest_by': 'inicio',
+            },
+        ),
+        migrations.AddField(
+            model_name='turno',
+            name='motivo_cancelacion',
+            field=models.CharField(blank=True, default='', max_length=100, verbose_name='Motivo de Cancelación'),
+        ),
+        migrations.RunPython(cargar_motivos_cancelacion, migrations.RunPython.noop),
+        migrations.CreateModel(
+            name='HechoCancelacionesDia',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField(verbose_name='Fecha')),
+                ('motivo', models.CharField(blank=True, help_text='Vacío si se canceló sin indicar motivo', max_length=100, verbose_name='Motivo')),
+                ('cantidad', models.PositiveIntegerField(default=0, verbose_name='Cancelaciones')),
+                ('odontologo', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Odontólogo')),
+            ],
+            options={
+                'verbose_name': 'Hecho: Cancelaciones por Día',
+                'verbose_name_plural': 'Hechos: Cancelaciones por Día',
+                'constraints': [models.UniqueConstraint(fields=('fecha', 'odontologo', 'motivo'), name='hecho_cancelaciones_dia_unico')],
+            },
+        ),
+        migrations.CreateModel(
+            name='HechoObraSocialDia',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField(verbose_name='Fecha')),
+                ('turnos', models.PositiveIntegerField(default=0, verbose_name='Turnos')),
+                ('atendidos', models.PositiveIntegerField(default=0, verbose_name='Turnos Atendidos')),
+                ('pacientes', models.PositiveIntegerField(default=0, help_text='Pacientes distintos con turno ese día', verbose_name='Pacientes')),
+                ('obra_social', models.ForeignKey(blank=True, help_text='Vacío: pacientes particulares', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='PacientesApp.obrasocial', verbose_name='Obra Social')),
+                ('odontologo', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Odontólogo')),
+            ],
+            options={
+                'verbose_name': 'Hecho: Obra Social por Día',
+                'verbose_name_plural': 'Hechos: Obra Social por Día',
+                'indexes': [models.Index(fields=['fecha', 'odontologo'], name='TurnosApp_h_fecha_8b33bb_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='HechoTurnosDia',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField(verbose_name='Fecha')),
+                ('estado', models.CharField(choices=[('pendiente', 'Pendiente'), ('confirmado', 'Confirmado'), ('en_atencion', 'En Atención'), ('atendido', 'Atendido'), ('cancelado', 'Cancelado'), ('ausente', 'Paciente Ausente')], max_length=20, verbose_name='Estado')),
+                ('cantidad', models.PositiveIntegerField(default=0, verbose_name='Turnos')),
+                ('minutos', models.PositiveIntegerField(default=0, help_text='Suma de las duraciones de los turnos', verbose_name='Minutos Agendados')),
+                ('suma_anticipacion_dias', models.PositiveIntegerField(default=0, verbose_name='Suma de Días de Anticipación')),
+                ('turnos_con_anticipacion', models.PositiveIntegerField(default=0, verbose_name='Turnos con Anticipación')),
+                ('odontologo', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Odontólogo')),
+            ],
+            options={
+                'verbose_name': 'Hecho: Turnos por Día',
+                'verbose_name_plural': 'Hechos: Turnos por Día',
+                'indexes': [models.Index(fields=['odontologo', 'fecha'], name='TurnosApp_h_odontol_f62c33_idx')],
+                'constraints': [models.UniqueConstraint(fields=('fecha', 'odontologo', 'estado'), name='hecho_turnos_dia_unico')],
+            },
+        ),
+    ]
@@ -0,0 +1,82 @@
+# Generated by Django 5.2.8 on 2026-10-19 11:57
+
+import django.core.validators
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('PacientesApp', '0005_prestacion'),
+        ('TurnosApp', '0004_reportes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LoteFacturacion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('periodo', models.DateField(help_text='Primer día del mes facturado', verbose_name='Período')),
+                ('estado', models.CharField(choices=[('abierto', 'Abierto'), ('cerrado', 'Cerrado')], default='abierto', max_length=10, verbose_name='Estado')),
+                ('firma', models.CharField(blank=True, help_text='Resumen de los datos de origen; si no cambia, el lote no se regenera', max_length=100, verbose_name='Firma')),
+                ('turnos', models.PositiveIntegerField(default=0, verbose_name='Turnos')),
+                ('prestaciones', models.PositiveIntegerField(default=0, verbose_name='Prestaciones')),
+                ('fecha_generacion', models.DateTimeField(blank=True, null=True, verbose_name='Última Generación')),
+                ('fecha_cierre', models.DateTimeField(blank=True, null=True, verbose_name='Fecha de Cierre')),
+                ('obra_social', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='lotes_facturacion', to='PacientesApp.obrasocial', verbose_name='Obra Social')),
+                ('usuario_cierre', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Cerrado por')),
+            ],
+            options={
+                'verbose_name': 'Lote de Facturación',
+                'verbose_name_plural': 'Lotes de Facturación',
+                'ordering': ['-periodo', 'obra_social__nombre'],
+            },
+        ),
+        migrations.CreateModel(
+            name='PrestacionTurno',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cantidad', models.PositiveSmallIntegerField(default=1, validators=[django.core.validators.MinValueValidator(1), django.core.validators.MaxValueValidator(32)], verbose_name='Cantidad')),
+                ('pieza', models.CharField(blank=True, help_text='Pieza dental (FDI) o zona, si corresponde', max_length=10, verbose_name='Pieza/s')),
+                ('fecha_modificacion', models.DateTimeField(auto_now=True, verbose_name='Última Modificación')),
+                ('prestacion', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='+', to='PacientesApp.prestacion', verbose_name='Prestación')),
+                ('turno', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='prestaciones', to='TurnosApp.turno', verbose_name='Turno')),
+                ('usuario_registro', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Usuario que Registró')),
+            ],
+            options={
+                'verbose_name': 'Prestación del Turno',
+                'verbose_name_plural': 'Prestaciones de Turnos',
+                'ordering': ['turno', 'id'],
+            },
+        ),
+        migrations.CreateModel(
+            name='LineaFacturacion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField(verbose_name='Fecha')),
+                ('dni', models.CharField(max_length=20, verbose_name='DNI')),
+                ('apellido', models.CharField(max_length=100, verbose_name='Apellido')),
+                ('nombre', models.CharField(max_length=100, verbose_name='Nombre')),
+                ('numero_afiliado', models.CharField(blank=True, max_length=50, verbose_name='Número de Afiliado')),
+                ('codigo', models.CharField(max_length=10, verbose_name='Código')),
+                ('descripcion', models.CharField(max_length=200, verbose_name='Descripción')),
+                ('cantidad', models.PositiveSmallIntegerField(verbose_name='Cantidad')),
+                ('pieza', models.CharField(blank=True, max_length=10, verbose_name='Pieza/s')),
+                ('matricula', models.CharField(blank=True, max_length=50, verbose_name='Matrícula')),
+                ('lote', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lineas', to='TurnosApp.lotefacturacion', verbose_name='Lote')),
+                ('prestacion_turno', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='TurnosApp.prestacionturno', verbose_name='Prestación del Turno')),
+            ],
+            options={
+                'verbose_name': 'Línea de Facturación',
+                'verbose_name_plural': 'Líneas de Facturación',
+                'ordering': ['lote', 'fecha', 'apellido', 'nombre', 'id'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='lotefacturacion',
+            constraint=models.UniqueConstraint(fields=('obra_social', 'periodo'), name='lote_obra_social_periodo_unico'),
+        ),
+    ]
@@ -2,10 +2,16 @@ from django.db import models
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.core.exceptions import ValidationError
 from UsuarioApp.models import Usuario
-from PacientesApp.models import Paciente
+from PacientesApp.models import Paciente, ObraSocial, Prestacion
 from datetime import time, datetime, timedelta
 
 
+def normalizar_motivo(motivo):
+    """Motivo de cancelación tal como se agrupa en los reportes (sin espacios de más, 100 caracteres)"""
+    motivo = ' '.join((motivo or '').split())
+    return motivo[:1].upper() + motivo[1:100]
+
+
 class ConfiguracionAgenda(models.Model):
     """Configuración de horarios de atención por odontólogo"""
     
@@ -174,6 +180,10 @@ class BloqueoHorario(models.Model):
         verbose_name = 'Bloqueo de Horario'
         verbose_name_plural = 'Bloqueos de Horarios'
         ordering = ['-fecha_inicio']
+        indexes = [
+            models.Index(fields=['activo', 'fecha_inicio', 'fecha_fin']),
+            models.Index(fields=['odontologo', 'activo', 'fecha_inicio']),
+        ]
     
     def __str__(self):
         odontologo = self.odontologo.get_full_name() if self.odontologo else "Todos"
@@ -201,6 +211,12 @@ class Turno(models.Model):
         ('ausente', 'Paciente Ausente'),
     ]
     
+    # Estados que ocupan lugar en la agenda
+    ESTADOS_ACTIVOS = ['pendiente', 'confirmado', 'en_atencion']
+    
+    # Columnas que afectan EstadisticaPaciente (ver TurnosApp.estadisticas)
+    CAMPOS_ESTADISTICAS = ('paciente_id', 'estado', 'fecha', 'fecha_creacion')
+    
     paciente = models.ForeignKey(
         Paciente,
         on_delete=models.CASCADE,
@@ -250,6 +266,13 @@ class Turno(models.Model):
         help_text='Notas adicionales sobre el turno'
     )
     
+    motivo_cancelacion = models.CharField(
+        max_length=100,
+        blank=True,
+        default='',
+        verbose_name='Motivo de Cancelación'
+    )
+    
     recordatorio_enviado = models.BooleanField(
         default=False,
         verbose_name='Recordatorio Enviado',
@@ -297,36 +320,29 @@ class Turno(models.Model):
             models.Index(fields=['paciente', 'fecha']),
         ]
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """
+        Recuerda los valores cargados que afectan las estadísticas, para
+        descontarlos al guardar. Solo copia columnas: nada se calcula hasta
+        que el turno efectivamente se guarda o elimina.
+        """
+        instance = super().from_db(db, field_names, values)
+        instance._valores_originales = {
+            campo: instance.__dict__[campo] for campo in cls.CAMPOS_ESTADISTICAS if campo in instance.__dict__
+        }
+        return instance
+    
     def __str__(self):
         return f"{self.paciente.get_nombre_completo()} - {self.fecha.strftime('%d/%m/%Y')} {self.hora.strftime('%H:%M')} - Dr/a. {self.odontologo.get_full_name()}"
     
     def clean(self):
-        """Validaciones del turno"""
-        # No permitir turnos en el pasado
-        if self.fecha and self.hora:
-            turno_datetime = datetime.combine(self.fecha, self.hora)
-            if turno_datetime < datetime.now():
-                raise ValidationError('No se pueden crear turnos en fechas/horas pasadas.')
+        """Validaciones del turno: fecha, agenda, bloqueos y capacidad (ver validaciones.py)"""
+        from .validaciones import ValidadorTurnos
         
-        # Verificar que no haya solapamiento de turnos
-        if self.odontologo and self.fecha and self.hora:
-            hora_fin = (datetime.combine(datetime.today(), self.hora) + timedelta(minutes=self.duracion)).time()
-            
-            turnos_solapados = Turno.objects.filter(
-                odontologo=self.odontologo,
-                fecha=self.fecha,
-                estado__in=['pendiente', 'confirmado', 'en_atencion']
-            ).exclude(pk=self.pk if self.pk else None)
-            
-            for turno in turnos_solapados:
-                turno_fin = (datetime.combine(datetime.today(), turno.hora) + timedelta(minutes=turno.duracion)).time()
-                
-                # Verificar solapamiento
-                if not (hora_fin <= turno.hora or self.hora >= turno_fin):
-                    raise ValidationError(
-                        f'Ya existe un turno para {self.odontologo.get_full_name()} '
-                        f'el {self.fecha.strftime("%d/%m/%Y")} de {turno.hora.strftime("%H:%M")} a {turno_fin.strftime("%H:%M")}.'
-                    )
+        errores = ValidadorTurnos([self]).validar(self)
+        if errores:
+            raise ValidationError(errores)
     
     def get_hora_fin(self):
         """Retorna la hora de finalización del turno"""
@@ -369,6 +385,7 @@ class Turno(models.Model):
         if self.puede_cancelar():
             self.estado = 'cancelado'
             if motivo:
+                self.motivo_cancelacion = normalizar_motivo(motivo)
                 self.observaciones = f"{self.observaciones or ''}\nCancelado: {motivo}".strip()
             self.save()
     
@@ -378,3 +395,377 @@ class Turno(models.Model):
             self.estado = 'ausente'
             self.save()
 
+
+
+class EstadisticaPaciente(models.Model):
+    """Estadísticas de asistencia materializadas por paciente"""
+    
+    paciente = models.OneToOneField(
+        Paciente,
+        on_delete=models.CASCADE,
+        related_name='estadisticas',
+        verbose_name='Paciente'
+    )
+    
+    total_turnos = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Total de Turnos'
+    )
+    
+    atendidos = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Turnos Atendidos'
+    )
+    
+    ausentes = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Ausencias'
+    )
+    
+    cancelados = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Cancelaciones'
+    )
+    
+    ultima_visita = models.DateField(
+        null=True,
+        blank=True,
+        verbose_name='Última Visita'
+    )
+    
+    suma_anticipacion_dias = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Suma de Anticipación (días)',
+        help_text='Días entre la reserva y el turno, acumulados'
+    )
+    
+    turnos_con_anticipacion = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Turnos con Anticipación'
+    )
+    
+    fecha_actualizacion = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Última Actualización'
+    )
+    
+    class Meta:
+        verbose_name = 'Estadística de Paciente'
+        verbose_name_plural = 'Estadísticas de Pacientes'
+    
+    def __str__(self):
+        return f"{self.paciente.get_nombre_completo()} - {self.ausentes}/{self.total_turnos} ausencias"
+    
+    def get_tasa_ausentismo(self):
+        """Proporción de turnos a los que el paciente no asistió"""
+        if not self.total_turnos:
+            return 0.0
+        return self.ausentes / self.total_turnos
+    
+    def get_anticipacion_promedio(self):
+        """Días promedio entre la reserva y el turno"""
+        if not self.turnos_con_anticipacion:
+            return None
+        return self.suma_anticipacion_dias / self.turnos_con_anticipacion
+
+
+# ========== REPORTES (tablas de hechos, ver reportes.py) ==========
+
+class HechoTurnosDia(models.Model):
+    """Turnos de un día agrupados por odontólogo y estado"""
+    
+    fecha = models.DateField(verbose_name='Fecha')
+    
+    odontologo = models.ForeignKey(
+        Usuario,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Odontólogo'
+    )
+    
+    estado = models.CharField(
+        max_length=20,
+        choices=Turno.ESTADO_CHOICES,
+        verbose_name='Estado'
+    )
+    
+    cantidad = models.PositiveIntegerField(default=0, verbose_name='Turnos')
+    
+    minutos = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Minutos Agendados',
+        help_text='Suma de las duraciones de los turnos'
+    )
+    
+    suma_anticipacion_dias = models.PositiveIntegerField(default=0, verbose_name='Suma de Días de Anticipación')
+    
+    turnos_con_anticipacion = models.PositiveIntegerField(default=0, verbose_name='Turnos con Anticipación')
+    
+    class Meta:
+        verbose_name = 'Hecho: Turnos por Día'
+        verbose_name_plural = 'Hechos: Turnos por Día'
+        constraints = [
+            models.UniqueConstraint(fields=['fecha', 'odontologo', 'estado'], name='hecho_turnos_dia_unico'),
+        ]
+        indexes = [
+            models.Index(fields=['odontologo', 'fecha']),
+        ]
+    
+    def __str__(self):
+        return f"{self.fecha} - {self.odontologo_id} - {self.estado}: {self.cantidad}"
+
+
+class HechoCancelacionesDia(models.Model):
+    """Cancelaciones de un día agrupadas por odontólogo y motivo"""
+    
+    fecha = models.DateField(verbose_name='Fecha')
+    
+    odontologo = models.ForeignKey(
+        Usuario,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Odontólogo'
+    )
+    
+    motivo = models.CharField(
+        max_length=100,
+        blank=True,
+        verbose_name='Motivo',
+        help_text='Vacío si se canceló sin indicar motivo'
+    )
+    
+    cantidad = models.PositiveIntegerField(default=0, verbose_name='Cancelaciones')
+    
+    class Meta:
+        verbose_name = 'Hecho: Cancelaciones por Día'
+        verbose_name_plural = 'Hechos: Cancelaciones por Día'
+        constraints = [
+            models.UniqueConstraint(fields=['fecha', 'odontologo', 'motivo'], name='hecho_cancelaciones_dia_unico'),
+        ]
+    
+    def __str__(self):
+        return f"{self.fecha} - {self.motivo or 'Sin motivo'}: {self.cantidad}"
+
+
+class HechoObraSocialDia(models.Model):
+    """Turnos y pacientes de un día agrupados por odontólogo y obra social del paciente"""
+    
+    fecha = models.DateField(verbose_name='Fecha')
+    
+    odontologo = models.ForeignKey(
+        Usuario,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Odontólogo'
+    )
+    
+    obra_social = models.ForeignKey(
+        'PacientesApp.ObraSocial',
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='+',
+        verbose_name='Obra Social',
+        help_text='Vacío: pacientes particulares'
+    )
+    
+    turnos = models.PositiveIntegerField(default=0, verbose_name='Turnos')
+    
+    atendidos = models.PositiveIntegerField(default=0, verbose_name='Turnos Atendidos')
+    
+    pacientes = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Pacientes',
+        help_text='Pacientes distintos con turno ese día'
+    )
+    
+    class Meta:
+        verbose_name = 'Hecho: Obra Social por Día'
+        verbose_name_plural = 'Hechos: Obra Social por Día'
+        indexes = [
+            models.Index(fields=['fecha', 'odontologo']),
+        ]
+    
+    def __str__(self):
+        return f"{self.fecha} - {self.obra_social_id or 'Particular'}: {self.turnos}"
+
+
+class EjecucionReportes(models.Model):
+    """Corrida de actualizar_reportes: la siguiente solo recalcula lo modificado desde `inicio`"""
+    
+    inicio = models.DateTimeField(verbose_name='Inicio')
+    
+    fin = models.DateTimeField(null=True, blank=True, verbose_name='Fin')
+    
+    completa = models.BooleanField(default=False, verbose_name='Reconstrucción Completa')
+    
+    dias_recalculados = models.PositiveIntegerField(default=0, verbose_name='Días Recalculados')
+    
+    class Meta:
+        verbose_name = 'Ejecución de Reportes'
+        verbose_name_plural = 'Ejecuciones de Reportes'
+        get_latest_by = 'inicio'
+    
+    def __str__(self):
+        return f"{self.inicio:%d/%m/%Y %H:%M} - {self.dias_recalculados} días"
+
+
+# ========== FACTURACIÓN A OBRAS SOCIALES (ver facturacion.py) ==========
+
+class PrestacionTurno(models.Model):
+    """Prestación del nomenclador realizada en un turno"""
+    
+    turno = models.ForeignKey(
+        Turno,
+        on_delete=models.CASCADE,
+        related_name='prestaciones',
+        verbose_name='Turno'
+    )
+    
+    prestacion = models.ForeignKey(
+        Prestacion,
+        on_delete=models.PROTECT,
+        related_name='+',
+        verbose_name='Prestación'
+    )
+    
+    cantidad = models.PositiveSmallIntegerField(
+        default=1,
+        validators=[MinValueValidator(1), MaxValueValidator(32)],
+        verbose_name='Cantidad'
+    )
+    
+    pieza = models.CharField(
+        max_length=10,
+        blank=True,
+        verbose_name='Pieza/s',
+        help_text='Pieza dental (FDI) o zona, si corresponde'
+    )
+    
+    usuario_registro = models.ForeignKey(
+        Usuario,
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name='+',
+        verbose_name='Usuario que Registró'
+    )
+    
+    fecha_modificacion = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Última Modificación'
+    )
+    
+    class Meta:
+        verbose_name = 'Prestación del Turno'
+        verbose_name_plural = 'Prestaciones de Turnos'
+        ordering = ['turno', 'id']
+    
+    def __str__(self):
+        return f"{self.prestacion.codigo} x{self.cantidad} - turno {self.turno_id}"
+
+
+class LoteFacturacion(models.Model):
+    """
+    Lote mensual de una obra social: copia de las prestaciones facturadas.
+    Mientras está abierto se regenera si cambió algo; cerrado queda fijo.
+    """
+    
+    ESTADO_CHOICES = [
+        ('abierto', 'Abierto'),
+        ('cerrado', 'Cerrado'),
+    ]
+    
+    obra_social = models.ForeignKey(
+        ObraSocial,
+        on_delete=models.PROTECT,
+        related_name='lotes_facturacion',
+        verbose_name='Obra Social'
+    )
+    
+    periodo = models.DateField(
+        verbose_name='Período',
+        help_text='Primer día del mes facturado'
+    )
+    
+    estado = models.CharField(
+        max_length=10,
+        choices=ESTADO_CHOICES,
+        default='abierto',
+        verbose_name='Estado'
+    )
+    
+    firma = models.CharField(
+        max_length=100,
+        blank=True,
+        verbose_name='Firma',
+        help_text='Resumen de los datos de origen; si no cambia, el lote no se regenera'
+    )
+    
+    turnos = models.PositiveIntegerField(default=0, verbose_name='Turnos')
+    
+    prestaciones = models.PositiveIntegerField(default=0, verbose_name='Prestaciones')
+    
+    fecha_generacion = models.DateTimeField(null=True, blank=True, verbose_name='Última Generación')
+    
+    fecha_cierre = models.DateTimeField(null=True, blank=True, verbose_name='Fecha de Cierre')
+    
+    usuario_cierre = models.ForeignKey(
+        Usuario,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+',
+        verbose_name='Cerrado por'
+    )
+    
+    class Meta:
+        verbose_name = 'Lote de Facturación'
+        verbose_name_plural = 'Lotes de Facturación'
+        ordering = ['-periodo', 'obra_social__nombre']
+        constraints = [
+            models.UniqueConstraint(fields=['obra_social', 'periodo'], name='lote_obra_social_periodo_unico'),
+        ]
+    
+    def __str__(self):
+        return f"{self.obra_social} - {self.periodo:%m/%Y}"
+    
+    def esta_cerrado(self):
+        return self.estado == 'cerrado'
+
+
+class LineaFacturacion(models.Model):
+    """Renglón de un lote: datos copiados al generar, así el archivo no depende de cambios posteriores"""
+    
+    lote = models.ForeignKey(
+        LoteFacturacion,
+        on_delete=models.CASCADE,
+        related_name='lineas',
+        verbose_name='Lote'
+    )
+    
+    prestacion_turno = models.ForeignKey(
+        PrestacionTurno,
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name='+',
+        verbose_name='Prestación del Turno'
+    )
+    
+    fecha = models.DateField(verbose_name='Fecha')
+    dni = models.CharField(max_length=20, verbose_name='DNI')
+    apellido = models.CharField(max_length=100, verbose_name='Apellido')
+    nombre = models.CharField(max_length=100, verbose_name='Nombre')
+    numero_afiliado = models.CharField(max_length=50, blank=True, verbose_name='Número de Afiliado')
+    codigo = models.CharField(max_length=10, verbose_name='Código')
+    descripcion = models.CharField(max_length=200, verbose_name='Descripción')
+    cantidad = models.PositiveSmallIntegerField(verbose_name='Cantidad')
+    pieza = models.CharField(max_length=10, blank=True, verbose_name='Pieza/s')
+    matricula = models.CharField(max_length=50, blank=True, verbose_name='Matrícula')
+    
+    class Meta:
+        verbose_name = 'Línea de Facturación'
+        verbose_name_plural = 'Líneas de Facturación'
+        ordering = ['lote', 'fecha', 'apellido', 'nombre', 'id']
+    
+    def __str__(self):
+        return f"{self.fecha} {self.dni} {self.codigo} x{self.cantidad}"
@@ -0,0 +1,287 @@
+"""
+Tablas de hechos para los reportes de auditoría.
+
+Los reportes no consultan Turno: leen HechoTurnosDia, HechoCancelacionesDia y
+HechoObraSocialDia, que tienen una fila por día, odontólogo y grupo (estado,
+motivo de cancelación, obra social del paciente). Años de turnos quedan en unos
+pocos miles de filas.
+
+actualizar_reportes() (comando actualizar_reportes, pensado para correr de noche)
+solo recalcula los días tocados desde la corrida anterior:
+
+    - días de turnos creados o modificados desde entonces (fecha_modificacion),
+      también los de pacientes modificados (pudo cambiar su obra social);
+    - días cuya cantidad de turnos no coincide con la de los hechos: así se detectan
+      turnos eliminados y turnos que se movieron a otra fecha (el día de origen).
+"""
+from django.db import transaction
+from django.db.models import Count, DurationField, ExpressionWrapper, F, Q, Sum
+from django.db.models.functions import TruncDate, TruncMonth
+from django.utils import timezone
+from .models import Turno, HechoTurnosDia, HechoCancelacionesDia, HechoObraSocialDia, EjecucionReportes
+
+
+# Días recalculados por transacción
+DIAS_POR_LOTE = 200
+
+# Motivos de cancelación que muestra el reporte (los más frecuentes)
+LIMITE_MOTIVOS = 15
+
+
+def _filtro_dias(fechas):
+    return {} if fechas is None else {'fecha__in': fechas}
+
+
+def _hechos_turnos(fechas=None):
+    fecha_reserva = TruncDate('fecha_creacion')
+    con_anticipacion = Q(fecha__gte=fecha_reserva)
+
+    filas = Turno.objects.filter(**_filtro_dias(fechas)).values('fecha', 'odontologo_id', 'estado').annotate(
+        n=Count('id'),
+        suma_minutos=Sum('duracion'),
+        suma_anticipacion=Sum(
+            ExpressionWrapper(F('fecha') - fecha_reserva, output_field=DurationField()),
+            filter=con_anticipacion
+        ),
+        n_anticipacion=Count('id', filter=con_anticipacion),
+    ).order_by()
+
+    return [
+        HechoTurnosDia(
+            fecha=fila['fecha'],
+            odontologo_id=fila['odontologo_id'],
+            estado=fila['estado'],
+            cantidad=fila['n'],
+            minutos=fila['suma_minutos'] or 0,
+            suma_anticipacion_dias=fila['suma_anticipacion'].days if fila['suma_anticipacion'] else 0,
+            turnos_con_anticipacion=fila['n_anticipacion'],
+        )
+        for fila in filas.iterator()
+    ]
+
+
+def _hechos_cancelaciones(fechas=None):
+    filas = Turno.objects.filter(estado='cancelado', **_filtro_dias(fechas)).values(
+        'fecha', 'odontologo_id', 'motivo_cancelacion'
+    ).annotate(n=Count('id')).order_by()
+
+    return [
+        HechoCancelacionesDia(
+            fecha=fila['fecha'],
+            odontologo_id=fila['odontologo_id'],
+            motivo=fila['motivo_cancelacion'],
+            cantidad=fila['n'],
+        )
+        for fila in filas.iterator()
+    ]
+
+
+def _hechos_obras_sociales(fechas=None):
+    # La obra social es la que el paciente tiene al calcular (no se guarda por turno)
+    filas = Turno.objects.filter(**_filtro_dias(fechas)).values(
+        'fecha', 'odontologo_id', 'paciente__obra_social_id'
+    ).annotate(
+        n=Count('id'),
+        n_atendidos=Count('id', filter=Q(estado='atendido')),
+        n_pacientes=Count('paciente_id', distinct=True),
+    ).order_by()
+
+    return [
+        HechoObraSocialDia(
+            fecha=fila['fecha'],
+            odontologo_id=fila['odontologo_id'],
+            obra_social_id=fila['paciente__obra_social_id'],
+            turnos=fila['n'],
+            atendidos=fila['n_atendidos'],
+            pacientes=fila['n_pacientes'],
+        )
+        for fila in filas.iterator()
+    ]
+
+
+def recalcular_dias(fechas=None, batch_size=1000):
+    """
+    Reemplaza los hechos de esos días por los calculados desde Turno.
+    Con fechas=None reconstruye todo. Retorna la cantidad de días recalculados.
+    """
+    modelos = (HechoTurnosDia, HechoCancelacionesDia, HechoObraSocialDia)
+    calculos = (_hechos_turnos, _hechos_cancelaciones, _hechos_obras_sociales)
+
+    if fechas is None:
+        with transaction.atomic():
+            for modelo, calcular in zip(modelos, calculos):
+                modelo.objects.all().delete()
+                modelo.objects.bulk_create(calcular(), batch_size=batch_size)
+        return HechoTurnosDia.objects.values('fecha').distinct().count()
+
+    fechas = sorted(set(fechas))
+    for inicio in range(0, len(fechas), DIAS_POR_LOTE):
+        lote = fechas[inicio:inicio + DIAS_POR_LOTE]
+        with transaction.atomic():
+            for modelo, calcular in zip(modelos, calculos):
+                modelo.objects.filter(fecha__in=lote).delete()
+                modelo.objects.bulk_create(calcular(lote), batch_size=batch_size)
+    return len(fechas)
+
+
+def dias_modificados(desde):
+    """Días con turnos (o pacientes con turnos) modificados desde `desde`"""
+    return set(
+        Turno.objects.filter(
+            Q(fecha_modificacion__gte=desde) | Q(paciente__fecha_modificacion__gte=desde)
+        ).values_list('fecha', flat=True).distinct().order_by()
+    )
+
+
+def dias_desfasados():
+    """Días cuya cantidad de turnos no coincide con los hechos (turnos eliminados o movidos)"""
+    actuales = dict(
+        Turno.objects.values_list('fecha').annotate(n=Count('id')).order_by()
+    )
+    materializados = dict(
+        HechoTurnosDia.objects.values_list('fecha').annotate(n=Sum('cantidad')).order_by()
+    )
+    return {
+        fecha
+        for fecha in actuales.keys() | materializados.keys()
+        if actuales.get(fecha, 0) != materializados.get(fecha, 0)
+    }
+
+
+def ultima_ejecucion():
+    """Última corrida terminada, o None"""
+    return EjecucionReportes.objects.filter(fin__isnull=False).order_by('-inicio').first()
+
+
+def actualizar_reportes(completo=False, batch_size=1000):
+    """
+    Pone al día las tablas de hechos. Sin corrida previa (o con completo=True)
+    reconstruye todo; si no, solo los días tocados desde la última corrida.
+    Retorna la EjecucionReportes registrada.
+    """
+    anterior = None if completo else ultima_ejecucion()
+    # Lo que se modifique mientras corre queda para la próxima (>= inicio)
+    ejecucion = EjecucionReportes.objects.create(inicio=timezone.now(), completa=anterior is None)
+
+    if anterior is None:
+        dias = recalcular_dias(batch_size=batch_size)
+    else:
+        dias = recalcular_dias(dias_modificados(anterior.inicio) | dias_desfasados(), batch_size=batch_size)
+
+    ejecucion.fin = timezone.now()
+    ejecucion.dias_recalculados = dias
+    ejecucion.save(update_fields=['fin', 'dias_recalculados'])
+    return ejecucion
+
+
+# ========== LECTURA (vistas de auditoría) ==========
+
+def _filtrar(modelo, desde, hasta, odontologo=None):
+    hechos = modelo.objects.filter(fecha__range=(desde, hasta))
+    if odontologo is not None:
+        hechos = hechos.filter(odontologo=odontologo)
+    return hechos
+
+
+def _promedio(suma, cantidad):
+    return round(suma / cantidad, 1) if cantidad else None
+
+
+def _porcentaje(parte, total):
+    return round(parte * 100 / total, 1) if total else None
+
+
+def datos_reporte(desde, hasta, odontologo=None):
+    """
+    Datos del tablero de auditoría del período, leídos solo de las tablas de hechos.
+    Los pacientes por obra social son pacientes-día: la suma de los pacientes
+    distintos de cada día, así que quien vino tres días cuenta tres veces. Contar
+    pacientes distintos del período obligaría a volver a leer Turno.
+    """
+    turnos = _filtrar(HechoTurnosDia, desde, hasta, odontologo)
+    nombres_estado = dict(Turno.ESTADO_CHOICES)
+
+    # Totales por estado
+    por_estado = {
+        fila['estado']: fila
+        for fila in turnos.values('estado').annotate(
+            n=Sum('cantidad'), suma_minutos=Sum('minutos')
+        ).order_by()
+    }
+    total = sum(fila['n'] for fila in por_estado.values())
+    estados = [
+        {
+            'estado': estado,
+            'nombre': nombre,
+            'cantidad': por_estado[estado]['n'] if estado in por_estado else 0,
+            'porcentaje': _porcentaje(por_estado[estado]['n'], total) if estado in por_estado else None,
+        }
+        for estado, nombre in Turno.ESTADO_CHOICES
+    ]
+
+    # Por odontólogo (una fila por odontólogo y estado, se pivotea acá)
+    odontologos = {}
+    for fila in turnos.values(
+        'odontologo_id', 'odontologo__first_name', 'odontologo__last_name', 'estado'
+    ).annotate(
+        n=Sum('cantidad'),
+        suma_minutos=Sum('minutos'),
+        suma_anticipacion=Sum('suma_anticipacion_dias'),
+        n_anticipacion=Sum('turnos_con_anticipacion'),
+    ).order_by('odontologo__last_name', 'odontologo__first_name'):
+        datos = odontologos.setdefault(fila['odontologo_id'], {
+            'nombre': f"{fila['odontologo__first_name']} {fila['odontologo__last_name']}".strip(),
+            'total': 0, 'minutos_atendidos': 0, 'suma_anticipacion': 0, 'n_anticipacion': 0,
+            **{estado: 0 for estado in nombres_estado},
+        })
+        datos[fila['estado']] = fila['n']
+        datos['total'] += fila['n']
+        datos['suma_anticipacion'] += fila['suma_anticipacion']
+        datos['n_anticipacion'] += fila['n_anticipacion']
+        if fila['estado'] == 'atendido':
+            datos['minutos_atendidos'] = fila['suma_minutos']
+
+    for datos in odontologos.values():
+        datos['horas_atendidas'] = round(datos['minutos_atendidos'] / 60, 1)
+        datos['anticipacion_promedio'] = _promedio(datos['suma_anticipacion'], datos['n_anticipacion'])
+        datos['tasa_ausentismo'] = _porcentaje(datos['ausente'], datos['total'])
+
+    # Evolución mensual
+    meses = [
+        {
+            'mes': fila['mes'],
+            'total': fila['n'],
+            'atendidos': fila['n_atendidos'] or 0,
+            'cancelados': fila['n_cancelados'] or 0,
+            'ausentes': fila['n_ausentes'] or 0,
+        }
+        for fila in turnos.annotate(mes=TruncMonth('fecha')).values('mes').annotate(
+            n=Sum('cantidad'),
+            n_atendidos=Sum('cantidad', filter=Q(estado='atendido')),
+            n_cancelados=Sum('cantidad', filter=Q(estado='cancelado')),
+            n_ausentes=Sum('cantidad', filter=Q(estado='ausente')),
+        ).order_by('mes')
+    ]
+
+    cancelaciones = list(
+        _filtrar(HechoCancelacionesDia, desde, hasta, odontologo).values('motivo').annotate(
+            n=Sum('cantidad')
+        ).order_by('-n', 'motivo')[:LIMITE_MOTIVOS]
+    )
+
+    obras_sociales = list(
+        _filtrar(HechoObraSocialDia, desde, hasta, odontologo).values('obra_social__nombre').annotate(
+            n=Sum('turnos'), n_atendidos=Sum('atendidos'), n_pacientes=Sum('pacientes')
+        ).order_by('-n', 'obra_social__nombre')
+    )
+
+    atendidos = por_estado.get('atendido', {})
+    return {
+        'total': total,
+        'estados': estados,
+        'horas_atendidas': round((atendidos.get('suma_minutos') or 0) / 60, 1),
+        'odontologos': list(odontologos.values()),
+        'meses': meses,
+        'cancelaciones': cancelaciones,
+        'obras_sociales': obras_sociales,
+    }
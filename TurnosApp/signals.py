@@ -0,0 +1,59 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from config.caches import registrar_invalidacion
+from .models import Turno, BloqueoHorario
+from .bloqueos import invalidar_cache
+from .estadisticas import (
+    actualizar_estadisticas, capturar_estado, descontar_turno, reconstruir_estadisticas, valores_estado,
+)
+
+
+# Versión de Turno para las claves del cache 'agenda' (ver PacientesApp.resumen)
+registrar_invalidacion(Turno)
+
+
+def estado_original(turno):
+    """
+    Foto del turno tal como se cargó de la base (Turno.from_db) o se guardó
+    por última vez. None si no se sabe (turno nuevo o armado a mano).
+    """
+    valores = getattr(turno, '_valores_originales', None)
+    return capturar_estado(valores) if valores else None
+
+
+@receiver(post_save, sender=Turno)
+def turno_guardado(sender, instance, created, raw=False, **kwargs):
+    """Actualiza las estadísticas del paciente ante altas y cambios de estado"""
+    if raw:
+        return
+
+    if created:
+        actualizar_estadisticas(instance)
+    else:
+        anterior = estado_original(instance)
+        if anterior is None:
+            # No sabemos cómo estaba el turno antes: recalcular al paciente
+            reconstruir_estadisticas(paciente_ids=[instance.paciente_id])
+        else:
+            actualizar_estadisticas(instance, anterior)
+
+    instance._valores_originales = valores_estado(instance)
+
+
+@receiver(post_delete, sender=Turno)
+def turno_eliminado(sender, instance, **kwargs):
+    """Descuenta el turno eliminado de las estadísticas del paciente"""
+    anterior = estado_original(instance)
+
+    if anterior is None:
+        reconstruir_estadisticas(paciente_ids=[instance.paciente_id])
+    else:
+        descontar_turno(anterior)
+
+
+@receiver(post_save, sender=BloqueoHorario)
+@receiver(post_delete, sender=BloqueoHorario)
+def bloqueo_modificado(sender, **kwargs):
+    """Invalida el índice de bloqueos en memoria cuando se confirma el cambio"""
+    transaction.on_commit(invalidar_cache)
@@ -1,3 +1,761 @@
-from django.test import TestCase
+import csv
+import tempfile
+import zipfile
+from datetime import date, time, timedelta
+from io import BytesIO, StringIO
+from pathlib import Path
+from xml.etree import ElementTree
+from django.core.management import call_command, CommandError
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from config.caches import version_modelo
+from UsuarioApp.instrumentacion import PresupuestoConsultasTestMixin
+from UsuarioApp.models import Usuario
+from PacientesApp.models import Paciente, ObraSocial, Prestacion
+from .bloqueos import IndiceBloqueos, IndiceIntervalos, _solapa
+from .capacidad import carga_maxima, hay_capacidad, probabilidad_asistencia
+from .estadisticas import descontar_turno, reconstruir_estadisticas
+from .filas import renderizar_filas
+from .models import (
+    Turno, ConfiguracionAgenda, EstadisticaPaciente, PrestacionTurno, HechoTurnosDia, HechoCancelacionesDia,
+    HechoObraSocialDia, LoteFacturacion,
+)
+from .facturacion import COLUMNAS_LOTE, cerrar_lote, generar_lotes
+from .reportes import actualizar_reportes, datos_reporte, dias_desfasados, recalcular_dias
+from .signals import estado_original
+from .validaciones import ValidadorTurnos
 
-# Create your tests here.
+
+class VistasTurnosTests(PresupuestoConsultasTestMixin, TestCase):
+    """Presupuesto de consultas de las vistas de TurnosApp (middleware en modo estricto)"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = Usuario.objects.create_user('admin', password='x', rol='administrador')
+        odontologos = [
+            Usuario.objects.create_user(f'odontologo{i}', password='x', rol='odontologo', last_name=f'Odontólogo {i}')
+            for i in range(3)
+        ]
+        obra_social = ObraSocial.objects.create(nombre='Obra Social Provincial', codigo='000001')
+        pacientes = Paciente.objects.bulk_create([
+            Paciente(
+                nombre='Paciente', apellido=f'Número {i}', dni=f'{30000000 + i}', fecha_nacimiento=date(1980, 1, 1),
+                telefono='3870000000', sexo='M', obra_social=obra_social if i % 2 else None
+            )
+            for i in range(10)
+        ])
+        ConfiguracionAgenda.objects.bulk_create([
+            ConfiguracionAgenda(odontologo=odontologo, dia_semana=dia, hora_inicio=time(8), hora_fin=time(20))
+            for odontologo in odontologos
+            for dia in range(7)
+        ])
+        manana = date.today() + timedelta(days=1)
+        Turno.objects.bulk_create([
+            Turno(
+                paciente=pacientes[i % len(pacientes)], odontologo=odontologos[i % len(odontologos)],
+                fecha=manana + timedelta(days=i // 10), hora=time(8 + i % 10), motivo_consulta='Control',
+                usuario_registro=cls.admin
+            )
+            for i in range(30)
+        ])
+        cls.turno, cls.atendido = Turno.objects.order_by('pk')[:2]
+        Turno.objects.filter(pk=cls.atendido.pk).update(estado='atendido')
+        prestacion = Prestacion.objects.create(codigo='01.01', descripcion='Consulta')
+        cls.prestacion_turno = PrestacionTurno.objects.create(turno=cls.atendido, prestacion=prestacion)
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.admin)
+
+    def obtener(self, url, **datos):
+        response = self.client.get(url, datos)
+        self.assertEqual(response.status_code, 200)
+        self.assertDentroDelPresupuesto(response, umbral_duplicadas=3)
+        return response
+
+    def enviar(self, url, **datos):
+        response = self.client.post(url, datos)
+        self.assertEqual(response.status_code, 302)
+        self.assertDentroDelPresupuesto(response)
+        return response
+
+    def test_lista_turnos(self):
+        self.obtener(reverse('TurnosApp:lista_turnos'))
+        # Segunda vez con las filas ya cacheadas
+        self.obtener(reverse('TurnosApp:lista_turnos'))
+
+    def test_fila_cacheada_sigue_las_banderas_del_paciente(self):
+        turnos = Turno.objects.filter(pk=self.turno.pk).select_related('paciente', 'odontologo')
+        self.assertNotIn('table-warning', renderizar_filas(turnos.all(), self.admin)[0])
+        # Como una carga masiva de antecedentes: update() sin tocar fecha_modificacion
+        Paciente.objects.filter(pk=self.turno.paciente_id).update(requiere_precaucion=True, categorias_antecedentes=1)
+        self.assertIn('table-warning', renderizar_filas(turnos.all(), self.admin)[0])
+
+    def test_exportar_turnos_csv(self):
+        Paciente.objects.filter(pk=self.turno.paciente_id).update(apellido='=HYPERLINK("http://x")')
+        response = self.obtener(reverse('TurnosApp:exportar_turnos', args=['csv']))
+        filas = list(csv.reader(b''.join(response.streaming_content).decode('utf-8-sig').splitlines(), delimiter=';'))
+
+        self.assertEqual(filas[0][:4], ['Fecha', 'Hora', 'Duración (min)', 'Apellido del paciente'])
+        self.assertEqual(len(filas), 31)
+        # Primer turno (fecha y hora): el apellido sale como texto, no como fórmula
+        fecha = self.turno.fecha.isoformat()
+        self.assertEqual(filas[1][:6], [fecha, '08:00', '30', '\'=HYPERLINK("http://x")', 'Paciente', '30000000'])
+        self.assertEqual(filas[1][10], 'Pendiente')
+
+    def test_exportar_turnos_xlsx(self):
+        Paciente.objects.filter(pk=self.turno.paciente_id).update(apellido='=HYPERLINK("http://x")')
+        response = self.obtener(reverse('TurnosApp:exportar_turnos', args=['xlsx']))
+        with zipfile.ZipFile(BytesIO(b''.join(response.streaming_content))) as archivo:
+            self.assertIn('sheet name="turnos"', archivo.read('xl/workbook.xml').decode())
+            hoja = ElementTree.fromstring(archivo.read('xl/worksheets/sheet1.xml'))
+
+        ns = {'x': 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'}
+        filas = hoja.findall('x:sheetData/x:row', ns)
+        self.assertEqual(len(filas), 31)
+        encabezados = [celda.findtext('x:is/x:t', namespaces=ns) for celda in filas[0]]
+        self.assertEqual(encabezados[:3], ['Fecha', 'Hora', 'Duración (min)'])
+
+        fecha, hora, duracion, apellido = list(filas[1])[:4]
+        # Fecha y hora como números con formato; texto como cadena inline (nunca fórmula)
+        self.assertEqual(fecha.findtext('x:v', namespaces=ns), str((self.turno.fecha - date(1899, 12, 30)).days))
+        self.assertEqual(float(hora.findtext('x:v', namespaces=ns)), 8 / 24)
+        self.assertEqual((duracion.get('t'), duracion.findtext('x:v', namespaces=ns)), ('n', '30'))
+        self.assertEqual(apellido.get('t'), 'inlineStr')
+        self.assertEqual(apellido.findtext('x:is/x:t', namespaces=ns), '=HYPERLINK("http://x")')
+        self.assertIsNone(hoja.find('.//x:f', ns))
+
+    def test_crear_turno(self):
+        self.obtener(reverse('TurnosApp:crear_turno'))
+
+    def test_editar_turno(self):
+        self.obtener(reverse('TurnosApp:editar_turno', args=[self.turno.pk]))
+
+    def test_ver_turno(self):
+        self.obtener(reverse('TurnosApp:ver_turno', args=[self.turno.pk]))
+
+    def test_cambios_de_estado(self):
+        self.enviar(reverse('TurnosApp:confirmar_turno', args=[self.turno.pk]))
+        self.enviar(reverse('TurnosApp:iniciar_atencion', args=[self.turno.pk]))
+        self.enviar(reverse('TurnosApp:finalizar_atencion', args=[self.turno.pk]))
+        self.turno.refresh_from_db()
+        self.assertEqual(self.turno.estado, 'atendido')
+
+    def test_cancelar_turno(self):
+        self.obtener(reverse('TurnosApp:cancelar_turno', args=[self.turno.pk]))
+
+    def test_configuracion_agenda(self):
+        self.obtener(reverse('TurnosApp:configuracion_agenda'))
+
+    def test_crear_configuracion(self):
+        self.obtener(reverse('TurnosApp:crear_configuracion'))
+
+    def test_prestaciones_turno(self):
+        self.obtener(reverse('TurnosApp:prestaciones_turno', args=[self.atendido.pk]))
+
+    def test_eliminar_prestacion_turno(self):
+        self.enviar(reverse('TurnosApp:eliminar_prestacion_turno', args=[self.prestacion_turno.pk]))
+
+    def test_reportes(self):
+        self.obtener(reverse('TurnosApp:reportes'))
+
+    def test_facturacion(self):
+        self.enviar(reverse('TurnosApp:generar_lotes_facturacion'), periodo=date.today().strftime('%Y-%m'))
+        self.obtener(reverse('TurnosApp:facturacion'))
+
+
+class ValidadorTurnosTests(TestCase):
+    """Validar un turno cuesta las mismas consultas con 10 veces más turnos en la tabla"""
+
+    N = 300
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.odontologos = [
+            Usuario.objects.create_user(f'odontologo{i}', password='x', rol='odontologo') for i in range(3)
+        ]
+        cls.pacientes = Paciente.objects.bulk_create([
+            Paciente(
+                nombre='Paciente', apellido=f'Número {i}', dni=f'{30000000 + i}', fecha_nacimiento=date(1980, 1, 1),
+                telefono='3870000000', sexo='F'
+            )
+            for i in range(10)
+        ])
+        ConfiguracionAgenda.objects.bulk_create([
+            ConfiguracionAgenda(odontologo=odontologo, dia_semana=dia, hora_inicio=time(8), hora_fin=time(20))
+            for odontologo in cls.odontologos
+            for dia in range(7)
+        ])
+        cls.fecha = date.today() + timedelta(days=30)
+
+    def cargar_turnos(self, desde, hasta):
+        Turno.objects.bulk_create([
+            Turno(
+                paciente=self.pacientes[i % len(self.pacientes)],
+                odontologo=self.odontologos[i % len(self.odontologos)],
+                # Historial en otros días, más algunos turnos el mismo día
+                fecha=self.fecha - timedelta(days=(i // 24) % 1000) if i % 50 else self.fecha,
+                hora=time(8 + (i % 24) // 2, 30 * (i % 2)),
+                motivo_consulta='Control',
+                estado='atendido' if i % 50 else 'pendiente',
+            )
+            for i in range(desde, hasta)
+        ], batch_size=1000)
+
+    def consultas_al_validar(self):
+        turno = Turno(
+            paciente=self.pacientes[0], odontologo=self.odontologos[0], fecha=self.fecha, hora=time(19),
+            motivo_consulta='Control'
+        )
+        ValidadorTurnos([turno]).validar(turno)  # Índice de bloqueos en memoria
+        with CaptureQueriesContext(connection) as consultas:
+            self.assertEqual(ValidadorTurnos([turno]).validar(turno), [])
+        return len(consultas)
+
+    def test_consultas_constantes(self):
+        self.cargar_turnos(0, self.N)
+        con_n = self.consultas_al_validar()
+        self.cargar_turnos(self.N, 10 * self.N)
+        con_10n = self.consultas_al_validar()
+
+        self.assertEqual(con_n, con_10n)
+        # Agenda y turnos del día (EstadisticaPaciente solo con sobreturnos)
+        self.assertLessEqual(con_10n, 2)
+
+    def test_lote_en_consultas_fijas(self):
+        self.cargar_turnos(0, self.N)
+        turnos = [
+            Turno(
+                paciente=self.pacientes[i % len(self.pacientes)], odontologo=self.odontologos[i % len(self.odontologos)],
+                fecha=self.fecha + timedelta(days=1 + i % 5), hora=time(8 + i % 10), motivo_consulta='Control'
+            )
+            for i in range(30)
+        ]
+        ValidadorTurnos(turnos[:1])
+        with CaptureQueriesContext(connection) as consultas:
+            validador = ValidadorTurnos(turnos)
+            errores = [validador.validar(turno) for turno in turnos]
+        self.assertLessEqual(len(consultas), 2)
+        self.assertTrue(all(not error for error in errores))
+
+    def test_agenda_solo_se_controla_si_el_odontologo_tiene(self):
+        sin_agenda = Usuario.objects.create_user('sin_agenda', password='x', rol='odontologo')
+        turnos = [
+            Turno(paciente=self.pacientes[0], odontologo=odontologo, fecha=self.fecha, hora=time(21),
+                  motivo_consulta='Control')
+            for odontologo in (sin_agenda, self.odontologos[0])
+        ]
+        validador = ValidadorTurnos(turnos, validar_agenda=True)
+        # Recién actualizado, sin ConfiguracionAgenda: se acepta a cualquier hora
+        self.assertEqual(validador.validar(turnos[0]), [])
+        # Con agenda de 8 a 20: las 21 quedan afuera
+        self.assertTrue(validador.validar(turnos[1]))
+
+    def test_lote_desordenado_carga_solo_sus_dias(self):
+        # Historial en cientos de días: el lote pide dos días lejanos entre sí
+        self.cargar_turnos(0, self.N)
+        Turno.objects.update(estado='pendiente')
+        dias = [self.fecha - timedelta(days=12), self.fecha]
+        turnos = [
+            Turno(paciente=self.pacientes[0], odontologo=self.odontologos[0], fecha=dia, hora=time(19),
+                  motivo_consulta='Control')
+            for dia in dias
+        ]
+        validador = ValidadorTurnos(turnos, validar_pasado=False)
+        self.assertTrue(validador.turnos_por_dia)
+        self.assertEqual({fecha for _, fecha in validador.turnos_por_dia}, set(dias))
+
+    def test_agenda_con_turnos_simultaneos(self):
+        ConfiguracionAgenda.objects.filter(odontologo=self.odontologos[0]).update(turnos_simultaneos=2)
+        turnos = [
+            Turno(
+                paciente=paciente, odontologo=self.odontologos[0], fecha=self.fecha, hora=time(10),
+                motivo_consulta='Control'
+            )
+            for paciente in self.pacientes[:3]
+        ]
+        validador = ValidadorTurnos(turnos)
+        self.assertEqual(validador.validar(turnos[0]), [])
+        self.assertEqual(validador.validar(turnos[1]), [])
+        self.assertTrue(validador.validar(turnos[2]))
+
+    def test_benchmark_revierte_y_sube_la_version_de_turno(self):
+        version = version_modelo(Turno)
+        call_command('benchmark_validacion', '--tamanios', '0', '20', '--repeticiones', '1', stdout=StringIO())
+        self.assertFalse(Turno.objects.exists())
+        self.assertGreater(version_modelo(Turno), version)
+
+    def test_detecta_superposicion_dentro_del_lote(self):
+        turnos = [
+            Turno(
+                paciente=paciente, odontologo=self.odontologos[0], fecha=self.fecha, hora=time(10),
+                motivo_consulta='Control'
+            )
+            for paciente in self.pacientes[:2]
+        ]
+        validador = ValidadorTurnos(turnos)
+        self.assertEqual(validador.validar(turnos[0]), [])
+        self.assertTrue(validador.validar(turnos[1]))
+
+
+class EstadisticasPacienteTests(TestCase):
+    """EstadisticaPaciente incremental (señales de Turno) contra el recálculo desde cero"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.odontologo = Usuario.objects.create_user('odontologo', password='x', rol='odontologo')
+        cls.pacientes = Paciente.objects.bulk_create([
+            Paciente(
+                nombre='Paciente', apellido=f'Número {i}', dni=f'{30000000 + i}', fecha_nacimiento=date(1980, 1, 1),
+                telefono='3870000000', sexo='F'
+            )
+            for i in range(2)
+        ])
+        cls.fecha = date.today() + timedelta(days=10)
+
+    def crear_turno(self, paciente, **campos):
+        return Turno.objects.create(
+            paciente=paciente, odontologo=self.odontologo, fecha=self.fecha, hora=time(9), motivo_consulta='Control',
+            **campos
+        )
+
+    def contadores(self, paciente):
+        return EstadisticaPaciente.objects.filter(paciente=paciente).values(
+            'total_turnos', 'atendidos', 'ausentes', 'cancelados', 'ultima_visita',
+            'suma_anticipacion_dias', 'turnos_con_anticipacion'
+        ).first()
+
+    def assertIgualAlRecalculo(self):
+        # El recálculo no deja fila a quien se quedó sin turnos; el incremental la deja en cero
+        def normalizar(contadores):
+            return contadores if contadores and contadores['total_turnos'] else None
+
+        incrementales = [normalizar(self.contadores(paciente)) for paciente in self.pacientes]
+        reconstruir_estadisticas()
+        self.assertEqual(incrementales, [normalizar(self.contadores(paciente)) for paciente in self.pacientes])
+
+    def test_alta_cambio_de_estado_y_baja(self):
+        turno = self.crear_turno(self.pacientes[0])
+        self.assertEqual(self.contadores(self.pacientes[0]), {
+            'total_turnos': 1, 'atendidos': 0, 'ausentes': 0, 'cancelados': 0, 'ultima_visita': None,
+            'suma_anticipacion_dias': 10, 'turnos_con_anticipacion': 1,
+        })
+
+        turno = Turno.objects.get(pk=turno.pk)
+        turno.estado = 'atendido'
+        turno.save()
+        self.assertEqual(self.contadores(self.pacientes[0])['atendidos'], 1)
+        self.assertEqual(self.contadores(self.pacientes[0])['ultima_visita'], self.fecha)
+        self.assertIgualAlRecalculo()
+
+        turno.estado = 'cancelado'
+        turno.save()
+        self.assertEqual(
+            [self.contadores(self.pacientes[0])[campo] for campo in ('atendidos', 'cancelados', 'ultima_visita')],
+            [0, 1, None]
+        )
+        self.assertIgualAlRecalculo()
+
+        Turno.objects.get(pk=turno.pk).delete()
+        self.assertEqual(self.contadores(self.pacientes[0])['total_turnos'], 0)
+        self.assertEqual(self.contadores(self.pacientes[0])['cancelados'], 0)
+
+    def test_cambio_de_paciente_mueve_el_aporte(self):
+        self.crear_turno(self.pacientes[1])
+        turno = self.crear_turno(self.pacientes[0], estado='ausente')
+
+        turno = Turno.objects.get(pk=turno.pk)
+        turno.paciente = self.pacientes[1]
+        turno.save()
+
+        self.assertEqual(self.contadores(self.pacientes[0])['total_turnos'], 0)
+        self.assertEqual(self.contadores(self.pacientes[1])['total_turnos'], 2)
+        self.assertEqual(self.contadores(self.pacientes[1])['ausentes'], 1)
+        self.assertIgualAlRecalculo()
+
+    def test_turno_cargado_sin_el_estado_recalcula(self):
+        turno = self.crear_turno(self.pacientes[0])
+        # .only() sin 'estado': no hay foto de cómo estaba, se recalcula al paciente
+        turno = Turno.objects.only('id', 'paciente_id').get(pk=turno.pk)
+        turno.estado = 'atendido'
+        turno.save(update_fields=['estado'])
+        self.assertEqual(self.contadores(self.pacientes[0])['atendidos'], 1)
+        self.assertIgualAlRecalculo()
+
+    def test_turnos_nuevos_no_guardan_foto(self):
+        self.assertFalse(hasattr(Turno(paciente=self.pacientes[0], estado='pendiente'), '_valores_originales'))
+
+    def test_descuento_repetido_no_baja_de_cero(self):
+        turno = self.crear_turno(self.pacientes[0])
+        foto = estado_original(Turno.objects.get(pk=turno.pk))
+        turno.delete()
+        # El mismo turno eliminado desde dos pedidos a la vez
+        descontar_turno(foto)
+        self.assertEqual(self.contadores(self.pacientes[0])['total_turnos'], 0)
+        self.assertEqual(self.contadores(self.pacientes[0])['suma_anticipacion_dias'], 0)
+
+    def test_reconstruir_solo_los_pacientes_pedidos(self):
+        for paciente in self.pacientes:
+            self.crear_turno(paciente, estado='atendido')
+        EstadisticaPaciente.objects.update(total_turnos=99)
+
+        self.assertEqual(reconstruir_estadisticas(paciente_ids=[self.pacientes[0].pk]), 1)
+        self.assertEqual(self.contadores(self.pacientes[0])['total_turnos'], 1)
+        self.assertEqual(self.contadores(self.pacientes[1])['total_turnos'], 99)
+
+
+class ActualizarReportesTests(TestCase):
+    """actualizar_reportes recalcula solo los días tocados y deja los hechos como una reconstrucción completa"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.odontologo = Usuario.objects.create_user('odontologo', password='x', rol='odontologo')
+        obra_social = ObraSocial.objects.create(nombre='Obra Social Provincial', codigo='000001')
+        cls.pacientes = Paciente.objects.bulk_create([
+            Paciente(
+                nombre='Paciente', apellido=f'Número {i}', dni=f'{30000000 + i}', fecha_nacimiento=date(1980, 1, 1),
+                telefono='3870000000', sexo='F', obra_social=obra_social
+            )
+            for i in range(2)
+        ])
+        cls.dias = [date(2026, 3, 2) + timedelta(days=i) for i in range(4)]
+        Turno.objects.bulk_create([
+            Turno(
+                paciente=cls.pacientes[i % 2], odontologo=cls.odontologo, fecha=dia, hora=time(8 + i),
+                motivo_consulta='Control', estado='atendido'
+            )
+            for dia in cls.dias
+            for i in range(3)
+        ])
+
+    def hechos(self):
+        return (
+            sorted(HechoTurnosDia.objects.values_list('fecha', 'estado', 'cantidad')),
+            sorted(HechoObraSocialDia.objects.values_list('fecha', 'turnos', 'atendidos', 'pacientes')),
+            sorted(HechoCancelacionesDia.objects.values_list('fecha', 'motivo', 'cantidad')),
+        )
+
+    def assertIgualALaReconstruccion(self):
+        incrementales = self.hechos()
+        recalcular_dias()
+        self.assertEqual(incrementales, self.hechos())
+
+    def test_sin_cambios_no_recalcula_nada(self):
+        self.assertEqual(actualizar_reportes().dias_recalculados, len(self.dias))
+        ejecucion = actualizar_reportes()
+        self.assertFalse(ejecucion.completa)
+        self.assertEqual(ejecucion.dias_recalculados, 0)
+
+    def test_recalcula_solo_el_dia_modificado(self):
+        actualizar_reportes()
+        turno = Turno.objects.filter(fecha=self.dias[1]).first()
+        turno.estado = 'cancelado'
+        turno.motivo_cancelacion = 'enfermedad'
+        turno.save()
+
+        self.assertEqual(actualizar_reportes().dias_recalculados, 1)
+        self.assertIn((self.dias[1], 'cancelado', 1), self.hechos()[0])
+        self.assertEqual(self.hechos()[2], [(self.dias[1], 'enfermedad', 1)])
+        self.assertIgualALaReconstruccion()
+
+    def test_turnos_eliminados_y_movidos_sin_save(self):
+        actualizar_reportes()
+        # update() y delete() de QuerySet no cambian fecha_modificacion
+        Turno.objects.filter(fecha=self.dias[0], hora=time(8)).delete()
+        Turno.objects.filter(fecha=self.dias[2], hora=time(8)).update(fecha=self.dias[3])
+        self.assertEqual(dias_desfasados(), {self.dias[0], self.dias[2], self.dias[3]})
+
+        self.assertEqual(actualizar_reportes().dias_recalculados, 3)
+        self.assertEqual(dias_desfasados(), set())
+        self.assertIgualALaReconstruccion()
+
+    def test_pacientes_por_obra_social_son_pacientes_dia(self):
+        actualizar_reportes()
+        datos = datos_reporte(self.dias[0], self.dias[-1])
+        # Dos pacientes distintos, cada uno con turnos los cuatro días
+        self.assertEqual(datos['obras_sociales'][0]['n_pacientes'], 2 * len(self.dias))
+
+
+class LotesFacturacionTests(TestCase):
+    """generar_lotes solo regenera lotes abiertos que cambiaron; el txt respeta los anchos de COLUMNAS_LOTE"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = Usuario.objects.create_user('admin', password='x', rol='administrador')
+        odontologo = Usuario.objects.create_user(
+            'odontologo', password='x', rol='odontologo', matricula_profesional='MP 100'
+        )
+        cls.obras_sociales = ObraSocial.objects.bulk_create([
+            ObraSocial(nombre=f'Obra Social {i}', codigo=f'{i:06d}') for i in range(2)
+        ])
+        pacientes = Paciente.objects.bulk_create([
+            Paciente(
+                nombre='Paciente', apellido=f'Número {i}', dni=f'{30000000 + i}', fecha_nacimiento=date(1980, 1, 1),
+                telefono='3870000000', sexo='F', obra_social=obra_social, numero_afiliado=f'{i:08d}'
+            )
+            for i, obra_social in enumerate(cls.obras_sociales)
+        ])
+        cls.periodo = date(2026, 3, 1)
+        consulta = Prestacion.objects.create(codigo='01.01', descripcion='Consulta')
+        for i, paciente in enumerate(pacientes * 2):
+            turno = Turno.objects.create(
+                paciente=paciente, odontologo=odontologo, fecha=cls.periodo + timedelta(days=i), hora=time(9),
+                motivo_consulta='Control', estado='atendido'
+            )
+            PrestacionTurno.objects.create(turno=turno, prestacion=consulta, pieza='36')
+
+    def lote(self, obra_social):
+        return LoteFacturacion.objects.get(periodo=self.periodo, obra_social=obra_social)
+
+    def lineas(self, obra_social):
+        return list(self.lote(obra_social).lineas.order_by('pk').values_list('pk', 'cantidad'))
+
+    def test_segunda_corrida_sin_cambios_no_escribe(self):
+        self.assertEqual(generar_lotes(self.periodo)['generados'], 2)
+        generado = self.lote(self.obras_sociales[0]).fecha_generacion
+        lineas = self.lineas(self.obras_sociales[0])
+
+        with CaptureQueriesContext(connection) as consultas:
+            resumen = generar_lotes(self.periodo)
+        self.assertEqual((resumen['generados'], resumen['sin_cambios']), (0, 2))
+        # Solo se leen las firmas y los lotes existentes
+        escrituras = [consulta['sql'] for consulta in consultas if consulta['sql'].startswith(('INSERT', 'UPDATE', 'DELETE'))]
+        self.assertEqual(escrituras, [])
+        self.assertEqual(self.lote(self.obras_sociales[0]).fecha_generacion, generado)
+        self.assertEqual(self.lineas(self.obras_sociales[0]), lineas)
+
+    def test_lote_cerrado_no_se_reescribe(self):
+        generar_lotes(self.periodo)
+        cerrar_lote(self.lote(self.obras_sociales[0]), self.admin)
+        cerradas = self.lineas(self.obras_sociales[0])
+
+        # Cambian prestaciones de las dos obras sociales después del cierre
+        for prestacion_turno in PrestacionTurno.objects.all():
+            prestacion_turno.cantidad = 2
+            prestacion_turno.save()
+        resumen = generar_lotes(self.periodo)
+
+        self.assertEqual(
+            (resumen['generados'], resumen['cerrados'], resumen['cerrados_con_cambios']), (1, 1, 1)
+        )
+        self.assertEqual(self.lineas(self.obras_sociales[0]), cerradas)
+        self.assertEqual({cantidad for _, cantidad in self.lineas(self.obras_sociales[1])}, {2})
+
+    def test_txt_de_ancho_fijo(self):
+        generar_lotes(self.periodo)
+        self.client.force_login(self.admin)
+        response = self.client.get(
+            reverse('TurnosApp:descargar_lote', args=[self.lote(self.obras_sociales[0]).pk, 'txt'])
+        )
+        registros = b''.join(response.streaming_content).decode('utf-8').split('\r\n')
+
+        self.assertEqual(registros[-1], '')
+        self.assertEqual(len(registros[:-1]), 2)
+        anchos = [columna.ancho for columna in COLUMNAS_LOTE]
+        for registro in registros[:-1]:
+            self.assertEqual(len(registro), sum(anchos))
+
+        campos = []
+        inicio = 0
+        for ancho in anchos:
+            campos.append(registros[0][inicio:inicio + ancho])
+            inicio += ancho
+        self.assertEqual(campos, [
+            '20260301', '30000000  ', '00000000'.ljust(20), 'Número 0'.ljust(30), 'Paciente'.ljust(30),
+            '01.01   ', 'Consulta'.ljust(40), '001', '36'.ljust(10), 'MP 100'.ljust(12),
+        ])
+
+
+class CapacidadTests(SimpleTestCase):
+    """carga_maxima y hay_capacidad sobre intervalos [inicio, fin) en minutos"""
+
+    def test_turnos_que_se_tocan_no_se_superponen(self):
+        # 9:00-9:30 y 9:30-10:00: uno termina cuando empieza el otro
+        self.assertEqual(carga_maxima([(540, 570, 1), (570, 600, 1)], 540, 600), 1)
+        self.assertEqual(carga_maxima([(540, 571, 1), (570, 600, 1)], 540, 600), 2)
+        # Fuera de la ventana no cuenta, aunque la toque
+        self.assertEqual(carga_maxima([(480, 540, 1), (600, 660, 1)], 540, 600), 0)
+
+    def test_carga_es_la_suma_de_pesos_simultaneos(self):
+        intervalos = [(540, 600, 0.5), (550, 560, 0.25), (555, 580, 1), (590, 620, 0.75)]
+        self.assertEqual(carga_maxima(intervalos, 540, 600), 1.75)
+        self.assertEqual(carga_maxima(intervalos, 580, 600), 1.25)
+
+    def test_varios_turnos_simultaneos(self):
+        turnos = [(540, 570, 1.0), (540, 570, 1.0)]
+        self.assertTrue(hay_capacidad(turnos[:1], 540, 570, capacidad=2))
+        self.assertFalse(hay_capacidad(turnos, 540, 570, capacidad=2))
+        self.assertTrue(hay_capacidad(turnos, 540, 570, capacidad=3))
+        # A continuación de los dos ocupados entra aunque se toquen
+        self.assertTrue(hay_capacidad(turnos, 570, 600, capacidad=2))
+
+    @override_settings(TURNOS_SOBRETURNO_ACTIVO=True, TURNOS_SOBRETURNO_MAXIMO=1)
+    def test_sobreturno_segun_asistencia_esperada(self):
+        # Dos pacientes que faltan la mitad de las veces: se espera 1 presente en capacidad 2
+        faltadores = [(540, 570, 0.5), (540, 570, 0.5)]
+        self.assertTrue(hay_capacidad(faltadores, 540, 570, capacidad=2))
+        self.assertFalse(hay_capacidad(faltadores, 540, 570, capacidad=2, asistencia_nuevo=1.5))
+        # Pacientes que siempre vienen: no hay lugar para el extra
+        self.assertFalse(hay_capacidad([(540, 570, 1.0), (540, 570, 1.0)], 540, 570, capacidad=2))
+        # Nunca más de TURNOS_SOBRETURNO_MAXIMO por encima de la capacidad
+        self.assertFalse(hay_capacidad([(540, 570, 0.1)] * 3, 540, 570, capacidad=2))
+
+    @override_settings(TURNOS_SOBRETURNO_ACTIVO=False)
+    def test_sin_sobreturnos_la_capacidad_es_estricta(self):
+        self.assertFalse(hay_capacidad([(540, 570, 0.1), (540, 570, 0.1)], 540, 570, capacidad=2))
+
+    @override_settings(TURNOS_SOBRETURNO_MIN_HISTORIAL=5)
+    def test_probabilidad_asistencia(self):
+        self.assertEqual(probabilidad_asistencia(3, 4), 1.0)
+        self.assertEqual(probabilidad_asistencia(2, 8), 0.75)
+        self.assertEqual(probabilidad_asistencia(None, None), 1.0)
+
+
+class IndiceBloqueosTests(SimpleTestCase):
+    """IndiceIntervalos y _solapa (bloqueos en memoria, sin consultas)"""
+
+    def bloqueo(self, inicio, fin, odontologo_id=None, hora_inicio=None, hora_fin=None):
+        return {
+            'odontologo_id': odontologo_id, 'fecha_inicio': inicio, 'fecha_fin': fin,
+            'hora_inicio': hora_inicio, 'hora_fin': hora_fin,
+        }
+
+    def test_intervalos_inclusivos(self):
+        indice = IndiceIntervalos([(date(2026, 3, 2), date(2026, 3, 6), 'semana')])
+        self.assertEqual(indice.en(date(2026, 3, 2)), ['semana'])
+        self.assertEqual(indice.en(date(2026, 3, 6)), ['semana'])
+        self.assertEqual(indice.en(date(2026, 3, 1)), [])
+        self.assertEqual(indice.en(date(2026, 3, 7)), [])
+        self.assertEqual(IndiceIntervalos([]).en(date(2026, 3, 2)), [])
+
+    def test_intervalo_largo_detras_de_otros_cortos(self):
+        # El largo empieza primero: la búsqueda hacia atrás no debe cortar en los cortos
+        indice = IndiceIntervalos([
+            (date(2026, 1, 1), date(2026, 12, 31), 'licencia'),
+            (date(2026, 2, 1), date(2026, 2, 2), 'congreso'),
+            (date(2026, 3, 1), date(2026, 3, 1), 'feriado'),
+        ])
+        self.assertEqual(indice.en(date(2026, 6, 1)), ['licencia'])
+        self.assertEqual(sorted(indice.en(date(2026, 2, 2))), ['congreso', 'licencia'])
+
+    def test_igual_que_recorrer_todos(self):
+        base = date(2026, 1, 1)
+        intervalos = [
+            (base + timedelta(days=(i * 7) % 60), base + timedelta(days=(i * 7) % 60 + (i * 5) % 20), i)
+            for i in range(40)
+        ]
+        indice = IndiceIntervalos(intervalos)
+        for dias in range(-1, 85):
+            fecha = base + timedelta(days=dias)
+            esperado = sorted(valor for inicio, fin, valor in intervalos if inicio <= fecha <= fin)
+            self.assertEqual(sorted(indice.en(fecha)), esperado, fecha)
+
+    def test_bloqueos_generales_y_del_odontologo(self):
+        feriado = self.bloqueo(date(2026, 3, 24), date(2026, 3, 24))
+        licencia = self.bloqueo(date(2026, 3, 23), date(2026, 3, 27), odontologo_id=1)
+        indice = IndiceBloqueos([feriado, licencia])
+
+        self.assertEqual(indice.bloqueos_en(1, date(2026, 3, 24)), [feriado, licencia])
+        self.assertEqual(indice.bloqueos_en(2, date(2026, 3, 24)), [feriado])
+        self.assertEqual(indice.bloqueos_en(2, date(2026, 3, 25)), [])
+        self.assertEqual(indice.bloqueos_en(None, date(2026, 3, 25)), [])
+        self.assertIs(indice.esta_bloqueado(1, date(2026, 3, 25)), licencia)
+
+    def test_solapa(self):
+        dia_completo = self.bloqueo(None, None)
+        manana = self.bloqueo(None, None, hora_inicio=time(8), hora_fin=time(12))
+
+        self.assertTrue(_solapa(dia_completo, time(0), time(0, 30)))
+        self.assertTrue(_solapa(dia_completo, time(23, 30), time(23, 59)))
+        self.assertTrue(_solapa(manana, time(11, 30), time(12, 30)))
+        self.assertTrue(_solapa(manana, time(7, 30), time(8, 30)))
+        # Turnos que apenas tocan el bloqueo
+        self.assertFalse(_solapa(manana, time(12), time(12, 30)))
+        self.assertFalse(_solapa(manana, time(7, 30), time(8)))
+        # Sin hora de fin: el bloqueo cubre [inicio, fin)
+        self.assertTrue(_solapa(manana, time(8), time(8)))
+        self.assertFalse(_solapa(manana, time(12), time(12)))
+
+
+class ImportarTurnosTests(TestCase):
+    """importar_turnos: reanudar (o repetir) un lote no duplica turnos"""
+
+    @classmethod
+    def setUpTestData(cls):
+        Usuario.objects.create_user('odontologo', password='x', rol='odontologo', matricula_profesional='MP 100')
+        Paciente.objects.bulk_create([
+            Paciente(
+                nombre='Paciente', apellido=f'Número {i}', dni=f'{30000000 + i}', fecha_nacimiento=date(1980, 1, 1),
+                telefono='3870000000', sexo='F'
+            )
+            for i in range(5)
+        ])
+
+    def setUp(self):
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        self.csv = Path(directorio.name) / 'turnos.csv'
+        filas = ['dni,matricula,fecha,hora,duracion,motivo,estado'] + [
+            f'{30000000 + i % 5},mp100,{date(2020, 1, 1) + timedelta(days=i // 8):%d/%m/%Y},{8 + i % 8}:00,30,Control,atendido'
+            for i in range(40)
+        ]
+        self.csv.write_text('\n'.join(filas), encoding='utf-8')
+
+    def importar(self, *opciones):
+        call_command('importar_turnos', str(self.csv), '--batch-size', '15', *opciones, stdout=StringIO())
+
+    def test_importa_todo(self):
+        self.importar()
+        self.assertEqual(Turno.objects.count(), 40)
+        self.assertFalse(self.csv.with_name('turnos.csv.progreso').exists())
+
+    def test_importar_sube_la_version_de_turno(self):
+        # bulk_create no dispara señales: sin esto el cache 'agenda' seguiría sirviendo turnos viejos
+        version = version_modelo(Turno)
+        self.importar()
+        self.assertGreater(version_modelo(Turno), version)
+
+    def test_reanudar_despues_de_un_corte_no_duplica(self):
+        self.importar()
+        # Corte entre el commit de un lote y la escritura del avance: el avance quedó en el lote anterior
+        self.csv.with_name('turnos.csv.progreso').write_text('15')
+        self.importar('--reanudar')
+        self.assertEqual(Turno.objects.count(), 40)
+
+    def test_repetir_la_importacion_no_duplica(self):
+        self.importar()
+        self.importar()
+        self.assertEqual(Turno.objects.count(), 40)
+
+
+class CargaReservasTests(TransactionTestCase):
+    """carga_reservas solo corre con --confirmar sobre una base sin datos reales, y limpia lo que crea"""
+
+    def carga(self, *opciones):
+        salida = StringIO()
+        call_command('carga_reservas', '--hilos', '2', '--segundos', '0.3', *opciones, stdout=salida)
+        return salida.getvalue()
+
+    def test_sin_confirmar_no_corre(self):
+        with self.assertRaises(CommandError):
+            self.carga()
+        self.assertFalse(Usuario.objects.exists())
+
+    def test_base_con_pacientes_no_corre(self):
+        paciente = Paciente.objects.create(
+            nombre='Paciente', apellido='Real', dni='00000001', fecha_nacimiento=date(1980, 1, 1),
+            telefono='3870000000', sexo='F'
+        )
+        with self.assertRaises(CommandError):
+            self.carga('--confirmar')
+        self.assertEqual(list(Paciente.objects.all()), [paciente])
+        self.assertFalse(Usuario.objects.exists())
+
+    def test_base_vacia_mide_y_limpia(self):
+        salida = self.carga('--confirmar')
+        self.assertIn('Reservas/s', salida)
+        self.assertFalse(Paciente.objects.exists())
+        self.assertFalse(Usuario.objects.exists())
+        self.assertFalse(Turno.objects.exists())
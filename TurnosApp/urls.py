@@ -7,6 +7,7 @@ urlpatterns = [
     # Gestión de turnos
     path('', views.lista_turnos, name='lista_turnos'),
     path('crear/', views.crear_turno, name='crear_turno'),
+    path('exportar/<str:formato>/', views.exportar_turnos, name='exportar_turnos'),
     path('<int:pk>/editar/', views.editar_turno, name='editar_turno'),
     path('<int:pk>/ver/', views.ver_turno, name='ver_turno'),
     path('<int:pk>/confirmar/', views.confirmar_turno, name='confirmar_turno'),
@@ -14,10 +15,21 @@ urlpatterns = [
     path('<int:pk>/iniciar/', views.iniciar_atencion, name='iniciar_atencion'),
     path('<int:pk>/finalizar/', views.finalizar_atencion, name='finalizar_atencion'),
     path('<int:pk>/ausente/', views.marcar_ausente, name='marcar_ausente'),
+    path('<int:pk>/prestaciones/', views.prestaciones_turno, name='prestaciones_turno'),
+    path('prestaciones/<int:pk>/eliminar/', views.eliminar_prestacion_turno, name='eliminar_prestacion_turno'),
     
     # Configuración de agenda
     path('configuracion/', views.configuracion_agenda, name='configuracion_agenda'),
     path('configuracion/crear/', views.crear_configuracion, name='crear_configuracion'),
     path('configuracion/<int:pk>/editar/', views.editar_configuracion, name='editar_configuracion'),
     path('configuracion/<int:pk>/eliminar/', views.eliminar_configuracion, name='eliminar_configuracion'),
+    
+    # Facturación a obras sociales
+    path('facturacion/', views.facturacion, name='facturacion'),
+    path('facturacion/generar/', views.generar_lotes_facturacion, name='generar_lotes_facturacion'),
+    path('facturacion/<int:pk>/cerrar/', views.cerrar_lote_facturacion, name='cerrar_lote_facturacion'),
+    path('facturacion/<int:pk>/<str:formato>/', views.descargar_lote, name='descargar_lote'),
+    
+    # Reportes de auditoría
+    path('reportes/', views.reportes, name='reportes'),
 ]
\ No newline at end of file
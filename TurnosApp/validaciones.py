@@ -0,0 +1,150 @@
+from datetime import datetime
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from .models import Turno, ConfiguracionAgenda, BloqueoHorario, EstadisticaPaciente
+from .bloqueos import obtener_indice
+from .capacidad import a_minutos, probabilidad_asistencia, hay_capacidad
+
+
+def filtro_dias(turnos):
+    """
+    Q con los días exactos (odontólogo, fecha) de los turnos, para el índice
+    (odontologo, fecha). Un rango entre la fecha mínima y la máxima recorrería casi
+    toda la tabla con un lote desordenado (una importación de años de historial).
+    """
+    fechas = {}
+    for turno in turnos:
+        fechas.setdefault(turno.odontologo_id, set()).add(turno.fecha)
+
+    filtro = Q(pk__in=[])
+    for odontologo_id, dias in fechas.items():
+        filtro |= Q(odontologo_id=odontologo_id, fecha__in=sorted(dias))
+    return filtro
+
+
+class ValidadorTurnos:
+    """
+    Valida turnos contra la agenda del odontólogo, los bloqueos de horario y la
+    capacidad (turnos simultáneos).
+
+    Todo lo necesario se precarga al crear el validador, con a lo sumo una consulta
+    por modelo sin importar cuántos turnos haya en la tabla o en el lote:
+    ConfiguracionAgenda, Turno (con el historial de asistencia de cada paciente) y
+    EstadisticaPaciente solo si hay sobreturnos. Los bloqueos salen del índice en memoria.
+
+    Lo usan Turno.clean() (formularios y admin) y la importación masiva:
+
+        validador = ValidadorTurnos(turnos)
+        for turno in turnos:
+            errores = validador.validar(turno)
+    """
+
+    def __init__(self, turnos, validar_pasado=True, validar_agenda=None):
+        self.validar_pasado = validar_pasado
+        self.validar_agenda = (
+            getattr(settings, 'TURNOS_VALIDAR_AGENDA', True) if validar_agenda is None else validar_agenda
+        )
+        self.sobreturno = getattr(settings, 'TURNOS_SOBRETURNO_ACTIVO', False)
+        self.tipos_bloqueo = dict(BloqueoHorario.TIPO_BLOQUEO)
+
+        turnos = [turno for turno in turnos if turno.odontologo_id and turno.fecha]
+        odontologos = {turno.odontologo_id for turno in turnos}
+        excluir = [turno.pk for turno in turnos if turno.pk]
+
+        self.agendas = {}
+        self.con_agenda = set()
+        self.turnos_por_dia = {}
+        self.asistencia = {}
+        self.bloqueos = obtener_indice()
+
+        if not turnos:
+            return
+
+        # Ventanas de atención por (odontólogo, día de la semana)
+        for odontologo_id, dia, hora_inicio, hora_fin, simultaneos in ConfiguracionAgenda.objects.filter(
+            odontologo_id__in=odontologos,
+            activo=True
+        ).values_list('odontologo_id', 'dia_semana', 'hora_inicio', 'hora_fin', 'turnos_simultaneos'):
+            self.agendas.setdefault((odontologo_id, dia), []).append(
+                (a_minutos(hora_inicio), a_minutos(hora_fin), simultaneos)
+            )
+        self.con_agenda = {odontologo_id for odontologo_id, _ in self.agendas}
+
+        # Turnos que ya ocupan lugar, con el historial de asistencia de su paciente
+        for odontologo_id, fecha, hora, duracion, ausentes, total in Turno.objects.filter(
+            filtro_dias(turnos),
+            estado__in=Turno.ESTADOS_ACTIVOS
+        ).exclude(pk__in=excluir).order_by().values_list(
+            'odontologo_id', 'fecha', 'hora', 'duracion',
+            'paciente__estadisticas__ausentes', 'paciente__estadisticas__total_turnos'
+        ):
+            inicio = a_minutos(hora)
+            self.turnos_por_dia.setdefault((odontologo_id, fecha), []).append(
+                (inicio, inicio + duracion, probabilidad_asistencia(ausentes, total))
+            )
+
+        if self.sobreturno:
+            self.asistencia = {
+                paciente_id: probabilidad_asistencia(ausentes, total)
+                for paciente_id, ausentes, total in EstadisticaPaciente.objects.filter(
+                    paciente_id__in={turno.paciente_id for turno in turnos}
+                ).values_list('paciente_id', 'ausentes', 'total_turnos')
+            }
+
+    def _ventana(self, turno, inicio, fin):
+        """Ventana de agenda que contiene completamente al turno"""
+        for desde, hasta, simultaneos in self.agendas.get((turno.odontologo_id, turno.fecha.weekday()), []):
+            if desde <= inicio and fin <= hasta:
+                return desde, hasta, simultaneos
+        return None
+
+    def validar(self, turno):
+        """
+        Retorna la lista de errores del turno (vacía si es válido).
+        Los turnos válidos quedan registrados para validar el resto del lote.
+        """
+        errores = []
+
+        if not (turno.odontologo_id and turno.fecha and turno.hora and turno.duracion):
+            return errores
+
+        # No permitir turnos en el pasado
+        if self.validar_pasado:
+            ahora = timezone.localtime().replace(tzinfo=None)
+            if datetime.combine(turno.fecha, turno.hora) < ahora:
+                errores.append('No se pueden crear turnos en fechas/horas pasadas.')
+
+        # Los turnos cancelados, atendidos o ausentes no ocupan lugar
+        if turno.estado not in Turno.ESTADOS_ACTIVOS:
+            return errores
+
+        inicio = a_minutos(turno.hora)
+        fin = inicio + turno.duracion
+        rango = f'el {turno.fecha.strftime("%d/%m/%Y")} de {turno.hora.strftime("%H:%M")} a {turno.get_hora_fin().strftime("%H:%M")}'
+
+        bloqueo = self.bloqueos.esta_bloqueado(turno.odontologo_id, turno.fecha, turno.hora, turno.get_hora_fin())
+        if bloqueo:
+            errores.append(
+                f'El horario está bloqueado {rango}: {bloqueo["motivo"]} ({self.tipos_bloqueo.get(bloqueo["tipo"], bloqueo["tipo"])}).'
+            )
+
+        # Un odontólogo sin ninguna agenda cargada (instalaciones que recién la empiezan a
+        # usar) atiende en cualquier horario: solo se controla a los que tienen agenda
+        ventana = self._ventana(turno, inicio, fin)
+        if ventana is None and self.validar_agenda and turno.odontologo_id in self.con_agenda:
+            errores.append(f'El turno {rango} está fuera del horario de atención del odontólogo.')
+
+        capacidad = ventana[2] if ventana else 1
+        turnos_del_dia = self.turnos_por_dia.setdefault((turno.odontologo_id, turno.fecha), [])
+        asistencia = self.asistencia.get(turno.paciente_id, 1.0)
+
+        if not hay_capacidad(turnos_del_dia, inicio, fin, capacidad, asistencia):
+            errores.append(
+                f'{turno.odontologo.get_full_name()} ya tiene {capacidad} turno(s) simultáneo(s) {rango}.'
+            )
+
+        if not errores:
+            turnos_del_dia.append((inicio, fin, asistencia))
+
+        return errores
@@ -3,21 +3,25 @@ from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.db.models import Q
 from django.utils import timezone
+from django.urls import reverse
+from django.views.decorators.http import require_POST
 from datetime import datetime, timedelta, date
-from UsuarioApp.decorators import staff_medico, solo_administrador, admin_o_odontologo_gestor
-from .models import Turno, ConfiguracionAgenda, BloqueoHorario
-from .forms import TurnoForm, TurnoEditarForm, ConfiguracionAgendaForm, BloqueoHorarioForm, FiltroTurnosForm
+from UsuarioApp.decorators import staff_medico, solo_administrador, admin_o_odontologo_gestor, auditoria, staff_o_auditor, presupuesto_consultas, lectura_en_replica
+from .models import Turno, ConfiguracionAgenda, BloqueoHorario, PrestacionTurno, LoteFacturacion
+from .forms import TurnoForm, TurnoEditarForm, ConfiguracionAgendaForm, BloqueoHorarioForm, FiltroTurnosForm, FiltroReportesForm, PrestacionTurnoForm, PeriodoFacturacionForm
 from .notificaciones import enviar_confirmacion_turno, enviar_cancelacion_turno
+from .filas import renderizar_filas
+from .reportes import datos_reporte, ultima_ejecucion
+from .facturacion import COLUMNAS_LOTE, generar_lotes, cerrar_lote, inicio_periodo, periodo_anterior
+from config.exportar import Columna, respuesta_exportacion
 
 
 # ========== GESTIÓN DE TURNOS ==========
 
-@staff_medico
-def lista_turnos(request):
-    """Lista de turnos con filtros"""
+def _turnos_filtrados(request):
+    """Turnos según los filtros de la lista (los usa también la exportación)"""
     
-    # Obtener turnos
-    turnos = Turno.objects.all().select_related('paciente', 'odontologo').order_by('fecha', 'hora')
+    turnos = Turno.objects.all()
     
     # Aplicar filtros del formulario
     form = FiltroTurnosForm(request.GET or None)
@@ -53,21 +57,63 @@ def lista_turnos(request):
             turnos = turnos.filter(estado=estado)
     else:
         # Sin filtros: mostrar turnos de hoy en adelante (próximos turnos)
-        from datetime import date
         turnos = turnos.filter(fecha__gte=date.today())
     
     # Si es odontólogo, solo ver sus turnos
     if request.user.es_odontologo():
         turnos = turnos.filter(odontologo=request.user)
     
+    return turnos.order_by('fecha', 'hora'), form
+
+
+@presupuesto_consultas(9)
+@lectura_en_replica
+@staff_medico
+def lista_turnos(request):
+    """Lista de turnos con filtros"""
+    
+    turnos, form = _turnos_filtrados(request)
+    turnos = turnos.select_related('paciente', 'odontologo')
+    
+    # Filas renderizadas una vez y cacheadas por turno (ver TurnosApp.filas)
+    filas = renderizar_filas(turnos, request.user)
+    
     context = {
-        'turnos': turnos,
+        'filas': filas,
         'form': form,
-        'total_turnos': turnos.count(),
+        'total_turnos': len(filas),
     }
     
     return render(request, 'TurnosApp/lista_turnos.html', context)
 
+
+@presupuesto_consultas(6)
+@lectura_en_replica
+@staff_o_auditor
+def exportar_turnos(request, formato):
+    """Descarga los turnos de la lista (mismos filtros) en CSV o XLSX"""
+    
+    turnos, _ = _turnos_filtrados(request)
+    estados = dict(Turno.ESTADO_CHOICES)
+    
+    columnas = [
+        Columna('Fecha', 'fecha'),
+        Columna('Hora', 'hora'),
+        Columna('Duración (min)', 'duracion'),
+        Columna('Apellido del paciente', 'paciente__apellido'),
+        Columna('Nombre del paciente', 'paciente__nombre'),
+        Columna('DNI', 'paciente__dni'),
+        Columna('Obra social', 'paciente__obra_social__nombre'),
+        Columna('Apellido del odontólogo', 'odontologo__last_name'),
+        Columna('Nombre del odontólogo', 'odontologo__first_name'),
+        Columna('Motivo de consulta', 'motivo_consulta'),
+        Columna('Estado', 'estado', estados.get),
+        Columna('Motivo de cancelación', 'motivo_cancelacion'),
+    ]
+    
+    return respuesta_exportacion(turnos, columnas, 'turnos', formato)
+
+@presupuesto_consultas(14)
 @staff_medico
 def crear_turno(request):
     """Crear un nuevo turno"""
@@ -97,6 +143,7 @@ def crear_turno(request):
     return render(request, 'TurnosApp/form_turno.html', context)
 
 
+@presupuesto_consultas(15)
 @staff_medico
 def editar_turno(request, pk):
     """Editar un turno existente"""
@@ -127,14 +174,18 @@ def editar_turno(request, pk):
     return render(request, 'TurnosApp/form_turno.html', context)
 
 
+@presupuesto_consultas(6)
+@lectura_en_replica
 @staff_medico
 def ver_turno(request, pk):
     """Ver detalles de un turno"""
     
-    turno = get_object_or_404(Turno, pk=pk)
+    turno = get_object_or_404(
+        Turno.objects.select_related('paciente__obra_social', 'odontologo', 'usuario_registro'), pk=pk
+    )
     
     # Si es odontólogo, solo puede ver sus turnos
-    if request.user.es_odontologo() and turno.odontologo != request.user:
+    if request.user.es_odontologo() and turno.odontologo_id != request.user.pk:
         messages.error(request, 'No tenés permisos para ver este turno.')
         return redirect('TurnosApp:lista_turnos')
     
@@ -145,6 +196,7 @@ def ver_turno(request, pk):
     return render(request, 'TurnosApp/ver_turno.html', context)
 
 
+@presupuesto_consultas(12)
 @staff_medico
 def confirmar_turno(request, pk):
     """Confirmar un turno"""
@@ -160,6 +212,7 @@ def confirmar_turno(request, pk):
     return redirect('TurnosApp:lista_turnos')
 
 
+@presupuesto_consultas(12)
 @staff_medico
 def cancelar_turno(request, pk):
     """Cancelar un turno"""
@@ -185,6 +238,7 @@ def cancelar_turno(request, pk):
     return render(request, 'TurnosApp/cancelar_turno.html', context)
 
 
+@presupuesto_consultas(12)
 @staff_medico
 def iniciar_atencion(request, pk):
     """Marcar turno como en atención"""
@@ -202,6 +256,7 @@ def iniciar_atencion(request, pk):
     return redirect('TurnosApp:lista_turnos')
 
 
+@presupuesto_consultas(12)
 @staff_medico
 def finalizar_atencion(request, pk):
     """Marcar turno como atendido"""
@@ -216,9 +271,11 @@ def finalizar_atencion(request, pk):
     turno.finalizar_atencion()
     messages.success(request, f'Atención finalizada para {turno.paciente.get_nombre_completo()}.')
     
-    return redirect('TurnosApp:lista_turnos')
+    # Siguiente paso: registrar lo realizado (se factura a la obra social)
+    return redirect('TurnosApp:prestaciones_turno', pk=turno.pk)
 
 
+@presupuesto_consultas(12)
 @staff_medico
 def marcar_ausente(request, pk):
     """Marcar paciente como ausente"""
@@ -233,6 +290,8 @@ def marcar_ausente(request, pk):
 
 # ========== CONFIGURACIÓN DE AGENDA (Solo Administrador) ==========
 
+@presupuesto_consultas(6)
+@lectura_en_replica
 @solo_administrador
 def configuracion_agenda(request):
     """Lista de configuraciones de agenda"""
@@ -246,6 +305,7 @@ def configuracion_agenda(request):
     return render(request, 'TurnosApp/configuracion_agenda.html', context)
 
 
+@presupuesto_consultas(10)
 @solo_administrador
 def crear_configuracion(request):
     """Crear configuración de agenda"""
@@ -268,6 +328,7 @@ def crear_configuracion(request):
     return render(request, 'TurnosApp/form_configuracion.html', context)
 
 
+@presupuesto_consultas(10)
 @solo_administrador
 def editar_configuracion(request, pk):
     """Editar configuración de agenda"""
@@ -293,6 +354,7 @@ def editar_configuracion(request, pk):
     return render(request, 'TurnosApp/form_configuracion.html', context)
 
 
+@presupuesto_consultas(8)
 @solo_administrador
 def eliminar_configuracion(request, pk):
     """Eliminar configuración de agenda"""
@@ -302,3 +364,163 @@ def eliminar_configuracion(request, pk):
     messages.success(request, 'Configuración eliminada exitosamente.')
     
     return redirect('TurnosApp:configuracion_agenda')
+
+
+# ========== REPORTES DE AUDITORÍA ==========
+
+@presupuesto_consultas(12)
+@lectura_en_replica
+@auditoria
+def reportes(request):
+    """Tablero de auditoría: lee solo las tablas de hechos (ver reportes.py)"""
+    
+    hoy = date.today()
+    # Por defecto: los últimos 12 meses completos más el actual
+    desde = hoy.replace(day=1).replace(year=hoy.year - 1)
+    hasta = hoy
+    odontologo = None
+    
+    form = FiltroReportesForm(request.GET or None)
+    if form.is_valid():
+        desde = form.cleaned_data.get('fecha_desde') or desde
+        hasta = form.cleaned_data.get('fecha_hasta') or hasta
+        odontologo = form.cleaned_data.get('odontologo')
+    
+    context = {
+        'form': form,
+        'desde': desde,
+        'hasta': hasta,
+        'odontologo': odontologo,
+        'ejecucion': ultima_ejecucion(),
+        **datos_reporte(desde, hasta, odontologo),
+    }
+    
+    return render(request, 'TurnosApp/reportes.html', context)
+
+
+# ========== PRESTACIONES Y FACTURACIÓN ==========
+
+@presupuesto_consultas(10)
+@staff_medico
+def prestaciones_turno(request, pk):
+    """Prestaciones del nomenclador realizadas en el turno"""
+    
+    turno = get_object_or_404(Turno.objects.select_related('paciente__obra_social', 'odontologo'), pk=pk)
+    
+    # Solo el odontólogo asignado registra prestaciones de sus turnos
+    if request.user.es_odontologo() and turno.odontologo_id != request.user.pk:
+        messages.error(request, 'Solo el odontólogo asignado puede registrar prestaciones.')
+        return redirect('TurnosApp:lista_turnos')
+    
+    if turno.estado not in ('en_atencion', 'atendido'):
+        messages.warning(request, 'Solo se registran prestaciones de turnos en atención o atendidos.')
+        return redirect('TurnosApp:lista_turnos')
+    
+    if request.method == 'POST':
+        form = PrestacionTurnoForm(request.POST)
+        if form.is_valid():
+            prestacion = form.save(commit=False)
+            prestacion.turno = turno
+            prestacion.usuario_registro = request.user
+            prestacion.save()
+            messages.success(request, f'Prestación {prestacion.prestacion.codigo} registrada.')
+            return redirect('TurnosApp:prestaciones_turno', pk=turno.pk)
+    else:
+        form = PrestacionTurnoForm()
+    
+    context = {
+        'turno': turno,
+        'prestaciones': turno.prestaciones.select_related('prestacion'),
+        'form': form,
+    }
+    
+    return render(request, 'TurnosApp/prestaciones_turno.html', context)
+
+
+@presupuesto_consultas(10)
+@require_POST
+@staff_medico
+def eliminar_prestacion_turno(request, pk):
+    """Quitar una prestación cargada por error"""
+    
+    prestacion = get_object_or_404(PrestacionTurno.objects.select_related('turno'), pk=pk)
+    turno = prestacion.turno
+    
+    if request.user.es_odontologo() and turno.odontologo_id != request.user.pk:
+        messages.error(request, 'Solo el odontólogo asignado puede modificar las prestaciones.')
+    else:
+        prestacion.delete()
+        messages.success(request, 'Prestación eliminada.')
+    
+    return redirect('TurnosApp:prestaciones_turno', pk=turno.pk)
+
+
+@presupuesto_consultas(6)
+@solo_administrador
+def facturacion(request):
+    """Lotes de facturación del mes, uno por obra social"""
+    
+    form = PeriodoFacturacionForm(request.GET or {'periodo': periodo_anterior().strftime('%Y-%m')})
+    periodo = form.cleaned_data['periodo'] if form.is_valid() else periodo_anterior()
+    
+    context = {
+        'form': form,
+        'periodo': inicio_periodo(periodo),
+        'lotes': LoteFacturacion.objects.filter(periodo=inicio_periodo(periodo)).select_related('obra_social'),
+    }
+    
+    return render(request, 'TurnosApp/facturacion.html', context)
+
+
+@presupuesto_consultas(20)
+@require_POST
+@solo_administrador
+def generar_lotes_facturacion(request):
+    """Genera los lotes del mes (solo los que cambiaron desde la última vez)"""
+    
+    form = PeriodoFacturacionForm(request.POST)
+    if not form.is_valid():
+        messages.error(request, 'Período inválido.')
+        return redirect('TurnosApp:facturacion')
+    
+    periodo = form.cleaned_data['periodo']
+    resumen = generar_lotes(periodo)
+    messages.success(
+        request,
+        f"Lotes generados: {resumen['generados']}. Sin cambios: {resumen['sin_cambios']}. "
+        f"Cerrados: {resumen['cerrados']}."
+    )
+    if resumen['cerrados_con_cambios']:
+        messages.warning(
+            request,
+            f"{resumen['cerrados_con_cambios']} lote(s) cerrado(s) tienen cambios posteriores al cierre."
+        )
+    
+    return redirect(f"{reverse('TurnosApp:facturacion')}?periodo={periodo:%Y-%m}")
+
+
+@presupuesto_consultas(8)
+@require_POST
+@solo_administrador
+def cerrar_lote_facturacion(request, pk):
+    """Cerrar un lote presentado: ya no se regenera"""
+    
+    lote = get_object_or_404(LoteFacturacion, pk=pk)
+    if lote.esta_cerrado():
+        messages.warning(request, 'El lote ya estaba cerrado.')
+    else:
+        cerrar_lote(lote, request.user)
+        messages.success(request, f'Lote {lote} cerrado.')
+    
+    return redirect(f"{reverse('TurnosApp:facturacion')}?periodo={lote.periodo:%Y-%m}")
+
+
+@presupuesto_consultas(6)
+@solo_administrador
+def descargar_lote(request, pk, formato):
+    """Archivo del lote para presentar a la obra social (CSV, XLSX o ancho fijo)"""
+    
+    lote = get_object_or_404(LoteFacturacion.objects.select_related('obra_social'), pk=pk)
+    nombre = f"lote-{lote.obra_social.codigo or lote.obra_social_id}-{lote.periodo:%Y%m}"
+    
+    return respuesta_exportacion(lote.lineas.order_by('fecha', 'apellido', 'nombre', 'id'), COLUMNAS_LOTE, nombre, formato)
@@ -0,0 +1,63 @@
+from django.db import transaction
+from .models import Usuario, PalabraBusquedaUsuario, normalizar_busqueda, palabras_busqueda
+
+
+def reconstruir_palabras_busqueda(usuario_ids=None, batch_size=1000):
+    """
+    Recalcula texto_busqueda y las palabras de búsqueda de los usuarios creados o
+    modificados sin pasar por Usuario.save (bulk_create, update(), cargas masivas).
+    Si se pasan usuario_ids solo revisa esos usuarios. Solo escribe los que cambiaron.
+    Retorna la cantidad de usuarios actualizados.
+    """
+    usuarios = Usuario.objects.order_by('pk')
+    if usuario_ids is not None:
+        usuarios = usuarios.filter(pk__in=usuario_ids)
+    filas = usuarios.values_list('pk', 'texto_busqueda', *Usuario.CAMPOS_BUSQUEDA).iterator(chunk_size=batch_size)
+
+    actualizados = 0
+    lote = []
+    for fila in filas:
+        lote.append(fila)
+        if len(lote) == batch_size:
+            actualizados += _reconstruir_lote(lote)
+            lote = []
+    if lote:
+        actualizados += _reconstruir_lote(lote)
+
+    return actualizados
+
+
+def _reconstruir_lote(filas):
+    """Reescribe los usuarios del lote cuyo texto o palabras no coinciden con sus campos"""
+    guardadas = {}
+    for usuario_id, palabra in PalabraBusquedaUsuario.objects.filter(
+        usuario_id__in=[fila[0] for fila in filas]
+    ).values_list('usuario_id', 'palabra'):
+        guardadas.setdefault(usuario_id, set()).add(palabra)
+
+    textos = {}
+    palabras = {}
+    for usuario_id, texto_anterior, *campos in filas:
+        texto = normalizar_busqueda(*campos)[:400]
+        nuevas = palabras_busqueda(texto)
+        if texto != texto_anterior:
+            textos[usuario_id] = texto
+        if texto != texto_anterior or set(nuevas) != guardadas.get(usuario_id, set()):
+            palabras[usuario_id] = nuevas
+
+    if not palabras:
+        return 0
+
+    with transaction.atomic():
+        Usuario.objects.bulk_update(
+            [Usuario(pk=usuario_id, texto_busqueda=texto) for usuario_id, texto in textos.items()],
+            ['texto_busqueda']
+        )
+        PalabraBusquedaUsuario.objects.filter(usuario_id__in=list(palabras)).delete()
+        PalabraBusquedaUsuario.objects.bulk_create([
+            PalabraBusquedaUsuario(usuario_id=usuario_id, palabra=palabra)
+            for usuario_id, nuevas in palabras.items()
+            for palabra in nuevas
+        ])
+
+    return len(palabras)
@@ -1,6 +1,8 @@
 from django.contrib.auth.decorators import user_passes_test
 from django.core.exceptions import PermissionDenied
 from functools import wraps
+from config.router import usar_replica
+from .middleware import LecturaReplicaMiddleware
 
 def rol_requerido(*roles_permitidos):
     """
@@ -51,4 +53,41 @@ def staff_medico(view_func):
 
 def admin_o_odontologo_gestor(view_func):
     """Administradores o odontólogos pueden gestionar usuarios (con restricciones)"""
-    return rol_requerido('administrador', 'odontologo')(view_func)
\ No newline at end of file
+    return rol_requerido('administrador', 'odontologo')(view_func)
+
+
+def staff_o_auditor(view_func):
+    """Staff médico o auditores pueden acceder (exportaciones de solo lectura)"""
+    return rol_requerido('administrador', 'odontologo', 'recepcionista', 'auditor')(view_func)
+
+
+def auditoria(view_func):
+    """Auditores o administradores pueden acceder (reportes de solo lectura)"""
+    return rol_requerido('administrador', 'auditor')(view_func)
+
+
+def lectura_en_replica(view_func):
+    """
+    Vista de solo lectura (listados, tableros) que lee de la réplica cuando hay una
+    configurada, salvo justo después de un POST de la misma sesión
+    (ver UsuarioApp.middleware.LecturaReplicaMiddleware).
+    Uso: @lectura_en_replica
+    """
+    @wraps(view_func)
+    def _wrapped_view(request, *args, **kwargs):
+        with usar_replica(LecturaReplicaMiddleware.puede_leer_de_replica(request)):
+            return view_func(request, *args, **kwargs)
+    _wrapped_view.lectura_en_replica = True
+    return _wrapped_view
+
+
+def presupuesto_consultas(maximo):
+    """
+    Declara cuántas consultas puede ejecutar la vista (incluye sesión y autenticación).
+    Lo controla UsuarioApp.middleware.PresupuestoConsultasMiddleware.
+    Uso: @presupuesto_consultas(8)
+    """
+    def decorator(view_func):
+        view_func.presupuesto_consultas = maximo
+        return view_func
+    return decorator
@@ -0,0 +1,154 @@
+import hashlib
+import os
+import re
+import tempfile
+from io import BytesIO
+from pathlib import PurePosixPath
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+
+CARPETA = 'perfiles'
+CARPETA_MINIATURAS = 'perfiles/miniaturas'
+FORMATOS_PERMITIDOS = {'JPEG', 'PNG', 'WEBP'}
+FORMATOS_MINIATURA = {'webp': ('WEBP', 'image/webp'), 'jpg': ('JPEG', 'image/jpeg')}
+
+# Solo las fotos normalizadas (perfiles/<clave>.jpg) tienen miniaturas
+_PATRON_CLAVE = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+
+
+def tamanios_miniatura():
+    return getattr(settings, 'FOTO_PERFIL_MINIATURAS', {'chico': 48, 'mediano': 160})
+
+
+def validar_foto_perfil(archivo):
+    """Rechaza archivos demasiado pesados, formatos no permitidos e imágenes gigantes o dañadas"""
+    maximo = getattr(settings, 'FOTO_PERFIL_MAX_BYTES', 5 * 1024 * 1024)
+    if archivo.size > maximo:
+        raise ValidationError(f'La foto no puede superar los {maximo // (1024 * 1024)} MB.')
+
+    try:
+        archivo.seek(0)
+        with Image.open(archivo) as imagen:
+            formato = imagen.format
+            ancho, alto = imagen.size
+            imagen.verify()
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError):
+        raise ValidationError('El archivo no es una imagen válida.')
+    finally:
+        archivo.seek(0)
+
+    if formato not in FORMATOS_PERMITIDOS:
+        raise ValidationError('La foto debe ser JPG, PNG o WEBP.')
+
+    if ancho * alto > getattr(settings, 'FOTO_PERFIL_MAX_PIXELES', 40_000_000):
+        raise ValidationError('La foto tiene una resolución demasiado grande.')
+
+
+def _a_rgb(imagen):
+    """Aplana la transparencia sobre blanco (JPEG no la soporta)"""
+    if imagen.mode in ('RGBA', 'LA', 'P'):
+        imagen = imagen.convert('RGBA')
+        fondo = Image.new('RGB', imagen.size, (255, 255, 255))
+        fondo.paste(imagen, mask=imagen.getchannel('A'))
+        return fondo
+    return imagen.convert('RGB')
+
+
+def normalizar_foto(archivo):
+    """
+    Re-codifica la foto subida: respeta la orientación EXIF, descarta todos los
+    metadatos (EXIF, GPS, perfiles), limita el lado mayor a FOTO_PERFIL_MAX_LADO
+    y la guarda como JPEG. Retorna (contenido, clave) donde la clave es el hash
+    del contenido, así la URL cambia cuando cambia la foto.
+    """
+    lado = getattr(settings, 'FOTO_PERFIL_MAX_LADO', 1024)
+
+    archivo.seek(0)
+    with Image.open(archivo) as imagen:
+        imagen = _a_rgb(ImageOps.exif_transpose(imagen))
+    imagen.thumbnail((lado, lado), Image.Resampling.LANCZOS)
+
+    buffer = BytesIO()
+    imagen.save(buffer, 'JPEG', quality=85, optimize=True, progressive=True)
+    contenido = buffer.getvalue()
+
+    return contenido, hashlib.sha256(contenido).hexdigest()[:20]
+
+
+def escribir_archivo(storage, ruta, contenido):
+    """
+    Escribe el archivo en su ruta final de una sola vez (archivo temporal en la
+    misma carpeta + os.replace): nadie lee un archivo a medio escribir y dos
+    procesos escribiendo a la vez terminan en el mismo nombre, sin copias
+    con sufijo como las que deja storage.save.
+    """
+    destino = storage.path(ruta)
+    carpeta = os.path.dirname(destino)
+    os.makedirs(carpeta, exist_ok=True)
+
+    descriptor, temporal = tempfile.mkstemp(dir=carpeta, prefix='.tmp-')
+    try:
+        with os.fdopen(descriptor, 'wb') as archivo:
+            archivo.write(contenido)
+        os.chmod(temporal, storage.file_permissions_mode or 0o644)
+        os.replace(temporal, destino)
+    except BaseException:
+        if os.path.exists(temporal):
+            os.remove(temporal)
+        raise
+
+
+def guardar_foto_normalizada(archivo, storage=default_storage):
+    """
+    Guarda la versión normalizada de la foto (perfiles/<clave>.jpg) y retorna su
+    nombre. Si ya existe la misma foto se reutiliza el archivo.
+    """
+    contenido, clave = normalizar_foto(archivo)
+    nombre = f'{CARPETA}/{clave}.jpg'
+
+    if not storage.exists(nombre):
+        escribir_archivo(storage, nombre, contenido)
+    return nombre
+
+
+def clave_foto(nombre):
+    """Clave de una foto normalizada, o None si es una foto vieja sin procesar"""
+    ruta = PurePosixPath(nombre or '')
+    if str(ruta.parent) != CARPETA or ruta.suffix != '.jpg' or not _PATRON_CLAVE.match(ruta.stem):
+        return None
+    return ruta.stem
+
+
+def ruta_miniatura(clave, tamanio, formato):
+    return f'{CARPETA_MINIATURAS}/{clave}-{tamanio}.{formato}'
+
+
+def generar_miniatura(clave, tamanio, formato, storage=default_storage):
+    """
+    Genera (si falta) la miniatura cuadrada de la foto y retorna su ruta, o None
+    si la foto no existe. Dos procesos generando a la vez escriben lo mismo en
+    la misma ruta.
+    """
+    ruta = ruta_miniatura(clave, tamanio, formato)
+    if storage.exists(ruta):
+        return ruta
+
+    original = f'{CARPETA}/{clave}.jpg'
+    if not storage.exists(original):
+        return None
+
+    lado = tamanios_miniatura()[tamanio]
+    with storage.open(original) as archivo, Image.open(archivo) as imagen:
+        miniatura = ImageOps.fit(_a_rgb(imagen), (lado, lado), Image.Resampling.LANCZOS)
+
+    buffer = BytesIO()
+    if formato == 'webp':
+        miniatura.save(buffer, 'WEBP', quality=80, method=4)
+    else:
+        miniatura.save(buffer, 'JPEG', quality=80, optimize=True, progressive=True)
+
+    escribir_archivo(storage, ruta, buffer.getvalue())
+    return ruta
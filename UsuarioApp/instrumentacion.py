@@ -0,0 +1,189 @@
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections
+from django.template.backends.django import DjangoTemplates, Template as DjangoTemplate
+from django.template import TemplateDoesNotExist
+
+
+# Registro de la request en curso (None fuera de una request instrumentada)
+_registro_actual = ContextVar('registro_consultas', default=None)
+
+# Listas de parámetros "IN (%s, %s, ...)" se colapsan para agrupar la misma consulta
+_PATRON_IN = re.compile(r'IN \((?:%s, )*%s\)')
+
+# Control de transacciones: no se cuenta. Bajo TestCase cada atomic() es SAVEPOINT +
+# RELEASE en lugar de BEGIN, y contarlos haría que los tests no midan lo mismo que producción
+_PATRON_TRANSACCION = re.compile(r'^\s*(BEGIN|COMMIT|ROLLBACK|SAVEPOINT|RELEASE SAVEPOINT)\b', re.IGNORECASE)
+
+
+def huella_sql(sql):
+    """Huella de una consulta: el SQL parametrizado con las listas IN colapsadas"""
+    return _PATRON_IN.sub('IN (...)', sql)
+
+
+class RegistroConsultas:
+    """Consultas, tiempo en base de datos y tiempo de templates de una request"""
+
+    def __init__(self):
+        self.consultas = []  # (huella, duración en segundos, ejecutada dentro de un template)
+        self.tiempo_templates = 0.0
+        self.profundidad_template = 0
+        self.inicio = time.perf_counter()
+        self.fin = None
+
+    # Se registra como execute_wrapper en cada conexión
+    def __call__(self, execute, sql, params, many, context):
+        if _PATRON_TRANSACCION.match(sql):
+            return execute(sql, params, many, context)
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.consultas.append((huella_sql(sql), time.perf_counter() - inicio, self.profundidad_template > 0))
+
+    @property
+    def total(self):
+        return len(self.consultas)
+
+    @property
+    def tiempo_db(self):
+        return sum(duracion for _, duracion, _ in self.consultas)
+
+    @property
+    def tiempo_total(self):
+        return (self.fin or time.perf_counter()) - self.inicio
+
+    @property
+    def consultas_en_templates(self):
+        """Consultas disparadas al renderizar (típico de un select_related faltante)"""
+        return sum(1 for _, _, en_template in self.consultas if en_template)
+
+    def duplicadas(self, umbral=2):
+        """Huellas repetidas al menos `umbral` veces, de la más repetida a la menos"""
+        conteo = Counter(huella for huella, _, _ in self.consultas)
+        return [(huella, veces) for huella, veces in conteo.most_common() if veces >= umbral]
+
+    def resumen(self):
+        return (
+            f'{self.total} consultas ({self.consultas_en_templates} en templates), '
+            f'db {self.tiempo_db * 1000:.1f} ms, templates {self.tiempo_templates * 1000:.1f} ms, '
+            f'total {self.tiempo_total * 1000:.1f} ms'
+        )
+
+
+@contextmanager
+def registrar_consultas():
+    """Registra las consultas de todas las conexiones mientras dura el bloque"""
+    registro = RegistroConsultas()
+    token = _registro_actual.set(registro)
+    envoltorios = [conexion.execute_wrapper(registro) for conexion in connections.all()]
+
+    for envoltorio in envoltorios:
+        envoltorio.__enter__()
+    try:
+        yield registro
+    finally:
+        for envoltorio in reversed(envoltorios):
+            envoltorio.__exit__(None, None, None)
+        registro.fin = time.perf_counter()
+        _registro_actual.reset(token)
+
+
+# ========== TEMPLATES INSTRUMENTADOS ==========
+
+class Template(DjangoTemplate):
+    """Template que suma su tiempo de render al registro de la request"""
+
+    def render(self, context=None, request=None):
+        registro = _registro_actual.get()
+        if registro is None:
+            return super().render(context, request)
+
+        inicio = time.perf_counter()
+        registro.profundidad_template += 1
+        try:
+            return super().render(context, request)
+        finally:
+            registro.profundidad_template -= 1
+            if registro.profundidad_template == 0:
+                registro.tiempo_templates += time.perf_counter() - inicio
+
+
+def _template_no_existe(exc, backend):
+    """Copia de TemplateDoesNotExist atribuida a este backend, con los templates probados (para la página de debug)"""
+    nueva = TemplateDoesNotExist(*exc.args, tried=exc.tried, backend=backend, chain=exc.chain)
+    if hasattr(exc, 'template_debug'):
+        nueva.template_debug = exc.template_debug
+    return nueva
+
+
+class DjangoTemplatesInstrumentado(DjangoTemplates):
+    """Backend de templates de Django que mide el tiempo de render"""
+
+    def from_string(self, template_code):
+        return Template(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return Template(self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            raise _template_no_existe(exc, self) from exc
+
+
+# ========== PRESUPUESTOS ==========
+
+class PresupuestoExcedido(AssertionError):
+    """Una vista ejecutó más consultas que su presupuesto declarado"""
+
+
+def presupuesto_de_vista(view_func):
+    """Presupuesto declarado con @presupuesto_consultas o en la clase de la vista"""
+    presupuesto = getattr(view_func, 'presupuesto_consultas', None)
+    if presupuesto is None:
+        presupuesto = getattr(getattr(view_func, 'view_class', None), 'presupuesto_consultas', None)
+    return presupuesto
+
+
+class PresupuestoConsultasTestMixin:
+    """
+    Mixin para TestCase que verifica el presupuesto de consultas de una respuesta.
+    Requiere PresupuestoConsultasMiddleware activo (en tests corre en modo estricto).
+    Cada test empieza con los caches fríos: se mide el peor caso.
+
+        class ListaPacientesTests(PresupuestoConsultasTestMixin, TestCase):
+            def test_presupuesto(self):
+                self.assertDentroDelPresupuesto(self.client.get(url))
+    """
+
+    def setUp(self):
+        super().setUp()
+        from config.caches import ALIAS_VERSIONES, invalidar_modelo
+
+        for alias in settings.CACHES:
+            if alias != ALIAS_VERSIONES:
+                caches[alias].clear()
+        # Las versiones no se borran: subirlas descarta también los índices en memoria
+        # de cada proceso (catálogos, obras sociales, bloqueos) armados en otro test
+        for modelo in apps.get_models():
+            invalidar_modelo(modelo)
+
+    def assertDentroDelPresupuesto(self, response, presupuesto=None, umbral_duplicadas=None):
+        registro = getattr(response, 'registro_consultas', None)
+        self.assertIsNotNone(registro, 'La respuesta no tiene registro: ¿está activo PresupuestoConsultasMiddleware?')
+
+        presupuesto = presupuesto if presupuesto is not None else getattr(response, 'presupuesto_consultas', None)
+        self.assertIsNotNone(presupuesto, 'La vista no declara presupuesto de consultas.')
+        self.assertLessEqual(
+            registro.total, presupuesto,
+            f'La vista superó su presupuesto de {presupuesto} consultas: {registro.resumen()}'
+        )
+
+        if umbral_duplicadas is not None:
+            duplicadas = registro.duplicadas(umbral_duplicadas)
+            self.assertFalse(duplicadas, f'Consultas repetidas (posible N+1): {duplicadas}')
@@ -0,0 +1,90 @@
+import gzip
+import os
+from pathlib import Path
+from urllib.request import urlopen
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from config.estaticos import VENDOR, EXTENSIONES_COMPRIMIBLES
+
+try:
+    import brotli
+except ImportError:  # Opcional: sin el paquete brotli solo se generan .gz
+    brotli = None
+
+
+class Command(BaseCommand):
+    help = ('Arma los archivos estáticos para producción: descarga las librerías a static/vendor/ '
+            '(--descargar, ya vienen en el repositorio), corre collectstatic (nombres con hash) y genera las variantes .gz/.br')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--descargar',
+            action='store_true',
+            help='Actualiza Bootstrap, Popper y Font Awesome en static/vendor/ desde su origen; requiere internet'
+        )
+        parser.add_argument(
+            '--tamanio-minimo',
+            type=int,
+            default=1024,
+            help='No comprimir archivos más chicos que esto (bytes)'
+        )
+
+    def handle(self, *args, **options):
+        if options['descargar']:
+            self.descargar()
+
+        faltantes = [ruta for ruta in VENDOR if not (self.directorio_vendor() / ruta).is_file()]
+        if faltantes:
+            raise CommandError(
+                f'Faltan {len(faltantes)} archivos en static/vendor/ ({", ".join(faltantes)}): '
+                'restauralos desde el repositorio o corré con --descargar'
+            )
+
+        self.stdout.write(self.style.WARNING('Recolectando estáticos...'))
+        call_command('collectstatic', interactive=False, verbosity=0)
+
+        comprimidos = self.comprimir(Path(settings.STATIC_ROOT), options['tamanio_minimo'])
+
+        self.stdout.write('\n' + '='*50)
+        self.stdout.write(self.style.SUCCESS(f'Estáticos en: {settings.STATIC_ROOT}'))
+        self.stdout.write(self.style.SUCCESS(f'Archivos comprimidos: {comprimidos}'))
+        if brotli is None:
+            self.stdout.write(self.style.WARNING('Paquete brotli no instalado: solo variantes .gz'))
+        self.stdout.write('='*50)
+
+    def directorio_vendor(self):
+        return Path(settings.STATICFILES_DIRS[0])
+
+    def descargar(self):
+        base = self.directorio_vendor()
+        for ruta, url in VENDOR.items():
+            destino = base / ruta
+            destino.parent.mkdir(parents=True, exist_ok=True)
+            try:
+                with urlopen(url, timeout=30) as respuesta:
+                    contenido = respuesta.read()
+            except OSError as e:
+                raise CommandError(f'No se pudo descargar {url}: {e}')
+            destino.write_bytes(contenido)
+            self.stdout.write(f'  {ruta} ({len(contenido) // 1024} KB)')
+
+    def comprimir(self, directorio, tamanio_minimo):
+        """Escribe archivo.gz (y archivo.br) junto a cada archivo comprimible"""
+        total = 0
+        for raiz, _, archivos in os.walk(directorio):
+            for nombre in archivos:
+                ruta = Path(raiz) / nombre
+                if ruta.suffix not in EXTENSIONES_COMPRIMIBLES or ruta.stat().st_size < tamanio_minimo:
+                    continue
+
+                contenido = ruta.read_bytes()
+                comprimido = gzip.compress(contenido, compresslevel=9, mtime=0)
+                if len(comprimido) < len(contenido):
+                    ruta.with_name(nombre + '.gz').write_bytes(comprimido)
+                    total += 1
+                if brotli is not None:
+                    comprimido = brotli.compress(contenido, quality=11)
+                    if len(comprimido) < len(contenido):
+                        ruta.with_name(nombre + '.br').write_bytes(comprimido)
+        return total
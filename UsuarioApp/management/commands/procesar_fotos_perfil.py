@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+from UsuarioApp.fotos import guardar_foto_normalizada, generar_miniatura, tamanios_miniatura, FORMATOS_MINIATURA
+from UsuarioApp.models import Usuario
+
+
+class Command(BaseCommand):
+    help = ('Normaliza las fotos de perfil subidas antes del procesamiento (sin metadatos, nombre por hash) '
+            'y genera todas sus miniaturas, para no generarlas durante las visitas')
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.WARNING('Procesando fotos de perfil...'))
+
+        normalizadas = 0
+        miniaturas = 0
+        errores = 0
+
+        for usuario in Usuario.objects.exclude(foto_perfil='').exclude(foto_perfil__isnull=True).only('id', 'username', 'foto_perfil'):
+            try:
+                if usuario.get_clave_foto() is None:
+                    with usuario.foto_perfil.open('rb') as archivo:
+                        nombre = guardar_foto_normalizada(archivo, usuario.foto_perfil.storage)
+
+                    usuario.foto_perfil.name = nombre
+                    Usuario.objects.filter(pk=usuario.pk).update(foto_perfil=nombre)
+                    normalizadas += 1
+
+                clave = usuario.get_clave_foto()
+                for tamanio in tamanios_miniatura():
+                    for formato in FORMATOS_MINIATURA:
+                        if generar_miniatura(clave, tamanio, formato):
+                            miniaturas += 1
+            except (OSError, ValueError) as e:
+                errores += 1
+                self.stdout.write(self.style.ERROR(f'Error con la foto de {usuario.username}: {e}'))
+
+        self.stdout.write('\n' + '='*50)
+        self.stdout.write(self.style.SUCCESS(f'Fotos normalizadas: {normalizadas}'))
+        self.stdout.write(self.style.SUCCESS(f'Miniaturas disponibles: {miniaturas}'))
+        if errores:
+            self.stdout.write(self.style.ERROR(f'Errores: {errores}'))
+        self.stdout.write('='*50)
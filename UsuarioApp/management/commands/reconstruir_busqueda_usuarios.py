@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from UsuarioApp.busqueda import reconstruir_palabras_busqueda
+
+
+class Command(BaseCommand):
+    help = ('Recalcula el texto y las palabras de búsqueda de todos los usuarios '
+            '(necesario después de cargas masivas que no pasan por Usuario.save)')
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.WARNING('Recalculando palabras de búsqueda de usuarios...'))
+
+        total = reconstruir_palabras_busqueda()
+
+        self.stdout.write('\n' + '='*50)
+        self.stdout.write(self.style.SUCCESS(f'Usuarios con búsqueda actualizada: {total}'))
+        self.stdout.write('='*50)
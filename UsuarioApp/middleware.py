@@ -4,6 +4,12 @@ from django.conf import settings
 from django.shortcuts import redirect
 from django.contrib import messages
 from datetime import datetime, timedelta
+import logging
+import time
+from config.router import replica_configurada
+from .instrumentacion import registrar_consultas, presupuesto_de_vista, PresupuestoExcedido
+
+logger = logging.getLogger('consultas')
 
 class SessionIdleTimeout:
     """
@@ -37,4 +43,87 @@ class SessionIdleTimeout:
             request.session['last_activity'] = datetime.now().isoformat()
         
         response = self.get_response(request)
-        return response
\ No newline at end of file
+        return response
+
+class PresupuestoConsultasMiddleware:
+    """
+    Middleware que registra por vista la cantidad de consultas, las consultas repetidas
+    (posibles N+1) y el tiempo en base de datos vs. templates.
+    Si la vista declara @presupuesto_consultas y lo supera, lo informa en el log
+    'consultas' (o lanza PresupuestoExcedido con CONSULTAS_PRESUPUESTO_ESTRICTO, para tests).
+    Debe ir primero en MIDDLEWARE para contar también sesión y autenticación.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.activo = getattr(settings, 'CONSULTAS_INSTRUMENTACION_ACTIVA', True)
+        self.estricto = getattr(settings, 'CONSULTAS_PRESUPUESTO_ESTRICTO', False)
+        self.umbral_duplicadas = getattr(settings, 'CONSULTAS_UMBRAL_DUPLICADAS', 3)
+
+    def __call__(self, request):
+        if not self.activo:
+            return self.get_response(request)
+        
+        with registrar_consultas() as registro:
+            response = self.get_response(request)
+        
+        presupuesto = getattr(request, 'presupuesto_consultas', None)
+        vista = getattr(request, 'vista_instrumentada', request.path)
+        
+        # Disponible para PresupuestoConsultasTestMixin
+        response.registro_consultas = registro
+        response.presupuesto_consultas = presupuesto
+        
+        if settings.DEBUG:
+            response['Server-Timing'] = (
+                f'db;dur={registro.tiempo_db * 1000:.1f}, '
+                f'tpl;dur={registro.tiempo_templates * 1000:.1f}, '
+                f'total;dur={registro.tiempo_total * 1000:.1f}'
+            )
+        
+        duplicadas = registro.duplicadas(self.umbral_duplicadas)
+        if duplicadas:
+            logger.warning(
+                'Posible N+1 en %s: %s. Repetidas: %s',
+                vista, registro.resumen(), '; '.join(f'{veces}x {huella[:200]}' for huella, veces in duplicadas[:3])
+            )
+        
+        if presupuesto is not None and registro.total > presupuesto:
+            mensaje = f'{vista} superó su presupuesto de {presupuesto} consultas: {registro.resumen()}'
+            if self.estricto:
+                # En tests: con la lista de consultas para ver cuál sobra
+                consultas = ''.join(f'\n  {huella[:200]}' for huella, _, _ in registro.consultas)
+                raise PresupuestoExcedido(mensaje + consultas)
+            logger.warning(mensaje)
+        
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.presupuesto_consultas = presupuesto_de_vista(view_func)
+        request.vista_instrumentada = f'{view_func.__module__}.{view_func.__name__}'
+
+
+class LecturaReplicaMiddleware:
+    """
+    Anota en la sesión la hora de cada POST (o PUT/PATCH/DELETE). Las vistas
+    marcadas con @lectura_en_replica leen de la réplica salvo durante
+    REPLICA_LECTURA_PEGADA_SEGUNDOS después de una escritura de la misma sesión:
+    quien acaba de guardar un turno lo ve en la lista aunque la réplica esté atrasada.
+    """
+    METODOS_LECTURA = ('GET', 'HEAD', 'OPTIONS')
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if request.method not in self.METODOS_LECTURA and replica_configurada():
+            request.session['ultima_escritura'] = time.time()
+        
+        return self.get_response(request)
+
+    @classmethod
+    def puede_leer_de_replica(cls, request):
+        """Lectura sin una escritura reciente de la misma sesión (y con réplica configurada)"""
+        if request.method not in cls.METODOS_LECTURA or not replica_configurada():
+            return False
+        pegada = getattr(settings, 'REPLICA_LECTURA_PEGADA_SEGUNDOS', 10)
+        return time.time() - request.session.get('ultima_escritura', 0) >= pegada
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.8 on 2026-10-19 11:34
+
+import unicodedata
+from django.db import migrations, models
+
+
+def calcular_texto_busqueda(apps, schema_editor):
+    Usuario = apps.get_model('UsuarioApp', 'Usuario')
+    campos = ['username', 'first_name', 'last_name', 'matricula_profesional', 'email']
+
+    usuarios = []
+    for usuario in Usuario.objects.only('id', *campos).iterator(chunk_size=1000):
+        texto = unicodedata.normalize('NFKD', ' '.join(getattr(usuario, campo) or '' for campo in campos))
+        texto = ''.join(caracter for caracter in texto if not unicodedata.combining(caracter))
+        usuario.texto_busqueda = ' '.join(texto.lower().split())[:400]
+        usuarios.append(usuario)
+
+    Usuario.objects.bulk_update(usuarios, ['texto_busqueda'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('UsuarioApp', '0001_initial'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='usuario',
+            name='texto_busqueda',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=400, verbose_name='Texto de búsqueda'),
+        ),
+        migrations.AddIndex(
+            model_name='usuario',
+            index=models.Index(fields=['-fecha_creacion'], name='UsuarioApp__fecha_c_8b5c39_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='usuario',
+            index=models.Index(fields=['rol', 'activo'], name='UsuarioApp__rol_5f4d4d_idx'),
+        ),
+        migrations.RunPython(calcular_texto_busqueda, migrations.RunPython.noop),
+    ]
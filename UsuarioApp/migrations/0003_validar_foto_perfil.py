@@ -0,0 +1,19 @@
+# Generated by Django 5.2.8 on 2026-10-19 11:37
+
+import UsuarioApp.fotos
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('UsuarioApp', '0002_busqueda_usuarios'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='usuario',
+            name='foto_perfil',
+            field=models.ImageField(blank=True, null=True, upload_to='perfiles/', validators=[UsuarioApp.fotos.validar_foto_perfil], verbose_name='Foto de perfil'),
+        ),
+    ]
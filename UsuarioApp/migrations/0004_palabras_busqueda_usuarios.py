@@ -0,0 +1,44 @@
+# Generated by Django 5.2.8 on 2026-10-19 12:25
+
+import re
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def cargar_palabras_busqueda(apps, schema_editor):
+    Usuario = apps.get_model('UsuarioApp', 'Usuario')
+    PalabraBusquedaUsuario = apps.get_model('UsuarioApp', 'PalabraBusquedaUsuario')
+
+    palabras = []
+    for usuario_id, texto in Usuario.objects.values_list('id', 'texto_busqueda').iterator(chunk_size=1000):
+        palabras.extend(
+            PalabraBusquedaUsuario(usuario_id=usuario_id, palabra=palabra)
+            for palabra in dict.fromkeys(palabra[:150] for palabra in re.findall(r'\w+', texto))
+        )
+
+    PalabraBusquedaUsuario.objects.bulk_create(palabras, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('UsuarioApp', '0003_validar_foto_perfil'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PalabraBusquedaUsuario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('palabra', models.CharField(db_index=True, max_length=150, verbose_name='Palabra')),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='palabras_busqueda', to=settings.AUTH_USER_MODEL, verbose_name='Usuario')),
+            ],
+            options={
+                'verbose_name': 'Palabra de búsqueda',
+                'verbose_name_plural': 'Palabras de búsqueda',
+                'constraints': [models.UniqueConstraint(fields=('usuario', 'palabra'), name='palabra_busqueda_unica')],
+            },
+        ),
+        migrations.RunPython(cargar_palabras_busqueda, migrations.RunPython.noop),
+    ]
@@ -1,5 +1,21 @@
+import re
+import unicodedata
 from django.contrib.auth.models import AbstractUser
-from django.db import models
+from django.db import models, transaction
+from django.urls import reverse
+from .fotos import validar_foto_perfil, guardar_foto_normalizada, clave_foto, tamanios_miniatura, FORMATOS_MINIATURA
+
+
+def normalizar_busqueda(*partes):
+    """Texto en minúsculas, sin acentos y con espacios simples para buscar: 'José  Pérez' -> 'jose perez'"""
+    texto = unicodedata.normalize('NFKD', ' '.join(parte for parte in partes if parte))
+    texto = ''.join(caracter for caracter in texto if not unicodedata.combining(caracter))
+    return ' '.join(texto.lower().split())
+
+
+def palabras_busqueda(texto):
+    """Palabras de un texto normalizado, para buscar por prefijo: 'ana.perez@mail.com' -> ['ana', 'perez', 'mail', 'com']"""
+    return list(dict.fromkeys(palabra[:150] for palabra in re.findall(r'\w+', texto)))
 
 class Usuario(AbstractUser):
     """
@@ -13,6 +29,9 @@ class Usuario(AbstractUser):
         ('auditor', 'Auditor'),
     ]
     
+    # Campos que se buscan desde la lista de usuarios (ver texto_busqueda)
+    CAMPOS_BUSQUEDA = ('username', 'first_name', 'last_name', 'matricula_profesional', 'email')
+    
     rol = models.CharField(
         max_length=20,
         choices=ROLES,
@@ -47,6 +66,7 @@ class Usuario(AbstractUser):
         upload_to='perfiles/',
         blank=True,
         null=True,
+        validators=[validar_foto_perfil],
         verbose_name='Foto de perfil'
     )
     
@@ -65,14 +85,98 @@ class Usuario(AbstractUser):
         verbose_name='Última modificación'
     )
     
+    # Usuario, nombre, apellido, matrícula y email normalizados (se arma al guardar)
+    texto_busqueda = models.CharField(
+        max_length=400,
+        blank=True,
+        default='',
+        editable=False,
+        db_index=True,
+        verbose_name='Texto de búsqueda'
+    )
+    
     class Meta:
         verbose_name = 'Usuario'
         verbose_name_plural = 'Usuarios'
         ordering = ['-fecha_creacion']
+        indexes = [
+            models.Index(fields=['-fecha_creacion']),
+            models.Index(fields=['rol', 'activo']),
+        ]
+    
+    # Nombre de la foto leído de la base (None en usuarios nuevos)
+    _foto_cargada = None
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """Recuerda la foto cargada para normalizar al guardar solo las fotos nuevas"""
+        instance = super().from_db(db, field_names, values)
+        instance._foto_cargada = instance.__dict__.get('foto_perfil')
+        return instance
     
     def __str__(self):
         return f"{self.get_full_name()} ({self.get_rol_display()})"
     
+    def save(self, *args, **kwargs):
+        # Recalcular el texto de búsqueda salvo en guardados parciales que no lo afectan (ej: last_login)
+        update_fields = kwargs.get('update_fields')
+        texto_anterior = self.texto_busqueda if self.pk and 'texto_busqueda' not in self.get_deferred_fields() else None
+        if update_fields is None or not set(update_fields).isdisjoint(self.CAMPOS_BUSQUEDA):
+            self.texto_busqueda = normalizar_busqueda(
+                *(getattr(self, campo) for campo in self.CAMPOS_BUSQUEDA)
+            )[:400]
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'texto_busqueda'}
+        
+        # Foto nueva: se guarda sin metadatos y con nombre por hash (ver UsuarioApp.fotos).
+        # Asignar el nombre ya guardado evita que el ImageField guarde el archivo subido.
+        foto = self.foto_perfil
+        if (
+            foto and foto.name != self._foto_cargada and clave_foto(foto.name) is None
+            and (update_fields is None or 'foto_perfil' in update_fields)
+        ):
+            self.foto_perfil = guardar_foto_normalizada(foto, foto.storage)
+        
+        # El usuario y sus palabras de búsqueda se guardan juntos o nada
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            
+            # Las palabras de búsqueda solo se reescriben si cambió el texto
+            if self.texto_busqueda != texto_anterior:
+                self.palabras_busqueda.all().delete()
+                PalabraBusquedaUsuario.objects.bulk_create([
+                    PalabraBusquedaUsuario(usuario=self, palabra=palabra)
+                    for palabra in palabras_busqueda(self.texto_busqueda)
+                ])
+        
+        self._foto_cargada = self.foto_perfil.name
+    
+    def get_clave_foto(self):
+        """Clave de la foto para sus miniaturas, o None si no tiene o no está normalizada"""
+        if not self.foto_perfil:
+            return None
+        return clave_foto(self.foto_perfil.name)
+    
+    def get_miniaturas(self):
+        """
+        URLs de las miniaturas por tamaño y formato: {'mediano': {'webp': url, 'jpg': url}, ...}.
+        Las fotos viejas sin normalizar usan la original en todos los tamaños.
+        """
+        if not self.foto_perfil:
+            return {}
+        
+        clave = self.get_clave_foto()
+        if clave is None:
+            return {tamanio: {'webp': None, 'jpg': self.foto_perfil.url} for tamanio in tamanios_miniatura()}
+        
+        return {
+            tamanio: {
+                formato: reverse('UsuarioApp:miniatura_foto', args=[clave, tamanio, formato])
+                for formato in FORMATOS_MINIATURA
+            }
+            for tamanio in tamanios_miniatura()
+        }
+    
     def es_administrador(self):
         return self.rol == 'administrador'
     
@@ -83,4 +187,35 @@ class Usuario(AbstractUser):
         return self.rol == 'recepcionista'
     
     def es_auditor(self):
-        return self.rol == 'auditor'
\ No newline at end of file
+        return self.rol == 'auditor'
+
+
+class PalabraBusquedaUsuario(models.Model):
+    """
+    Una palabra del texto de búsqueda de un usuario. La lista de usuarios busca
+    por prefijo de palabra (LIKE 'texto%'), que usa el índice de esta tabla;
+    un LIKE '%texto%' sobre texto_busqueda recorre la tabla entera.
+    """
+    
+    usuario = models.ForeignKey(
+        Usuario,
+        on_delete=models.CASCADE,
+        related_name='palabras_busqueda',
+        verbose_name='Usuario'
+    )
+    
+    palabra = models.CharField(
+        max_length=150,
+        db_index=True,
+        verbose_name='Palabra'
+    )
+    
+    class Meta:
+        verbose_name = 'Palabra de búsqueda'
+        verbose_name_plural = 'Palabras de búsqueda'
+        constraints = [
+            models.UniqueConstraint(fields=['usuario', 'palabra'], name='palabra_busqueda_unica'),
+        ]
+    
+    def __str__(self):
+        return self.palabra
@@ -1,3 +1,264 @@
-from django.test import TestCase
+import os
+import tempfile
+from io import BytesIO, StringIO
+from unittest import mock
+from django.core.exceptions import ValidationError
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import DatabaseError
+from django.template import TemplateDoesNotExist, engines
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+from config.caches import ALIAS_VERSIONES
+from . import views
+from .instrumentacion import PresupuestoConsultasTestMixin, PresupuestoExcedido
+from .busqueda import reconstruir_palabras_busqueda
+from .fotos import generar_miniatura, normalizar_foto, validar_foto_perfil
+from .models import Usuario, PalabraBusquedaUsuario
 
-# Create your tests here.
+
+class VistasUsuarioTests(PresupuestoConsultasTestMixin, TestCase):
+    """Presupuesto de consultas de las vistas de UsuarioApp (middleware en modo estricto)"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = Usuario.objects.create_user('admin', password='x', rol='administrador', first_name='Ana')
+        cls.odontologo = Usuario.objects.create_user(
+            'odontologo', password='x', rol='odontologo', first_name='Pablo', last_name='Pérez',
+            matricula_profesional='MP-100'
+        )
+        # bulk_create no pasa por save(): las palabras de búsqueda se arman después
+        recepcionistas = Usuario.objects.bulk_create([
+            Usuario(username=f'recepcion{i}', rol='recepcionista', first_name='Recepción', last_name=str(i))
+            for i in range(30)
+        ])
+        reconstruir_palabras_busqueda([usuario.pk for usuario in recepcionistas])
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.admin)
+
+    def obtener(self, url, **datos):
+        response = self.client.get(url, datos)
+        self.assertEqual(response.status_code, 200)
+        self.assertDentroDelPresupuesto(response, umbral_duplicadas=3)
+        return response
+
+    def test_presupuesto_excedido_falla_en_tests(self):
+        with mock.patch.object(views.dashboard, 'presupuesto_consultas', 1):
+            with self.assertRaises(PresupuestoExcedido):
+                self.client.get(reverse('UsuarioApp:dashboard'))
+
+    def test_template_inexistente(self):
+        backend = engines.all()[0]
+        with self.assertRaises(TemplateDoesNotExist) as error:
+            backend.get_template('UsuarioApp/no_existe.html')
+        self.assertIs(error.exception.backend, backend)
+        self.assertTrue(error.exception.tried)
+
+    def test_login(self):
+        self.client.logout()
+        self.obtener(reverse('UsuarioApp:login'))
+
+    def test_dashboard(self):
+        self.obtener(reverse('UsuarioApp:dashboard'))
+
+    def test_panel_administracion(self):
+        self.obtener(reverse('UsuarioApp:panel_admin'))
+
+    def test_estado_cache(self):
+        self.obtener(reverse('UsuarioApp:estado_cache'))
+
+    def test_vaciar_cache(self):
+        caches['fragmentos'].set('prueba', 1)
+        caches[ALIAS_VERSIONES].set('version:prueba', 7, None)
+        self.client.post(reverse('UsuarioApp:estado_cache'), {'alias': 'fragmentos'})
+        self.client.post(reverse('UsuarioApp:estado_cache'), {'alias': ALIAS_VERSIONES})
+
+        self.assertIsNone(caches['fragmentos'].get('prueba'))
+        # Las versiones de los modelos no se vacían: volverían a números ya usados en claves viejas
+        self.assertEqual(caches[ALIAS_VERSIONES].get('version:prueba'), 7)
+
+    def test_historias_clinicas(self):
+        self.obtener(reverse('UsuarioApp:historias_clinicas'))
+        self.obtener(reverse('UsuarioApp:historias_clinicas'), buscar='perez')
+
+    def test_lista_usuarios(self):
+        self.obtener(reverse('UsuarioApp:lista_usuarios'))
+
+    def test_buscar_usuarios(self):
+        # Una página completa de resultados dentro del presupuesto
+        response = self.obtener(reverse('UsuarioApp:lista_usuarios'), buscar='Recepción')
+        self.assertEqual(response.context['paginator'].count, 30)
+        self.assertEqual(len(response.context['usuarios']), 25)
+
+        # Por prefijo de palabra, sin acentos, en cualquier campo y en cualquier orden
+        for busqueda in ['perez', 'Pér', 'pablo pe', 'mp-100', 'mp 10']:
+            response = self.obtener(reverse('UsuarioApp:lista_usuarios'), buscar=busqueda)
+            self.assertEqual(list(response.context['usuarios']), [self.odontologo], busqueda)
+
+        # Dentro de una palabra no coincide (LIKE '%texto%' no usaría el índice)
+        response = self.obtener(reverse('UsuarioApp:lista_usuarios'), buscar='erez')
+        self.assertEqual(response.context['paginator'].count, 0)
+
+    def test_palabras_busqueda_siguen_al_usuario(self):
+        self.odontologo.last_name = 'Gómez'
+        self.odontologo.save()
+        self.assertEqual(
+            sorted(self.odontologo.palabras_busqueda.values_list('palabra', flat=True)),
+            ['100', 'gomez', 'mp', 'odontologo', 'pablo']
+        )
+
+    def test_save_fallido_no_deja_palabras_sueltas(self):
+        self.odontologo.last_name = 'Gómez'
+        with mock.patch.object(PalabraBusquedaUsuario.objects, 'bulk_create', side_effect=DatabaseError):
+            with self.assertRaises(DatabaseError):
+                self.odontologo.save()
+        # Ni el usuario ni sus palabras quedaron a medio guardar
+        self.assertEqual(Usuario.objects.get(pk=self.odontologo.pk).last_name, 'Pérez')
+        self.assertIn('perez', self.odontologo.palabras_busqueda.values_list('palabra', flat=True))
+
+    def test_reconstruir_palabras_busqueda(self):
+        # update() no pasa por save(): texto y palabras quedan viejos
+        Usuario.objects.filter(pk=self.odontologo.pk).update(last_name='Gómez')
+        PalabraBusquedaUsuario.objects.filter(usuario=self.admin).delete()
+
+        salida = StringIO()
+        call_command('reconstruir_busqueda_usuarios', stdout=salida)
+        self.assertIn('Usuarios con búsqueda actualizada: 2', salida.getvalue())
+
+        self.assertEqual(Usuario.objects.get(pk=self.odontologo.pk).texto_busqueda, 'odontologo pablo gomez mp-100')
+        response = self.obtener(reverse('UsuarioApp:lista_usuarios'), buscar='gome')
+        self.assertEqual(list(response.context['usuarios']), [self.odontologo])
+        response = self.obtener(reverse('UsuarioApp:lista_usuarios'), buscar='ana')
+        self.assertEqual(list(response.context['usuarios']), [self.admin])
+        # Sin cambios pendientes no se escribe nada
+        self.assertEqual(reconstruir_palabras_busqueda(), 0)
+
+    def test_ver_usuario(self):
+        self.obtener(reverse('UsuarioApp:ver_usuario', args=[self.odontologo.pk]))
+
+    def test_crear_usuario(self):
+        self.obtener(reverse('UsuarioApp:crear_usuario'))
+
+    def test_editar_usuario(self):
+        self.obtener(reverse('UsuarioApp:editar_usuario', args=[self.odontologo.pk]))
+
+    def test_cambiar_password(self):
+        self.obtener(reverse('UsuarioApp:cambiar_password', args=[self.odontologo.pk]))
+
+    def test_toggle_usuario(self):
+        response = self.client.post(reverse('UsuarioApp:toggle_usuario', args=[self.odontologo.pk]))
+        self.assertEqual(response.status_code, 302)
+        self.assertDentroDelPresupuesto(response)
+
+    def test_sesion_expirada(self):
+        self.obtener(reverse('UsuarioApp:sesion_expirada'))
+
+
+def imagen_subida(nombre='foto.jpg', formato='JPEG', tamanio=(400, 200), color='red', exif=None):
+    """Archivo subido con una imagen generada en memoria"""
+    buffer = BytesIO()
+    opciones = {'exif': exif} if exif is not None else {}
+    Image.new('RGB', tamanio, color).save(buffer, formato, **opciones)
+    return SimpleUploadedFile(nombre, buffer.getvalue(), content_type=f'image/{formato.lower()}')
+
+
+class FotosPerfilTests(TestCase):
+    """Validación, normalización y miniaturas de las fotos de perfil (UsuarioApp.fotos)"""
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        ajustes = override_settings(MEDIA_ROOT=media.name)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+        self.media = media.name
+
+    def archivos(self, carpeta):
+        ruta = os.path.join(self.media, carpeta)
+        return sorted(nombre for nombre in os.listdir(ruta) if os.path.isfile(os.path.join(ruta, nombre)))
+
+    def test_validar_foto_perfil(self):
+        validar_foto_perfil(imagen_subida())
+
+        with override_settings(FOTO_PERFIL_MAX_BYTES=100):
+            with self.assertRaisesMessage(ValidationError, 'no puede superar'):
+                validar_foto_perfil(imagen_subida())
+        with self.assertRaisesMessage(ValidationError, 'no es una imagen válida'):
+            validar_foto_perfil(SimpleUploadedFile('foto.jpg', b'no soy una imagen'))
+        with self.assertRaisesMessage(ValidationError, 'JPG, PNG o WEBP'):
+            validar_foto_perfil(imagen_subida('foto.gif', 'GIF'))
+        with override_settings(FOTO_PERFIL_MAX_PIXELES=1000):
+            with self.assertRaisesMessage(ValidationError, 'resolución demasiado grande'):
+                validar_foto_perfil(imagen_subida())
+
+    def test_normalizar_rota_reduce_y_quita_metadatos(self):
+        exif = Image.Exif()
+        exif[0x0112] = 6  # Orientación: rotar 90°
+        exif[0x010E] = 'Consultorio'
+        subida = imagen_subida(tamanio=(2000, 1000), exif=exif)
+
+        contenido, clave = normalizar_foto(subida)
+
+        with Image.open(BytesIO(contenido)) as imagen:
+            self.assertEqual(imagen.format, 'JPEG')
+            self.assertEqual(imagen.size, (512, 1024))
+            self.assertEqual(len(imagen.getexif()), 0)
+        self.assertRegex(clave, r'^[0-9a-f]{20}$')
+        self.assertEqual(normalizar_foto(subida), (contenido, clave))
+
+    def test_guardar_usuario_normaliza_y_reutiliza_la_foto(self):
+        ana = Usuario.objects.create_user('ana', password='x', rol='recepcionista', foto_perfil=imagen_subida('ana.png', 'PNG'))
+        clave = ana.get_clave_foto()
+        self.assertEqual(ana.foto_perfil.name, f'perfiles/{clave}.jpg')
+
+        # La misma foto subida por otro usuario usa el mismo archivo
+        luis = Usuario.objects.create_user('luis', password='x', rol='recepcionista', foto_perfil=imagen_subida('luis.png', 'PNG'))
+        self.assertEqual(luis.foto_perfil.name, ana.foto_perfil.name)
+        self.assertEqual(self.archivos('perfiles'), [f'{clave}.jpg'])
+
+        # Guardar un usuario leído de la base no vuelve a procesar su foto
+        with mock.patch('UsuarioApp.models.guardar_foto_normalizada') as guardar:
+            usuario = Usuario.objects.get(pk=ana.pk)
+            usuario.first_name = 'Ana'
+            usuario.save()
+        guardar.assert_not_called()
+
+        # Una foto nueva reemplaza a la anterior
+        usuario.foto_perfil = imagen_subida('otra.jpg', color='blue')
+        usuario.save()
+        self.assertNotEqual(usuario.get_clave_foto(), clave)
+        self.assertEqual(Usuario.objects.get(pk=ana.pk).foto_perfil.name, usuario.foto_perfil.name)
+
+    def test_miniatura_cuadrada(self):
+        usuario = Usuario.objects.create_user('ana', password='x', rol='recepcionista', foto_perfil=imagen_subida())
+        clave = usuario.get_clave_foto()
+
+        ruta = generar_miniatura(clave, 'chico', 'webp')
+        with default_storage.open(ruta) as archivo, Image.open(archivo) as imagen:
+            self.assertEqual((imagen.format, imagen.size), ('WEBP', (48, 48)))
+        self.assertIsNone(generar_miniatura('a' * 20, 'chico', 'webp'))
+
+        self.client.force_login(usuario)
+        response = self.client.get(reverse('UsuarioApp:miniatura_foto', args=[clave, 'mediano', 'jpg']))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        self.assertIn('immutable', response['Cache-Control'])
+        response = self.client.get(reverse('UsuarioApp:miniatura_foto', args=['a' * 20, 'mediano', 'jpg']))
+        self.assertEqual(response.status_code, 404)
+
+    def test_miniaturas_simultaneas_no_dejan_copias(self):
+        usuario = Usuario.objects.create_user('ana', password='x', rol='recepcionista', foto_perfil=imagen_subida())
+        clave = usuario.get_clave_foto()
+
+        # Dos procesos que vieron a la vez que la miniatura faltaba
+        original = f'perfiles/{clave}.jpg'
+        with mock.patch.object(default_storage, 'exists', side_effect=lambda ruta: ruta == original):
+            generar_miniatura(clave, 'chico', 'jpg')
+            generar_miniatura(clave, 'chico', 'jpg')
+
+        self.assertEqual(self.archivos('perfiles/miniaturas'), [f'{clave}-chico.jpg'])
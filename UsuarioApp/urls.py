@@ -1,6 +1,7 @@
 from django.urls import path
 from django.contrib.auth import views as auth_views
 from . import views
+from .decorators import presupuesto_consultas
 
 app_name = 'UsuarioApp'
 
@@ -9,11 +10,12 @@ urlpatterns = [
     path('dashboard/', views.dashboard, name='dashboard'),
     
     # Login/Logout
-    path('login/', auth_views.LoginView.as_view(template_name='UsuarioApp/login.html'), name='login'),
+    path('login/', presupuesto_consultas(8)(auth_views.LoginView.as_view(template_name='UsuarioApp/login.html')), name='login'),
     path('logout/', views.logout_view, name='logout'),
     
     # Ejemplos de vistas protegidas
     path('admin/panel/', views.panel_administracion, name='panel_admin'),
+    path('admin/cache/', views.estado_cache, name='estado_cache'),
     path('historias-clinicas/', views.historias_clinicas, name='historias_clinicas'),
     
     # Gestión de usuarios (Solo Administrador)
@@ -23,6 +25,7 @@ urlpatterns = [
     path('usuarios/<int:pk>/ver/', views.ver_usuario, name='ver_usuario'),
     path('usuarios/<int:pk>/password/', views.cambiar_password_usuario, name='cambiar_password'),
     path('usuarios/<int:pk>/toggle/', views.toggle_usuario_activo, name='toggle_usuario'),
+    path('usuarios/fotos/<str:clave>/<str:tamanio>.<str:formato>', views.miniatura_foto, name='miniatura_foto'),
     
 
     # Sesión expirada
@@ -1,17 +1,35 @@
+import os
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth import logout
 from django.contrib import messages
 from django.views.generic import TemplateView, ListView, CreateView, UpdateView
 from django.urls import reverse_lazy
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.core.files.storage import default_storage
+from django.http import FileResponse, Http404
+from django.views.decorators.http import require_GET
+from django.utils.cache import patch_cache_control
 from django.db.models import Q
-from .decorators import solo_administrador, odontologo_o_admin,admin_o_odontologo_gestor, staff_medico
+from .decorators import solo_administrador, odontologo_o_admin,admin_o_odontologo_gestor, staff_medico, presupuesto_consultas, lectura_en_replica
 from .mixins import SoloAdministradorMixin, OdontologoOAdminMixin
-from .models import Usuario
+from .models import Usuario, PalabraBusquedaUsuario, normalizar_busqueda, palabras_busqueda
 from .forms import UsuarioCreacionForm, UsuarioEdicionForm, CambiarPasswordForm
+from config.caches import ALIAS_VERSIONES, estadisticas, reiniciar_contadores
+from PacientesApp.models import Paciente
+from django.core.cache import caches
+from .fotos import FORMATOS_MINIATURA, tamanios_miniatura, clave_foto, generar_miniatura
 from django.shortcuts import redirect
 
+# Columnas que usa la lista de usuarios
+COLUMNAS_LISTA_USUARIOS = [
+    'id', 'username', 'first_name', 'last_name', 'email', 'rol',
+    'matricula_profesional', 'activo', 'is_superuser', 'fecha_creacion',
+]
 # Vista de inicio/dashboard
+@presupuesto_consultas(5)
+@lectura_en_replica
 @login_required
 def dashboard(request):
     """Dashboard principal según el rol del usuario"""
@@ -32,52 +50,105 @@ def dashboard(request):
     return render(request, 'UsuarioApp/dashboard.html', context)
 
 
+@presupuesto_consultas(6)
+@solo_administrador
+def estado_cache(request):
+    """Aciertos/fallos de cada cache en este proceso, con opción de vaciarlo"""
+    if request.method == 'POST':
+        alias = request.POST.get('alias')
+        if alias == ALIAS_VERSIONES:
+            messages.error(request, f'El cache "{alias}" guarda las versiones de los modelos y no se vacía.')
+        elif alias in caches:
+            caches[alias].clear()
+            reiniciar_contadores(alias)
+            messages.success(request, f'Cache "{alias}" vaciado.')
+        return redirect('UsuarioApp:estado_cache')
+    
+    context = {
+        'caches': estadisticas(),
+        'proceso': os.getpid(),
+    }
+    
+    return render(request, 'UsuarioApp/estado_cache.html', context)
+
+
 # Ejemplo con decorador
+@presupuesto_consultas(5)
 @solo_administrador
 def panel_administracion(request):
     """Solo administradores pueden ver esto"""
     return render(request, 'UsuarioApp/panel_admin.html')
 
 
+def _historias_clinicas_context(request):
+    """Sin búsqueda, los pacientes con entradas más recientes; con búsqueda, todos los que coinciden"""
+    pacientes = Paciente.objects.select_related('resumen_historia').only(
+        'nombre', 'apellido', 'dni', 'activo',
+        'resumen_historia__entradas', 'resumen_historia__ultima_fecha',
+    )
+    
+    busqueda = request.GET.get('buscar', '').strip()
+    if busqueda:
+        pacientes = pacientes.filter(
+            Q(dni__icontains=busqueda) |
+            Q(nombre__icontains=busqueda) |
+            Q(apellido__icontains=busqueda)
+        ).order_by('apellido', 'nombre')
+    else:
+        pacientes = pacientes.filter(resumen_historia__isnull=False).order_by('-resumen_historia__ultima_fecha')
+    
+    paginator = Paginator(pacientes, 20)
+    return {
+        'pacientes': paginator.get_page(request.GET.get('pagina')),
+        'busqueda': busqueda,
+    }
+
+
+@presupuesto_consultas(6)
+@lectura_en_replica
 @odontologo_o_admin
 def historias_clinicas(request):
-    """Odontólogos y administradores pueden ver historias clínicas"""
-    return render(request, 'UsuarioApp/historias_clinicas.html')
+    """Odontólogos y administradores: acceso a las historias clínicas de los pacientes"""
+    return render(request, 'UsuarioApp/historias_clinicas.html', _historias_clinicas_context(request))
 
 
 # Ejemplo con Class-Based View
 class PanelAdministracionView(SoloAdministradorMixin, TemplateView):
     """Vista basada en clase - solo administradores"""
     template_name = 'UsuarioApp/panel_admin.html'
+    presupuesto_consultas = 5
 
 
 class HistoriasClinicasView(OdontologoOAdminMixin, TemplateView):
     """Vista basada en clase - odontólogos y administradores"""
     template_name = 'UsuarioApp/historias_clinicas.html'
+    presupuesto_consultas = 6
+    
+    def get_context_data(self, **kwargs):
+        return {**super().get_context_data(**kwargs), **_historias_clinicas_context(self.request)}
 
 # ========== GESTIÓN DE USUARIOS (Administrador o Odontólogo) ==========
 
+@presupuesto_consultas(6)
+@lectura_en_replica
 @admin_o_odontologo_gestor
 def lista_usuarios(request):
-    """Lista de todos los usuarios del sistema con búsqueda y filtros"""
+    """Lista paginada de los usuarios del sistema con búsqueda y filtros"""
+    
+    # Solo las columnas que muestra la lista (sin password ni foto)
+    usuarios = Usuario.objects.only(*COLUMNAS_LISTA_USUARIOS).order_by('-fecha_creacion')
     
     # Si es odontólogo, solo puede ver recepcionistas y auditores
     if request.user.es_odontologo():
-        usuarios = Usuario.objects.filter(rol__in=['recepcionista', 'auditor']).order_by('-fecha_creacion')
-    else:
-        # Administradores ven todos
-        usuarios = Usuario.objects.all().order_by('-fecha_creacion')
+        usuarios = usuarios.filter(rol__in=['recepcionista', 'auditor'])
     
-    # Búsqueda
+    # Búsqueda: cada palabra debe ser el comienzo de una palabra del usuario, nombre,
+    # apellido, matrícula o email (por prefijo, con el índice de PalabraBusquedaUsuario)
     busqueda = request.GET.get('buscar', '')
-    if busqueda:
-        usuarios = usuarios.filter(
-            Q(username__icontains=busqueda) |
-            Q(first_name__icontains=busqueda) |
-            Q(last_name__icontains=busqueda) |
-            Q(email__icontains=busqueda) |
-            Q(matricula_profesional__icontains=busqueda)
-        )
+    for palabra in palabras_busqueda(normalizar_busqueda(busqueda)):
+        usuarios = usuarios.filter(pk__in=PalabraBusquedaUsuario.objects.filter(
+            palabra__startswith=palabra
+        ).values('usuario_id'))
     
     # Filtro por rol
     rol_filtro = request.GET.get('rol', '')
@@ -97,8 +168,18 @@ def lista_usuarios(request):
     else:
         roles_disponibles = Usuario.ROLES
     
+    # Paginación: el total se cuenta una sola vez (paginator.count)
+    paginator = Paginator(usuarios, getattr(settings, 'USUARIOS_POR_PAGINA', 25))
+    pagina = paginator.get_page(request.GET.get('pagina'))
+    
+    # Filtros actuales para los enlaces de paginación
+    filtros = request.GET.copy()
+    filtros.pop('pagina', None)
+    
     context = {
-        'usuarios': usuarios,
+        'usuarios': pagina,
+        'paginator': paginator,
+        'filtros': filtros.urlencode(),
         'busqueda': busqueda,
         'rol_filtro': rol_filtro,
         'estado_filtro': estado_filtro,
@@ -108,6 +189,7 @@ def lista_usuarios(request):
     return render(request, 'UsuarioApp/lista_usuarios.html', context)
 
 
+@presupuesto_consultas(10)
 @admin_o_odontologo_gestor
 def crear_usuario(request):
     """Crear un nuevo usuario"""
@@ -149,6 +231,7 @@ def crear_usuario(request):
     return render(request, 'UsuarioApp/form_usuario.html', context)
 
 
+@presupuesto_consultas(10)
 @admin_o_odontologo_gestor
 def editar_usuario(request, pk):
     """Editar un usuario existente"""
@@ -199,6 +282,7 @@ def editar_usuario(request, pk):
     return render(request, 'UsuarioApp/form_usuario.html', context)
 
 
+@presupuesto_consultas(8)
 @admin_o_odontologo_gestor
 def cambiar_password_usuario(request, pk):
     """Cambiar la contraseña de un usuario"""
@@ -229,6 +313,7 @@ def cambiar_password_usuario(request, pk):
     return render(request, 'UsuarioApp/cambiar_password.html', context)
 
 
+@presupuesto_consultas(8)
 @admin_o_odontologo_gestor
 def toggle_usuario_activo(request, pk):
     """Activar o desactivar un usuario"""
@@ -260,6 +345,8 @@ def toggle_usuario_activo(request, pk):
     return redirect('UsuarioApp:lista_usuarios')
 
 
+@presupuesto_consultas(6)
+@lectura_en_replica
 @admin_o_odontologo_gestor
 def ver_usuario(request, pk):
     """Ver detalles de un usuario"""
@@ -277,10 +364,41 @@ def ver_usuario(request, pk):
     
     return render(request, 'UsuarioApp/ver_usuario.html', context)
 
+@presupuesto_consultas(5)
+@require_GET
+@login_required
+def miniatura_foto(request, clave, tamanio, formato):
+    """
+    Miniatura de una foto de perfil, generada la primera vez que se pide.
+    La clave es el hash de la foto, así que la URL cambia con la foto y la
+    respuesta se puede cachear en el navegador sin revalidar.
+    """
+    if formato not in FORMATOS_MINIATURA or tamanio not in tamanios_miniatura():
+        raise Http404
+    if clave_foto(f'perfiles/{clave}.jpg') != clave:
+        raise Http404
+    
+    ruta = generar_miniatura(clave, tamanio, formato)
+    if ruta is None:
+        raise Http404
+    
+    response = FileResponse(default_storage.open(ruta), content_type=FORMATOS_MINIATURA[formato][1])
+    # private: las fotos solo se ven con sesión iniciada, no deben quedar en caches compartidos
+    patch_cache_control(
+        response,
+        private=True,
+        max_age=getattr(settings, 'FOTO_PERFIL_CACHE_SEGUNDOS', 365 * 24 * 60 * 60),
+        immutable=True
+    )
+    response['ETag'] = f'"{clave}-{tamanio}-{formato}"'
+    return response
+
+@presupuesto_consultas(5)
 def sesion_expirada(request):
     """Vista que se muestra cuando la sesión expira por inactividad"""
     return render(request, 'UsuarioApp/sesion_expirada.html')
 
+@presupuesto_consultas(5)
 def logout_view(request):
     """Cerrar sesión del usuario"""
     logout(request)
@@ -0,0 +1,146 @@
+"""
+Configuración de la base de datos a partir de variables de entorno.
+
+Sin variables se usa SQLite (db.sqlite3), para desarrollo, tests y consultorios chicos.
+Cada conexión SQLite se ajusta con los PRAGMAS de pragmas_sqlite() (WAL, espera en
+vez de "database is locked", etc.); DB_SQLITE_PERFIL=basico deja los valores de SQLite.
+
+Con PostgreSQL:
+
+    DB_ENGINE=postgresql
+    DB_NAME=odontologia  DB_USER=odontologia  DB_PASSWORD=...  DB_HOST=localhost  DB_PORT=5432
+
+Réplica de solo lectura (opcional, ver config/router.py): DB_REPLICA_NAME y/o
+DB_REPLICA_HOST, DB_REPLICA_PORT, DB_REPLICA_USER, DB_REPLICA_PASSWORD; lo que no se
+indique se toma de la base principal. Para probar alcanza una copia de db.sqlite3.
+
+Perfiles de conexión (DB_PERFIL):
+
+    persistente  Cada proceso mantiene su conexión abierta DB_CONN_MAX_AGE segundos
+                 (por defecto 60) y la verifica antes de reusarla. Es el valor por defecto.
+    pool         Pool de conexiones dentro de cada proceso (psycopg_pool, requiere
+                 psycopg[pool]); tamaño con DB_POOL_MIN / DB_POOL_MAX.
+    pgbouncer    Conexiones a un PgBouncer local en modo transacción: sin cursores del
+                 lado del servidor (no sobreviven entre transacciones del pooler).
+"""
+import os
+from django.core.exceptions import ImproperlyConfigured
+
+
+PERFILES = ('persistente', 'pool', 'pgbouncer')
+PERFILES_SQLITE = ('ajustado', 'basico')
+
+
+def _booleano(valor):
+    return str(valor).strip().lower() in ('1', 'true', 'si', 'sí', 'yes', 'on')
+
+
+def configuracion_base_datos(base_dir, entorno=None):
+    """Retorna la entrada 'default' de DATABASES"""
+    entorno = os.environ if entorno is None else entorno
+    motor = entorno.get('DB_ENGINE', 'sqlite').strip().lower()
+
+    if motor in ('sqlite', 'sqlite3'):
+        configuracion = {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': entorno.get('DB_NAME') or base_dir / 'db.sqlite3',
+        }
+        if _perfil_sqlite(entorno) == 'ajustado':
+            # Las transacciones toman el lock de escritura al empezar (BEGIN IMMEDIATE): una
+            # transacción que lee y después escribe no puede fallar al querer escribir, espera
+            # como las demás el busy_timeout
+            configuracion['OPTIONS'] = {
+                'transaction_mode': 'IMMEDIATE',
+                'init_command': init_command_sqlite(entorno),
+            }
+        return configuracion
+
+    if motor not in ('postgresql', 'postgres'):
+        raise ImproperlyConfigured(f'DB_ENGINE desconocido: {motor!r} (usar sqlite o postgresql)')
+
+    perfil = entorno.get('DB_PERFIL', 'persistente').strip().lower()
+    if perfil not in PERFILES:
+        raise ImproperlyConfigured(f'DB_PERFIL desconocido: {perfil!r} (opciones: {", ".join(PERFILES)})')
+
+    configuracion = {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': entorno.get('DB_NAME', 'odontologia'),
+        'USER': entorno.get('DB_USER', 'odontologia'),
+        'PASSWORD': entorno.get('DB_PASSWORD', ''),
+        'HOST': entorno.get('DB_HOST', 'localhost'),
+        'PORT': entorno.get('DB_PORT', '6432' if perfil == 'pgbouncer' else '5432'),
+        'CONN_MAX_AGE': int(entorno.get('DB_CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': _booleano(entorno.get('DB_CONN_HEALTH_CHECKS', True)),
+        'OPTIONS': {
+            'connect_timeout': int(entorno.get('DB_CONNECT_TIMEOUT', 5)),
+            'application_name': entorno.get('DB_APPLICATION_NAME', 'serv_odonto'),
+        },
+    }
+
+    if perfil == 'pool':
+        # El pool reemplaza a las conexiones persistentes (Django no permite ambas)
+        configuracion['CONN_MAX_AGE'] = 0
+        configuracion['CONN_HEALTH_CHECKS'] = False
+        configuracion['OPTIONS']['pool'] = {
+            'min_size': int(entorno.get('DB_POOL_MIN', 2)),
+            'max_size': int(entorno.get('DB_POOL_MAX', 10)),
+            'timeout': int(entorno.get('DB_POOL_TIMEOUT', 10)),
+        }
+    elif perfil == 'pgbouncer':
+        configuracion['DISABLE_SERVER_SIDE_CURSORS'] = True
+        configuracion['OPTIONS']['prepare_threshold'] = None  # PgBouncer en modo transacción no soporta sentencias preparadas
+
+    return configuracion
+
+
+def configuracion_replica(base_dir, entorno=None):
+    """Entrada 'replica' de DATABASES, o None si no hay réplica configurada"""
+    entorno = os.environ if entorno is None else entorno
+    if not (entorno.get('DB_REPLICA_NAME') or entorno.get('DB_REPLICA_HOST')):
+        return None
+
+    configuracion = configuracion_base_datos(base_dir, entorno)
+    for clave in ('NAME', 'HOST', 'PORT', 'USER', 'PASSWORD'):
+        valor = entorno.get(f'DB_REPLICA_{clave}')
+        if valor and (clave in configuracion or clave == 'NAME'):
+            configuracion[clave] = valor
+
+    # En los tests la réplica es la misma base de prueba
+    configuracion['TEST'] = {'MIRROR': 'default'}
+    return configuracion
+
+
+def _perfil_sqlite(entorno):
+    perfil = entorno.get('DB_SQLITE_PERFIL', 'ajustado').strip().lower()
+    if perfil not in PERFILES_SQLITE:
+        raise ImproperlyConfigured(f'DB_SQLITE_PERFIL desconocido: {perfil!r} (opciones: {", ".join(PERFILES_SQLITE)})')
+    return perfil
+
+
+def pragmas_sqlite(entorno=None):
+    """PRAGMAS que se aplican a cada conexión SQLite nueva (ver init_command_sqlite)"""
+    entorno = os.environ if entorno is None else entorno
+    if _perfil_sqlite(entorno) != 'ajustado':
+        return {}
+
+    return {
+        # Lectores y escritor no se bloquean entre sí; el modo queda guardado en el archivo
+        'journal_mode': 'WAL',
+        # Esperar hasta N ms a que se libere el lock en vez de fallar enseguida
+        'busy_timeout': int(entorno.get('DB_SQLITE_BUSY_TIMEOUT', 10000)),
+        # Con WAL es seguro: ante un corte de luz se pierde a lo sumo la última transacción
+        'synchronous': 'NORMAL',
+        'mmap_size': int(entorno.get('DB_SQLITE_MMAP', 256 * 1024 * 1024)),
+        'cache_size': -int(entorno.get('DB_SQLITE_CACHE_KB', 20000)),  # Negativo: en KB
+        'temp_store': 'MEMORY',
+    }
+
+
+
+def init_command_sqlite(entorno=None):
+    """
+    OPTIONS['init_command'] con los PRAGMAS de pragmas_sqlite(): Django los ejecuta
+    directo sobre cada conexión nueva, así que no son consultas de la aplicación (no
+    cuentan en los presupuestos de consultas ni aparecen en connection.queries)
+    """
+    return ';'.join(f'PRAGMA {nombre} = {valor}' for nombre, valor in pragmas_sqlite(entorno).items())
@@ -0,0 +1,213 @@
+"""
+Caches del proyecto, todos pensados para un solo servidor (ver CACHES en settings):
+
+    default     Memoria del proceso: datos derivados chicos (ficha del paciente).
+    catalogos   Archivos, compartido entre procesos: versiones de modelos, con las que
+                cada proceso sabe si sus catálogos e índices en memoria quedaron viejos.
+    sesiones    Archivos: sesiones (SESSION_ENGINE cached_db, la base sigue siendo la fuente).
+    fragmentos  Archivos: HTML renderizado (filas de la lista de turnos).
+    agenda      Memoria del proceso, vida corta: turnos por paciente.
+
+Con CACHE_SOLO_MEMORIA=1 todos quedan en memoria (tests, un solo proceso).
+
+Claves versionadas: clave_versionada('pacientes:turnos', 42, modelos=[Turno]) incluye la
+versión de Turno, que sube al guardar/eliminar un turno si el modelo se registró con
+registrar_invalidacion(Turno). Así no hace falta buscar y borrar claves viejas.
+"""
+import os
+import threading
+import time as reloj
+from pathlib import Path
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+
+
+# Guarda las versiones de los modelos: no se vacía nunca. Si las versiones volvieran a 0
+# subirían de nuevo por números que ya están en claves de los otros caches (HTML, turnos,
+# fichas) y esas entradas viejas se volverían a servir
+ALIAS_VERSIONES = 'catalogos'
+
+_AUSENTE = object()
+
+
+# ========== CONFIGURACIÓN ==========
+
+def configuracion_caches(base_dir, entorno=None):
+    """Retorna el setting CACHES"""
+    entorno = os.environ if entorno is None else entorno
+    solo_memoria = entorno.get('CACHE_SOLO_MEMORIA', '').strip().lower() in ('1', 'true', 'si', 'sí', 'yes')
+    directorio = Path(entorno.get('CACHE_DIR') or base_dir / 'cache')
+
+    def memoria(alias, timeout, maximo):
+        return {
+            'BACKEND': 'config.caches.MemoriaConContador',
+            'LOCATION': f'serv-odonto-{alias}',
+            'TIMEOUT': timeout,
+            'OPTIONS': {'MAX_ENTRIES': maximo},
+            'ALIAS': alias,
+        }
+
+    def archivos(alias, timeout, maximo):
+        if solo_memoria:
+            return memoria(alias, timeout, maximo)
+        return {
+            'BACKEND': 'config.caches.ArchivosConContador',
+            'LOCATION': str(directorio / alias),
+            'TIMEOUT': timeout,
+            'OPTIONS': {'MAX_ENTRIES': maximo},
+            'ALIAS': alias,
+        }
+
+    return {
+        'default': memoria('default', 600, 5000),
+        'catalogos': archivos('catalogos', None, 1000),
+        'sesiones': archivos('sesiones', 3600, 10000),
+        'fragmentos': archivos('fragmentos', 3600, 20000),
+        'agenda': memoria('agenda', 60, 5000),
+    }
+
+
+# ========== CONTADORES ==========
+
+_lock_contadores = threading.Lock()
+_contadores = {}
+
+
+def _registrar(alias, acierto):
+    with _lock_contadores:
+        contador = _contadores.setdefault(alias, {'aciertos': 0, 'fallos': 0})
+        contador['aciertos' if acierto else 'fallos'] += 1
+
+
+def estadisticas():
+    """Aciertos y fallos por cache desde que arrancó este proceso"""
+    with _lock_contadores:
+        copia = {alias: dict(valores) for alias, valores in _contadores.items()}
+
+    resultado = []
+    for alias in caches:
+        valores = copia.get(alias, {'aciertos': 0, 'fallos': 0})
+        total = valores['aciertos'] + valores['fallos']
+        resultado.append({
+            'alias': alias,
+            'backend': type(caches[alias]).__name__,
+            'aciertos': valores['aciertos'],
+            'fallos': valores['fallos'],
+            'porcentaje': round(valores['aciertos'] * 100 / total, 1) if total else None,
+            'vaciable': alias != ALIAS_VERSIONES,
+        })
+    return resultado
+
+
+def reiniciar_contadores(alias=None):
+    with _lock_contadores:
+        if alias is None:
+            _contadores.clear()
+        else:
+            _contadores.pop(alias, None)
+
+
+class ContadorMixin:
+    """Cuenta aciertos y fallos de get() (get_many y get_or_set pasan por get)"""
+
+    def __init__(self, location, params):
+        super().__init__(location, params)
+        self.alias = params.get('ALIAS', location)
+
+    def get(self, key, default=None, version=None):
+        valor = super().get(key, _AUSENTE, version)
+        _registrar(self.alias, valor is not _AUSENTE)
+        return default if valor is _AUSENTE else valor
+
+
+class MemoriaConContador(ContadorMixin, LocMemCache):
+    pass
+
+
+class ArchivosConContador(ContadorMixin, FileBasedCache):
+    pass
+
+
+# ========== VERSIONES POR MODELO ==========
+
+def _clave_version(modelo):
+    return f'version:{modelo._meta.label_lower}'
+
+
+def versiones(*modelos):
+    """Versión actual de cada modelo (una sola lectura del cache)"""
+    if not modelos:
+        return ()
+    guardadas = caches[ALIAS_VERSIONES].get_many([_clave_version(modelo) for modelo in modelos])
+    return tuple(guardadas.get(_clave_version(modelo), 0) for modelo in modelos)
+
+
+def version_modelo(modelo):
+    return versiones(modelo)[0]
+
+
+def clave_versionada(prefijo, *partes, modelos=()):
+    """'prefijo:parte1:parte2:v3.7' con las versiones de los modelos de los que depende"""
+    sufijo = 'v' + '.'.join(str(version) for version in versiones(*modelos)) if modelos else ''
+    return ':'.join(str(parte) for parte in (prefijo, *partes, sufijo) if parte != '')
+
+
+def invalidar_modelo(modelo):
+    """Sube la versión del modelo: las claves que dependen de él dejan de usarse"""
+    cache = caches[ALIAS_VERSIONES]
+    clave = _clave_version(modelo)
+    try:
+        cache.incr(clave)
+    except ValueError:
+        cache.set(clave, version_modelo(modelo) + 1, None)
+
+
+def registrar_invalidacion(*modelos):
+    """Sube la versión de cada modelo al confirmarse un alta, cambio o baja"""
+    for modelo in modelos:
+        def modificado(sender, raw=False, **kwargs):
+            if not raw:
+                transaction.on_commit(lambda: invalidar_modelo(sender))
+
+        uid = f'invalidar_cache:{modelo._meta.label_lower}'
+        post_save.connect(modificado, sender=modelo, weak=False, dispatch_uid=uid)
+        post_delete.connect(modificado, sender=modelo, weak=False, dispatch_uid=uid)
+
+
+# ========== GET OR SET SIN ESTAMPIDA ==========
+
+def obtener_o_calcular(clave, calcular, timeout=DEFAULT_TIMEOUT, alias='default', espera=5.0):
+    """
+    Como cache.get_or_set, pero cuando la clave falta solo un hilo/proceso la
+    calcula: el resto espera (hasta `espera` segundos) a que aparezca el valor en
+    lugar de ir todos juntos a la base. Si nadie lo guarda a tiempo se calcula igual.
+    """
+    cache = caches[alias]
+    valor = cache.get(clave, _AUSENTE)
+    if valor is not _AUSENTE:
+        return valor
+
+    candado = f'{clave}:calculando'
+    if cache.add(candado, 1, timeout=max(1, int(espera * 2))):
+        try:
+            valor = calcular()
+            cache.set(clave, valor, timeout)
+            return valor
+        finally:
+            cache.delete(candado)
+
+    limite = reloj.monotonic() + espera
+    while reloj.monotonic() < limite:
+        reloj.sleep(0.05)
+        if cache.has_key(clave):
+            valor = cache.get(clave, _AUSENTE)
+            if valor is not _AUSENTE:
+                return valor
+
+    valor = calcular()
+    cache.set(clave, valor, timeout)
+    return valor
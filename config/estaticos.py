@@ -0,0 +1,99 @@
+import mimetypes
+import os
+from functools import lru_cache
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage, staticfiles_storage
+from django.http import FileResponse, Http404
+from django.utils._os import safe_join
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.views.decorators.http import require_safe
+
+
+# Librerías de terceros versionadas en static/vendor/: las páginas nunca dependen de
+# internet (instalaciones en la red local de la clínica). Las URLs son el origen de
+# cada archivo, solo para actualizarlos con construir_estaticos --descargar; fijan la
+# versión, y un cambio de versión cambia el contenido y por lo tanto el hash.
+VENDOR = {
+    'vendor/bootstrap/css/bootstrap.min.css':
+        'https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/css/bootstrap.min.css',
+    'vendor/bootstrap/js/bootstrap.min.js':
+        'https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/js/bootstrap.min.js',
+    'vendor/popper/popper.min.js':
+        'https://cdn.jsdelivr.net/npm/@popperjs/core@2.11.8/dist/umd/popper.min.js',
+    'vendor/fontawesome/css/all.min.css':
+        'https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.4.0/css/all.min.css',
+    **{
+        f'vendor/fontawesome/webfonts/{fuente}.{extension}':
+            f'https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.4.0/webfonts/{fuente}.{extension}'
+        for fuente in ('fa-solid-900', 'fa-regular-400', 'fa-brands-400', 'fa-v4compatibility')
+        for extension in ('woff2', 'ttf')
+    },
+}
+
+# Extensiones que vale la pena comprimir (woff2, png, jpg ya vienen comprimidos)
+EXTENSIONES_COMPRIMIBLES = {'.css', '.js', '.svg', '.ttf', '.eot', '.json', '.map', '.txt', '.html', '.xml'}
+
+
+class EstaticosConHash(ManifestStaticFilesStorage):
+    """
+    ManifestStaticFilesStorage para STORAGES['staticfiles'], con dos diferencias:
+
+        - no toca los comentarios sourceMappingURL: Bootstrap los trae pero los .map
+          no se copian a static/vendor/, y collectstatic fallaba al no encontrarlos;
+        - si falta el manifest o un archivo en STATIC_ROOT (instalación nueva sin
+          construir_estaticos) usa el nombre sin hash en vez de fallar cada página con 500.
+    """
+
+    manifest_strict = False
+    patterns = tuple(
+        (extension, tuple(regla for regla in reglas if 'sourceMappingURL' not in str(regla)))
+        for extension, reglas in ManifestStaticFilesStorage.patterns
+    )
+
+    def stored_name(self, name):
+        try:
+            return super().stored_name(name)
+        except ValueError:
+            return name
+
+
+@lru_cache(maxsize=None)
+def _nombres_con_hash():
+    """Archivos del manifest de collectstatic: su nombre cambia si cambia el contenido"""
+    manifest = getattr(staticfiles_storage, 'hashed_files', None)
+    return frozenset(manifest.values()) if manifest else frozenset()
+
+
+@require_safe
+def servir_estatico(request, ruta):
+    """
+    Sirve STATIC_ROOT cuando no hay un servidor web delante (instalaciones en la
+    red local de la clínica). Usa la variante .br/.gz precomprimida si el navegador
+    la acepta, y marca como inmutables los archivos con hash en el nombre.
+    """
+    try:
+        completa = safe_join(settings.STATIC_ROOT, ruta)
+    except SuspiciousFileOperation:
+        raise Http404
+    if not os.path.isfile(completa):
+        raise Http404
+
+    tipo, _ = mimetypes.guess_type(completa)
+    aceptadas = request.headers.get('Accept-Encoding', '')
+    archivo, codificacion = completa, None
+    for sufijo, nombre in (('.br', 'br'), ('.gz', 'gzip')):
+        if nombre in aceptadas and os.path.isfile(completa + sufijo):
+            archivo, codificacion = completa + sufijo, nombre
+            break
+
+    response = FileResponse(open(archivo, 'rb'), content_type=tipo or 'application/octet-stream')
+    if codificacion:
+        response['Content-Encoding'] = codificacion
+    patch_vary_headers(response, ['Accept-Encoding'])
+
+    if ruta in _nombres_con_hash():
+        patch_cache_control(response, public=True, max_age=365 * 24 * 60 * 60, immutable=True)
+    else:
+        patch_cache_control(response, public=True, max_age=getattr(settings, 'ESTATICOS_CACHE_SEGUNDOS', 3600))
+    return response
@@ -0,0 +1,282 @@
+"""
+Exportación de listados a CSV, XLSX y texto de ancho fijo en streaming.
+
+Las filas salen de queryset.values_list(...).iterator(chunk_size=...): no se crean
+instancias de los modelos ni se arma el archivo entero en memoria, y la descarga
+empieza con el primer bloque de filas. El XLSX se escribe a mano (un zip con XML
+mínimo, cadenas inline) para poder emitirlo mientras se genera.
+
+    columnas = [Columna('DNI', 'dni'), Columna('Estado', 'estado', dict(Turno.ESTADO_CHOICES).get)]
+    return respuesta_exportacion(turnos, columnas, 'turnos', 'xlsx')
+"""
+import csv
+import re
+import zipfile
+from collections import namedtuple
+from datetime import date, datetime, time
+from xml.sax.saxutils import escape
+from django.http import Http404, StreamingHttpResponse
+from django.utils import timezone
+
+
+FORMATOS = {
+    'csv': 'text/csv; charset=utf-8',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    # Ancho fijo (presentaciones a obras sociales): solo si todas las columnas tienen ancho
+    'txt': 'text/plain; charset=utf-8',
+}
+
+# Filas por consulta al recorrer el queryset
+FILAS_POR_BLOQUE = 2000
+
+# Bytes acumulados antes de enviar un bloque del XLSX
+BYTES_POR_ENVIO = 64 * 1024
+
+
+Columna = namedtuple('Columna', ['encabezado', 'campo', 'convertir', 'ancho'], defaults=[None, None])
+Columna.__doc__ = ('Columna exportada: encabezado, campo para values_list, conversión opcional del valor '
+                   'y ancho en caracteres para el formato de ancho fijo')
+
+
+def respuesta_exportacion(queryset, columnas, nombre, formato, chunk_size=FILAS_POR_BLOQUE):
+    """StreamingHttpResponse con el queryset exportado como adjunto (Http404 si el formato no existe)"""
+    if formato not in FORMATOS:
+        raise Http404
+    if formato == 'txt' and not all(columna.ancho for columna in columnas):
+        raise Http404
+
+    # El contenido se genera después de que la vista retorna (fuera de usar_replica):
+    # se fija ahora la base que le corresponde a la vista
+    queryset = queryset.using(queryset.db)
+    encabezados = [columna.encabezado for columna in columnas]
+    filas = _filas(queryset, columnas, chunk_size)
+
+    if formato == 'csv':
+        contenido = _csv(encabezados, filas)
+    elif formato == 'txt':
+        contenido = _ancho_fijo([columna.ancho for columna in columnas], filas)
+    else:
+        contenido = _xlsx(encabezados, filas, nombre)
+
+    response = StreamingHttpResponse(contenido, content_type=FORMATOS[formato])
+    response['Content-Disposition'] = f'attachment; filename="{nombre}-{date.today():%Y%m%d}.{formato}"'
+    response['Cache-Control'] = 'no-store'
+    return response
+
+
+def si_no(valor):
+    return 'Sí' if valor else 'No'
+
+
+def _filas(queryset, columnas, chunk_size):
+    conversiones = [(i, columna.convertir) for i, columna in enumerate(columnas) if columna.convertir]
+    for fila in queryset.values_list(*(columna.campo for columna in columnas)).iterator(chunk_size=chunk_size):
+        if conversiones:
+            fila = list(fila)
+            for i, convertir in conversiones:
+                fila[i] = convertir(fila[i])
+        yield fila
+
+
+def _local(valor):
+    """Fechas y horas en la zona horaria local y sin tzinfo (como las ve la clínica)"""
+    if isinstance(valor, datetime) and timezone.is_aware(valor):
+        return timezone.localtime(valor).replace(tzinfo=None)
+    return valor
+
+
+# ========== CSV ==========
+
+class _Eco:
+    """Pseudo-archivo: csv.writer escribe una fila y se devuelve tal cual"""
+
+    def write(self, valor):
+        return valor
+
+
+def _csv(encabezados, filas):
+    # Separador ';' y BOM: Excel en castellano abre el archivo con columnas y acentos correctos
+    escritor = csv.writer(_Eco(), delimiter=';')
+    yield '\ufeff' + escritor.writerow(encabezados)
+    for fila in filas:
+        yield escritor.writerow([_texto_csv(valor) for valor in fila])
+
+
+# Texto que Excel/LibreOffice interpretan como fórmula al abrir el CSV
+_INICIO_FORMULA = ('=', '+', '-', '@', '\t', '\r')
+
+
+def _texto_csv(valor):
+    valor = _local(valor)
+    if valor is None:
+        return ''
+    if isinstance(valor, bool):
+        return si_no(valor)
+    if isinstance(valor, datetime):
+        return valor.strftime('%Y-%m-%d %H:%M')
+    if isinstance(valor, time):
+        return valor.strftime('%H:%M')
+    if isinstance(valor, str) and valor.startswith(_INICIO_FORMULA):
+        # Un apellido '=HYPERLINK(...)' cargado en la ficha no debe llegar como fórmula
+        return "'" + valor
+    return valor
+
+
+# ========== ANCHO FIJO ==========
+
+def _ancho_fijo(anchos, filas):
+    """Sin encabezado, un registro por línea: números alineados a la derecha con ceros, texto a la izquierda"""
+    for fila in filas:
+        campos = []
+        for valor, ancho in zip(fila, anchos):
+            valor = _local(valor)
+            if isinstance(valor, bool):
+                texto = 'S' if valor else 'N'
+            elif isinstance(valor, int):
+                texto = str(valor).rjust(ancho, '0')
+            elif isinstance(valor, datetime):
+                texto = valor.strftime('%Y%m%d%H%M')
+            elif isinstance(valor, date):
+                texto = valor.strftime('%Y%m%d')
+            else:
+                texto = ' '.join(str(valor or '').split()).ljust(ancho)
+            campos.append(texto[:ancho])
+        yield ''.join(campos) + '\r\n'
+
+
+# ========== XLSX ==========
+
+_CARACTERES_INVALIDOS = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+# Índices de cellXfs en styles.xml
+_ESTILO_FECHA, _ESTILO_FECHA_HORA, _ESTILO_HORA = 1, 2, 3
+
+_EPOCA_EXCEL = datetime(1899, 12, 30)
+
+_ARCHIVOS_XLSX = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '<Override PartName="/xl/styles.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+        'Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+        'Target="worksheets/sheet1.xml"/>'
+        '<Relationship Id="rId2" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" '
+        'Target="styles.xml"/>'
+        '</Relationships>'
+    ),
+    'xl/styles.xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+        '<numFmts count="2">'
+        '<numFmt numFmtId="164" formatCode="dd/mm/yyyy"/>'
+        '<numFmt numFmtId="165" formatCode="dd/mm/yyyy hh:mm"/>'
+        '</numFmts>'
+        '<fonts count="1"><font><sz val="11"/><name val="Calibri"/></font></fonts>'
+        '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+        '<fill><patternFill patternType="gray125"/></fill></fills>'
+        '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+        '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+        '<cellXfs count="4">'
+        '<xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+        '<xf numFmtId="164" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+        '<xf numFmtId="165" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+        '<xf numFmtId="20" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+        '</cellXfs>'
+        '</styleSheet>'
+    ),
+}
+
+
+class _Salida:
+    """Destino del zip: acumula lo escrito hasta que el generador lo envía"""
+
+    def __init__(self):
+        self.partes = []
+        self.tamanio = 0
+
+    def write(self, datos):
+        self.partes.append(bytes(datos))
+        self.tamanio += len(datos)
+        return len(datos)
+
+    def flush(self):
+        pass
+
+    def vaciar(self):
+        datos = b''.join(self.partes)
+        self.partes, self.tamanio = [], 0
+        return datos
+
+
+def _celda(valor):
+    valor = _local(valor)
+    if valor is None or valor == '':
+        # Celda vacía igual: sin referencia (r="B2") las celdas se ubican por posición
+        return '<c/>'
+    if isinstance(valor, bool):
+        valor = si_no(valor)
+    elif isinstance(valor, (int, float)):
+        return f'<c t="n"><v>{valor}</v></c>'
+    elif isinstance(valor, datetime):
+        serial = (valor - _EPOCA_EXCEL).total_seconds() / 86400
+        return f'<c s="{_ESTILO_FECHA_HORA}"><v>{serial}</v></c>'
+    elif isinstance(valor, date):
+        return f'<c s="{_ESTILO_FECHA}"><v>{(valor - _EPOCA_EXCEL.date()).days}</v></c>'
+    elif isinstance(valor, time):
+        serial = (valor.hour * 3600 + valor.minute * 60 + valor.second) / 86400
+        return f'<c s="{_ESTILO_HORA}"><v>{serial}</v></c>'
+
+    texto = _CARACTERES_INVALIDOS.sub('', str(valor))
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{escape(texto)}</t></is></c>'
+
+
+def _xlsx(encabezados, filas, nombre_hoja):
+    salida = _Salida()
+    with zipfile.ZipFile(salida, 'w', compression=zipfile.ZIP_DEFLATED) as archivo:
+        for nombre, contenido in _ARCHIVOS_XLSX.items():
+            archivo.writestr(nombre, contenido)
+        archivo.writestr('xl/workbook.xml', (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+            'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+            f'<sheets><sheet name="{escape(nombre_hoja[:31])}" sheetId="1" r:id="rId1"/></sheets>'
+            '</workbook>'
+        ))
+        yield salida.vaciar()
+
+        with archivo.open('xl/worksheets/sheet1.xml', 'w') as hoja:
+            hoja.write(
+                b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+                b'<sheetData>'
+            )
+            hoja.write(('<row>' + ''.join(_celda(valor) for valor in encabezados) + '</row>').encode())
+            for fila in filas:
+                hoja.write(('<row>' + ''.join(_celda(valor) for valor in fila) + '</row>').encode())
+                if salida.tamanio >= BYTES_POR_ENVIO:
+                    yield salida.vaciar()
+            hoja.write(b'</sheetData></worksheet>')
+
+    yield salida.vaciar()
@@ -0,0 +1,52 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from django.conf import settings
+
+
+# Activado por usar_replica(): las lecturas de este hilo/contexto van a la réplica
+_leer_de_replica = ContextVar('leer_de_replica', default=False)
+
+
+def replica_configurada():
+    """Hay alias 'replica' y las lecturas en la réplica están activas (REPLICA_LECTURAS_ACTIVAS)"""
+    return 'replica' in settings.DATABASES and getattr(settings, 'REPLICA_LECTURAS_ACTIVAS', True)
+
+
+@contextmanager
+def usar_replica(activar=True):
+    """
+    Envía a la réplica las lecturas hechas dentro del bloque (si hay réplica).
+    Las escrituras siempre van a 'default'. Lo usan las vistas marcadas con
+    @lectura_en_replica y los comandos de reportes:
+
+        with usar_replica():
+            generar_reporte()
+    """
+    token = _leer_de_replica.set(activar and replica_configurada())
+    try:
+        yield
+    finally:
+        _leer_de_replica.reset(token)
+
+
+class RouterReplica:
+    """
+    Lecturas a 'replica' solo dentro de usar_replica(); todo lo demás (reservas,
+    formularios, sesiones) lee y escribe en 'default'.
+    """
+
+    def db_for_read(self, model, **hints):
+        if _leer_de_replica.get():
+            return 'replica'
+        return None
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Son la misma base (la réplica es una copia)
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # La réplica recibe los cambios de esquema por replicación
+        return db == 'default'
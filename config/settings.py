@@ -10,11 +10,17 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import sys
 from pathlib import Path
+from .base_datos import configuracion_base_datos, configuracion_replica
+from .caches import configuracion_caches
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
+# manage.py test
+TESTING = len(sys.argv) > 1 and sys.argv[1] == 'test'
+
 
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/5.2/howto/deployment/checklist/
@@ -46,6 +52,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Instrumentación de consultas por vista (primero, para contar sesión y autenticación)
+    'UsuarioApp.middleware.PresupuestoConsultasMiddleware',
+
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -56,13 +65,17 @@ MIDDLEWARE = [
 
     # Middleware personalizado para timeout de sesión
     'UsuarioApp.middleware.SessionIdleTimeout', 
+
+    # Lecturas en la réplica para vistas @lectura_en_replica (después de sesión y usuario)
+    'UsuarioApp.middleware.LecturaReplicaMiddleware',
 ]
 
 ROOT_URLCONF = 'config.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates que además mide el tiempo de render (ver UsuarioApp.instrumentacion)
+        'BACKEND': 'UsuarioApp.instrumentacion.DjangoTemplatesInstrumentado',
         'DIRS': [BASE_DIR / 'templates'],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -81,19 +94,39 @@ WSGI_APPLICATION = 'config.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# SQLite por defecto; PostgreSQL con DB_ENGINE=postgresql (ver config/base_datos.py)
 DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
+    'default': configuracion_base_datos(BASE_DIR),
 }
 
+# Réplica de solo lectura para listados y reportes (opcional, ver config/router.py)
+_replica = configuracion_replica(BASE_DIR)
+if TESTING:
+    # Otro alias sobre la base de tests: config/tests.py lo activa para probar el router
+    _replica = {**DATABASES['default'], 'TEST': {'MIRROR': 'default'}}
+if _replica:
+    DATABASES['replica'] = _replica
+DATABASE_ROUTERS = ['config.router.RouterReplica']
+
+# Con False las lecturas van a 'default' aunque haya réplica (p. ej. si viene muy atrasada)
+REPLICA_LECTURAS_ACTIVAS = not TESTING
+
+# Después de un POST, la sesión lee de 'default' durante estos segundos para ver sus
+# propios cambios aunque la réplica venga atrasada
+REPLICA_LECTURA_PEGADA_SEGUNDOS = 10
+
+# Caches en memoria y en archivos (BASE_DIR/cache o CACHE_DIR): default, catalogos,
+# sesiones, fragmentos y agenda (en tests, todos en memoria). Ver config/caches.py
+CACHES = configuracion_caches(BASE_DIR, {'CACHE_SOLO_MEMORIA': '1'} if TESTING else None)
+
 # ============================================
 # CONFIGURACIÓN DE SEGURIDAD
 # ============================================
 
 # Sesiones
 SESSION_COOKIE_AGE = 3600  # 1 hora (en segundos)
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'  # Lee del cache, escribe en ambos
+SESSION_CACHE_ALIAS = 'sesiones'
 SESSION_SAVE_EVERY_REQUEST = True  # Renueva la sesión en cada request
 SESSION_EXPIRE_AT_BROWSER_CLOSE = True  # Cierra sesión al cerrar el navegador
 SESSION_COOKIE_HTTPONLY = True  # No accesible desde JavaScript
@@ -115,6 +148,32 @@ SECURE_CONTENT_TYPE_NOSNIFF = True
 X_FRAME_OPTIONS = 'DENY'
 
 
+# ============================================
+# INSTRUMENTACIÓN DE CONSULTAS
+# ============================================
+
+# Cada vista declara su presupuesto con @presupuesto_consultas (UsuarioApp.decorators)
+CONSULTAS_INSTRUMENTACION_ACTIVA = True
+CONSULTAS_PRESUPUESTO_ESTRICTO = TESTING  # En tests superar el presupuesto lanza PresupuestoExcedido
+CONSULTAS_UMBRAL_DUPLICADAS = 3  # Misma consulta repetida N veces = posible N+1
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'consultas': {
+            'handlers': ['console'],
+            'level': 'WARNING',
+        },
+    },
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -156,6 +215,33 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/5.2/howto/static-files/
 
 STATIC_URL = 'static/'
+STATICFILES_DIRS = [BASE_DIR / 'static']  # Incluye static/vendor/ (Bootstrap, Font Awesome)
+STATIC_ROOT = BASE_DIR / 'staticfiles'  # Salida de construir_estaticos
+
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    # Nombres con hash del contenido (bootstrap.min.3f2a….css): se pueden cachear para siempre
+    'staticfiles': {
+        'BACKEND': 'config.estaticos.EstaticosConHash',
+    },
+    # Adjuntos clínicos (PacientesApp.adjuntos): fuera de MEDIA_ROOT, sin URL pública;
+    # solo se descargan a través de la vista, con sesión y permisos
+    'adjuntos': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+        'OPTIONS': {'location': BASE_DIR / 'adjuntos'},
+    },
+}
+
+# En tests no hay collectstatic: nombres sin hash
+if TESTING:
+    STORAGES['staticfiles'] = {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'}
+
+# Sin servidor web delante, Django sirve STATIC_ROOT (con DEBUG = False) usando las
+# variantes .gz/.br generadas por construir_estaticos
+SERVIR_ESTATICOS = True
+ESTATICOS_CACHE_SEGUNDOS = 3600  # Archivos sin hash en el nombre
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
@@ -193,4 +279,46 @@ EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
 
 # Configuración de recordatorios
 RECORDATORIO_EMAIL_HORAS_ANTES = 24  # Enviar recordatorio 24 horas antes
-RECORDATORIO_WHATSAPP_HORAS_ANTES = 24  # Para cuando implementemos WhatsApp
\ No newline at end of file
+RECORDATORIO_WHATSAPP_HORAS_ANTES = 24  # Para cuando implementemos WhatsApp
+
+# Validación de turnos
+TURNOS_VALIDAR_AGENDA = True  # Rechazar turnos fuera de las ConfiguracionAgenda del odontólogo (si tiene alguna)
+
+# Sobreturnos según ausentismo
+# Con TURNOS_SOBRETURNO_ACTIVO se permite superar turnos_simultaneos de la agenda
+# cuando la asistencia esperada de los pacientes (según su historial) lo permite
+TURNOS_SOBRETURNO_ACTIVO = False
+TURNOS_SOBRETURNO_MAXIMO = 1  # Turnos extra permitidos por encima de la capacidad
+TURNOS_SOBRETURNO_MIN_HISTORIAL = 5  # Turnos mínimos para confiar en la tasa de ausentismo
+
+# Índice de bloqueos de horario en memoria (se invalida al modificar un bloqueo)
+BLOQUEOS_CACHE_SEGUNDOS = 300  # Expiración para procesos que no vieron la modificación
+
+# Filas de la lista de turnos (la clave incluye las fechas de modificación, no hace falta invalidar)
+TURNOS_FILA_CACHE_SEGUNDOS = 3600
+
+# Ficha del paciente (la clave incluye la fecha de modificación, no hace falta invalidar)
+PACIENTES_RESUMEN_CACHE_SEGUNDOS = 600
+
+# Catálogo de antecedentes en memoria (se invalida al modificar una categoría)
+CATALOGO_ANTECEDENTES_CACHE_SEGUNDOS = 300  # Expiración para procesos que no vieron la modificación
+
+# Índice de obras sociales en memoria para el autocompletado (se invalida al modificar una)
+OBRAS_SOCIALES_CACHE_SEGUNDOS = 300
+
+# Lista de usuarios
+USUARIOS_POR_PAGINA = 25
+
+# Fotos de perfil (ver UsuarioApp.fotos)
+FOTO_PERFIL_MAX_BYTES = 5 * 1024 * 1024
+FOTO_PERFIL_MAX_PIXELES = 40_000_000  # Evita imágenes que ocupan gigas al decodificarse
+FOTO_PERFIL_MAX_LADO = 1024  # La original se guarda reducida a este lado mayor
+FOTO_PERFIL_MINIATURAS = {'chico': 48, 'mediano': 160}  # Miniaturas cuadradas (px)
+FOTO_PERFIL_CACHE_SEGUNDOS = 365 * 24 * 60 * 60  # La URL incluye el hash de la foto
+
+# Adjuntos clínicos: radiografías, escaneos y documentos (ver PacientesApp.adjuntos)
+ADJUNTOS_MAX_BYTES = 500 * 1024 * 1024  # Tamaño máximo de un archivo
+ADJUNTOS_MAX_BYTES_POR_PARTE = 8 * 1024 * 1024  # Cada parte de una subida en partes
+ADJUNTOS_SUBIDAS_DIR = BASE_DIR / 'adjuntos' / 'subidas'  # Subidas en curso (disco local)
+ADJUNTOS_SUBIDA_HORAS = 24  # Subidas sin completar que borra limpiar_adjuntos
+ADJUNTOS_MINIATURAS = {'chica': 200, 'grande': 1024}  # Lado mayor (px), se generan al pedirlas
@@ -0,0 +1,196 @@
+import re
+import tempfile
+import threading
+import time
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import connections
+from django.db.utils import ConnectionHandler
+from django.db.models.signals import post_save, post_delete
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from PacientesApp.models import ObraSocial, Prestacion
+from UsuarioApp.models import Usuario
+from .base_datos import configuracion_base_datos
+from .caches import (
+    ALIAS_VERSIONES, clave_versionada, invalidar_modelo, obtener_o_calcular, registrar_invalidacion, version_modelo,
+)
+from .estaticos import VENDOR
+from .router import RouterReplica, usar_replica
+
+
+class EstaticosTests(TestCase):
+    """base.html usa solo las copias locales de static/vendor/, con hash en el nombre"""
+
+    def test_base_referencia_solo_urls_locales_con_hash(self):
+        for ruta in VENDOR:
+            self.assertTrue((settings.BASE_DIR / 'static' / ruta).is_file(), ruta)
+
+        with tempfile.TemporaryDirectory() as destino, override_settings(
+            STATIC_ROOT=destino,
+            STORAGES={**settings.STORAGES, 'staticfiles': {'BACKEND': 'config.estaticos.EstaticosConHash'}},
+        ):
+            call_command('collectstatic', interactive=False, verbosity=0)
+            html = self.client.get(reverse('UsuarioApp:login')).content.decode()
+
+        urls = re.findall(r'<(?:link|script)[^>]+(?:href|src)="([^"]+)"', html)
+        self.assertGreaterEqual(len(urls), 4)
+        for url in urls:
+            self.assertRegex(url, r'^/static/[\w/.-]+\.[0-9a-f]{12}\.(css|js)$')
+
+
+class VersionesTests(TestCase):
+    """Claves versionadas por modelo (config.caches)"""
+
+    def setUp(self):
+        caches[ALIAS_VERSIONES].clear()
+
+    def test_clave_sin_modelos(self):
+        self.assertEqual(clave_versionada('pacientes:turnos', 42, 5), 'pacientes:turnos:42:5')
+
+    def test_clave_cambia_al_invalidar(self):
+        self.assertEqual(clave_versionada('catalogo', modelos=[ObraSocial, Prestacion]), 'catalogo:v0.0')
+        invalidar_modelo(Prestacion)
+        invalidar_modelo(Prestacion)
+        self.assertEqual(version_modelo(Prestacion), 2)
+        self.assertEqual(clave_versionada('catalogo', modelos=[ObraSocial, Prestacion]), 'catalogo:v0.2')
+
+    def test_registrar_invalidacion_sube_al_confirmar(self):
+        registrar_invalidacion(Prestacion)
+        for senial in (post_save, post_delete):
+            self.addCleanup(senial.disconnect, sender=Prestacion, dispatch_uid='invalidar_cache:pacientesapp.prestacion')
+        with self.captureOnCommitCallbacks(execute=True):
+            prestacion = Prestacion.objects.create(codigo='01.01', descripcion='Consulta')
+            # Hasta el commit nadie ve la versión nueva
+            self.assertEqual(version_modelo(Prestacion), 0)
+        self.assertEqual(version_modelo(Prestacion), 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            prestacion.delete()
+        self.assertEqual(version_modelo(Prestacion), 2)
+
+
+class ObtenerOCalcularTests(SimpleTestCase):
+    """obtener_o_calcular: un solo cálculo aunque varios lo pidan a la vez"""
+
+    def setUp(self):
+        caches['default'].clear()
+
+    def test_calcula_una_vez_y_cachea(self):
+        llamadas = []
+        for _ in range(3):
+            valor = obtener_o_calcular('prueba:simple', lambda: llamadas.append(1) or 'valor')
+        self.assertEqual(valor, 'valor')
+        self.assertEqual(len(llamadas), 1)
+
+    def test_pedidos_simultaneos_esperan_al_primero(self):
+        llamadas = []
+        resultados = []
+
+        def calcular():
+            llamadas.append(1)
+            time.sleep(0.2)
+            return 'lento'
+
+        hilos = [
+            threading.Thread(target=lambda: resultados.append(obtener_o_calcular('prueba:lento', calcular)))
+            for _ in range(5)
+        ]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+
+        self.assertEqual(resultados, ['lento'] * 5)
+        self.assertEqual(len(llamadas), 1)
+
+    def test_si_nadie_guarda_a_tiempo_calcula_igual(self):
+        # Otro proceso tomó el candado y murió sin guardar
+        caches['default'].add('prueba:huerfana:calculando', 1)
+        valor = obtener_o_calcular('prueba:huerfana', lambda: 'calculado', espera=0.1)
+        self.assertEqual(valor, 'calculado')
+
+
+@override_settings(REPLICA_LECTURAS_ACTIVAS=True)
+class RouterReplicaTests(TransactionTestCase):
+    """
+    Lecturas a 'replica' solo dentro de usar_replica() y escrituras siempre a 'default'.
+    En tests 'replica' es otro alias (otra conexión) sobre la misma base.
+    """
+    databases = {'default', 'replica'}
+
+    def consultas(self, funcion):
+        """(consultas en 'default', consultas en 'replica') al ejecutar funcion()"""
+        with CaptureQueriesContext(connections['default']) as default, \
+                CaptureQueriesContext(connections['replica']) as replica:
+            funcion()
+        return len(default), len(replica)
+
+    def test_router(self):
+        router = RouterReplica()
+        self.assertIsNone(router.db_for_read(ObraSocial))
+        with usar_replica():
+            self.assertEqual(router.db_for_read(ObraSocial), 'replica')
+            self.assertEqual(router.db_for_write(ObraSocial), 'default')
+            with usar_replica(False):
+                self.assertIsNone(router.db_for_read(ObraSocial))
+        self.assertTrue(router.allow_migrate('default', 'PacientesApp'))
+        self.assertFalse(router.allow_migrate('replica', 'PacientesApp'))
+
+        with override_settings(REPLICA_LECTURAS_ACTIVAS=False), usar_replica():
+            self.assertIsNone(router.db_for_read(ObraSocial))
+
+    def test_escrituras_van_a_default_dentro_de_usar_replica(self):
+        def escribir_y_leer():
+            with usar_replica():
+                obra_social = ObraSocial.objects.create(nombre='Obra Social Provincial', codigo='000001')
+                ObraSocial.objects.filter(pk=obra_social.pk).update(activa=False)
+                self.assertEqual(ObraSocial.objects.filter(activa=False).count(), 1)
+
+        default, replica = self.consultas(escribir_y_leer)
+        self.assertEqual((default, replica), (2, 1))
+
+    def test_vista_lee_de_replica_salvo_despues_de_escribir(self):
+        odontologo = Usuario.objects.create_user('odontologo', password='x', rol='odontologo')
+        self.client.force_login(odontologo)
+        listar = lambda: self.client.get(reverse('PacientesApp:lista_pacientes'))
+
+        self.assertGreater(self.consultas(listar)[1], 0)
+
+        # Cualquier POST de la sesión: durante REPLICA_LECTURA_PEGADA_SEGUNDOS lee de 'default'
+        self.client.post(reverse('PacientesApp:lista_pacientes'))
+        self.assertEqual(self.consultas(listar)[1], 0)
+
+        with override_settings(REPLICA_LECTURA_PEGADA_SEGUNDOS=0):
+            self.assertGreater(self.consultas(listar)[1], 0)
+
+
+class BaseDatosSqliteTests(SimpleTestCase):
+    """Perfil ajustado de SQLite: cada conexión nueva sale con los PRAGMAS de OPTIONS['init_command']"""
+
+    def conectar(self, entorno):
+        """Conexión nueva a un archivo SQLite temporal configurado con configuracion_base_datos()"""
+        carpeta = tempfile.TemporaryDirectory()
+        self.addCleanup(carpeta.cleanup)
+        configuracion = configuracion_base_datos(None, {'DB_NAME': f'{carpeta.name}/prueba.sqlite3', **entorno})
+        # ConnectionHandler exige 'default', pero SimpleTestCase no deja conectar con ese alias
+        conexiones = ConnectionHandler({'default': configuracion, 'ajustes': configuracion})
+        self.addCleanup(conexiones.close_all)
+        return conexiones['ajustes']
+
+    def pragma(self, conexion, nombre):
+        with conexion.cursor() as cursor:
+            return cursor.execute(f'PRAGMA {nombre}').fetchone()[0]
+
+    def test_conexion_nueva_en_wal_con_busy_timeout(self):
+        conexion = self.conectar({'DB_SQLITE_BUSY_TIMEOUT': '4321'})
+        self.assertEqual(self.pragma(conexion, 'journal_mode'), 'wal')
+        self.assertEqual(self.pragma(conexion, 'busy_timeout'), 4321)
+        self.assertEqual(self.pragma(conexion, 'synchronous'), 1)  # NORMAL
+        self.assertEqual(conexion.transaction_mode, 'IMMEDIATE')
+
+    def test_perfil_basico_deja_los_valores_de_sqlite(self):
+        conexion = self.conectar({'DB_SQLITE_PERFIL': 'basico'})
+        self.assertEqual(self.pragma(conexion, 'journal_mode'), 'delete')
+        self.assertEqual(self.pragma(conexion, 'busy_timeout'), 5000)
@@ -15,10 +15,11 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, include, re_path
 from django.conf import settings
 from django.conf.urls.static import static
 from django.views.generic import RedirectView
+from .estaticos import servir_estatico
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -30,4 +31,10 @@ urlpatterns = [
 
 # Para servir archivos media en desarrollo
 if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file
+    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+
+# Estáticos en producción sin servidor web delante (en desarrollo los sirve runserver)
+if not settings.DEBUG and settings.SERVIR_ESTATICOS:
+    urlpatterns += [
+        re_path(r'^%s(?P<ruta>.+)$' % settings.STATIC_URL.lstrip('/'), servir_estatico),
+    ]